@@ -1,11 +1,21 @@
 from errors import InvalidUpdate
-from git import git, CalledProcessError
+from git import git, object_reader
+from git_config_file import ConfigFileParseError, parse_config_file
+from git_odb import repository_dirs
+from git_parsers import parse_config_list
 from io_utils import encode_utf8, safe_decode
 from type_conversions import to_type
 
+from collections import OrderedDict
+import json
 import os
-from subprocess import Popen, PIPE, STDOUT
+import selectors
+import signal
+from subprocess import Popen, PIPE, STDOUT, TimeoutExpired
 from tempfile import mkstemp
+import threading
+import time
+import zlib
 
 # A list of regular expressions matching reference names created internally
 # by gerrit.
@@ -71,10 +81,14 @@ GIT_CONFIG_OPTS = {
     "hooks.branch-ref-namespace": {"default": (), "type": tuple},
     "hooks.combined-style-checking": {"default": False, "type": bool},
     "hooks.commit-email-formatter": {"default": None},
+    "hooks.commit-email-formatter-batch": {"default": False, "type": bool},
     "hooks.commit-extra-checker": {"default": None},
+    "hooks.commit-extra-checker-batch": {"default": False, "type": bool},
+    "hooks.commit-extra-checker-jobs": {"default": 1, "type": int},
     "hooks.commit-url": {"default": None},
     "hooks.debug-level": {"default": 0, "type": int},
     "hooks.email-new-commits-only": {"default": (), "type": tuple},
+    "hooks.email-transport": {"default": "sendmail"},
     "hooks.disable-email-diff": {"default": False, "type": bool},
     "hooks.disable-merge-commit-checks": {"default": False, "type": bool},
     "hooks.file-commit-cmd": {"default": None},
@@ -82,6 +96,8 @@ GIT_CONFIG_OPTS = {
     "hooks.force-precommit-checks": {"default": (), "type": tuple},
     "hooks.from-domain": {"default": None},
     "hooks.frozen-ref": {"default": (), "type": tuple},
+    "hooks.hook-time-budget": {"default": 0, "type": int},
+    "hooks.hook-timeout": {"default": 0, "type": int},
     "hooks.ignore-refs": {"default": GERRIT_INTERNAL_REFS, "type": tuple},
     "hooks.mailinglist": {"default": (), "type": tuple},
     "hooks.max-commit-emails": {"default": 100, "type": int},
@@ -99,8 +115,14 @@ GIT_CONFIG_OPTS = {
     "hooks.reject-merge-commits": {"default": (), "type": tuple},
     "hooks.rejected-branch-deletion-tip": {"default": None},
     "hooks.restrict-branch-deletion": {"default": False, "type": bool},
+    "hooks.smtp-server": {"default": "localhost"},
     "hooks.style-checker": {"default": "style_checker"},
+    "hooks.style-checker-cache-size": {"default": 0, "type": int},
     "hooks.style-checker-config-file": {"default": None},
+    "hooks.style-checker-jobs": {"default": 1, "type": int},
+    "hooks.style-checker-protocol": {"default": "exec"},
+    "hooks.style-checker-shard-by": {"default": "size"},
+    "hooks.style-checker-shards": {"default": 1, "type": int},
     "hooks.tag-ref-namespace": {"default": (), "type": tuple},
     "hooks.tn-required": {"default": False, "type": bool},
     "hooks.update-hook": {"default": None},
@@ -108,6 +130,11 @@ GIT_CONFIG_OPTS = {
     "hooks.use-standard-tag-ref-namespace": {"default": True, "type": bool},
 }
 
+# The maximum time (in seconds) given to a third-party hook to exit
+# once killed for running out of time, after which we stop waiting
+# for its output (see ThirdPartyHook).
+HOOK_KILL_TIMEOUT = 5
+
 # The maximum number of characters from a commit's subject
 # to be used as part of the subject of emails describing
 # the commit.
@@ -120,6 +147,11 @@ class ThirdPartyHook(object):
     This class aims at centralizing the handling of such options, so
     as to provide a consistent handling of these options.
 
+    The time a hook may run for can be limited via the hooks.hook-timeout
+    and hooks.hook-time-budget config options, in which case the hook
+    gets killed (along with all the processes it started) if it has not
+    finished executing in time.
+
     ATTRIBUTES
         hook_option_name: The name of the config option to use in order
             to get the path of the hook (if defined).
@@ -127,21 +159,43 @@ class ThirdPartyHook(object):
             the project does not define that option.
     """
 
-    def __init__(self, hook_option_name):
+    # The total time (in seconds) spent executing the third-party hooks
+    # which finished executing so far, to be checked against the
+    # hooks.hook-time-budget config option.
+    __time_used = 0.0
+
+    # The hooks currently executing: A dictionary, indexed by the PID
+    # of the hook's process, giving the value of time.monotonic() when
+    # the hook was started. The time spent so far executing these hooks
+    # also counts against the hooks.hook-time-budget config option.
+    __calls_in_progress = {}
+
+    # A lock protecting __time_used and __calls_in_progress, as hooks
+    # may be called from several threads at the same time.
+    __time_used_lock = threading.Lock()
+
+    def __init__(self, hook_option_name, hook_exe=None):
         """Initialize self.
 
         PARAMETERS
             hook_option_name: Same as the attribute.
+            hook_exe: The path to the hook, if not given by the value
+                of the hook_option_name option itself (Eg: for the
+                scripts listed in the hooks.mailinglist option).
         """
         self.hook_option_name = hook_option_name
-        self.hook_exe = git_config(hook_option_name)
+        self.hook_exe = (
+            hook_exe if hook_exe is not None else git_config(hook_option_name)
+        )
 
     @property
     def defined_p(self):
         """Return True if the project config set this hook, False if not."""
         return self.hook_exe is not None
 
-    def call(self, hook_input=None, hook_args=None, cwd=None):
+    def call(
+        self, hook_input=None, hook_args=None, cwd=None, on_start=None, stderr_p=True
+    ):
         """Call the script specified via self.hook_option_name.
 
         This method assumes that the repository's configuration
@@ -152,6 +206,9 @@ class ThirdPartyHook(object):
         Raises InvalidUpdate if we failed to call the hook for whatever
         reason (typically, the hook's path does not exist, or we do not
         have the right permissions for us to execute it).
+        Raises ThirdPartyHookTimeoutError if the hook ran out of time
+        (see the hooks.hook-timeout and hooks.hook-time-budget config
+        options).
 
         PARAMETERS
             hook_input: A string, containing the data to be sent to
@@ -162,6 +219,16 @@ class ThirdPartyHook(object):
             cwd: The working directory from which to execute the hook.
                 If None, the hook is executed from the current working
                 directory.
+            on_start: If not None, a function to be called with
+                the Popen object corresponding to the script's execution
+                as its only argument, as soon as the script has started
+                (Eg: to allow the script to be killed from another thread).
+                The script is then run in its own process group, so
+                the processes it started can be killed as well, using
+                kill_process_group.
+            stderr_p: If False, the script's standard error is not
+                captured, and the output of the script is only what
+                it printed on its standard output.
 
         RETURN VALUE
             Return a tuple with the following elements:
@@ -169,18 +236,77 @@ class ThirdPartyHook(object):
               - The Popen object corresponding the script's execution
                 (which, by the time this function returns, has finished
                 executing);
-              - The output of the script (stdout + stderr combined).
+              - The output of the script (stdout + stderr combined,
+                unless stderr_p is False).
+        """
+        p, out = self.__run(
+            hook_args,
+            cwd,
+            encode_utf8(hook_input) if hook_input is not None else None,
+            on_start,
+            stdin=PIPE if hook_input is not None else None,
+            stdout=PIPE,
+            stderr=STDOUT if stderr_p else None,
+        )
+        return (self.hook_exe, p, safe_decode(out))
+
+    def call_if_defined(self, hook_input=None, hook_args=None, cwd=None):
+        """If defined, call the script specified via self.hook_option_name.
+
+        This is a convenience wrapper around self.call. This wrapper
+        first checks whether the self.hook_option_name config is defined,
+        and only then tries to call the associated hook. Otherwise,
+        this method does nothing.
+
+        PARAMETERS
+            hook_input: Same as self.call.
+            hook_args: Same as self.call.
+            cwd: Same as self.call.
+
+        RETURN VALUE
+            If the self.hook_option_name config is defined, then returns
+            the same as self.call. Otherwise, returns None.
+        """
+        if not self.defined_p:
+            return
+        return self.call(hook_input=hook_input, hook_args=hook_args, cwd=cwd)
+
+    def start(self, hook_args=None, cwd=None):
+        """Start the script specified via self.hook_option_name.
+
+        This method assumes that the repository's configuration
+        defines a hook via the self.hook_option_name option.
+
+        Contrary to self.call, this method does not wait for the hook
+        to finish executing. It is the caller's responsibility to
+        communicate with the hook, and then to wait for its termination.
+
+        Raises InvalidUpdate if we failed to start the hook (see self.call).
+
+        PARAMETERS
+            hook_args: Same as self.call.
+            cwd: Same as self.call.
+
+        RETURN VALUE
+            The Popen object corresponding to the script's execution.
+            The script's standard input and output are pipes (see
+            the Popen object's stdin and stdout attributes), its
+            standard error being redirected to its standard output.
+            The script runs in its own process group, so that it can
+            be killed along with the processes it started (see
+            kill_process_group).
         """
         hook_cmd = [self.hook_exe]
         if hook_args is not None:
             hook_cmd.extend(hook_args)
         try:
-            p = Popen(
+            return Popen(
                 hook_cmd,
-                stdin=PIPE if hook_input is not None else None,
+                stdin=PIPE,
                 stdout=PIPE,
                 stderr=STDOUT,
                 cwd=cwd,
+                start_new_session=True,
             )
         except OSError as E:
             raise InvalidUpdate(
@@ -189,32 +315,537 @@ class ThirdPartyHook(object):
                 "{err_info}".format(self=self, err_info=str(E))
             )
 
-        if hook_input is not None:
-            hook_input = encode_utf8(hook_input)
-        out, _ = p.communicate(hook_input)
+    def request(self, p, request, timeout):
+        """Send a request to a hook started via self.start, and return its response.
 
-        return (self.hook_exe, p, safe_decode(out))
+        The request and the response are each expected to be a single
+        line. If the hook does not respond in time, it gets killed,
+        along with all the processes in its process group.
 
-    def call_if_defined(self, hook_input=None, hook_args=None, cwd=None):
-        """If defined, call the script specified via self.hook_option_name.
+        Raises OSError if the request cannot be sent, and
+        ThirdPartyHookTimeoutError if the hook does not respond
+        in time.
 
-        This is a convenience wrapper around self.call. This wrapper
-        first checks whether the self.hook_option_name config is defined,
-        and only then tries to call the associated hook. Otherwise,
-        this method does nothing.
+        PARAMETERS
+            p: The Popen object returned by self.start.
+            request: The request (a bytes object), including its
+                terminating newline.
+            timeout: The maximum time (in seconds) to wait for the
+                response, unless the hooks.hook-timeout or
+                hooks.hook-time-budget config options impose a shorter
+                time limit (the time spent waiting for the response
+                counts against the latter).
+
+        RETURN VALUE
+            The response (a bytes object). The response is normally
+            terminated by a newline, unless the hook closed its standard
+            output before sending a whole line (Eg: because it exited).
+        """
+        start_time = time.monotonic()
+        with ThirdPartyHook.__time_used_lock:
+            ThirdPartyHook.__calls_in_progress[p.pid] = start_time
+        try:
+            p.stdin.write(request)
+            p.stdin.flush()
+            (response, time_limit_option) = self.__read_response(p, start_time, timeout)
+        finally:
+            with ThirdPartyHook.__time_used_lock:
+                del ThirdPartyHook.__calls_in_progress[p.pid]
+                ThirdPartyHook.__time_used += time.monotonic() - start_time
+        if response is not None:
+            return response
+
+        kill_process_group(p)
+        if time_limit_option == "hooks.hook-timeout":
+            reason = (
+                "it did not respond within its time limit of {timeout}"
+                " seconds (hooks.hook-timeout)".format(
+                    timeout=git_config("hooks.hook-timeout")
+                )
+            )
+        elif time_limit_option == "hooks.hook-time-budget":
+            reason = self.__time_budget_overrun()
+        else:
+            reason = "it did not respond within {timeout} seconds".format(
+                timeout=timeout
+            )
+        raise ThirdPartyHookTimeoutError(
+            "{self.hook_option_name} ({self.hook_exe}) timed out"
+            " and was killed: {reason}.".format(self=self, reason=reason)
+        )
+
+    def __read_response(self, p, start_time, timeout):
+        """Wait for the response to a request sent by self.request, and return it.
 
         PARAMETERS
-            hook_input: Same as self.call.
+            p: Same as in self.request.
+            start_time: The value of time.monotonic() when the request
+                was sent.
+            timeout: Same as in self.request.
+
+        RETURN VALUE
+            A tuple with the following elements:
+              - The response (see self.request), or None if the hook
+                did not respond in time;
+              - If the hook did not respond in time, the name of
+                the config option whose time limit it exceeded, or None
+                if it exceeded the timeout.
+        """
+        # Read the response directly from the pipe, rather than via
+        # p.stdout, as buffered reads cannot be interrupted.
+        fd = p.stdout.fileno()
+        response = b""
+        with selectors.DefaultSelector() as selector:
+            selector.register(fd, selectors.EVENT_READ)
+            while True:
+                (time_left, time_limit_option) = self.__time_left(start_time)
+                response_time_left = timeout - (time.monotonic() - start_time)
+                if time_left is None or response_time_left < time_left:
+                    (time_left, time_limit_option) = (response_time_left, None)
+                if time_left <= 0:
+                    return (None, time_limit_option)
+                # Other hooks may use part of the time budget while
+                # we wait, so check the time left again once it elapsed.
+                if not selector.select(time_left):
+                    continue
+                data = os.read(fd, 64 * 1024)
+                response += data
+                if not data or response.endswith(b"\n"):
+                    return (response, None)
+
+    def call_batch(self, hook_inputs, hook_args=None, cwd=None):
+        """Call the script specified via self.hook_option_name in batch mode.
+
+        In batch mode, the hook is called only once for a whole series
+        of inputs, rather than once per input. The inputs are sent to
+        the hook via its standard input, each of them as a JSON document
+        on a line of its own. The hook is expected to print on its
+        standard output one line per input, in the same order, each
+        line being a JSON dictionary with the following key/value pairs:
+          - "status": The status the hook would have returned if it
+            had been called for that input alone (an integer);
+          - "output" (optional): The output the hook would have printed
+            if it had been called for that input alone (a string).
+
+        This method assumes that the repository's configuration
+        defines a hook via the self.hook_option_name option.
+
+        Raises InvalidUpdate if we failed to call the hook, and
+        ThirdPartyHookTimeoutError if the hook ran out of time
+        (see self.call).
+        Raises ThirdPartyHookBatchError if the hook returned nonzero,
+        or did not provide a valid result for each input.
+
+        PARAMETERS
+            hook_inputs: A list of objects to be sent to the hook
+                (each object must be serializable in JSON format).
             hook_args: Same as self.call.
             cwd: Same as self.call.
 
         RETURN VALUE
-            If the self.hook_option_name config is defined, then returns
-            the same as self.call. Otherwise, returns None.
+            Return a tuple with the following elements:
+              - The name of the script called as a hook;
+              - The Popen object corresponding the script's execution
+                (which, by the time this function returns, has finished
+                executing);
+              - A list with one tuple (status, output) per element
+                of hook_inputs, providing the hook's result for that
+                input.
+
+        REMARKS
+            Contrary to self.call, the hook's standard error is not
+            captured, and is therefore passed through to the user.
         """
-        if not self.defined_p:
-            return
-        return self.call(hook_input=hook_input, hook_args=hook_args, cwd=cwd)
+        hook_input = "".join(
+            json.dumps(batch_input) + "\n" for batch_input in hook_inputs
+        )
+        p, out = self.__run(
+            hook_args, cwd, encode_utf8(hook_input), stdin=PIPE, stdout=PIPE
+        )
+        out = safe_decode(out)
+
+        if p.returncode != 0:
+            raise ThirdPartyHookBatchError(
+                "{self.hook_option_name} returned nonzero:"
+                " {p.returncode}.".format(self=self, p=p),
+                out,
+            )
+
+        results = []
+        for (lineno, line) in enumerate(out.split("\n"), start=1):
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+            except ValueError:
+                raise ThirdPartyHookBatchError(
+                    "{self.hook_option_name} returned invalid JSON"
+                    " (line {lineno}).".format(self=self, lineno=lineno),
+                    out,
+                )
+            if (
+                not isinstance(result, dict)
+                or type(result.get("status")) is not int
+                or not isinstance(result.get("output", ""), str)
+            ):
+                raise ThirdPartyHookBatchError(
+                    "{self.hook_option_name} returned an invalid result"
+                    " (line {lineno}).".format(self=self, lineno=lineno),
+                    out,
+                )
+            results.append((result["status"], result.get("output", "")))
+
+        if len(results) != len(hook_inputs):
+            raise ThirdPartyHookBatchError(
+                "{self.hook_option_name} returned {nb_results} result(s)"
+                " for {nb_inputs} input(s).".format(
+                    self=self, nb_results=len(results), nb_inputs=len(hook_inputs)
+                ),
+                out,
+            )
+
+        return (self.hook_exe, p, results)
+
+    def __run(self, hook_args, cwd, hook_input, on_start=None, **popen_kwargs):
+        """Run the hook until it exits, within the time allowed.
+
+        The time the hook is allowed to run for is determined by
+        the hooks.hook-timeout and hooks.hook-time-budget config options.
+        If the hook does not finish executing in time, it gets killed,
+        along with all the processes in its process group.
+
+        Raises InvalidUpdate if we failed to start the hook, and
+        ThirdPartyHookTimeoutError if the hook ran out of time
+        (see self.call).
+
+        PARAMETERS
+            hook_args: Same as self.call.
+            cwd: Same as self.call.
+            hook_input: The data to be sent to the hook via its stdin
+                stream (a bytes object), or None.
+            on_start: Same as self.call.
+            popen_kwargs: Additional arguments for the Popen constructor
+                (Eg: stdin, stdout and stderr).
+
+        RETURN VALUE
+            Return a tuple with the following elements:
+              - The Popen object corresponding the script's execution
+                (which, by the time this function returns, has finished
+                executing);
+              - The output of the script (a bytes object), or None
+                if it was not captured.
+        """
+        # If the hook may need to be killed, either because it runs
+        # out of time or because it gets cancelled via on_start, run it
+        # in its own process group, so we can kill the processes it
+        # started as well.
+        new_session_p = (
+            git_config("hooks.hook-timeout") > 0
+            or git_config("hooks.hook-time-budget") > 0
+            or on_start is not None
+        )
+        if git_config("hooks.hook-time-budget") > 0:
+            time_left = self.__time_budget_left()
+            if time_left <= 0:
+                raise ThirdPartyHookTimeoutError(
+                    "Cannot call {self.hook_option_name} ({self.hook_exe}):"
+                    " {reason}.".format(self=self, reason=self.__time_budget_overrun())
+                )
+
+        hook_cmd = [self.hook_exe]
+        if hook_args is not None:
+            hook_cmd.extend(hook_args)
+        start_time = time.monotonic()
+        try:
+            p = HookProcess(
+                hook_cmd,
+                cwd=cwd,
+                start_new_session=new_session_p,
+                **popen_kwargs
+            )
+        except OSError as E:
+            raise InvalidUpdate(
+                "Invalid {self.hook_option_name} configuration"
+                " ({self.hook_exe}):\n"
+                "{err_info}".format(self=self, err_info=str(E))
+            )
+
+        with ThirdPartyHook.__time_used_lock:
+            ThirdPartyHook.__calls_in_progress[p.pid] = start_time
+        try:
+            if on_start is not None:
+                on_start(p)
+            (out, time_limit_option) = self.__communicate(p, hook_input, start_time)
+        finally:
+            with ThirdPartyHook.__time_used_lock:
+                del ThirdPartyHook.__calls_in_progress[p.pid]
+                ThirdPartyHook.__time_used += time.monotonic() - start_time
+        elapsed_time = time.monotonic() - start_time
+        self.__print_usage(p, elapsed_time)
+
+        if time_limit_option == "hooks.hook-timeout":
+            reason = (
+                "it ran for {elapsed_time:.1f} seconds, exceeding"
+                " its time limit of {timeout} seconds"
+                " (hooks.hook-timeout) by {overrun:.1f} seconds".format(
+                    elapsed_time=elapsed_time,
+                    timeout=git_config("hooks.hook-timeout"),
+                    overrun=elapsed_time - git_config("hooks.hook-timeout"),
+                )
+            )
+        elif time_limit_option == "hooks.hook-time-budget":
+            reason = self.__time_budget_overrun()
+        if time_limit_option is not None:
+            raise ThirdPartyHookTimeoutError(
+                "{self.hook_option_name} ({self.hook_exe}) timed out"
+                " and was killed: {reason}.".format(self=self, reason=reason),
+                safe_decode(out) if out is not None else "",
+            )
+
+        return (p, out)
+
+    def __communicate(self, p, hook_input, start_time):
+        """Send hook_input to the hook, and wait for it to exit, or time out.
+
+        If the hook runs out of time, it gets killed, along with all
+        the processes in its process group.
+
+        PARAMETERS
+            p: The HookProcess object of the hook's process.
+            hook_input: Same as in self.__run.
+            start_time: The value of time.monotonic() when the hook
+                was started.
+
+        RETURN VALUE
+            A tuple with the following elements:
+              - The output of the hook (a bytes object), or None
+                if it was not captured;
+              - The name of the config option whose time limit
+                the hook exceeded, or None if the hook exited in time.
+        """
+        while True:
+            (time_left, time_limit_option) = self.__time_left(start_time)
+            if time_left is not None and time_left <= 0:
+                break
+            try:
+                out, _ = p.communicate(hook_input, timeout=time_left)
+                return (out, None)
+            except TimeoutExpired:
+                # The input, if any, is still being sent to the hook,
+                # and must not be passed again.
+                hook_input = None
+                # Other hooks may have used part of the time budget
+                # in the meantime, so check the time left again.
+
+        kill_process_group(p)
+        try:
+            out, _ = p.communicate(timeout=HOOK_KILL_TIMEOUT)
+        except TimeoutExpired as E:  # pragma: no cover (never hangs in testsuite)
+            # One of the hook's processes escaped its process group
+            # (Eg: by calling setsid) while keeping the hook's output
+            # open. Do not wait for it.
+            out = E.output
+            for f in (p.stdin, p.stdout, p.stderr):
+                if f is not None:
+                    f.close()
+            p.wait()
+        return (out, time_limit_option)
+
+    def __time_left(self, start_time):
+        """Return the time left for the hook to run.
+
+        PARAMETERS
+            start_time: The value of time.monotonic() when the hook
+                was started.
+
+        RETURN VALUE
+            A tuple with the following elements:
+              - The time (in seconds) the hook may still run for
+                (zero or negative if the hook ran out of time),
+                or None if unlimited;
+              - The name of the config option imposing that limit,
+                or None if unlimited.
+
+        REMARKS
+            When several hooks are executing at the same time,
+            the hooks.hook-time-budget gets used up faster, so
+            the time left for the hook in that budget is shared
+            between all those hooks. Since hooks may start or exit
+            in the meantime, the caller should call this function
+            again once that time has elapsed.
+        """
+        time_left = None
+        time_limit_option = None
+
+        timeout = git_config("hooks.hook-timeout")
+        if timeout > 0:
+            time_left = timeout - (time.monotonic() - start_time)
+            time_limit_option = "hooks.hook-timeout"
+
+        if git_config("hooks.hook-time-budget") > 0:
+            with ThirdPartyHook.__time_used_lock:
+                nb_calls_in_progress = len(ThirdPartyHook.__calls_in_progress)
+            budget_time_left = self.__time_budget_left() / max(nb_calls_in_progress, 1)
+            if time_left is None or budget_time_left < time_left:
+                time_left = budget_time_left
+                time_limit_option = "hooks.hook-time-budget"
+
+        return (time_left, time_limit_option)
+
+    def __time_budget_used(self):
+        """Return the time (in seconds) used so far in hooks.hook-time-budget.
+
+        This includes the time spent executing the hooks which are
+        currently executing.
+        """
+        now = time.monotonic()
+        with ThirdPartyHook.__time_used_lock:
+            return ThirdPartyHook.__time_used + sum(
+                now - start_time
+                for start_time in ThirdPartyHook.__calls_in_progress.values()
+            )
+
+    def __time_budget_left(self):
+        """Return the time (in seconds) left in hooks.hook-time-budget.
+
+        This function assumes that the hooks.hook-time-budget config
+        option is set.
+        """
+        return git_config("hooks.hook-time-budget") - self.__time_budget_used()
+
+    def __time_budget_overrun(self):
+        """Return a description of how much the hooks.hook-time-budget was exceeded.
+
+        This function assumes that the hooks.hook-time-budget config
+        option is set.
+        """
+        time_budget = git_config("hooks.hook-time-budget")
+        time_used = self.__time_budget_used()
+        return (
+            "the hooks ran for a total of {time_used:.1f} seconds, exceeding"
+            " their time budget of {time_budget} seconds"
+            " (hooks.hook-time-budget) by {overrun:.1f} seconds".format(
+                time_used=time_used,
+                time_budget=time_budget,
+                overrun=time_used - time_budget,
+            )
+        )
+
+    def __print_usage(self, p, elapsed_time):
+        """Print the resources used by the hook, as a debug trace.
+
+        PARAMETERS
+            p: The HookProcess object of the hook's process, which
+                has finished executing.
+            elapsed_time: The hook's execution time (in seconds).
+        """
+        # Imported here, as the utils module imports this module.
+        from utils import debug
+
+        if p.rusage is None:  # pragma: no cover (see HookProcess)
+            usage = "cpu time: unknown, max rss: unknown"
+        else:
+            usage = "cpu time: {cpu:.3f}s, max rss: {maxrss} KB".format(
+                cpu=p.rusage.ru_utime + p.rusage.ru_stime,
+                maxrss=p.rusage.ru_maxrss,
+            )
+        debug(
+            "{self.hook_option_name} ({self.hook_exe}): wall time: {wall:.3f}s,"
+            " {usage}".format(self=self, wall=elapsed_time, usage=usage),
+            level=3,
+        )
+
+
+def kill_process_group(p):
+    """Kill the given process, along with all the processes in its process group.
+
+    PARAMETERS
+        p: The Popen object of a process started in its own process
+            group (Eg: using start_new_session=True).
+    """
+    try:
+        os.killpg(p.pid, signal.SIGKILL)
+    except OSError:  # pragma: no cover (process exited just in time)
+        pass
+
+
+class HookProcess(Popen):
+    """A Popen recording the resource usage of its process.
+
+    ATTRIBUTES
+        rusage: The resource usage of the process (see os.wait4),
+            once it has been waited for, or None.
+
+    REMARKS
+        The resource usage is obtained by waiting for the process
+        with os.wait4 rather than os.waitpid, which requires overriding
+        Popen._try_wait, used by Popen.wait (and therefore by
+        Popen.communicate). The resource usage remains unknown
+        if the process gets waited for by other means (Eg: Popen.poll).
+    """
+
+    rusage = None
+
+    def _try_wait(self, wait_flags):
+        """Same as Popen._try_wait, but using os.wait4."""
+        try:
+            (pid, sts, rusage) = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:  # pragma: no cover (same as Popen._try_wait)
+            # This happens if SIGCLD is set to be ignored or waiting
+            # for child processes has otherwise been disabled for our
+            # process.  This child is dead, we can't get the status.
+            return (self.pid, 0)
+        if pid == self.pid:
+            self.rusage = rusage
+        return (pid, sts)
+
+
+class ThirdPartyHookTimeoutError(InvalidUpdate):
+    """An exception raised when a hook ran out of time.
+
+    See the hooks.hook-timeout and hooks.hook-time-budget config options.
+
+    The exception's arguments are the lines describing the problem,
+    followed by the lines of the hook's output, as expected for
+    an InvalidUpdate.
+
+    ATTRIBUTES
+        message: A description of the problem.
+        out: The output of the hook before it got killed (a string).
+    """
+
+    def __init__(self, message, out=""):
+        """Initialize self.
+
+        PARAMETERS
+            message: Same as the attribute.
+            out: Same as the attribute.
+        """
+        super(ThirdPartyHookTimeoutError, self).__init__(message, *out.splitlines())
+        self.message = message
+        self.out = out
+
+
+class ThirdPartyHookBatchError(Exception):
+    """An exception raised when a hook called in batch mode misbehaves.
+
+    The exception's message describes the problem.
+
+    ATTRIBUTES
+        message: The exception's message.
+        out: The output of the hook.
+    """
+
+    def __init__(self, message, out):
+        """Initialize self.
+
+        PARAMETERS
+            message: Same as the attribute.
+            out: Same as the attribute.
+        """
+        super(ThirdPartyHookBatchError, self).__init__(message)
+        self.message = message
+        self.out = out
 
 
 class UnsupportedOptionName(Exception):
@@ -231,6 +862,34 @@ class UnsupportedOptionName(Exception):
 # its place.
 __git_config_map = None
 
+# The value of config_commit when __git_config_map was initialized.
+# This allows us to detect that config_commit was changed since
+# then (see init.init_all_globals), and that __git_config_map
+# therefore needs to be initialized again.
+__git_config_map_commit = None
+
+# The name of the file, in the repository's git directory, where
+# the contents of __git_config_map is cached, so as to avoid having
+# to parse the CONFIG_FILENAME file each time the hooks get called.
+CONFIG_CACHE_FILENAME = "git-hooks-config-cache.json"
+
+# The version of the format of the CONFIG_CACHE_FILENAME file.
+# It must be changed each time the format changes, or whenever
+# the data it contains could be different for a given version
+# of CONFIG_FILENAME, so as to invalidate the existing caches.
+# (changes to GIT_CONFIG_OPTS automatically invalidate them).
+CONFIG_CACHE_VERSION = 1
+
+# The config maps preloaded by the git-hooks server (see
+# preload_git_config), indexed by git_config_cache_key, from the least
+# recently used to the most recently used. The processes forked by
+# the server inherit them, which saves them from reading the
+# CONFIG_CACHE_FILENAME file.
+__preloaded_git_config_maps = OrderedDict()
+
+# The maximum number of entries in __preloaded_git_config_maps.
+PRELOADED_GIT_CONFIG_MAPS_SIZE = 64
+
 CANNOT_FIND_CONFIG_FILE_ERROR = """\
 -----------------------------------------------------------------
 Unable to find the file {CONFIG_FILENAME} in {CONFIG_REF}.
@@ -249,19 +908,19 @@ def git_config(option_name):
     PARAMETERS
         option_name: The name of the git config option to query.
     """
-    global __git_config_map
-
     if option_name not in GIT_CONFIG_OPTS:
         raise UnsupportedOptionName(option_name)
 
-    if __git_config_map is None:
+    if __git_config_map is None or __git_config_map_commit != config_commit:
         initialize_git_config_map()
     val = __git_config_map[option_name]
 
     # If this option as a 'type' specified, then convert it to
-    # this type if necessary.  We do this here, rather than during
-    # initialize_git_config_map to avoid the potential for causing
-    # an error for options which might not be used in the end.
+    # this type if necessary. This is normally done when initializing
+    # the config map, except when the conversion fails, in which case
+    # we report the error here, rather than during the initialization,
+    # to avoid the potential for causing an error for options which
+    # might not be used in the end.
     if "type" in GIT_CONFIG_OPTS[option_name] and isinstance(val, str):
         try:
             val = to_type(val, GIT_CONFIG_OPTS[option_name]["type"])
@@ -285,63 +944,81 @@ def git_config(option_name):
 def initialize_git_config_map():
     """Initialize the __git_config_map global."""
     global __git_config_map
+    global __git_config_map_commit
 
     # The hooks' configuration is stored in a special reference
     # (see CONFIG_REF), inside a file whose name is CONFIG_FILENAME.
-    # Get that file.
-    (tmp_fd, tmp_file) = mkstemp("tmp-git-hooks-")
+    # Get that file's SHA1, which we use to determine whether
+    # we have a cached version of the corresponding configuration.
+    cfg_info = object_reader().info(config_commit + ":" + CONFIG_FILENAME)
+    if cfg_info is None:
+        # Either the CONFIG_REF reference does not exist, or
+        # the config file itself does not exist. Either way,
+        # it means that the repository has not been properly
+        # set up for these hooks, which is a fatal error.
+        raise InvalidUpdate(*CANNOT_FIND_CONFIG_FILE_ERROR.splitlines())
+    cfg_sha = cfg_info[0]
+
+    config_map = load_git_config_cache(cfg_sha)
+    if config_map is None:
+        config_map = parse_git_config(object_reader().contents(cfg_sha))
+        save_git_config_cache(cfg_sha, config_map)
+
+    __git_config_map = config_map
+    __git_config_map_commit = config_commit
+
+
+def parse_git_config(cfg_contents, git_fallback_p=True):
+    """Parse the given config file, and return the corresponding config map.
+
+    PARAMETERS
+        cfg_contents: The contents of the config file (a byte string).
+        git_fallback_p: If False, raise ConfigFileParseError when
+            the file has a syntax error, rather than asking git
+            to parse it (see below).
+
+    RETURN VALUE
+        A dictionary, suitable for use as __git_config_map.
+    """
+    # Get the currently defined config values, all in one go.
+    #
+    # We normally parse the file ourselves, as this is faster than
+    # asking git to do it (which requires saving the file's contents
+    # in a temporary file first). But if the file turns out to have
+    # some syntax error, let git do the parsing so that git reports
+    # the error, as it would normally do.
     try:
-        cfg_file = tmp_file
-        try:
-            git.show(config_commit + ":" + CONFIG_FILENAME, _outfile=tmp_fd)
-        except CalledProcessError:
-            # Either the CONFIG_REF reference does not exist, or
-            # the config file itself does not exist. Either way,
-            # it means that the repository has not been properly
-            # set up for these hooks, which is a fatal error.
-            raise InvalidUpdate(*CANNOT_FIND_CONFIG_FILE_ERROR.splitlines())
-        os.close(tmp_fd)
-        # Get the currently defined config values, all in one go.
-        # Use "--file <cfg_file>" to make sure that we only parse
-        # the file we just retrieved. Otherwise, git also parses
-        # the user's config file.
-        #
-        # Also, use the nul character as the separator between each
-        # entry (-z option) so as to not confuse them with potential
-        # newlines being used inside the value of an option.
-        all_configs = git.config("-z", "-l", "--file", cfg_file, _decode=True).split(
-            "\x00"
-        )
-    finally:
-        os.unlink(tmp_file)
+        records = [safe_decode(record) for record in parse_config_file(cfg_contents)]
+    except ConfigFileParseError:
+        if not git_fallback_p:
+            raise
+        records = git_config_list(cfg_contents)
+    all_configs = parse_config_list(records)
 
     all_configs_map = {}
-    for config in all_configs:
-        if not config:
-            # "git config -z" adds a nul character at the end of its output,
-            # which cause all_configs to end with an empty entry. Just ignore
-            # those.
-            continue
-        config_name, config_val = config.split("\n", 1)
-        if (
-            config_name in GIT_CONFIG_OPTS
-            and "type" in GIT_CONFIG_OPTS[config_name]
-            and GIT_CONFIG_OPTS[config_name]["type"] == tuple
-        ):
-            # This config is a list of potentially multiple values, and
-            # therefore multiple entries with the same config name can be
-            # provided for each value. Just save them in a list.
-            if config_name not in all_configs_map:
-                all_configs_map[config_name] = ()
+    for (config_name, config_val) in all_configs:
+        config_type = GIT_CONFIG_OPTS.get(config_name, {}).get("type")
+        if config_val is None:
+            # An option without a value (Eg: "[hooks] some-option").
+            # For git, this means "true" for a boolean option, and
+            # the empty string otherwise.
+            config_val = True if config_type == bool else ""
+        if config_type == tuple:
+            # This config is a list of potentially multiple values,
+            # and therefore multiple entries with the same config name
+            # can be provided for each value. Just save them in a list.
+            #
             # Also, at least for now, we support coma-separated entries
-            # for this multiple-value configs. So split each entry as well...
-            config_val = to_type(config_val, tuple)
-            all_configs_map[config_name] += config_val
+            # for this multiple-value configs. So split each entry
+            # as well...
+            all_configs_map.setdefault(config_name, []).extend(
+                to_type(config_val, tuple)
+            )
         else:
             all_configs_map[config_name] = config_val
 
-    # Populate the __git_config_map dictionary...
-    __git_config_map = {}
+    # Populate the config map...
+    config_map = {}
     for config_name in GIT_CONFIG_OPTS.keys():
         # Get the config value from either the all_configs_map
         # if defined, or else from the default value.
@@ -354,10 +1031,171 @@ def initialize_git_config_map():
                 # would have to repeat that default in their repository's
                 # configuration first before adding their own values,
                 # as if starting the config option from scratch.
-                config_val = GIT_CONFIG_OPTS[config_name]["default"] + config_val
+                config_val = GIT_CONFIG_OPTS[config_name]["default"] + tuple(config_val)
 
         else:
             config_val = GIT_CONFIG_OPTS[config_name]["default"]
 
-        # Finally, save the config value if __git_config_map
-        __git_config_map[config_name] = config_val
+        # Convert the value to the option's type now, so that
+        # the cached configuration holds the converted values.
+        # If the conversion fails, keep the value as is, and
+        # let git_config report the error if the option ends up
+        # being used.
+        if "type" in GIT_CONFIG_OPTS[config_name] and isinstance(config_val, str):
+            try:
+                config_val = to_type(config_val, GIT_CONFIG_OPTS[config_name]["type"])
+            except ValueError:
+                pass
+
+        # Finally, save the config value in config_map
+        config_map[config_name] = config_val
+
+    return config_map
+
+
+def git_config_list(cfg_contents):
+    """Return the output of "git config -z --list" for the given config file.
+
+    PARAMETERS
+        cfg_contents: The contents of the config file (a byte string).
+
+    RETURN VALUE
+        A list of the (decoded) NUL-separated records of the output.
+    """
+    (tmp_fd, tmp_file) = mkstemp("tmp-git-hooks-")
+    try:
+        cfg_file = tmp_file
+        with os.fdopen(tmp_fd, "wb") as f:
+            f.write(cfg_contents)
+        # Use "--file <cfg_file>" to make sure that we only parse
+        # the file we just retrieved. Otherwise, git also parses
+        # the user's config file.
+        #
+        # Also, use the nul character as the separator between each
+        # entry (-z option) so as to not confuse them with potential
+        # newlines being used inside the value of an option.
+        return list(
+            git.config("-z", "-l", "--file", cfg_file, _iter_sep=b"\x00", _decode=True)
+        )
+    finally:
+        os.unlink(tmp_file)
+
+
+def git_config_cache_key(cfg_sha):
+    """Return the key identifying the config map for the given config file.
+
+    PARAMETERS
+        cfg_sha: The SHA1 of the CONFIG_FILENAME blob.
+    """
+    # Include a checksum of GIT_CONFIG_OPTS, so that changes to the list
+    # of options or to their default values invalidate the cache.
+    # We use zlib rather than hashlib, because zlib is already loaded
+    # (see git_odb), whereas hashlib is comparatively slow to import.
+    opts_checksum = zlib.crc32(repr(sorted(GIT_CONFIG_OPTS.items())).encode("utf-8"))
+    return "%d:%s:%08x" % (CONFIG_CACHE_VERSION, cfg_sha, opts_checksum)
+
+
+def git_config_cache_filename():
+    """Return the full path of the CONFIG_CACHE_FILENAME file."""
+    (git_dir, _) = repository_dirs()
+    return os.path.join(git_dir, CONFIG_CACHE_FILENAME)
+
+
+def load_git_config_cache(cfg_sha):
+    """Return the cached config map for the given config file, or None.
+
+    The config maps preloaded by the git-hooks server, if any, are used
+    in priority over the CONFIG_CACHE_FILENAME file.
+
+    PARAMETERS
+        cfg_sha: The SHA1 of the CONFIG_FILENAME blob.
+    """
+    config_map = __preloaded_git_config_maps.get(git_config_cache_key(cfg_sha))
+    if config_map is not None:
+        # Return a copy, as git_config may modify the config map.
+        return dict(config_map)
+
+    try:
+        with open(git_config_cache_filename(), encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(cache, dict)
+        or cache.get("key") != git_config_cache_key(cfg_sha)
+        or not isinstance(cache.get("config"), dict)
+        or set(cache["config"]) != set(GIT_CONFIG_OPTS)
+    ):
+        return None
+    # JSON does not have tuples, so they were saved as lists.
+    return {
+        config_name: tuple(config_val) if isinstance(config_val, list) else config_val
+        for (config_name, config_val) in cache["config"].items()
+    }
+
+
+def save_git_config_cache(cfg_sha, config_map):
+    """Save the given config map in the CONFIG_CACHE_FILENAME file.
+
+    This function does nothing if the cache cannot be written
+    (Eg: the repository is read-only for the current user),
+    since the cache is only an optimization.
+
+    PARAMETERS
+        cfg_sha: The SHA1 of the CONFIG_FILENAME blob.
+        config_map: The config map corresponding to that blob.
+    """
+    cache_filename = git_config_cache_filename()
+    tmp_file = None
+    try:
+        # Write the cache in a temporary file first, and then move it
+        # to its final location, so that other processes never see
+        # a partially written cache.
+        (tmp_fd, tmp_file) = mkstemp(
+            prefix=CONFIG_CACHE_FILENAME, dir=os.path.dirname(cache_filename)
+        )
+        with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
+            json.dump({"key": git_config_cache_key(cfg_sha), "config": config_map}, f)
+        os.chmod(tmp_file, 0o644)
+        os.replace(tmp_file, cache_filename)
+        tmp_file = None
+    except OSError:
+        pass
+    finally:
+        if tmp_file is not None:
+            os.unlink(tmp_file)
+
+
+def git_config_preloaded_p(cfg_sha):
+    """Return True if the given config file was preloaded (see preload_git_config).
+
+    PARAMETERS
+        cfg_sha: The SHA1 of the CONFIG_FILENAME blob.
+    """
+    key = git_config_cache_key(cfg_sha)
+    if key not in __preloaded_git_config_maps:
+        return False
+    __preloaded_git_config_maps.move_to_end(key)
+    return True
+
+
+def preload_git_config(cfg_sha, cfg_contents):
+    """Parse the given config file, and keep the resulting config map in memory.
+
+    This function is used by the git-hooks server (see server.py),
+    so that the processes it forks to run the hooks inherit the config
+    map (see load_git_config_cache), rather than reading it from the
+    CONFIG_CACHE_FILENAME file. Files with syntax errors are ignored,
+    so as to let the hooks report the error.
+
+    PARAMETERS
+        cfg_sha: The SHA1 of the CONFIG_FILENAME blob.
+        cfg_contents: The contents of that blob (a byte string).
+    """
+    try:
+        config_map = parse_git_config(cfg_contents, git_fallback_p=False)
+    except ConfigFileParseError:
+        return
+    __preloaded_git_config_maps[git_config_cache_key(cfg_sha)] = config_map
+    if len(__preloaded_git_config_maps) > PRELOADED_GIT_CONFIG_MAPS_SIZE:
+        __preloaded_git_config_maps.popitem(last=False)
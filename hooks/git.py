@@ -24,11 +24,19 @@
 # |
 # | (These are adapted from git-bz)
 
+import atexit
 import os
 import re
 from subprocess import Popen, PIPE, STDOUT
 import subprocess
-
+from tempfile import TemporaryFile
+import threading
+
+import git_odb
+from git_odb import ObjectStoreError
+import git_refs
+from git_refs import RefStoreError, literal_prefix
+from git_parsers import GitOutputParseError, parse_diff_tree, parse_diff_tree_stdin
 from io_utils import safe_decode
 
 
@@ -61,6 +69,18 @@ def git_run(command, *args, **kwargs):
            _input=<str>: Feed <str> to stdinin of the command
            _outfile=<file): Use <file> as the output file descriptor
            _split_lines: Return an array with one string per returned line
+           _no_strip: Return the output as is, rather than stripping
+               any trailing whitespaces and newlines (see below).
+           _iter: Return an iterator which yields the output one line
+               at a time (without the line terminator) while the command
+               is running, rather than the whole output once the command
+               has completed. This allows callers to process the output
+               of commands which produce a large amount of output without
+               having to hold it in memory all at once. See iter_git_output
+               for more details.
+           _iter_sep=<bytes>: Same as _iter, but using the given byte
+               string as the record separator instead of the newline
+               character (Eg: b"\0" for commands using the -z option).
            _decode: This only applies if the _outfile parameter is not used.
                Decode the command's output using safe_decode. Otherwise,
                return the output as a byte string.
@@ -79,6 +99,8 @@ def git_run(command, *args, **kwargs):
     input = None
     outfile = None
     do_split_lines = False
+    do_strip = True
+    iter_sep = None
     do_decode = False
     for (k, v) in kwargs.items():
         if k == "_cwd":
@@ -91,6 +113,12 @@ def git_run(command, *args, **kwargs):
             outfile = v
         elif k == "_split_lines":
             do_split_lines = True
+        elif k == "_no_strip":
+            do_strip = False
+        elif k == "_iter":
+            iter_sep = b"\n"
+        elif k == "_iter_sep":
+            iter_sep = v
         elif k == "_decode":
             do_decode = True
         elif v is True:
@@ -103,6 +131,9 @@ def git_run(command, *args, **kwargs):
 
     to_run.extend(args)
 
+    if iter_sep is not None:
+        return iter_git_output(to_run, cwd, env, input, iter_sep, do_decode)
+
     stdout = outfile if outfile else PIPE
     stdin = None if input is None else PIPE
 
@@ -124,7 +155,8 @@ def git_run(command, *args, **kwargs):
         # Strip any trailing whitespaces and newlines at the end of
         # the output. This is because Git commands often add an extra
         # newline at the end of the data we're querying.
-        output = output.rstrip()
+        if do_strip:
+            output = output.rstrip()
 
         if do_split_lines:
             return output.splitlines()
@@ -132,6 +164,105 @@ def git_run(command, *args, **kwargs):
             return output
 
 
+def iter_git_output(to_run, cwd, env, input, record_sep, do_decode):
+    """Run the given git command, and iterate over its output.
+
+    This is the implementation of git_run's _iter and _iter_sep
+    parameters.  The command is started when the iteration starts.
+    Its output is read in chunks, and split into records as it
+    arrives, so the memory used does not depend on the size of
+    the output (only on the size of the largest record).
+
+    Once the output has been entirely consumed, CalledProcessError
+    is raised if the command returned nonzero.  Since the command's
+    standard error cannot be merged into the output being parsed,
+    it is saved aside, and used as the exception's output.
+
+    If the iterator is closed before the output has been entirely
+    consumed (Eg: the caller stopped iterating early), the command
+    is killed, and its exit status is ignored.
+
+    PARAMETERS
+        to_run: The command to run (a list).
+        cwd: Same as the "cwd" parameter of the Popen constructor.
+        env: Same as the "env" parameter of the Popen constructor.
+        input: If not None, some data to be fed to the command's
+            standard input (a string or a byte string).
+        record_sep: The record separator (a byte string).
+        do_decode: If True, decode each record using safe_decode.
+            Otherwise, the records are returned as byte strings.
+    """
+    with TemporaryFile() as stderr_file:
+        process = Popen(
+            to_run,
+            stdout=PIPE,
+            stderr=stderr_file,
+            stdin=None if input is None else PIPE,
+            cwd=cwd,
+            env=env,
+        )
+
+        # Feed the input from a separate thread, to avoid a deadlock
+        # if the command's output fills the pipe before the command
+        # has consumed all of its input.
+        input_thread = None
+        if input is not None:
+            if isinstance(input, str):
+                input = input.encode("utf-8")
+
+            def write_input():
+                try:
+                    process.stdin.write(input)
+                    process.stdin.close()
+                except BrokenPipeError:
+                    # The command terminated without reading all
+                    # its input. Its exit status will tell.
+                    pass
+
+            input_thread = threading.Thread(target=write_input, daemon=True)
+            input_thread.start()
+
+        completed_p = False
+        try:
+            # The beginning of the current record, when that record
+            # spans multiple chunks of output.
+            partial_record = []
+            while True:
+                chunk = process.stdout.read1(65536)
+                if not chunk:
+                    break
+                records = chunk.split(record_sep)
+                # The last element is the (possibly empty) beginning
+                # of the next record, which is not complete yet.
+                next_partial_record = records.pop()
+                if records:
+                    if partial_record:
+                        partial_record.append(records[0])
+                        records[0] = b"".join(partial_record)
+                        partial_record = []
+                    for record in records:
+                        yield safe_decode(record) if do_decode else record
+                if next_partial_record:
+                    partial_record.append(next_partial_record)
+            if partial_record:
+                record = b"".join(partial_record)
+                yield safe_decode(record) if do_decode else record
+            completed_p = True
+        finally:
+            if not completed_p:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+            if input_thread is not None:
+                input_thread.join()
+
+        if process.returncode != 0:
+            stderr_file.seek(0)
+            raise CalledProcessError(
+                process.returncode, " ".join(to_run), stderr_file.read()
+            )
+
+
 class Git:
     """Wrapper to allow us to do git.<command>(...) instead of git_run()
 
@@ -160,6 +291,325 @@ class Git:
 git = Git()
 
 
+def git_version():
+    """Return the version of git being used, as a tuple of integers.
+
+    For instance, if "git --version" returns "git version 2.32.0",
+    then this function returns (2, 32, 0).  Only the leading numeric
+    components of the version number are taken into account.
+
+    The result is cached, so as to avoid calling git more than once.
+    """
+    if not hasattr(git_version, "cached_version"):
+        version_str = git.version(_decode=True)
+        m = re.match(r"git version (\d+(?:\.\d+)*)", version_str)
+        if m is None:  # pragma: no cover (all supported gits match)
+            git_version.cached_version = (0,)
+        else:
+            git_version.cached_version = tuple(int(n) for n in m.group(1).split("."))
+    return git_version.cached_version
+
+
+class ObjectReader(object):
+    """A long-lived "git cat-file" process to query objects...
+
+    ... allowing us to answer existence, type, size and content
+    queries for any number of objects without having to fork one
+    git process for each of them.
+
+    With versions of git which support it (2.36 and later), a single
+    "git cat-file --batch-command" process is used to answer all
+    queries, over one pipe.  With older versions of git, we use
+    a "git cat-file --batch-check" process for the existence/type/size
+    queries, and a "git cat-file --batch" process for the content
+    queries.  In all cases, the processes are started lazily, the first
+    time they are needed.
+
+    Object names are the same as with "git cat-file" (any revision
+    expression is accepted, including "<rev>:<path>").  The batch
+    protocol being line-based, names containing a newline character
+    cannot be sent through the pipe; for those, we fall back to
+    running "git cat-file" directly.
+
+    Do not instantiate this class directly; use the object_reader
+    function instead, which returns the reader for this process.
+    """
+
+    def __init__(self):
+        """The constructor."""
+        # The pid of the process which started our git processes.
+        # Used to detect forks, after which the child must not use
+        # the pipes it inherited from its parent.
+        self.__pid = os.getpid()
+        # A dictionary of running cat-file processes, indexed by
+        # the mode ("--batch-command", "--batch-check", or "--batch").
+        self.__processes = {}
+        # A lock serializing the queries, so that the reader can be
+        # used by multiple threads.
+        self.__lock = threading.Lock()
+
+    def info(self, name):
+        """Return a tuple (object_name, object_type, object_size).
+
+        Return None if the object does not exist.
+
+        PARAMETERS
+            name: The name of the object to query.
+        """
+        if "\n" in name:
+            return self.__info_from_cat_file(name)
+        with self.__lock:
+            if self.__batch_command_p():
+                header = self.__query("--batch-command", b"info " + os.fsencode(name))
+            else:
+                header = self.__query("--batch-check", os.fsencode(name))
+            return self.__parse_header(header)
+
+    def contents(self, name):
+        """Return the contents of the given object as a byte string.
+
+        Return None if the object does not exist.
+
+        PARAMETERS
+            name: The name of the object to query.
+        """
+        if "\n" in name:
+            info = self.__info_from_cat_file(name)
+            if info is None:
+                return None
+            return git.cat_file(info[1], info[0], _no_strip=True)
+        with self.__lock:
+            (mode, request_prefix) = self.__contents_mode()
+            header = self.__query(mode, request_prefix + os.fsencode(name))
+            return self.__read_contents(mode, header)
+
+    def iter_contents(self, names):
+        """Return an iterator over the contents of the given objects.
+
+        This is equivalent to calling the contents method for each
+        of the given names, except that all the requests are sent
+        upfront, rather than waiting for the response to each request
+        before sending the next one. This saves a round trip between
+        us and git for each object, which is significant when reading
+        a large number of small objects.
+
+        PARAMETERS
+            names: A list of object names.
+
+        RETURN VALUE
+            An iterator of (name, contents), one per element of names
+            (in the same order), where contents is the object's contents,
+            as returned by the contents method.
+
+        REMARKS
+            The reader cannot be used by other threads until the iterator
+            has been exhausted (or deleted).
+        """
+        if any("\n" in name for name in names):
+            for name in names:
+                yield (name, self.contents(name))
+            return
+
+        with self.__lock:
+            (mode, request_prefix) = self.__contents_mode()
+            p = self.__process(mode)
+            requests = b"".join(
+                request_prefix + os.fsencode(name) + b"\n" for name in names
+            )
+
+            # Send the requests from a separate thread, to avoid
+            # a deadlock if git fills the pipe with its responses
+            # before having read all our requests.
+            def write_requests():
+                try:
+                    p.stdin.write(requests)
+                    p.stdin.flush()
+                except BrokenPipeError:
+                    # The process died. We will notice when reading
+                    # its responses.
+                    pass
+
+            writer = threading.Thread(target=write_requests, daemon=True)
+            writer.start()
+            nb_responses_left = len(names)
+            try:
+                for name in names:
+                    header = self.__read_header(mode)
+                    contents = self.__read_contents(mode, header)
+                    nb_responses_left -= 1
+                    yield (name, contents)
+            except GeneratorExit:
+                # Our caller stopped iterating early. Read the responses
+                # it did not consume, so as to leave the process ready
+                # for the next request.
+                while nb_responses_left > 0:
+                    self.__read_contents(mode, self.__read_header(mode))
+                    nb_responses_left -= 1
+                raise
+            finally:
+                writer.join()
+
+    def exists(self, name):
+        """Return True if the object exists, False otherwise.
+
+        PARAMETERS
+            name: The name of the object to query.
+        """
+        return self.info(name) is not None
+
+    def object_type(self, name):
+        """Return the type of the given object (Eg: "commit").
+
+        Return None if the object does not exist.
+
+        PARAMETERS
+            name: The name of the object to query.
+        """
+        info = self.info(name)
+        return None if info is None else info[1]
+
+    def object_size(self, name):
+        """Return the size of the given object (in bytes).
+
+        Return None if the object does not exist.
+
+        PARAMETERS
+            name: The name of the object to query.
+        """
+        info = self.info(name)
+        return None if info is None else info[2]
+
+    def close(self):
+        """Terminate all the git processes started by this reader."""
+        with self.__lock:
+            for p in self.__processes.values():
+                if self.__pid == os.getpid():
+                    p.stdin.close()
+                    p.wait()
+            self.__processes = {}
+
+    def __contents_mode(self):
+        """Return the cat-file mode to use to get the contents of objects.
+
+        RETURN VALUE
+            A tuple with the mode, and the prefix to prepend to
+            the object names in the requests sent to the process.
+        """
+        if self.__batch_command_p():
+            return ("--batch-command", b"contents ")
+        return ("--batch", b"")
+
+    def __batch_command_p(self):
+        """Return True if "git cat-file --batch-command" can be used."""
+        return git_version() >= (2, 36)
+
+    def __process(self, mode):
+        """Return the cat-file process for the given mode, starting it if needed.
+
+        PARAMETERS
+            mode: The cat-file mode of the process.
+        """
+        if self.__pid != os.getpid():
+            # We have been forked. Forget about our parent's processes
+            # (without terminating them, since they are still in use
+            # by our parent), and start our own.
+            self.__pid = os.getpid()
+            self.__processes = {}
+        if mode not in self.__processes:
+            self.__processes[mode] = Popen(
+                ["git", "cat-file", mode], stdin=PIPE, stdout=PIPE
+            )
+        return self.__processes[mode]
+
+    def __query(self, mode, request):
+        """Send a request to the cat-file process, and return its header line.
+
+        PARAMETERS
+            mode: The cat-file mode of the process to send the request to.
+            request: The request (a byte string, without the newline).
+        """
+        p = self.__process(mode)
+        p.stdin.write(request + b"\n")
+        p.stdin.flush()
+        return self.__read_header(mode)
+
+    def __read_header(self, mode):
+        """Read the header line of the next response of the cat-file process.
+
+        PARAMETERS
+            mode: The cat-file mode of the process to read the header from.
+        """
+        p = self.__processes[mode]
+        header = p.stdout.readline()
+        if not header:
+            # The process died on us.
+            del self.__processes[mode]
+            raise CalledProcessError(
+                p.wait(), "git cat-file %s" % mode, b"unexpected end of output"
+            )
+        return header
+
+    def __read_contents(self, mode, header):
+        """Read the contents of an object, following its header line.
+
+        Return None if the object does not exist, in which case
+        the header line is the only part of the response.
+
+        PARAMETERS
+            mode: The cat-file mode of the process to read the contents from.
+            header: The header line which has just been read.
+        """
+        info = self.__parse_header(header)
+        if info is None:
+            return None
+        (_, _, size) = info
+        stdout = self.__processes[mode].stdout
+        data = stdout.read(size)
+        # The contents is followed by a newline, which is not
+        # part of the object's contents.
+        stdout.read(1)
+        return data
+
+    @staticmethod
+    def __parse_header(header):
+        """Parse the given cat-file header, and return the object's info.
+
+        PARAMETERS
+            header: The header line returned by cat-file (a byte string).
+
+        RETURN VALUE
+            Same as the info method.
+        """
+        fields = safe_decode(header).rstrip("\n").rsplit(" ", 2)
+        if len(fields) != 3 or not fields[2].isdigit():
+            # The object is either missing or ambiguous.
+            return None
+        return (fields[0], fields[1], int(fields[2]))
+
+    @staticmethod
+    def __info_from_cat_file(name):
+        """Implement the info method by calling "git cat-file" directly.
+
+        PARAMETERS
+            name: The name of the object to query.
+        """
+        try:
+            obj_name = git.rev_parse("--verify", "--quiet", name, _decode=True)
+            obj_type = git.cat_file("-t", obj_name, _decode=True)
+            obj_size = int(git.cat_file("-s", obj_name, _decode=True))
+        except CalledProcessError:
+            return None
+        return (obj_name, obj_type, obj_size)
+
+
+def object_reader():
+    """Return the ObjectReader to be used by this process."""
+    if not hasattr(object_reader, "reader"):
+        object_reader.reader = ObjectReader()
+        atexit.register(object_reader.reader.close)
+    return object_reader.reader
+
+
 def get_git_dir():
     """Return the full path to the repository's .git directory.
 
@@ -240,11 +690,7 @@ def is_valid_commit(rev):
     PARAMETERS
         rev: The commit SHA1 we want to test.
     """
-    try:
-        git.cat_file("-e", rev)
-        return True
-    except CalledProcessError:
-        return False
+    return object_reader().exists(rev)
 
 
 def get_object_type(rev):
@@ -260,7 +706,9 @@ def get_object_type(rev):
     if is_null_rev(rev):
         rev_type = "delete"
     else:
-        rev_type = git.cat_file(rev, t=True, _decode=True)
+        rev_type = object_reader().object_type(rev)
+        if rev_type is None:
+            raise CalledProcessError(1, "git cat-file -t %s" % rev)
     return rev_type
 
 
@@ -315,12 +763,7 @@ def file_exists(commit_rev, filename):
     RETURN VALUE
         A boolean.
     """
-    try:
-        git.cat_file("-e", "%s:%s" % (commit_rev, filename))
-    except CalledProcessError:
-        # cat-file -e returned non-zero; the file does not exist.
-        return False
-    return True
+    return object_reader().exists("%s:%s" % (commit_rev, filename))
 
 
 def parse_tag_object(tag_name):
@@ -382,7 +825,15 @@ def parse_tag_object(tag_name):
     # rev-log/signature extraction issue by calling "git cat-file"
     # (as we used to do before).
 
-    for line in git.show(tag_name, _split_lines=True, _decode=True):
+    #
+    # Note that we first try to get the same information directly
+    # from the object database, which is a lot cheaper than calling
+    # "git show" (which also describes the tagged commit).
+    try:
+        show_lines = git_odb.tag_show_header_lines(tag_name)
+    except ObjectStoreError:
+        show_lines = git.show(tag_name, _split_lines=True, _decode=True)
+    for line in show_lines:
         if line.strip() == "":
             break
         elif line.startswith("Tagger:"):
@@ -403,7 +854,12 @@ def parse_tag_object(tag_name):
     revision_log = []
     section_no = 1
 
-    for line in git.cat_file(tag_name, p=True, _split_lines=True, _decode=True):
+    try:
+        (_, _, tag_contents) = git_odb.read_object(tag_name, "tag")
+        cat_file_lines = safe_decode(tag_contents).rstrip().splitlines()
+    except ObjectStoreError:
+        cat_file_lines = git.cat_file(tag_name, p=True, _split_lines=True, _decode=True)
+    for line in cat_file_lines:
         if section_no == 1:
             if line.strip() == "":
                 # We have reached the end of this section, moving on
@@ -444,13 +900,34 @@ def git_show_ref(*args):
     # actually depends on this module.  So we import it here instead.
     from config import git_config
 
-    ignore_refs_list = [regex.strip() for regex in git_config("hooks.ignore-refs")]
+    ignore_refs_list = [
+        re.compile(regex.strip()) for regex in git_config("hooks.ignore-refs")
+    ]
+
+    all_refs = None
+    if not args:
+        # Try reading the references ourselves, which allows us to skip
+        # the namespaces of references which are entirely ignored
+        # (typically, Gerrit's internal references) without even
+        # looking at them.
+        skip_prefixes = [
+            literal_prefix(ignore_ref_re.pattern) for ignore_ref_re in ignore_refs_list
+        ]
+        try:
+            all_refs = git_refs.read_refs(
+                [prefix for prefix in skip_prefixes if prefix is not None]
+            )
+        except RefStoreError:
+            pass
+    if all_refs is None:
+        all_refs = {}
+        for ref_info in git.show_ref(*args, _iter=True, _decode=True):
+            rev, ref = ref_info.split(None, 2)
+            all_refs[ref] = rev
 
-    matching_refs = git.show_ref(*args, _split_lines=True, _decode=True)
     result = {}
-    for ref_info in matching_refs:
-        rev, ref = ref_info.split(None, 2)
-        if any(re.match(ignore_ref_re, ref) for ignore_ref_re in ignore_refs_list):
+    for ref, rev in all_refs.items():
+        if any(ignore_ref_re.match(ref) for ignore_ref_re in ignore_refs_list):
             # This reference is in the ignore-refs list, so ignore it.
             continue
         result[ref] = rev
@@ -458,6 +935,25 @@ def git_show_ref(*args):
     return result
 
 
+def rev_list_input(revs):
+    """Return the given list of revisions formatted for "git rev-list --stdin".
+
+    Passing revisions to "git rev-list" via its standard input
+    rather than its command line should be preferred whenever
+    the number of revisions can be large (Eg: when excluding the
+    commits accessible from all the references in the repository),
+    as the command line might otherwise become too long.
+
+    PARAMETERS
+        revs: A list of revisions, using the same syntax as on
+            the command line (Eg: "^<rev>" to exclude <rev>).
+
+    RETURN VALUE
+        A byte string.
+    """
+    return "".join("%s\n" % rev for rev in revs).encode("utf-8")
+
+
 def commit_parents(rev):
     """Return the commit parents.
 
@@ -469,7 +965,10 @@ def commit_parents(rev):
         (ie: the first parent is first on the list, etc). If this is
         a headeless commit, return an empty list.
     """
-    return git.log("-n1", "--pretty=format:%P", rev, _decode=True).strip().split()
+    try:
+        return git_odb.commit_parents(rev)
+    except ObjectStoreError:
+        return git.log("-n1", "--pretty=format:%P", rev, _decode=True).strip().split()
 
 
 def commit_subject(rev):
@@ -478,7 +977,10 @@ def commit_subject(rev):
     PARAMETERS
         rev: A commit revision.
     """
-    return git.log("-n1", "--pretty=format:%s", rev, _decode=True)
+    try:
+        return git_odb.commit_subject(rev)
+    except ObjectStoreError:
+        return git.log("-n1", "--pretty=format:%s", rev, _decode=True)
 
 
 def diff_tree(*args):
@@ -498,48 +1000,78 @@ def diff_tree(*args):
         is a 6-element tuple, organized as follow:
             (old_mode, new_mode, old_sha1, new_sha1, status, filename)
     """
+    return list(iter_diff_tree(*args))
+
+
+def iter_diff_tree(*args):
+    """Same as diff_tree, but returning an iterator instead of a list.
+
+    The output of "git diff-tree" is processed as it arrives, so
+    this function should be preferred when the caller only needs
+    to iterate once over the result.
+
+    PARAMETERS
+        *args: The arguments to be passed to the "git diff-tree" command.
+
+    RETURN VALUE
+        An iterator over the same elements as diff_tree.
+    """
     # To avoid having to deal with the parsing of quoted filenames,
     # we use the -z option of "git diff-tree". What this does is
     # that it separates the filename from the rest of the data
     # using the NUL character instead of a space or newline.
-    #
-    # To parse the output, we split it at each NUL character.
-    # This means that the output gets split into a sequence of
-    # pairs of lines, with the first line containing the information
-    # about a given file, and the line following it containing
-    # the name of the file.
-    diff_data = git.diff_tree("-z", *args, _decode=True).split("\x00")
-
-    # When doing a "git diff-tree" with a single tree-ish, the output
-    # starts with the hash of what is being compared. We're not
-    # interested in this piece of information, so strip it.
-    if diff_data and diff_data[0] and not diff_data[0].startswith(":"):
-        assert re.match("[0-9a-fA-F]+$", diff_data[0]) is not None
-        diff_data.pop(0)
-
-    if len(diff_data) % 2 == 1 and not diff_data[-1]:
-        # Each filename ends with a NUL character, so the terminating
-        # NUL character in the last entry caused the split to add
-        # one empty element at the end. This is expected, so just
-        # remove it.
-        diff_data.pop()
-
-    # As per the above, we should now have an even number of elements
-    # in our list.
-    assert len(diff_data) % 2 == 0
-
-    result = []
-    while diff_data:
-        stats = diff_data.pop(0)
-        filename = diff_data.pop(0)
-
-        # The stats line should start with a colon and then be followed
-        # by space-separated information about the changes made to our
-        # file.  Strip that colon before we do the splitting.
-        assert stats.startswith(":")
-        stats = stats[1:]
-
-        (old_mode, new_mode, old_sha1, new_sha1, status) = stats.split(None, 4)
-        result.append((old_mode, new_mode, old_sha1, new_sha1, status, filename))
+    return parse_diff_tree(git.diff_tree("-z", *args, _iter_sep=b"\0", _decode=True))
 
-    return result
+
+def iter_diff_tree_batch(rev_pairs):
+    """Same as iter_diff_tree for a list of (base_rev, rev) pairs.
+
+    This function allows the caller to get the list of changes
+    made by many commits using a single "git diff-tree" process,
+    rather than having to call git once for each commit.
+
+    PARAMETERS
+        rev_pairs: A list of (base_rev, rev) tuples, where rev is
+            the SHA1 of the commit whose changes we want, and base_rev
+            is the SHA1 of the commit to use as the reference to
+            determine the changes made by rev.  base_rev may be None
+            if rev is a root commit, in which case the changes are
+            computed against the empty tree.
+
+    RETURN VALUE
+        An iterator of (rev, changes), one per element of rev_pairs
+        (in the same order), where changes is a list of tuples as
+        returned by diff_tree("-r", base_rev, rev).
+    """
+    if not rev_pairs:
+        return
+
+    # Each line fed to "git diff-tree --stdin" being of the form
+    # "<commit> <parent>" causes git to compute the changes between
+    # <commit> and <parent>. For root commits, the --root option
+    # allows us to get the changes compared to the empty tree by
+    # only providing the commit (which has no parent).
+    diff_tree_input = "".join(
+        "%s\n" % rev if base_rev is None else "%s %s\n" % (rev, base_rev)
+        for (base_rev, rev) in rev_pairs
+    ).encode("ascii")
+    output = parse_diff_tree_stdin(
+        git.diff_tree(
+            "--stdin",
+            "--root",
+            "--always",
+            "-r",
+            "-z",
+            _input=diff_tree_input,
+            _iter_sep=b"\0",
+            _decode=True,
+        )
+    )
+    for (_, rev) in rev_pairs:
+        (output_rev, changes) = next(output, (None, None))
+        if output_rev != rev:
+            raise GitOutputParseError(
+                "unexpected commit in diff-tree output: %s (expected %s)"
+                % (output_rev, rev)
+            )
+        yield (rev, changes)
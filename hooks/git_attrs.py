@@ -7,38 +7,68 @@ we take into account a default_attributes file in info/).
 
 import os
 from os.path import isfile
-from shutil import copy
+import re
+import string
 
-from git import git, file_exists
-from io_utils import encode_utf8
-from tempfile import mkdtemp
-import utils
+from git import git, object_reader
 
 # The name of the default attributes file in the bare repository.
 # This file expected to be relative to the root of the bare repository.
 DEFAULT_ATTRIBUTES_FILE = "info/default_attributes"
 
+# The attributes file which git always uses, with the lowest
+# precedence (it only defines the "binary" macro attribute).
+BUILTIN_ATTRIBUTES = b"[attr]binary -diff -merge -text\n"
 
-def cached_file_exists(commit_rev, filename):
-    """A wrapper around git.file_exists but with a cache...
+# The prefix of the lines defining a macro attribute.
+ATTRIBUTE_MACRO_PREFIX = b"[attr]"
 
-    ... to avoid repetitive calls to git.
+# Lines longer than this (in bytes) are ignored by git.
+ATTR_MAX_LINE_LENGTH = 2048
 
-    PARAMETERS
-        commit_rev: Same as git.file_exists.
-        filename: Same as git.file_exists.
-    """
-    # Implement the cache as an attribute of this function,
-    # where the key is a tuple (commit_rev, filename), and
-    # the value the result of the query.
-    if "cache" not in cached_file_exists.__dict__:
-        # First time call, initialize the attribute.
-        cached_file_exists.cache = {}
+# The characters separating the elements of a line.
+ATTR_BLANKS = b" \t\r\n"
+
+# A regular expression matching valid attribute names.
+ATTR_NAME_RE = re.compile(rb"[-._0-9a-zA-Z]+")
+
+# The possible states of an attribute, other than having a value
+# (in which case the state is the value itself, as a string).
+# For the "unspecified" state, we use None rather than
+# the string we return (see ATTR_STATE_IMAGES), so as to
+# distinguish it from an attribute set to "unspecified".
+ATTR_SET = True
+ATTR_UNSET = False
+ATTR_UNSPECIFIED = None
+
+# The string returned by git_attribute for each state of
+# an attribute which does not have a value.
+ATTR_STATE_IMAGES = {
+    ATTR_SET: "set",
+    ATTR_UNSET: "unset",
+    ATTR_UNSPECIFIED: "unspecified",
+}
+
+# The characters which have a special meaning in patterns.
+PATTERN_SPECIAL_CHARS = b"*?[\\"
 
-    key = (commit_rev, filename)
-    if key not in cached_file_exists.cache:
-        cached_file_exists.cache[key] = file_exists(commit_rev, filename)
-    return cached_file_exists.cache[key]
+# The character classes which can be used in bracket expressions
+# (Eg: "[[:digit:]]"). The values are the set of characters of
+# each class. Same as git, we only consider ASCII characters.
+PATTERN_CHAR_CLASSES = {
+    b"alnum": set((string.ascii_letters + string.digits).encode("ascii")),
+    b"alpha": set(string.ascii_letters.encode("ascii")),
+    b"blank": set(b" \t"),
+    b"cntrl": set(range(0x20)) | {0x7F},
+    b"digit": set(string.digits.encode("ascii")),
+    b"graph": set(range(0x21, 0x7F)),
+    b"lower": set(string.ascii_lowercase.encode("ascii")),
+    b"print": set(range(0x20, 0x7F)),
+    b"punct": set(string.punctuation.encode("ascii")),
+    b"space": set(b" \t\n\r"),
+    b"upper": set(string.ascii_uppercase.encode("ascii")),
+    b"xdigit": set(string.hexdigits.encode("ascii")),
+}
 
 
 def git_attribute(commit_rev, filename_list, attr_name):
@@ -77,117 +107,656 @@ def git_attribute(commit_rev, filename_list, attr_name):
         for commits where 2-3 thousand files were modified (typical
         when updating the copyright year, for instance).
 
-        So, instead of trying to re-implement the git-check-attr
-        command ourselves, what we do now, is create a dummy git
-        repository inside which we (lazily) reproduce the directory
-        tree, with their .gitattributes file. And then, from there
-        call `git check-attr'. And, to help with the performance
-        aspect, we call it only once requesting the attribute value
-        for all files all in one go.
+        We then created a dummy git repository inside which we
+        reproduced the directory tree, with their .gitattributes file,
+        and called `git check-attr' from there. This was still fairly
+        expensive, especially when checking many commits, so we now
+        evaluate the attributes ourselves, following the same rules
+        as git (see gitattributes(5)): The .gitattributes files
+        are read directly from the repository, and the lines of
+        the .gitattributes files are matched against each file,
+        from the .gitattributes file in the file's directory to
+        the .gitattributes file at the root of the repository,
+        and last, the DEFAULT_ATTRIBUTES_FILE (which therefore
+        has the same role as git's core.attributesFile).
+        In each file, the last matching line which says something
+        about our attribute wins.
     """
-    # Verify that we have a scratch area we can use for create the fake
-    # git repository (see REMARKS section above).
-    assert utils.scratch_dir is not None
-
-    # A copy of the environment, but without the GIT_DIR environment
-    # variable (which gets sets when called by git), pointing to
-    # the repository to which changes are being pushed.  This interferes
-    # with most git commands when we're trying to work with our fake
-    # repository. So we use this copy of the environment without
-    # the GIT_DIR environment variable when needed.
-    tmp_git_dir_env = dict(os.environ)
-    tmp_git_dir_env.pop("GIT_DIR", None)
-
-    tmp_git_dir = mkdtemp(".git", "check-attr-", utils.scratch_dir)
-    git.init(_cwd=tmp_git_dir, _env=tmp_git_dir_env)
-
-    # There is one extra complication: We want to also provide support
-    # for a DEFAULT_ATTRIBUTES_FILE, where the semantics is that,
-    # if none of the .gitattributes file have an entry matching
-    # our file, then this file is consulted. Once again, to avoid
-    # calling `git check-attr' multiple times, what we do instead
-    # is that we create a the directory tree in a root which is in
-    # a subdir of tmp_git_dir. That way, we can put the default
-    # attribute file in the root of tmp_git_dir, and git-check-attr
-    # will only look at it if checked-in .gitattributes don't define
-    # the attribute of a given file, thus implementing the "default"
-    # behavior.
-    #
-    # This requires a bit of manipulation, because now, in the fake
-    # git repository, the files we want to check are conceptually
-    # inside the subdir.  So filenames passed to `git check-attr'
-    # have to contain that subdir, and the that subdir needs to be
-    # excised from the command's output.
-
-    if isfile(DEFAULT_ATTRIBUTES_FILE):
-        copy(DEFAULT_ATTRIBUTES_FILE, os.path.join(tmp_git_dir, ".gitattributes"))
-    checkout_subdir = "src"
-    tmp_checkout_dir = os.path.join(tmp_git_dir, checkout_subdir)
-
-    dirs_with_changes = {}
+    # The .gitattributes files of the directories containing the files
+    # we are interested in, indexed by directory name.
+    dir_attrs = {}
+    for (dir_name, blob_sha1) in gitattributes_blobs(
+        commit_rev, {os.path.dirname(filename) for filename in filename_list}
+    ).items():
+        dir_attrs[dir_name] = gitattributes_file(blob_sha1, macros_allowed=not dir_name)
+
+    default_attrs = default_attributes_file()
+
+    # The macro attributes, and the attributes which are relevant
+    # to determine the value of attr_name (that is, attr_name itself,
+    # and the macro attributes which can change its value).
+    macros = {}
+    for attrs in (builtin_attributes_file(), default_attrs, dir_attrs.get("")):
+        if attrs is not None:
+            macros.update(attrs.macros)
+    relevant_attrs = relevant_attributes(attr_name, macros)
+    macros = {
+        macro_name: [state for state in states if state[0] in relevant_attrs]
+        for (macro_name, states) in macros.items()
+        if macro_name in relevant_attrs
+    }
+
+    # The list of .gitattributes files to consult for the files of
+    # each directory, indexed by directory name (see attribute_stack).
+    attr_stacks = {}
+
+    result = {}
     for filename in filename_list:
         assert not os.path.isabs(filename)
-        dir_path = filename
-        dir_created = False
-        while dir_path:
-            dir_path = os.path.dirname(dir_path)
-            if dir_path in dirs_with_changes:
-                continue
-            gitattributes_rel_file = os.path.join(dir_path, ".gitattributes")
-            if cached_file_exists(commit_rev, gitattributes_rel_file):
-                if not dir_created:
-                    os.makedirs(os.path.join(tmp_checkout_dir, dir_path))
-                    dir_created = True
-                git.show(
-                    "%s:%s" % (commit_rev, gitattributes_rel_file),
-                    _outfile=os.path.join(tmp_checkout_dir, gitattributes_rel_file),
-                )
-            dirs_with_changes[dir_path] = True
-
-    # To avoid having to deal with the parsing of quoted filenames,
-    # we use the -z option of "git check-attr". What this does is
-    # that each of the 3 elements of each line is now separated by
-    # a NUL character. Also, each line now ends with a NUL character
-    # as well, instead of LF.
-    #
-    # To parse the output, we split it at each NUL character.
-    # This means that the output gets split into a sequence of
-    # lines which go 3 by 3, with the first line containing
-    # the filename, the second being the name of the attribute
-    # being queried, and the third being the attribute's value
-    # for that file.
-    check_attr_input = "\x00".join(
-        ["%s/%s" % (checkout_subdir, filename) for filename in filename_list]
-    )
-    attr_info = git.check_attr(
+        dir_name = os.path.dirname(filename)
+        if dir_name not in attr_stacks:
+            attr_stacks[dir_name] = attribute_stack(
+                dir_name, dir_attrs, default_attrs, relevant_attrs
+            )
+        path = os.fsencode(filename)
+        basename = path[path.rfind(b"/") + 1 :]
+
+        states = {}
+        for (base_len, rules) in attr_stacks[dir_name]:
+            rel_path = path[base_len:]
+            for (pattern, rule_states) in rules:
+                if pattern.matches(rel_path, basename):
+                    fill_attribute_states(states, rule_states, macros)
+                    if attr_name in states:
+                        break
+            if attr_name in states:
+                break
+
+        state = states.get(attr_name, ATTR_UNSPECIFIED)
+        result[filename] = ATTR_STATE_IMAGES.get(state, state)
+
+    return result
+
+
+def gitattributes_blobs(commit_rev, dir_names):
+    """Return the .gitattributes files which apply to the given directories.
+
+    PARAMETERS
+        commit_rev: The commit where to look for the .gitattributes files.
+        dir_names: An iterable of directory names, relative to the root
+            of the repository ("" designates the root directory).
+
+    RETURN VALUE
+        A dictionary, whose keys are the names of the directories
+        (among dir_names and all their parent directories) which have
+        a .gitattributes file in commit_rev, and whose values are
+        the SHA1 of the blob of their .gitattributes file.
+    """
+    all_dir_names = set()
+    for dir_name in dir_names:
+        while dir_name not in all_dir_names:
+            all_dir_names.add(dir_name)
+            dir_name = os.path.dirname(dir_name)
+    if not all_dir_names:
+        return {}
+
+    # Get the SHA1 of the blob of the .gitattributes files which
+    # exist in commit_rev, all in one go. Each line of output has
+    # the following format: <mode> SP <type> SP <object> TAB <file>.
+    result = {}
+    for entry in git.ls_tree(
+        "--full-tree",
         "-z",
-        "--stdin",
-        attr_name,
-        _cwd=tmp_git_dir,
-        _env=tmp_git_dir_env,
-        _input=encode_utf8(check_attr_input),
+        commit_rev,
+        "--",
+        *sorted(os.path.join(dir_name, ".gitattributes") for dir_name in all_dir_names),
+        _iter_sep=b"\x00",
         _decode=True,
-    ).split("\x00")
-    if len(attr_info) % 3 == 1 and not attr_info[-1]:
-        # The attribute information for each filename ends with
-        # a NUL character, so the terminating NUL character in
-        # the last entry caused the split to add one empty element
-        # at the end. This is expected, so just remove it.
-        attr_info.pop()
-
-    # As per the above, we should now have a number of lines that's
-    # a multiple of 3.
-    assert len(attr_info) % 3 == 0
+    ):
+        (info, path) = entry.split("\t", 1)
+        (mode, obj_type, obj_sha1) = info.split()
+        # Same as git, ignore .gitattributes files which are symbolic
+        # links.
+        if obj_type == "blob" and mode != "120000":
+            result[os.path.dirname(path)] = obj_sha1
+    return result
+
+
+def gitattributes_file(blob_sha1, macros_allowed):
+    """Return the GitAttributesFile for the given .gitattributes blob.
+
+    PARAMETERS
+        blob_sha1: The SHA1 of the blob of the .gitattributes file.
+        macros_allowed: Same as in GitAttributesFile.__init__.
+    """
+    # Implement the cache as an attribute of this function,
+    # where the key is a tuple (blob_sha1, macros_allowed).
+    if "cache" not in gitattributes_file.__dict__:
+        # First time call, initialize the attribute.
+        gitattributes_file.cache = {}
+
+    key = (blob_sha1, macros_allowed)
+    if key not in gitattributes_file.cache:
+        gitattributes_file.cache[key] = GitAttributesFile(
+            object_reader().contents(blob_sha1), macros_allowed
+        )
+    return gitattributes_file.cache[key]
+
+
+def default_attributes_file():
+    """Return the GitAttributesFile for the DEFAULT_ATTRIBUTES_FILE.
+
+    Return None if the repository does not have such a file.
+    """
+    if not isfile(DEFAULT_ATTRIBUTES_FILE):
+        return None
+    with open(DEFAULT_ATTRIBUTES_FILE, "rb") as f:
+        contents = f.read()
+    # Cache the result, to avoid parsing the file again when
+    # querying some attributes at several commits.
+    if getattr(default_attributes_file, "contents", None) != contents:
+        default_attributes_file.attrs = GitAttributesFile(contents, macros_allowed=True)
+        default_attributes_file.contents = contents
+    return default_attributes_file.attrs
+
+
+def builtin_attributes_file():
+    """Return the GitAttributesFile for the BUILTIN_ATTRIBUTES."""
+    if "attrs" not in builtin_attributes_file.__dict__:
+        builtin_attributes_file.attrs = GitAttributesFile(
+            BUILTIN_ATTRIBUTES, macros_allowed=True
+        )
+    return builtin_attributes_file.attrs
 
-    result = {}
-    while attr_info:
-        filename = attr_info.pop(0)
-        attr_info.pop(0)  # Ignore the attribute name...
-        attr_val = attr_info.pop(0)
 
-        assert filename.startswith(checkout_subdir + "/")
-        filename = filename[len(checkout_subdir) + 1 :]
+def relevant_attributes(attr_name, macros):
+    """Return the attributes which can affect the value of attr_name.
 
-        result[filename] = attr_val
+    PARAMETERS
+        attr_name: The name of an attribute.
+        macros: A dictionary of macro attributes, whose keys are
+            the macro attributes' name, and whose values are the list
+            of attribute states which each macro attribute expands to.
+
+    RETURN VALUE
+        A set with attr_name, and the names of all the macro attributes
+        which expand (directly, or through other macro attributes)
+        to a state of attr_name.
+    """
+    result = {attr_name}
+    while True:
+        new_attrs = {
+            macro_name
+            for (macro_name, states) in macros.items()
+            if macro_name not in result and any(name in result for (name, _) in states)
+        }
+        if not new_attrs:
+            return result
+        result |= new_attrs
 
+
+def attribute_stack(dir_name, dir_attrs, default_attrs, relevant_attrs):
+    """Return the rules to consult for the files in the given directory.
+
+    PARAMETERS
+        dir_name: The name of the directory.
+        dir_attrs: A dictionary providing the GitAttributesFile
+            of each directory having a .gitattributes file.
+        default_attrs: The GitAttributesFile for the
+            DEFAULT_ATTRIBUTES_FILE, or None if there is no such file.
+        relevant_attrs: A set with the names of the attributes
+            which we are interested in.
+
+    RETURN VALUE
+        A list of tuples (base_len, rules), in decreasing order of
+        precedence, where base_len is the length of the part of
+        the files' path to remove to get their path relative to
+        the .gitattributes file's directory, and rules the file's
+        rules concerning relevant_attrs (see GitAttributesFile.rules_for).
+    """
+    result = []
+    while True:
+        if dir_name in dir_attrs:
+            base_len = len(os.fsencode(dir_name)) + 1 if dir_name else 0
+            result.append((base_len, dir_attrs[dir_name].rules_for(relevant_attrs)))
+        if not dir_name:
+            break
+        dir_name = os.path.dirname(dir_name)
+    if default_attrs is not None:
+        result.append((0, default_attrs.rules_for(relevant_attrs)))
     return result
+
+
+def fill_attribute_states(states, new_states, macros):
+    """Record the given attribute states, unless already determined.
+
+    This function also expands the macro attributes which get set.
+
+    PARAMETERS
+        states: A dictionary, whose keys are the names of the attributes
+            whose state has already been determined, and whose values
+            are their state.
+        new_states: A list of tuples (attr_name, state), from the line
+            of a .gitattributes file, or the definition of a macro
+            attribute.
+        macros: A dictionary providing the expansion of the macro
+            attributes (see relevant_attributes).
+    """
+    # Same as git, the last state of a given attribute on the line
+    # takes precedence.
+    for (name, state) in reversed(new_states):
+        if name not in states:
+            states[name] = state
+            if state is ATTR_SET and name in macros:
+                fill_attribute_states(states, macros[name], macros)
+
+
+class GitAttributesFile(object):
+    """The compiled contents of a .gitattributes file.
+
+    ATTRIBUTES
+        macros: A dictionary, whose keys are the names of the macro
+            attributes defined in this file, and whose values are
+            the list of attribute states of their definition
+            (see parse_attribute_states).
+        rules: A list of tuples (pattern, states), one for each line
+            of the file assigning some attributes to the files matching
+            some pattern, in the order of the file. The pattern is
+            a PathPattern object, and states the list of attribute
+            states of that line.
+    """
+
+    def __init__(self, contents, macros_allowed):
+        """Initialize self.
+
+        PARAMETERS
+            contents: The contents of the .gitattributes file (a byte
+                string).
+            macros_allowed: True if macro attributes can be defined
+                in this file (which git only allows in the .gitattributes
+                file at the root of the repository, and in the attributes
+                files outside of the repository's tree). Lines defining
+                macro attributes in other files are ignored.
+        """
+        self.macros = {}
+        self.rules = []
+        # The rules concerning some given attributes, in reverse order
+        # (see rules_for), indexed by the set of those attributes.
+        self.__rules_for = {}
+
+        # Same as git, stop at the first NUL character, if any.
+        contents = contents.split(b"\0", 1)[0]
+        for (lineno, line) in enumerate(contents.split(b"\n")):
+            if lineno == 0 and line.startswith(b"\xef\xbb\xbf"):
+                # Skip the UTF-8 BOM.
+                line = line[3:]
+            self.__parse_line(line, macros_allowed)
+
+    def rules_for(self, attr_names):
+        """Return the rules concerning the given attributes.
+
+        PARAMETERS
+            attr_names: A frozenset of attribute names.
+
+        RETURN VALUE
+            A list of tuples (pattern, states), similar to self.rules,
+            but in reverse order, and where states only contains the
+            states of the attributes in attr_names. The rules without
+            any such state are not included.
+        """
+        attr_names = frozenset(attr_names)
+        if attr_names not in self.__rules_for:
+            rules = []
+            for (pattern, states) in reversed(self.rules):
+                states = [state for state in states if state[0] in attr_names]
+                if states:
+                    rules.append((pattern, states))
+            self.__rules_for[attr_names] = rules
+        return self.__rules_for[attr_names]
+
+    def __parse_line(self, line, macros_allowed):
+        """Parse one line of the .gitattributes file.
+
+        Invalid lines are ignored, as git does.
+
+        PARAMETERS
+            line: The line (a byte string), without the line terminator.
+            macros_allowed: Same as in __init__.
+        """
+        start = len(line) - len(line.lstrip(ATTR_BLANKS))
+        if start == len(line) or line[start : start + 1] == b"#":
+            return
+        if len(line) >= ATTR_MAX_LINE_LENGTH:
+            return
+
+        pattern = None
+        if line[start : start + 1] == b'"':
+            unquoted = unquote_c_style(line, start)
+            if unquoted is not None:
+                (pattern, states_start) = unquoted
+        if pattern is None:
+            states_start = start
+            while states_start < len(line) and line[states_start] not in ATTR_BLANKS:
+                states_start += 1
+            pattern = line[start:states_start]
+
+        states = parse_attribute_states(line[states_start:])
+        if states is None:
+            return
+
+        if len(pattern) > len(ATTRIBUTE_MACRO_PREFIX) and pattern.startswith(
+            ATTRIBUTE_MACRO_PREFIX
+        ):
+            macro_name = pattern[len(ATTRIBUTE_MACRO_PREFIX) :]
+            if macros_allowed and valid_attribute_name(macro_name):
+                self.macros[macro_name.decode("ascii")] = states
+        elif not pattern.startswith(b"!"):
+            # Same as git, ignore negative patterns.
+            path_pattern = PathPattern(pattern)
+            if not path_pattern.never_matches:
+                self.rules.append((path_pattern, states))
+
+
+def unquote_c_style(line, start):
+    """Unquote the C-style quoted string starting at line[start].
+
+    PARAMETERS
+        line: A byte string.
+        start: The index of the opening double quote in line.
+
+    RETURN VALUE
+        None if the quoted string is invalid. Otherwise, a tuple with
+        the unquoted string, and the index of the character following
+        the closing double quote.
+    """
+    escapes = {
+        b"a": b"\a",
+        b"b": b"\b",
+        b"f": b"\f",
+        b"n": b"\n",
+        b"r": b"\r",
+        b"t": b"\t",
+        b"v": b"\v",
+        b"\\": b"\\",
+        b'"': b'"',
+    }
+    result = []
+    pos = start + 1
+    while pos < len(line):
+        c = line[pos : pos + 1]
+        pos += 1
+        if c == b'"':
+            return (b"".join(result), pos)
+        if c != b"\\":
+            result.append(c)
+            continue
+        c = line[pos : pos + 1]
+        pos += 1
+        if c in escapes and c:
+            result.append(escapes[c])
+        elif c in (b"0", b"1", b"2", b"3") and c:
+            octal = line[pos - 1 : pos + 2]
+            if len(octal) != 3 or not all(d in b"01234567" for d in octal):
+                return None
+            result.append(bytes([int(octal, 8)]))
+            pos += 2
+        else:
+            return None
+    return None
+
+
+def parse_attribute_states(text):
+    """Parse the attribute states of a line of a .gitattributes file.
+
+    PARAMETERS
+        text: The part of the line following the pattern (a byte
+            string).
+
+    RETURN VALUE
+        A list of tuples (attr_name, state), where state is either
+        ATTR_SET, ATTR_UNSET, ATTR_UNSPECIFIED, or the attribute's
+        value (a string). None if one of the attribute names is
+        invalid (in which case git ignores the whole line).
+    """
+    result = []
+    for item in text.replace(b"\r", b" ").replace(b"\t", b" ").split(b" "):
+        if not item:
+            continue
+        (name, equals, value) = item.partition(b"=")
+        if name.startswith(b"-"):
+            (name, state) = (name[1:], ATTR_UNSET)
+        elif name.startswith(b"!"):
+            (name, state) = (name[1:], ATTR_UNSPECIFIED)
+        elif equals:
+            state = value.decode("utf-8", "surrogateescape")
+        else:
+            state = ATTR_SET
+        if not valid_attribute_name(name):
+            return None
+        result.append((name.decode("ascii"), state))
+    return result
+
+
+def valid_attribute_name(name):
+    """Return True if name (a byte string) is a valid attribute name."""
+    return not name.startswith(b"-") and ATTR_NAME_RE.fullmatch(name) is not None
+
+
+class PathPattern(object):
+    """A pattern of a .gitattributes file, to be matched against paths.
+
+    ATTRIBUTES
+        never_matches: True if the pattern can never match a file.
+            This is the case of patterns matching directories only
+            (Eg: "dir/"), as well as invalid patterns (Eg: "[a-").
+    """
+
+    def __init__(self, pattern):
+        """Initialize self.
+
+        PARAMETERS
+            pattern: The pattern (a byte string).
+        """
+        self.never_matches = False
+        # Same as git, patterns are NUL-terminated strings.
+        pattern = pattern.split(b"\0", 1)[0]
+
+        if pattern.endswith(b"/"):
+            # A pattern which only matches directories. Directories
+            # do not have attributes, and, unlike in .gitignore files,
+            # such a pattern has no effect on the files they contain.
+            self.never_matches = True
+            return
+
+        # A pattern without a slash is matched against the file's
+        # basename. Otherwise, it is matched against the file's path
+        # relative to the directory of the .gitattributes file.
+        self.__basename_only = b"/" not in pattern
+        if self.__basename_only:
+            regex = wildmatch_regex(pattern, pathname=False)
+        else:
+            if pattern.startswith(b"/"):
+                pattern = pattern[1:]
+            # Same as git, compare the part of the pattern without
+            # wildcards literally, and then match the rest of the pattern
+            # against the rest of the path, as a separate pattern
+            # (this only matters for "**", which behaves differently
+            # at the start of a pattern).
+            prefix_len = len(pattern)
+            for c in PATTERN_SPECIAL_CHARS:
+                pos = pattern.find(bytes([c]))
+                if pos >= 0:
+                    prefix_len = min(prefix_len, pos)
+            regex = wildmatch_regex(pattern[prefix_len:], pathname=True)
+            if regex is not None:
+                regex = re.escape(pattern[:prefix_len]) + regex
+
+        if regex is None:
+            self.never_matches = True
+        else:
+            self.__regex = re.compile(regex, re.DOTALL)
+
+    def matches(self, rel_path, basename):
+        """Return True if the given file matches this pattern.
+
+        PARAMETERS
+            rel_path: The path of the file relative to the directory
+                of the .gitattributes file (a byte string).
+            basename: The file's basename (a byte string).
+        """
+        return (
+            self.__regex.fullmatch(basename if self.__basename_only else rel_path)
+            is not None
+        )
+
+
+def wildmatch_regex(pattern, pathname):
+    """Return a regular expression equivalent to the given pattern.
+
+    The regular expression implements the same semantics as git's
+    wildmatch function, which git uses to match the patterns
+    of .gitattributes files.
+
+    PARAMETERS
+        pattern: The pattern (a byte string).
+        pathname: True if the pattern is to be matched against
+            a path, in which case wildcards do not match slashes,
+            except for "**" (git's WM_PATHNAME flag). False if
+            the pattern is to be matched against a basename.
+
+    RETURN VALUE
+        A regular expression (a byte string), or None if the pattern
+        is invalid (in which case it does not match anything).
+    """
+    result = []
+    pos = 0
+    while pos < len(pattern):
+        c = pattern[pos : pos + 1]
+        if c == b"\\":
+            # Literal match with the following character. A backslash
+            # at the end of the pattern never matches anything.
+            if pos + 1 == len(pattern):
+                return None
+            result.append(re.escape(pattern[pos + 1 : pos + 2]))
+            pos += 2
+        elif c == b"?":
+            result.append(b"[^/]" if pathname else b".")
+            pos += 1
+        elif c == b"*":
+            end = pos
+            while pattern[end : end + 1] == b"*":
+                end += 1
+            if not pathname:
+                result.append(b".*")
+            elif (
+                end - pos > 1
+                and (pos == 0 or pattern[pos - 1 : pos] == b"/")
+                and (
+                    end == len(pattern)
+                    or pattern[end : end + 1] == b"/"
+                    or pattern[end : end + 2] == b"\\/"
+                )
+            ):
+                # "**" as a whole path component: Matches any number
+                # of path components.  When followed by a slash, it
+                # can also match nothing at all (Eg: "a/**/b" matches
+                # "a/b").
+                if pattern[end : end + 1] == b"/":
+                    result.append(b"(?:.*/)?")
+                    end += 1
+                else:
+                    result.append(b".*")
+            else:
+                result.append(b"[^/]*")
+            pos = end
+        elif c == b"[":
+            char_class = parse_bracket_expression(pattern, pos)
+            if char_class is None:
+                return None
+            (chars, pos) = char_class
+            if pathname:
+                chars.discard(ord("/"))
+            if chars:
+                result.append(
+                    b"[" + b"".join(re.escape(bytes([c])) for c in sorted(chars)) + b"]"
+                )
+            else:
+                result.append(b"(?!)")
+        else:
+            result.append(re.escape(c))
+            pos += 1
+    return b"".join(result)
+
+
+def parse_bracket_expression(pattern, start):
+    """Parse the bracket expression at pattern[start] (Eg: "[a-z]").
+
+    PARAMETERS
+        pattern: A pattern (a byte string).
+        start: The index of the opening bracket in pattern.
+
+    RETURN VALUE
+        None if the bracket expression is invalid (in which case
+        the whole pattern does not match anything). Otherwise,
+        a tuple with the set of characters (as integers) matched
+        by the bracket expression, and the index of the character
+        following the bracket expression.
+    """
+
+    def char_at(pos):
+        """Return the character at pattern[pos], or 0 past its end."""
+        return pattern[pos] if pos < len(pattern) else 0
+
+    chars = set()
+    pos = start + 1
+    negated = char_at(pos) in (ord("!"), ord("^"))
+    if negated:
+        pos += 1
+    prev_c = 0
+    while True:
+        c = char_at(pos)
+        if not c:
+            return None
+        if c == ord("\\"):
+            pos += 1
+            c = char_at(pos)
+            if not c:
+                return None
+            chars.add(c)
+        elif c == ord("-") and prev_c and char_at(pos + 1) not in (0, ord("]")):
+            pos += 1
+            c = char_at(pos)
+            if c == ord("\\"):
+                pos += 1
+                c = char_at(pos)
+                if not c:
+                    return None
+            chars.update(range(prev_c, c + 1))
+            c = 0
+        elif c == ord("[") and char_at(pos + 1) == ord(":"):
+            class_start = pos + 2
+            class_end = class_start
+            while char_at(class_end) not in (0, ord("]")):
+                class_end += 1
+            if not char_at(class_end):
+                return None
+            if class_end == class_start or pattern[class_end - 1] != ord(":"):
+                # Not a character class after all, just a "[".
+                chars.add(c)
+            else:
+                class_name = pattern[class_start : class_end - 1]
+                if class_name not in PATTERN_CHAR_CLASSES:
+                    return None
+                chars.update(PATTERN_CHAR_CLASSES[class_name])
+                pos = class_end
+                c = 0
+        else:
+            chars.add(c)
+        prev_c = c
+        pos += 1
+        if char_at(pos) == ord("]"):
+            break
+
+    if negated:
+        chars = set(range(1, 256)) - chars
+    return (chars, pos + 1)
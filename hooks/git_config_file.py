@@ -0,0 +1,248 @@
+"""A pure-Python parser for git's configuration file format...
+
+... allowing us to parse the repository's project.config file
+without having to save it in a temporary file first, and then
+call "git config --list" on that temporary file.
+
+The parser follows the same rules as git's own parser (see
+the "CONFIGURATION FILE" section of git-config(1)), and produces
+the same records as "git config -z --list --file <file>" does.
+Like that command, it does not follow "include" directives.
+
+Like the git_odb and git_refs modules, this parser is an optional
+optimization: Whenever it meets an input which git would reject,
+it raises ConfigFileParseError, and callers are expected to handle
+that exception by falling back to calling git (thus letting git
+report the error to the user).
+"""
+
+# The characters which git considers as whitespaces in its config files.
+CONFIG_SPACES = b" \t\n\r"
+
+# The UTF-8 byte order mark, which git ignores at the start of the file.
+UTF8_BOM = b"\xef\xbb\xbf"
+
+# The characters resulting from the escape sequences git supports
+# in config values.
+CONFIG_VALUE_ESCAPES = {
+    b"t": b"\t",
+    b"b": b"\b",
+    b"n": b"\n",
+    b'"': b'"',
+    b"\\": b"\\",
+}
+
+
+class ConfigFileParseError(Exception):
+    """An exception raised when a config file cannot be parsed."""
+
+    pass
+
+
+def iskeychar(c):
+    """Return True if c can be part of a section or key name.
+
+    PARAMETERS
+        c: A one-byte byte string.
+    """
+    return c.isalnum() or c == b"-"
+
+
+class ConfigFileParser(object):
+    """A parser for the contents of a git config file.
+
+    ATTRIBUTES
+        contents: The contents of the file (a byte string).
+        pos: The offset in contents of the next character to read.
+        line: The current line number, for the error messages.
+    """
+
+    def __init__(self, contents):
+        """The constructor.
+
+        PARAMETERS
+            contents: The contents of the config file, as a byte string.
+        """
+        self.contents = contents
+        self.pos = len(UTF8_BOM) if contents.startswith(UTF8_BOM) else 0
+        self.line = 1
+
+    def records(self):
+        """Return an iterator over the entries of the config file.
+
+        The entries are returned in the same form as what
+        "git config -z --list" prints for each entry, minus
+        the NUL separator. In other words, the entry's name,
+        followed by a newline and its value if the entry has
+        a value, all as a byte string.
+        """
+        section = b""
+        comment = False
+        while True:
+            c = self.next_char()
+            if c is None:
+                return
+            if c == b"\n":
+                comment = False
+            elif comment or c in CONFIG_SPACES:
+                pass
+            elif c in b"#;":
+                comment = True
+            elif c == b"[":
+                section = self.parse_section_name()
+            elif c.isalpha():
+                yield self.parse_entry(section, c)
+            else:
+                self.error()
+
+    def next_char(self):
+        """Return the next character (a one-byte byte string), or None at EOF.
+
+        Like git, "\r\n" sequences are returned as a single "\n".
+        """
+        if self.pos >= len(self.contents):
+            return None
+        c = self.contents[self.pos : self.pos + 1]
+        self.pos += 1
+        if c == b"\r" and self.contents[self.pos : self.pos + 1] == b"\n":
+            c = b"\n"
+            self.pos += 1
+        if c == b"\n":
+            self.line += 1
+        return c
+
+    def error(self):
+        """Raise ConfigFileParseError for the current line."""
+        raise ConfigFileParseError("bad config line %d" % self.line)
+
+    def parse_section_name(self):
+        """Parse a section header, and return the section's name.
+
+        The opening bracket is assumed to have already been read.
+        The section's name is returned in the form used in the name
+        of the entries (Eg: 'section' or 'section.Subsection').
+        """
+        name = b""
+        while True:
+            c = self.next_char()
+            if c is None or c == b"\n":
+                self.error()
+            if c in CONFIG_SPACES:
+                return name + b"." + self.parse_subsection_name()
+            if c == b"]":
+                if not name:
+                    self.error()
+                return name
+            if not iskeychar(c) and c != b".":
+                self.error()
+            name += c.lower()
+
+    def parse_subsection_name(self):
+        """Parse the subsection part of a section header, and return it.
+
+        This handles the part of the header which follows the section
+        name (Eg: ' "Subsection"]').
+        """
+        c = self.next_char()
+        while c is not None and c in CONFIG_SPACES:
+            c = self.next_char()
+        if c != b'"':
+            self.error()
+        name = b""
+        while True:
+            c = self.next_char()
+            if c == b"\\":
+                c = self.next_char()
+            elif c == b'"':
+                break
+            if c is None or c == b"\n":
+                self.error()
+            name += c
+        if self.next_char() != b"]":
+            self.error()
+        return name
+
+    def parse_entry(self, section, c):
+        """Parse an entry of the config file, and return its record.
+
+        PARAMETERS
+            section: The name of the current section.
+            c: The first character of the entry's name, which
+                has already been read.
+        """
+        name = c.lower()
+        while True:
+            c = self.next_char()
+            if c is None or not iskeychar(c):
+                break
+            name += c.lower()
+        while c in (b" ", b"\t"):
+            c = self.next_char()
+        if section:
+            name = section + b"." + name
+        if c is None or c == b"\n":
+            # An entry without a value.
+            return name
+        if c != b"=":
+            self.error()
+        return name + b"\n" + self.parse_value()
+
+    def parse_value(self):
+        """Parse the value of an entry, and return it.
+
+        The equal sign preceding the value is assumed to have
+        already been read.
+        """
+        value = b""
+        quoted = False
+        comment = False
+        nb_spaces = 0
+        while True:
+            c = self.next_char()
+            if c is None or c == b"\n":
+                if quoted:
+                    self.error()
+                return value
+            if comment:
+                continue
+            if c in CONFIG_SPACES and not quoted:
+                # Whitespaces are only kept if they are followed by
+                # something else than a comment, and each of them is
+                # then replaced by a space. Leading whitespaces are
+                # always discarded.
+                if value:
+                    nb_spaces += 1
+                continue
+            if not quoted and c in b"#;":
+                comment = True
+                continue
+            value += b" " * nb_spaces
+            nb_spaces = 0
+            if c == b"\\":
+                c = self.next_char()
+                if c is None or c == b"\n":
+                    # A line continuation (git treats the end of
+                    # the file as an end of line).
+                    continue
+                if c not in CONFIG_VALUE_ESCAPES:
+                    self.error()
+                value += CONFIG_VALUE_ESCAPES[c]
+            elif c == b'"':
+                quoted = not quoted
+            else:
+                value += c
+
+
+def parse_config_file(contents):
+    """Return the entries in the given config file.
+
+    Raise ConfigFileParseError if the file cannot be parsed.
+
+    PARAMETERS
+        contents: The contents of the config file, as a byte string.
+
+    RETURN VALUE
+        A list of records, in the same format as the records printed
+        by "git config -z --list" (see ConfigFileParser.records).
+    """
+    return list(ConfigFileParser(contents).records())
@@ -0,0 +1,1020 @@
+"""A pure-Python reader for the git object database...
+
+... allowing us to read objects directly from the repository,
+without having to call git at all. This module knows how to read
+loose objects as well as objects stored in packfiles (using
+the packfiles' .idx files to locate them), including objects
+stored as deltas.
+
+This reader is an optional optimization: It only supports the most
+common repository formats, and whenever it meets a situation it does
+not support (an unknown pack version, a repository using SHA-256,
+replace references, grafts, a shallow repository, an object it
+cannot find, etc), it raises ObjectStoreError. Callers are expected
+to handle that exception by falling back to calling git.
+
+The object directories are determined the same way git determines
+them, including the GIT_OBJECT_DIRECTORY and GIT_ALTERNATE_OBJECT_DIRECTORIES
+environment variables. This is important, because git uses those
+to make the objects being pushed available to the pre-receive
+and update hooks while they are still in quarantine.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import mmap
+import os
+import re
+import struct
+import zlib
+
+from io_utils import safe_decode
+
+# The maximum number of objects kept in our delta base cache.
+DELTA_BASE_CACHE_SIZE = 256
+
+# Objects larger than this size (in bytes) are never kept in our
+# delta base cache.
+DELTA_BASE_CACHE_MAX_OBJECT_SIZE = 1024 * 1024
+
+# The maximum number of packfiles kept open by function pack_file.
+PACK_FILE_CACHE_SIZE = 64
+
+# The maximum depth of alternates (alternates of alternates, etc)
+# we follow. This is the same limit as git's.
+MAX_ALTERNATE_DEPTH = 5
+
+# The object types, indexed by the type number used in packfiles.
+PACK_OBJECT_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+PACK_OFS_DELTA = 6
+PACK_REF_DELTA = 7
+
+# The signature and version of version-2 pack index files.
+# Version-1 pack index files do not have any header.
+IDX_V2_HEADER = b"\377tOc\0\0\0\2"
+
+SHA1_RE = re.compile(r"[0-9a-f]{40}")
+
+# The names used by git when formatting dates.
+WEEKDAY_NAMES = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MONTH_NAMES = (
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Oct",
+    "Nov",
+    "Dec",
+)
+
+
+class ObjectStoreError(Exception):
+    """An exception raised when an object cannot be read by this module.
+
+    This exception does not necessarily mean that the object does not
+    exist; only that we are unable to read it ourselves. Callers should
+    handle it by asking git instead.
+    """
+
+    pass
+
+
+class PackFile(object):
+    """A packfile, accessed through its .idx file.
+
+    ATTRIBUTES
+        pack_path: The path to the packfile.
+    """
+
+    def __init__(self, idx_path):
+        """The constructor.
+
+        PARAMETERS
+            idx_path: The path to the pack's .idx file.
+        """
+        self.pack_path = idx_path[: -len(".idx")] + ".pack"
+        self.__idx = self.__mmap_file(idx_path)
+        self.__pack = self.__mmap_file(self.pack_path)
+
+        if self.__pack[:4] != b"PACK" or self.__pack[4:8] not in (
+            b"\0\0\0\2",
+            b"\0\0\0\3",
+        ):
+            raise ObjectStoreError("unsupported packfile: %s" % self.pack_path)
+
+        if self.__idx[:8] == IDX_V2_HEADER:
+            self.__v2_p = True
+            fanout_offset = 8
+        elif self.__idx[:4] == IDX_V2_HEADER[:4]:
+            raise ObjectStoreError("unsupported pack index: %s" % idx_path)
+        else:
+            self.__v2_p = False
+            fanout_offset = 0
+        self.__fanout = struct.unpack_from(">256I", self.__idx, fanout_offset)
+        self.__nr_objects = self.__fanout[255]
+        # The offset of the table of SHA1s (version 2), or the table
+        # of (offset, SHA1) entries (version 1).
+        self.__table_offset = fanout_offset + 256 * 4
+
+    def find(self, binsha):
+        """Return the offset in the packfile of the given object.
+
+        Return None if the object is not in this pack.
+
+        PARAMETERS
+            binsha: The object's SHA1, in binary form (20 bytes).
+        """
+        first_byte = binsha[0]
+        lo = self.__fanout[first_byte - 1] if first_byte > 0 else 0
+        hi = self.__fanout[first_byte]
+        if self.__v2_p:
+            entry_size, sha_offset = 20, 0
+        else:
+            entry_size, sha_offset = 24, 4
+        idx = self.__idx
+        base = self.__table_offset + sha_offset
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = base + mid * entry_size
+            mid_sha = idx[start : start + 20]
+            if mid_sha < binsha:
+                lo = mid + 1
+            elif mid_sha > binsha:
+                hi = mid
+            else:
+                return self.__entry_offset(mid)
+        return None
+
+    def entry_header(self, offset):
+        """Decode the header of the pack entry at the given offset.
+
+        PARAMETERS
+            offset: The offset of the entry in the packfile.
+
+        RETURN VALUE
+            A tuple (type_num, size, data_offset), where type_num is
+            the entry's type number, size is the size of its (inflated)
+            data, and data_offset the offset of the data that follows
+            the header (for deltas, this includes the reference to
+            the delta base).
+        """
+        pack = self.__pack
+        c = pack[offset]
+        offset += 1
+        type_num = (c >> 4) & 7
+        size = c & 0x0F
+        shift = 4
+        while c & 0x80:
+            c = pack[offset]
+            offset += 1
+            size |= (c & 0x7F) << shift
+            shift += 7
+        return (type_num, size, offset)
+
+    def ofs_delta_base(self, entry_offset, data_offset):
+        """Decode the base reference of an OFS_DELTA entry.
+
+        PARAMETERS
+            entry_offset: The offset of the entry in the packfile.
+            data_offset: The data_offset returned by entry_header
+                for that entry.
+
+        RETURN VALUE
+            A tuple (base_offset, data_offset), where base_offset is
+            the offset of the delta base in the packfile, and data_offset
+            the offset of the compressed delta data.
+        """
+        pack = self.__pack
+        c = pack[data_offset]
+        data_offset += 1
+        rel_offset = c & 0x7F
+        while c & 0x80:
+            c = pack[data_offset]
+            data_offset += 1
+            rel_offset = ((rel_offset + 1) << 7) | (c & 0x7F)
+        if rel_offset <= 0 or rel_offset > entry_offset:
+            raise ObjectStoreError("invalid delta base in %s" % self.pack_path)
+        return (entry_offset - rel_offset, data_offset)
+
+    def ref_delta_base(self, data_offset):
+        """Decode the base reference of a REF_DELTA entry.
+
+        PARAMETERS
+            data_offset: The data_offset returned by entry_header
+                for that entry.
+
+        RETURN VALUE
+            A tuple (base_sha, data_offset), where base_sha is the
+            hexadecimal SHA1 of the delta base, and data_offset the offset
+            of the compressed delta data.
+        """
+        base_sha = self.__pack[data_offset : data_offset + 20].hex()
+        return (base_sha, data_offset + 20)
+
+    def inflate(self, offset, size):
+        """Return the uncompressed data starting at the given offset.
+
+        PARAMETERS
+            offset: The offset of the compressed data in the packfile.
+            size: The expected size of the uncompressed data.
+        """
+        decompressor = zlib.decompressobj()
+        view = memoryview(self.__pack)
+        chunks = []
+        # Feed the decompressor one chunk at a time, so as to avoid
+        # handing it the entire rest of the packfile (which it would
+        # copy into its unused_data attribute).
+        chunk_size = min(max(size + 64, 4096), 1024 * 1024)
+        try:
+            while not decompressor.eof:
+                chunk = view[offset : offset + chunk_size]
+                if not chunk:
+                    raise ObjectStoreError("truncated packfile: %s" % self.pack_path)
+                offset += len(chunk)
+                chunks.append(decompressor.decompress(chunk))
+        except zlib.error:
+            raise ObjectStoreError("corrupted packfile: %s" % self.pack_path)
+        finally:
+            view.release()
+        data = b"".join(chunks)
+        if len(data) != size:
+            raise ObjectStoreError("corrupted packfile: %s" % self.pack_path)
+        return data
+
+    def __entry_offset(self, n):
+        """Return the pack offset of the n-th object in the index.
+
+        PARAMETERS
+            n: The position of the object in the index.
+        """
+        idx = self.__idx
+        if not self.__v2_p:
+            return struct.unpack_from(">I", idx, self.__table_offset + n * 24)[0]
+        # Skip the table of SHA1s, and the table of CRC32s.
+        offsets_table = self.__table_offset + self.__nr_objects * 24
+        offset = struct.unpack_from(">I", idx, offsets_table + n * 4)[0]
+        if offset & 0x80000000:
+            # The actual offset is stored in the table of 64bit
+            # offsets which follows.
+            large_offsets_table = offsets_table + self.__nr_objects * 4
+            offset = struct.unpack_from(
+                ">Q", idx, large_offsets_table + (offset & 0x7FFFFFFF) * 8
+            )[0]
+        return offset
+
+    @staticmethod
+    def __mmap_file(filename):
+        """Map the given file in memory, and return the mmap object.
+
+        PARAMETERS
+            filename: The name of the file to map.
+        """
+        try:
+            with open(filename, "rb") as f:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as E:
+            raise ObjectStoreError("cannot map %s: %s" % (filename, E))
+
+
+class ObjectStore(object):
+    """An object database, made of one or more object directories.
+
+    ATTRIBUTES
+        objects_dirs: A list of object directories, in the order
+            they should be searched.
+    """
+
+    def __init__(self, objects_dirs):
+        """The constructor.
+
+        PARAMETERS
+            objects_dirs: Same as the attribute.
+        """
+        self.objects_dirs = objects_dirs
+        # A dictionary of all the PackFile objects we know about,
+        # indexed by the path of their .idx file.
+        self.__packs = {}
+        # A cache of recently read pack entries, indexed by
+        # (pack path, offset), used to speed up the reconstruction
+        # of objects from their deltas.
+        self.__delta_base_cache = OrderedDict()
+        self.__scan_packs()
+
+    def read(self, sha):
+        """Return a tuple (object_type, data) for the given object.
+
+        Raise ObjectStoreError if the object cannot be found.
+
+        PARAMETERS
+            sha: The object's SHA1, in hexadecimal form.
+        """
+        if SHA1_RE.fullmatch(sha) is None:
+            raise ObjectStoreError("invalid object name: %s" % sha)
+        binsha = bytes.fromhex(sha)
+
+        result = self.__read_from_packs(binsha)
+        if result is None:
+            result = self.__read_loose(sha)
+        if result is None and self.__scan_packs():
+            # Some new packs appeared since we last looked. Perhaps
+            # the object got packed in the meantime.
+            result = self.__read_from_packs(binsha)
+        if result is None:
+            raise ObjectStoreError("object not found: %s" % sha)
+        return result
+
+    def __scan_packs(self):
+        """Look for packfiles we do not know about yet.
+
+        RETURN VALUE
+            True if some new packfiles were found, False otherwise.
+        """
+        found_new_packs_p = False
+        for objects_dir in self.objects_dirs:
+            pack_dir = os.path.join(objects_dir, "pack")
+            try:
+                filenames = sorted(os.listdir(pack_dir))
+            except OSError:
+                continue
+            for filename in filenames:
+                if not filename.endswith(".idx"):
+                    continue
+                idx_path = os.path.join(pack_dir, filename)
+                if idx_path in self.__packs:
+                    continue
+                self.__packs[idx_path] = pack_file(idx_path)
+                found_new_packs_p = True
+        return found_new_packs_p
+
+    def __read_from_packs(self, binsha):
+        """Return the same as self.read if the object is packed, else None.
+
+        PARAMETERS
+            binsha: The object's SHA1, in binary form.
+        """
+        for pack in self.__packs.values():
+            offset = pack.find(binsha)
+            if offset is not None:
+                return self.__read_pack_entry(pack, offset)
+        return None
+
+    def __read_pack_entry(self, pack, offset):
+        """Return a tuple (object_type, data) for the given pack entry.
+
+        PARAMETERS
+            pack: A PackFile object.
+            offset: The offset of the entry in the packfile.
+        """
+        # The deltas we need to apply, in reverse order, along with
+        # the key to use when caching the result of applying them.
+        deltas = []
+
+        while True:
+            cache_key = (pack.pack_path, offset)
+            cached_result = self.__delta_base_cache.get(cache_key)
+            if cached_result is not None:
+                self.__delta_base_cache.move_to_end(cache_key)
+                (obj_type, data) = cached_result
+                break
+
+            (type_num, size, data_offset) = pack.entry_header(offset)
+            if type_num in PACK_OBJECT_TYPES:
+                obj_type = PACK_OBJECT_TYPES[type_num]
+                data = pack.inflate(data_offset, size)
+                self.__cache_delta_base(cache_key, obj_type, data)
+                break
+            elif type_num == PACK_OFS_DELTA:
+                (base_offset, data_offset) = pack.ofs_delta_base(offset, data_offset)
+                deltas.append((cache_key, pack.inflate(data_offset, size)))
+                offset = base_offset
+            elif type_num == PACK_REF_DELTA:
+                (base_sha, data_offset) = pack.ref_delta_base(data_offset)
+                deltas.append((cache_key, pack.inflate(data_offset, size)))
+                # The delta base may be anywhere in the object store.
+                (obj_type, data) = self.read(base_sha)
+                break
+            else:
+                raise ObjectStoreError(
+                    "unsupported pack entry type %d in %s" % (type_num, pack.pack_path)
+                )
+
+        for (cache_key, delta) in reversed(deltas):
+            data = apply_delta(data, delta)
+            self.__cache_delta_base(cache_key, obj_type, data)
+        return (obj_type, data)
+
+    def __cache_delta_base(self, cache_key, obj_type, data):
+        """Add the given object to our delta base cache.
+
+        PARAMETERS
+            cache_key: The key to use for this object.
+            obj_type: The type of the object.
+            data: The object's data.
+        """
+        if len(data) > DELTA_BASE_CACHE_MAX_OBJECT_SIZE:
+            return
+        self.__delta_base_cache[cache_key] = (obj_type, data)
+        if len(self.__delta_base_cache) > DELTA_BASE_CACHE_SIZE:
+            self.__delta_base_cache.popitem(last=False)
+
+    def __read_loose(self, sha):
+        """Return the same as self.read if the object is loose, else None.
+
+        PARAMETERS
+            sha: The object's SHA1, in hexadecimal form.
+        """
+        for objects_dir in self.objects_dirs:
+            try:
+                with open(os.path.join(objects_dir, sha[:2], sha[2:]), "rb") as f:
+                    raw_data = f.read()
+            except OSError:
+                continue
+            try:
+                raw_data = zlib.decompress(raw_data)
+            except zlib.error:
+                raise ObjectStoreError("corrupted loose object: %s" % sha)
+            (header, _, data) = raw_data.partition(b"\0")
+            (obj_type, _, size) = header.partition(b" ")
+            obj_type = obj_type.decode("ascii", errors="replace")
+            if obj_type not in PACK_OBJECT_TYPES.values() or size != b"%d" % len(data):
+                raise ObjectStoreError("unsupported loose object: %s" % sha)
+            return (obj_type, data)
+        return None
+
+
+def apply_delta(base, delta):
+    """Return the result of applying the given delta to the given base.
+
+    PARAMETERS
+        base: The data of the delta base (a byte string).
+        delta: The delta data (a byte string), in the format used
+            by git in packfiles.
+    """
+
+    def read_size(pos):
+        """Decode the variable-length size at delta[pos:].
+
+        Return a tuple (size, pos), where pos is the position of the data
+        following the size.
+        """
+        size = 0
+        shift = 0
+        while True:
+            c = delta[pos]
+            pos += 1
+            size |= (c & 0x7F) << shift
+            shift += 7
+            if not c & 0x80:
+                return (size, pos)
+
+    try:
+        (base_size, pos) = read_size(0)
+        (result_size, pos) = read_size(pos)
+        if base_size != len(base):
+            raise ObjectStoreError("delta base size mismatch")
+
+        result = bytearray()
+        delta_size = len(delta)
+        while pos < delta_size:
+            op = delta[pos]
+            pos += 1
+            if op & 0x80:
+                # Copy some data from the base.
+                copy_offset = 0
+                copy_size = 0
+                for i in range(4):
+                    if op & (1 << i):
+                        copy_offset |= delta[pos] << (8 * i)
+                        pos += 1
+                for i in range(3):
+                    if op & (0x10 << i):
+                        copy_size |= delta[pos] << (8 * i)
+                        pos += 1
+                if copy_size == 0:
+                    copy_size = 0x10000
+                if copy_offset + copy_size > base_size:
+                    raise ObjectStoreError("invalid delta copy instruction")
+                result += base[copy_offset : copy_offset + copy_size]
+            elif op:
+                # Insert the next op bytes from the delta.
+                result += delta[pos : pos + op]
+                pos += op
+            else:
+                raise ObjectStoreError("invalid delta opcode")
+    except IndexError:
+        raise ObjectStoreError("truncated delta")
+
+    if len(result) != result_size:
+        raise ObjectStoreError("delta result size mismatch")
+    return bytes(result)
+
+
+def pack_file(idx_path):
+    """Return the PackFile object for the given .idx file.
+
+    The PackFile objects are cached, and a cached PackFile is reused
+    as long as neither its .idx file nor its packfile was modified.
+    This allows the git-hooks server (see server.py) to open each pack
+    only once, for all the processes it forks to run the hooks.
+
+    PARAMETERS
+        idx_path: The path to the pack's .idx file.
+    """
+    if not hasattr(pack_file, "cache"):
+        # The PackFile objects, indexed by the path of their .idx file,
+        # along with the modification times of the pack's files,
+        # from the least recently used to the most recently used.
+        pack_file.cache = OrderedDict()
+    mtimes = pack_file_mtimes(idx_path)
+    cached_pack = pack_file.cache.get(idx_path)
+    if cached_pack is not None and cached_pack[0] == mtimes:
+        pack_file.cache.move_to_end(idx_path)
+        return cached_pack[1]
+
+    pack = PackFile(idx_path)
+    pack_file.cache[idx_path] = (mtimes, pack)
+    pack_file.cache.move_to_end(idx_path)
+    if len(pack_file.cache) > PACK_FILE_CACHE_SIZE:
+        pack_file.cache.popitem(last=False)
+    return pack
+
+
+def pack_file_mtimes(idx_path):
+    """Return the modification times of the given pack's files.
+
+    Raise ObjectStoreError if the pack does not exist.
+
+    PARAMETERS
+        idx_path: The path to the pack's .idx file.
+    """
+    try:
+        return tuple(
+            os.stat(filename).st_mtime_ns
+            for filename in (idx_path, idx_path[: -len(".idx")] + ".pack")
+        )
+    except OSError as E:
+        raise ObjectStoreError("cannot stat %s: %s" % (idx_path, E))
+
+
+def prune_pack_files():
+    """Remove from the cache of function pack_file the packs which changed.
+
+    This allows the packs removed from the repositories (Eg: by
+    "git gc") to be unmapped, rather than remain in the cache until
+    they are the least recently used ones.
+    """
+    for (idx_path, (mtimes, _)) in list(getattr(pack_file, "cache", {}).items()):
+        try:
+            if pack_file_mtimes(idx_path) == mtimes:
+                continue
+        except ObjectStoreError:
+            pass
+        del pack_file.cache[idx_path]
+
+
+def object_store():
+    """Return the ObjectStore to be used for the current repository.
+
+    Raise ObjectStoreError if the repository uses some features
+    that this module does not support.
+
+    The result is cached, so as to only set the store up once.
+    """
+    if not hasattr(object_store, "store"):
+        try:
+            object_store.store = ObjectStore(repository_objects_dirs())
+        except ObjectStoreError as E:
+            object_store.store = E
+    if isinstance(object_store.store, ObjectStoreError):
+        raise object_store.store
+    return object_store.store
+
+
+def repository_dirs():
+    """Return the git directory and common directory of the current repository.
+
+    RETURN VALUE
+        A tuple (git_dir, common_dir), where both directories are
+        absolute paths. The common directory is the same as the git
+        directory, except when using worktrees.
+    """
+    if "GIT_DIR" in os.environ:
+        git_dir = os.path.abspath(os.environ["GIT_DIR"])
+    else:
+        # We cannot import that at module level, because module git
+        # actually depends on this module.  So we import it here instead.
+        from git import get_git_dir
+
+        git_dir = get_git_dir()
+
+    common_dir = os.environ.get("GIT_COMMON_DIR")
+    if common_dir is None and os.path.isfile(os.path.join(git_dir, "commondir")):
+        with open(os.path.join(git_dir, "commondir")) as f:
+            common_dir = os.path.join(git_dir, f.read().strip())
+    if common_dir is None:
+        common_dir = git_dir
+    return (git_dir, os.path.abspath(common_dir))
+
+
+def repository_objects_dirs():
+    """Return the list of object directories of the current repository.
+
+    Raise ObjectStoreError if the repository uses some features
+    that would cause the contents of its objects to differ from
+    what git would report (e.g. replace references), or some
+    features that this module does not support.
+    """
+    (git_dir, common_dir) = repository_dirs()
+    check_repository_format(git_dir, common_dir)
+
+    objects_dir = os.environ.get("GIT_OBJECT_DIRECTORY")
+    if objects_dir is None:
+        objects_dir = os.path.join(common_dir, "objects")
+    objects_dir = os.path.abspath(objects_dir)
+    if not os.path.isdir(objects_dir):
+        raise ObjectStoreError("no objects directory: %s" % objects_dir)
+
+    result = []
+    add_objects_dir(result, objects_dir, 0)
+    for alt_dir in os.environ.get("GIT_ALTERNATE_OBJECT_DIRECTORIES", "").split(
+        os.pathsep
+    ):
+        if alt_dir.startswith('"'):
+            # A C-style quoted path. We do not support those.
+            raise ObjectStoreError("quoted alternate object directory")
+        if alt_dir:
+            add_objects_dir(result, os.path.abspath(alt_dir), 1)
+    return result
+
+
+def add_objects_dir(objects_dirs, objects_dir, depth):
+    """Add objects_dir and its alternates to the given list of directories.
+
+    PARAMETERS
+        objects_dirs: A list of object directories (modified in place).
+        objects_dir: The object directory to add.
+        depth: The number of alternates links followed to reach
+            objects_dir.
+    """
+    if depth > MAX_ALTERNATE_DEPTH:
+        raise ObjectStoreError("alternates nested too deeply")
+    if any(os.path.samefile(objects_dir, d) for d in objects_dirs):
+        return
+    objects_dirs.append(objects_dir)
+
+    alternates_filename = os.path.join(objects_dir, "info", "alternates")
+    if not os.path.isfile(alternates_filename):
+        return
+    with open(alternates_filename) as f:
+        for line in f.read().splitlines():
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith('"'):
+                raise ObjectStoreError("quoted alternate object directory")
+            add_objects_dir(
+                objects_dirs,
+                os.path.normpath(os.path.join(objects_dir, line)),
+                depth + 1,
+            )
+
+
+def check_repository_format(git_dir, common_dir):
+    """Raise ObjectStoreError if the repository's format is not supported.
+
+    This function verifies that the repository does not use any
+    feature that this module does not support.
+
+    PARAMETERS
+        git_dir: The repository's git directory.
+        common_dir: The repository's common directory (the same as
+            git_dir, except when using worktrees).
+    """
+    # Repositories using a different hash algorithm, or a different
+    # reference storage backend (in which case we would not be able
+    # to check for replace references below).
+    config_filename = os.path.join(common_dir, "config")
+    if os.path.isfile(config_filename):
+        with open(config_filename, "rb") as f:
+            config_contents = safe_decode(f.read())
+        for m in re.finditer(
+            r"^\s*(objectformat|refstorage)\s*=\s*\"?(\w*)",
+            config_contents,
+            flags=re.IGNORECASE | re.MULTILINE,
+        ):
+            if m.group(2).lower() not in ("sha1", "files"):
+                raise ObjectStoreError("unsupported %s: %s" % m.groups())
+
+    # Grafts and shallow repositories, which change the commits'
+    # list of parents.
+    if os.path.exists(os.path.join(git_dir, "shallow")):
+        raise ObjectStoreError("shallow repository")
+    graft_filename = os.environ.get(
+        "GIT_GRAFT_FILE", os.path.join(common_dir, "info", "grafts")
+    )
+    if os.path.exists(graft_filename):
+        raise ObjectStoreError("repository uses grafts")
+
+    # Replace references, which change the contents of some objects.
+    if "GIT_NO_REPLACE_OBJECTS" in os.environ:
+        return
+    if "GIT_REPLACE_REF_BASE" in os.environ:
+        raise ObjectStoreError("repository uses replace references")
+    for (_, _, filenames) in os.walk(os.path.join(common_dir, "refs", "replace")):
+        if filenames:
+            raise ObjectStoreError("repository uses replace references")
+    packed_refs_filename = os.path.join(common_dir, "packed-refs")
+    if os.path.isfile(packed_refs_filename):
+        with open(packed_refs_filename, "rb") as f:
+            if b" refs/replace/" in f.read():
+                raise ObjectStoreError("repository uses replace references")
+
+
+def resolve(name):
+    """Return the SHA1 of the object designated by the given name.
+
+    Raise ObjectStoreError if the object does not exist.
+
+    PARAMETERS
+        name: An object name, as accepted by "git cat-file". Names
+            which are not a full SHA1 are resolved using git.
+    """
+    if SHA1_RE.fullmatch(name) is not None:
+        return name
+
+    # We cannot import that at module level, because module git
+    # actually depends on this module.  So we import it here instead.
+    from git import object_reader
+
+    info = object_reader().info(name)
+    if info is None:
+        raise ObjectStoreError("invalid object name: %s" % name)
+    return info[0]
+
+
+def read_object(name, expected_type=None):
+    """Return a tuple (sha, object_type, data) for the given object.
+
+    PARAMETERS
+        name: The name of the object (see function "resolve").
+        expected_type: If not None, the type of object we expect.
+            Tag objects are peeled until an object of that type
+            is found, and ObjectStoreError is raised if the object
+            is not of that type.  For "tree", commits are peeled
+            to their tree as well.
+    """
+    sha = resolve(name)
+    (obj_type, data) = object_store().read(sha)
+    while expected_type is not None and obj_type != expected_type:
+        if obj_type == "tag":
+            sha = object_headers(data)[b"object"][0].decode("ascii")
+        elif obj_type == "commit" and expected_type == "tree":
+            sha = object_headers(data)[b"tree"][0].decode("ascii")
+        else:
+            raise ObjectStoreError(
+                "%s is a %s, not a %s" % (name, obj_type, expected_type)
+            )
+        (obj_type, data) = object_store().read(sha)
+    return (sha, obj_type, data)
+
+
+def object_headers(data):
+    """Return the headers of the given commit or tag object.
+
+    PARAMETERS
+        data: The contents of a commit or tag object.
+
+    RETURN VALUE
+        A dictionary indexed by header name (a byte string), whose
+        values are lists of values (byte strings) in the order they
+        appear in the object. Multi-line headers (Eg: "gpgsig") only
+        have their first line included.
+    """
+    result = {}
+    header_end = data.find(b"\n\n")
+    if header_end < 0:
+        header_end = len(data)
+    for line in data[:header_end].split(b"\n"):
+        if not line or line.startswith(b" "):
+            # A continuation line of a multi-line header.
+            continue
+        (key, _, value) = line.partition(b" ")
+        result.setdefault(key, []).append(value)
+    return result
+
+
+def object_message(data):
+    """Return the message of the given commit or tag object.
+
+    PARAMETERS
+        data: The contents of a commit or tag object.
+    """
+    header_end = data.find(b"\n\n")
+    if header_end < 0:
+        return b""
+    return data[header_end + 2 :]
+
+
+def commit_parents(name):
+    """Return the same as git.commit_parents.
+
+    PARAMETERS
+        name: The name of the commit (see function "resolve").
+    """
+    (_, _, data) = read_object(name, "commit")
+    return [
+        parent.decode("ascii") for parent in object_headers(data).get(b"parent", [])
+    ]
+
+
+def commit_subject(name):
+    """Return the same as git.commit_subject.
+
+    PARAMETERS
+        name: The name of the commit (see function "resolve").
+    """
+    (_, _, data) = read_object(name, "commit")
+    encoding = object_headers(data).get(b"encoding", [b"utf-8"])[0]
+    if encoding.lower() not in (b"utf-8", b"utf8"):
+        # Git would re-encode the subject. Let git do that.
+        raise ObjectStoreError("unsupported commit encoding: %s" % encoding)
+
+    # Reproduce what git does: skip any leading blank lines, and then
+    # join all the lines of the first paragraph with a space (after
+    # having stripped their trailing whitespaces).
+    subject_lines = []
+    for line in object_message(data).split(b"\n"):
+        line = line.rstrip(b" \t\r\n")
+        if line:
+            subject_lines.append(line)
+        elif subject_lines:
+            break
+    return safe_decode(b" ".join(subject_lines)).rstrip()
+
+
+def tag_show_header_lines(name):
+    """Return the header lines that "git show" prints for the given tag.
+
+    PARAMETERS
+        name: The name of the annotated tag (see function "resolve").
+
+    RETURN VALUE
+        A list of strings, containing the tag's name, tagger, and date,
+        formatted the same way as "git show" does, followed by an empty
+        string (corresponding to the empty line marking the end of
+        the header).
+    """
+    (_, obj_type, data) = read_object(name)
+    if obj_type != "tag":
+        raise ObjectStoreError("%s is not a tag" % name)
+    if mailmap_p():
+        # The tagger's name and email would be rewritten by "git show".
+        raise ObjectStoreError("repository uses a mailmap")
+
+    headers = object_headers(data)
+    result = ["tag %s" % safe_decode(headers.get(b"tag", [b""])[0])]
+    if b"tagger" in headers:
+        m = re.fullmatch(
+            rb"([^<>\n]*?) *<([^<>\n]*)> (\d+) ([-+]\d{4})", headers[b"tagger"][0]
+        )
+        if m is None:
+            raise ObjectStoreError("unsupported tagger line in %s" % name)
+        (tagger_name, tagger_email, timestamp, tz) = m.groups()
+        result.append(
+            "Tagger: %s <%s>" % (safe_decode(tagger_name), safe_decode(tagger_email))
+        )
+        result.append("Date:   %s" % format_date(int(timestamp), int(tz)))
+    result.append("")
+    return result
+
+
+def format_date(timestamp, tz):
+    """Format the given date the same way git does by default.
+
+    PARAMETERS
+        timestamp: The number of seconds since the Epoch.
+        tz: The timezone, as an integer in git's HHMM notation
+            (Eg: -700 for -0700).
+    """
+    tz_minutes = (abs(tz) // 100) * 60 + abs(tz) % 100
+    if tz < 0:
+        tz_minutes = -tz_minutes
+    try:
+        d = datetime.fromtimestamp(timestamp, timezone(timedelta(minutes=tz_minutes)))
+    except (OverflowError, OSError, ValueError):
+        raise ObjectStoreError("unsupported date: %d %+05d" % (timestamp, tz))
+    return "%s %s %d %02d:%02d:%02d %d %+05d" % (
+        WEEKDAY_NAMES[d.weekday()],
+        MONTH_NAMES[d.month - 1],
+        d.day,
+        d.hour,
+        d.minute,
+        d.second,
+        d.year,
+        tz,
+    )
+
+
+def mailmap_p():
+    """Return True if a mailmap might be used by git in this repository.
+
+    The result is cached, so as to avoid calling git more than once.
+    """
+    if not hasattr(mailmap_p, "cached_result"):
+        # We cannot import that at module level, because module git
+        # actually depends on this module.  So we import it here instead.
+        from git import git, object_reader, CalledProcessError
+
+        try:
+            git.config("--get-regexp", r"^mailmap\.")
+            mailmap_p.cached_result = True
+        except CalledProcessError:
+            mailmap_p.cached_result = os.path.exists(
+                ".mailmap"
+            ) or object_reader().exists("HEAD:.mailmap")
+    return mailmap_p.cached_result
+
+
+def tree_entries(data):
+    """Iterate over the entries of the given tree object.
+
+    PARAMETERS
+        data: The contents of a tree object.
+
+    RETURN VALUE
+        An iterator of tuples (mode, name, sha), where mode and name
+        are byte strings, and sha is the entry's SHA1 in hexadecimal
+        form.
+    """
+    pos = 0
+    data_size = len(data)
+    while pos < data_size:
+        mode_end = data.index(b" ", pos)
+        name_end = data.index(b"\0", mode_end)
+        yield (
+            data[pos:mode_end],
+            data[mode_end + 1 : name_end],
+            data[name_end + 1 : name_end + 21].hex(),
+        )
+        pos = name_end + 21
+
+
+def read_path(name, path):
+    """Return the contents of the given blob inside the given tree.
+
+    Return None if there is no such path in the tree.
+
+    PARAMETERS
+        name: The name of a tree-ish object (see function "resolve").
+        path: The path of the blob, relative to the root of that tree
+            (a string).
+    """
+    (_, _, data) = read_object(name, "tree")
+    components = os.fsencode(path).split(b"/")
+    if not all(components):
+        raise ObjectStoreError("unsupported path: %s" % path)
+    for (n, component) in enumerate(components):
+        sha = None
+        for (_, entry_name, entry_sha) in tree_entries(data):
+            if entry_name == component:
+                sha = entry_sha
+                break
+        if sha is None:
+            return None
+        (obj_type, data) = object_store().read(sha)
+        expected_type = "blob" if n == len(components) - 1 else "tree"
+        if obj_type != expected_type:
+            raise ObjectStoreError("%s is a %s" % (path, obj_type))
+    return data
+
+
+def list_tree_files(name):
+    """Return the list of all the files in the given tree, recursively.
+
+    This is the equivalent of "git ls-tree -r --name-only".
+
+    PARAMETERS
+        name: The name of a tree-ish object (see function "resolve").
+
+    RETURN VALUE
+        A list of byte strings, in the same order as git.
+    """
+
+    def add_tree_files(result, prefix, tree_sha):
+        (obj_type, data) = object_store().read(tree_sha)
+        if obj_type != "tree":
+            raise ObjectStoreError("%s is not a tree" % tree_sha)
+        for (mode, entry_name, sha) in tree_entries(data):
+            if mode == b"40000":
+                add_tree_files(result, prefix + entry_name + b"/", sha)
+            else:
+                result.append(prefix + entry_name)
+
+    (tree_sha, _, _) = read_object(name, "tree")
+    result = []
+    add_tree_files(result, b"", tree_sha)
+    return result
@@ -0,0 +1,201 @@
+"""Parsers for the output of various git commands...
+
+... in their line-delimited or NUL-delimited form.
+
+All parsers in this module take an iterator over the records of
+the command's output (typically, what git_run returns when called
+with the _iter or _iter_sep parameter), and return an iterator.
+The records are consumed one at a time, as the parsing progresses,
+which means that the time it takes to parse the output is linear
+in its size, and that the parsers themselves do not need to hold
+the entire output in memory.
+
+The parsers work with both byte strings and strings, provided
+that all the records are of the same kind.
+"""
+
+
+class GitOutputParseError(Exception):
+    """An exception raised when the output of git cannot be parsed."""
+
+    pass
+
+
+def take_records(records, n, what):
+    """Return a list with the next n elements of the given iterator.
+
+    Raise GitOutputParseError if the iterator is exhausted before
+    we could get n elements.
+
+    PARAMETERS
+        records: An iterator.
+        n: The number of elements to return.
+        what: A description of what we are trying to read, for use
+            in the error message.
+    """
+    result = []
+    for _ in range(n):
+        record = next(records, None)
+        if record is None:
+            raise GitOutputParseError("truncated output while reading %s" % what)
+        result.append(record)
+    return result
+
+
+def starts_with(record, prefix):
+    """Return True if record (a string or byte string) starts with prefix.
+
+    PARAMETERS
+        record: A string or byte string.
+        prefix: A string, which is encoded if record is a byte string.
+    """
+    if isinstance(record, bytes):
+        prefix = prefix.encode("ascii")
+    return record.startswith(prefix)
+
+
+def parse_diff_tree_entry(stats, records):
+    """Parse one entry of the output of "git diff-tree -z".
+
+    PARAMETERS
+        stats: The record providing the information about the change
+            (the record which starts with a colon).
+        records: An iterator over the remaining records of the command's
+            output, from which the name(s) of the file are read.
+
+    RETURN VALUE
+        A 6-element tuple, organized as follow:
+            (old_mode, new_mode, old_sha1, new_sha1, status, filename)
+
+        For copies and renames (only reported by git when explicitly
+        requested), filename is the name of the destination file.
+    """
+    # The stats record starts with a colon and is then followed
+    # by space-separated information about the changes made to
+    # our file.  Strip that colon before we do the splitting.
+    stats_fields = stats[1:].split(None, 4)
+    if len(stats_fields) != 5:
+        raise GitOutputParseError("invalid diff-tree entry: %r" % stats)
+    (old_mode, new_mode, old_sha1, new_sha1, status) = stats_fields
+
+    # The stats record is followed by the name of the file, or
+    # by the names of the source and destination files for copies
+    # and renames.
+    nb_filenames = 2 if starts_with(status, "R") or starts_with(status, "C") else 1
+    filename = take_records(records, nb_filenames, "diff-tree entry")[-1]
+
+    return (old_mode, new_mode, old_sha1, new_sha1, status, filename)
+
+
+def parse_diff_tree(records):
+    """Parse the output of "git diff-tree -z".
+
+    PARAMETERS
+        records: An iterator over the NUL-separated records of
+            the command's output.
+
+    RETURN VALUE
+        An iterator over the entries of the output, each entry
+        being a tuple as returned by parse_diff_tree_entry.
+    """
+    records = iter(records)
+    for stats in records:
+        if not starts_with(stats, ":"):
+            # When doing a "git diff-tree" with a single tree-ish,
+            # or when using --stdin, the output for each commit starts
+            # with the hash of what is being compared. We're not
+            # interested in this piece of information, so skip it.
+            continue
+        yield parse_diff_tree_entry(stats, records)
+
+
+def parse_diff_tree_stdin(records):
+    """Parse the output of "git diff-tree --stdin --always -z".
+
+    PARAMETERS
+        records: An iterator over the NUL-separated records of
+            the command's output.
+
+    RETURN VALUE
+        An iterator of tuples (rev, entries), one per commit, where
+        rev is the commit's SHA1 (as printed by git at the start
+        of the output for that commit), and entries is a list of
+        tuples as returned by parse_diff_tree_entry.
+
+    REMARKS
+        The --always option is needed in order for git to print
+        the commit's SHA1 even when that commit did not change
+        any file; without it, these commits would be missing
+        from the result.
+    """
+    records = iter(records)
+    rev = None
+    entries = None
+    for record in records:
+        if not starts_with(record, ":"):
+            if rev is not None:
+                yield (rev, entries)
+            (rev, entries) = (record, [])
+            continue
+        if rev is None:
+            raise GitOutputParseError("diff-tree entry without a commit: %r" % record)
+        entries.append(parse_diff_tree_entry(record, records))
+    if rev is not None:
+        yield (rev, entries)
+
+
+def parse_rev_list(records, nb_lines):
+    """Parse the output of "git rev-list --pretty=tformat:[...]".
+
+    PARAMETERS
+        records: An iterator over the lines of the command's output.
+        nb_lines: The number of lines that the format produces for
+            each commit.
+
+    RETURN VALUE
+        An iterator of tuples (rev, lines), one per commit, where
+        rev is the commit's SHA1, and lines is a list containing
+        the nb_lines lines of output produced by the format.
+    """
+    records = iter(records)
+    for commit_line in records:
+        if not starts_with(commit_line, "commit "):
+            raise GitOutputParseError("invalid rev-list entry: %r" % commit_line)
+        rev = commit_line[len("commit ") :].strip()
+        yield (rev, take_records(records, nb_lines, "rev-list entry"))
+
+
+def parse_check_attr(records):
+    """Parse the output of "git check-attr -z".
+
+    PARAMETERS
+        records: An iterator over the NUL-separated records of
+            the command's output.
+
+    RETURN VALUE
+        An iterator of tuples (filename, attr_name, attr_value).
+    """
+    records = iter(records)
+    for filename in records:
+        (attr_name, attr_value) = take_records(records, 2, "check-attr entry")
+        yield (filename, attr_name, attr_value)
+
+
+def parse_config_list(records):
+    """Parse the output of "git config -z --list".
+
+    PARAMETERS
+        records: An iterator over the NUL-separated records of
+            the command's output.
+
+    RETURN VALUE
+        An iterator of tuples (config_name, config_value), where
+        config_value is None for options defined without a value
+        (Eg: "[section] option", as opposed to "[section] option = ...").
+    """
+    newline = "\n"
+    for record in records:
+        if isinstance(record, bytes):
+            newline = b"\n"
+        (config_name, sep, config_value) = record.partition(newline)
+        yield (config_name, config_value if sep else None)
@@ -0,0 +1,343 @@
+"""A pure-Python reader for the references of a repository...
+
+... allowing us to get the list of references without calling git,
+and, more importantly, to skip entire namespaces of references
+without even looking at them. On repositories hosted by Gerrit,
+for instance, the vast majority of the references are internal
+references (refs/changes/, etc) which the hooks ignore anyway
+(see the hooks.ignore-refs config option).
+
+The references are read from the "packed-refs" file, which is
+memory-mapped, and, when that file is sorted (which git guarantees
+since version 2.13), the references in the namespaces to be skipped
+are jumped over using a binary search. The references stored as
+individual files in the refs/ directory ("loose" references) are
+then read, without descending into the directories corresponding
+to the namespaces to be skipped.
+
+Like the git_odb module, this reader is an optional optimization:
+It only supports the most common situations, and whenever it meets
+a situation it does not support (symbolic references, reference names
+that git would reject, worktrees, a reference storage backend other
+than the "files" backend, etc), it raises RefStoreError. Callers
+are expected to handle that exception by falling back to calling git.
+"""
+
+import mmap
+import os
+import re
+
+from git_odb import repository_dirs
+from io_utils import safe_decode
+
+# A regular expression matching the reference names we support.
+# This is a subset of the names that git accepts, excluding in
+# particular all the names containing some special characters.
+SUPPORTED_REF_NAME_RE = re.compile(rb"refs(/[A-Za-z0-9_+@-][A-Za-z0-9._+@-]*)+")
+
+# A regular expression matching the contents of a loose reference,
+# or a reference entry in the packed-refs file.
+LOOSE_REF_RE = re.compile(rb"([0-9a-f]{40})\n")
+PACKED_REF_RE = re.compile(rb"([0-9a-f]{40}) ([^\n]+)\n")
+
+# The start of the header line of the packed-refs file.
+PACKED_REFS_HEADER = b"# pack-refs with:"
+
+# The characters which have a special meaning in regular expressions.
+REGEX_SPECIAL_CHARS = set(".^$*+?{}[]\\|()")
+
+
+class RefStoreError(Exception):
+    """An exception raised when we cannot read the references ourselves.
+
+    This exception is raised when the repository uses some features
+    which this module does not support.
+    """
+
+    pass
+
+
+def literal_prefix(regex):
+    """Return the prefix of all the names matched by the given regex, if any.
+
+    In other words, if all reference names starting with a given
+    string are matched by regex (using re.match), and only those,
+    return that string. Return None otherwise.
+
+    PARAMETERS
+        regex: A regular expression, as a string.
+    """
+    if regex.startswith("^"):
+        regex = regex[1:]
+    if regex.endswith(".*"):
+        regex = regex[:-2]
+    if not regex or any(c in REGEX_SPECIAL_CHARS for c in regex):
+        return None
+    return regex
+
+
+def check_ref_name(name):
+    """Raise RefStoreError if the given reference name is not supported.
+
+    PARAMETERS
+        name: A reference name, as a byte string.
+    """
+    if (
+        SUPPORTED_REF_NAME_RE.fullmatch(name) is None
+        or b".." in name
+        or name.endswith(b".")
+        or b".lock/" in name
+        or name.endswith(b".lock")
+    ):
+        raise RefStoreError("unsupported reference name: %r" % name)
+
+
+def read_refs(skip_prefixes=()):
+    """Return a dictionary with all the references in the repository.
+
+    Raise RefStoreError if the repository uses some features
+    that this module does not support.
+
+    PARAMETERS
+        skip_prefixes: A list of strings. References whose name starts
+            with any of these strings are not included in the result.
+
+    RETURN VALUE
+        A dictionary whose keys are the reference names, and whose
+        values are the SHA1 of the object each reference points to.
+        The references are inserted in alphabetical order, which is
+        the order "git show-ref" uses.
+
+    REMARKS
+        Unlike "git show-ref", this function does not verify that
+        the objects the references point to exist.
+    """
+    (git_dir, common_dir) = repository_dirs()
+    if git_dir != common_dir:
+        # Some references are then specific to each worktree.
+        raise RefStoreError("repository has worktrees")
+    check_ref_storage(common_dir)
+
+    skip_prefixes = tuple(os.fsencode(prefix) for prefix in skip_prefixes)
+
+    # Read the loose references first, the same way git does. Packing
+    # the references (Eg: "git pack-refs", or "git gc") rewrites the
+    # packed-refs file before deleting the loose references it packed,
+    # so, this way, a reference which gets packed in the meantime is
+    # still found in the packed-refs file.
+    loose_refs = read_loose_refs(common_dir, skip_prefixes)
+    refs = read_packed_refs(os.path.join(common_dir, "packed-refs"), skip_prefixes)
+    # Loose references take precedence over the packed ones.
+    refs.update(loose_refs)
+
+    return {safe_decode(name): safe_decode(refs[name]) for name in sorted(refs)}
+
+
+def read_ref(common_dir, name):
+    """Return the SHA1 of the object the given reference points to.
+
+    Return None if the reference does not exist. Raise RefStoreError
+    if the repository uses some features that this module does not
+    support.
+
+    PARAMETERS
+        common_dir: The repository's common directory.
+        name: The name of the reference (Eg: "refs/meta/config").
+
+    REMARKS
+        Unlike read_refs, this function does not depend on the current
+        repository, which allows the git-hooks server (see server.py)
+        to use it for any repository.
+    """
+    check_ref_storage(common_dir)
+    name = os.fsencode(name)
+    check_ref_name(name)
+
+    try:
+        with open(os.path.join(os.fsencode(common_dir), name), "rb") as f:
+            contents = f.read()
+    except (FileNotFoundError, NotADirectoryError):
+        sha = read_packed_refs(os.path.join(common_dir, "packed-refs"), ()).get(name)
+    else:
+        m = LOOSE_REF_RE.fullmatch(contents)
+        if m is None:
+            # Most likely a symbolic reference.
+            raise RefStoreError("unsupported loose reference: %r" % name)
+        sha = m.group(1)
+    return safe_decode(sha) if sha is not None else None
+
+
+def check_ref_storage(common_dir):
+    """Raise RefStoreError if the repository does not use the "files" backend.
+
+    PARAMETERS
+        common_dir: The repository's common directory.
+    """
+    config_filename = os.path.join(common_dir, "config")
+    if not os.path.isfile(config_filename):
+        return
+    with open(config_filename, "rb") as f:
+        config_contents = safe_decode(f.read())
+    m = re.search(
+        r"^\s*refstorage\s*=\s*\"?(\w*)",
+        config_contents,
+        flags=re.IGNORECASE | re.MULTILINE,
+    )
+    if m is not None and m.group(1).lower() != "files":
+        raise RefStoreError("unsupported refstorage: %s" % m.group(1))
+
+
+def read_packed_refs(filename, skip_prefixes):
+    """Return a dictionary with the references in the given packed-refs file.
+
+    PARAMETERS
+        filename: The name of the packed-refs file. The file does not
+            need to exist, in which case the empty dictionary is returned.
+        skip_prefixes: Same as in read_refs, but as a tuple of
+            byte strings.
+
+    RETURN VALUE
+        A dictionary whose keys are the reference names, and whose
+        values are the SHA1 of the object each reference points to,
+        all as byte strings.
+    """
+    refs = {}
+    try:
+        f = open(filename, "rb")
+    except FileNotFoundError:
+        return refs
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return refs
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            pos = 0
+            sorted_p = False
+            if data[: len(PACKED_REFS_HEADER)] == PACKED_REFS_HEADER:
+                pos = data.find(b"\n") + 1
+                if pos == 0:
+                    raise RefStoreError("invalid packed-refs header")
+                sorted_p = b" sorted " in data[:pos].replace(b"\n", b" ")
+
+            end = len(data)
+            while pos < end:
+                if data[pos : pos + 1] == b"^":
+                    # The object a tag reference peels to. We do not
+                    # need that information, so just skip the line.
+                    pos = data.find(b"\n", pos) + 1
+                    if pos == 0:
+                        raise RefStoreError("truncated packed-refs file")
+                    continue
+
+                m = PACKED_REF_RE.match(data, pos)
+                if m is None:
+                    raise RefStoreError("invalid packed-refs entry at offset %d" % pos)
+                (sha, name) = m.groups()
+
+                skip_prefix = next(
+                    (prefix for prefix in skip_prefixes if name.startswith(prefix)),
+                    None,
+                )
+                if skip_prefix is None:
+                    check_ref_name(name)
+                    refs[name] = sha
+                    pos = m.end()
+                elif sorted_p:
+                    # Jump directly to the first reference past all
+                    # the references starting with skip_prefix.
+                    pos = packed_refs_lower_bound(
+                        data, m.end(), skip_prefix[:-1] + bytes([skip_prefix[-1] + 1])
+                    )
+                else:
+                    pos = m.end()
+    return refs
+
+
+def packed_refs_lower_bound(data, pos, name):
+    """Return the offset of the first reference >= name in a sorted packed-refs.
+
+    PARAMETERS
+        data: The contents of the packed-refs file.
+        pos: The offset of the start of a line in data. All references
+            before that offset must be lower than name.
+        name: A reference name, as a byte string.
+
+    RETURN VALUE
+        The offset of the start of the line of the first reference
+        (at or after pos) whose name is greater or equal to name,
+        or the size of data if there is no such reference.
+    """
+
+    def first_ref_at_or_after(offset):
+        """Return (line_offset, ref_name) for the first ref starting at/after offset.
+
+        Return (len(data), None) if there is no such reference.
+        """
+        if offset > pos and data[offset - 1 : offset] != b"\n":
+            offset = data.find(b"\n", offset) + 1
+            if offset == 0:
+                return (len(data), None)
+        while data[offset : offset + 1] == b"^":
+            offset = data.find(b"\n", offset) + 1
+            if offset == 0:
+                return (len(data), None)
+        if offset >= len(data):
+            return (len(data), None)
+        m = PACKED_REF_RE.match(data, offset)
+        if m is None:
+            raise RefStoreError("invalid packed-refs entry at offset %d" % offset)
+        return (offset, m.group(2))
+
+    # Binary search on the offsets in data, relying on the fact that
+    # the name of the first reference at or after a given offset
+    # increases with that offset.
+    (lo, hi) = (pos, len(data))
+    while lo < hi:
+        mid = (lo + hi) // 2
+        ref_name = first_ref_at_or_after(mid)[1]
+        if ref_name is None or ref_name >= name:
+            hi = mid
+        else:
+            lo = mid + 1
+    return first_ref_at_or_after(lo)[0]
+
+
+def read_loose_refs(common_dir, skip_prefixes):
+    """Return a dictionary with all the loose references in the repository.
+
+    PARAMETERS
+        common_dir: The repository's common directory.
+        skip_prefixes: Same as in read_packed_refs.
+
+    RETURN VALUE
+        Same as in read_packed_refs.
+    """
+    refs = {}
+    top_dir = os.fsencode(common_dir)
+    for (dirpath, dirnames, filenames) in os.walk(os.path.join(top_dir, b"refs")):
+        dir_ref_name = os.path.relpath(dirpath, top_dir).replace(os.sep.encode(), b"/")
+        # Do not descend into the directories whose references
+        # all need to be skipped.
+        dirnames[:] = [
+            d
+            for d in dirnames
+            if not (dir_ref_name + b"/" + d + b"/").startswith(skip_prefixes)
+        ]
+        for filename in filenames:
+            name = dir_ref_name + b"/" + filename
+            if name.startswith(skip_prefixes):
+                continue
+            check_ref_name(name)
+            try:
+                with open(os.path.join(dirpath, filename), "rb") as f:
+                    contents = f.read()
+            except FileNotFoundError:
+                # The reference was deleted, or packed, in the meantime
+                # (in which case it is in the packed-refs file, which
+                # we read afterwards).
+                continue
+            m = LOOSE_REF_RE.fullmatch(contents)
+            if m is None:
+                # Most likely a symbolic reference.
+                raise RefStoreError("unsupported loose reference: %r" % name)
+            refs[name] = m.group(1)
+    return refs
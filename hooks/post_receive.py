@@ -9,7 +9,7 @@ from argparse import ArgumentParser
 from collections import OrderedDict
 import sys
 
-from config import ThirdPartyHook
+from config import ThirdPartyHook, ThirdPartyHookTimeoutError
 from daemon import run_in_daemon
 from git import git_show_ref
 from init import init_all_globals
@@ -88,9 +88,13 @@ def maybe_post_receive_hook(post_receive_data):
     config variable, by calling this function if the config variable
     is defined.
     """
-    result = ThirdPartyHook("hooks.post-receive-hook").call_if_defined(
-        hook_input=post_receive_data
-    )
+    try:
+        result = ThirdPartyHook("hooks.post-receive-hook").call_if_defined(
+            hook_input=post_receive_data
+        )
+    except ThirdPartyHookTimeoutError as E:
+        warn("!!! WARNING: %s" % E.message, *E.out.splitlines())
+        return
     if result is not None:
         hook_exe, p, out = result
         sys.stdout.write(out)
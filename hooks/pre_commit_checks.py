@@ -1,11 +1,19 @@
+from collections import OrderedDict
 import os
 import re
+from shutil import rmtree
+import sys
+from tempfile import mkdtemp
+import threading
+import time
 
 from config import git_config, ThirdPartyHook
 from errors import InvalidUpdate
-from git import git, diff_tree, file_exists
+from git import CalledProcessError, git, iter_diff_tree, file_exists, object_reader
 from git_attrs import git_attribute
 import itertools
+from style_check_cache import style_check_cache, style_check_context
+from style_checker_server import style_checker_server_pool
 import utils
 from utils import debug, warn
 
@@ -21,7 +29,9 @@ yet?
 """
 
 
-def style_check_files(filename_list, commit_rev, project_name):
+def style_check_files(
+    filename_list, commit_rev, project_name, scratch_dir=None, blob_sha1s=None
+):
     """Check a file for style violations if appropriate.
 
     Raise InvalidUpdate if one or more style violations are detected.
@@ -34,6 +44,14 @@ def style_check_files(filename_list, commit_rev, project_name):
             whether pre-commit-checks should be applied or not.
         project_name: The name of the project (same as the attribute
             in updates.emails.EmailInfo).
+        scratch_dir: The directory where to copy the files to be checked.
+            None means utils.scratch_dir.
+        blob_sha1s: Same as in write_commit_files.
+
+    REMARKS
+        When the style-check cache is enabled (see style_check_cache),
+        the files whose blob is provided by blob_sha1s and which are
+        already known to pass the style-check are not checked again.
     """
     debug(
         "style_check_files (commit_rev=%s):\n%s"
@@ -42,19 +60,59 @@ def style_check_files(filename_list, commit_rev, project_name):
     )
 
     config_file = git_config("hooks.style-checker-config-file")
+    if (
+        config_file is not None
+        and config_file not in filename_list
+        and not file_exists(commit_rev, config_file)
+    ):
+        info = (
+            STYLE_CHECKER_CONFIG_FILE_MISSING_ERR_MSG
+            % {"config_filename": config_file, "commit_rev": commit_rev}
+        ).splitlines()
+        raise InvalidUpdate(*info)
+
+    # For testing purposes, provide a back-door allowing the user
+    # to override the style-checking program to be used.  That way,
+    # the testsuite has a way to control what the program returns,
+    # and easily test all execution paths without having to maintain
+    # some sources specifically designed to trigger the various
+    # error conditions.
+    style_checker_hook = ThirdPartyHook("hooks.style-checker")
+    if "GIT_HOOKS_STYLE_CHECKER" in os.environ:
+        style_checker_hook.hook_exe = os.environ["GIT_HOOKS_STYLE_CHECKER"]
+
+    # Do not check again the files which are already known to pass
+    # the style-check.
+    cache = style_check_cache()
+    if cache is not None:
+        config_sha1 = None
+        if config_file is not None:
+            config_sha1 = object_reader().info("%s:%s" % (commit_rev, config_file))[0]
+        cache_context = style_check_context(
+            style_checker_hook.hook_exe, config_sha1, project_name
+        )
+        passed_files = cache.passed_files(filename_list, blob_sha1s, cache_context)
+        if passed_files:
+            debug(
+                "style_check_files: %d files already known to pass the style-check"
+                % len(passed_files),
+                level=3,
+            )
+            filename_list = [
+                filename for filename in filename_list if filename not in passed_files
+            ]
+            if not filename_list:
+                return
 
     # Auxilary list of files we need to fetch from the same reference
     # for purposes other than checking their contents.
     aux_files = []
     if config_file is not None and config_file not in filename_list:
-        if not file_exists(commit_rev, config_file):
-            info = (
-                STYLE_CHECKER_CONFIG_FILE_MISSING_ERR_MSG
-                % {"config_filename": config_file, "commit_rev": commit_rev}
-            ).splitlines()
-            raise InvalidUpdate(*info)
         aux_files.append(config_file)
 
+    if scratch_dir is None:
+        scratch_dir = utils.scratch_dir
+
     # Get a copy of all the files and save them in our scratch dir.
     # In order to allow us to call the style-checker using
     # the full path (from the project's root directory) of
@@ -68,38 +126,32 @@ def style_check_files(filename_list, commit_rev, project_name):
     # it can also be useful to quickly locate a file in the project
     # when trying to make the needed corrections outlined by the
     # style-checker.
-    for filename in itertools.chain(filename_list, aux_files):
-        path_to_filename = "%s/%s" % (utils.scratch_dir, os.path.dirname(filename))
-        if not os.path.exists(path_to_filename):
-            os.makedirs(path_to_filename)
-        git.show(
-            "%s:%s" % (commit_rev, filename),
-            _outfile="%s/%s" % (utils.scratch_dir, filename),
+    write_commit_files(
+        itertools.chain(filename_list, aux_files),
+        commit_rev,
+        scratch_dir,
+        blob_sha1s=blob_sha1s,
+    )
+
+    # Optionally, split the list of files into shards, each checked
+    # by its own style-checker process.
+    nb_shards = git_config("hooks.style-checker-shards")
+    if nb_shards > 1 and len(filename_list) > 1:
+        shards = style_checker_shards(
+            filename_list,
+            scratch_dir,
+            nb_shards,
+            git_config("hooks.style-checker-shard-by"),
         )
+    else:
+        shards = [filename_list]
 
     # Call the style-checker.
-
-    # For testing purposes, provide a back-door allowing the user
-    # to override the style-checking program to be used.  That way,
-    # the testsuite has a way to control what the program returns,
-    # and easily test all execution paths without having to maintain
-    # some sources specifically designed to trigger the various
-    # error conditions.
-    style_checker_hook = ThirdPartyHook("hooks.style-checker")
-    if "GIT_HOOKS_STYLE_CHECKER" in os.environ:
-        style_checker_hook.hook_exe = os.environ["GIT_HOOKS_STYLE_CHECKER"]
-    style_checker_hook_args = []
-    if config_file is not None:
-        style_checker_hook_args.extend(["--config", config_file])
-    style_checker_hook_args.append(project_name)
-
-    _, p, out = style_checker_hook.call(
-        hook_input="\n".join(filename_list),
-        hook_args=style_checker_hook_args,
-        cwd=utils.scratch_dir,
+    returncode, out = call_style_checker(
+        style_checker_hook, shards, config_file, project_name, scratch_dir
     )
 
-    if p.returncode != 0:
+    if returncode != 0:
         info = [
             "pre-commit check failed for commit: %s" % commit_rev
         ] + out.splitlines()
@@ -109,6 +161,220 @@ def style_check_files(filename_list, commit_rev, project_name):
     # zero (success). Print any output, it might be a non-fatal warning.
     if out:
         warn(*out.splitlines())
+    elif cache is not None:
+        cache.record_passed_files(filename_list, blob_sha1s, cache_context)
+
+
+def style_checker_shards(filename_list, files_dir, nb_shards, shard_by):
+    """Split the given list of files into shards to be checked separately.
+
+    The files are distributed so as to balance the total size
+    of the files in each shard.
+
+    PARAMETERS
+        filename_list: The names of the files to be checked.
+        files_dir: The directory where the files to be checked
+            have been written.
+        nb_shards: The maximum number of shards to create.
+        shard_by: How to split the files: "size" to distribute the files
+            individually, or "directory" to always put all the files
+            from a given directory in the same shard.
+
+    RETURN VALUE
+        A list of lists of filenames. The files in each shard are listed
+        in the same order as in filename_list, and the shards are sorted
+        according to the position of their first file in filename_list.
+        Empty shards are not returned.
+    """
+    if shard_by == "size":
+        groups = [[filename] for filename in filename_list]
+    elif shard_by == "directory":
+        files_by_dir = OrderedDict()
+        for filename in filename_list:
+            files_by_dir.setdefault(os.path.dirname(filename), []).append(filename)
+        groups = list(files_by_dir.values())
+    else:
+        raise InvalidUpdate(
+            "Invalid hooks.style-checker-shard-by value: %s"
+            " (must be 'size' or 'directory')" % shard_by
+        )
+
+    def group_size(group):
+        """Return the total size of the given files."""
+        return sum(os.path.getsize(os.path.join(files_dir, f)) for f in group)
+
+    # Assign each group of files, starting with the largest ones,
+    # to the shard with the smallest total size so far. Use the
+    # position of the groups and shards as tie-breakers, in order
+    # to make the result deterministic.
+    shards = [[] for _ in range(nb_shards)]
+    shard_sizes = [0] * nb_shards
+    for (size, _, group) in sorted(
+        ((group_size(group), index, group) for (index, group) in enumerate(groups)),
+        key=lambda item: (-item[0], item[1]),
+    ):
+        shard_index = shard_sizes.index(min(shard_sizes))
+        shards[shard_index].extend(group)
+        shard_sizes[shard_index] += size
+
+    file_position = {filename: index for (index, filename) in enumerate(filename_list)}
+    shards = [sorted(shard, key=file_position.get) for shard in shards if shard]
+    shards.sort(key=lambda shard: file_position[shard[0]])
+    return shards
+
+
+def call_style_checker(style_checker_hook, shards, config_file, project_name, cwd):
+    """Call the style-checker on each shard of files, concurrently.
+
+    PARAMETERS
+        style_checker_hook: The ThirdPartyHook for the style checker.
+        shards: A list of lists of files to be checked (see
+            style_checker_shards), with one style-checker process
+            being run for each list.
+        config_file: The name of the style-checker's config file
+            (see the hooks.style-checker-config-file config option),
+            or None if there is no such file.
+        project_name: The name of the project.
+        cwd: The directory from which to run the style checker,
+            where the files to be checked have been written.
+
+    RETURN VALUE
+        A tuple with the following elements:
+          - The exit status of the first style-checker process
+            (in the order of shards) that returned nonzero,
+            or zero if they all returned zero;
+          - The output of all the style-checker processes,
+            concatenated in the order of shards.
+
+    REMARKS
+        When the hooks.style-checker-protocol config option is set
+        to "server", each shard is sent to a style-checker running
+        as a co-process (see the style_checker_server module), rather
+        than to a new style-checker process.
+    """
+    protocol = git_config("hooks.style-checker-protocol")
+    if protocol == "exec":
+        server_pool = None
+    elif protocol == "server":
+        server_pool = style_checker_server_pool(style_checker_hook)
+    else:
+        raise InvalidUpdate(
+            "Invalid hooks.style-checker-protocol value: %s"
+            " (must be 'exec' or 'server')" % protocol
+        )
+
+    hook_args = []
+    if config_file is not None:
+        hook_args.extend(["--config", config_file])
+    hook_args.append(project_name)
+
+    def check_shard(shard):
+        """Run the style checker on the given shard.
+
+        RETURN VALUE
+            A tuple with the process' exit status and its output.
+        """
+        if server_pool is not None:
+            result = server_pool.check(shard, cwd, config_file, project_name)
+            if result is not None:
+                return result
+        _, p, out = style_checker_hook.call(
+            hook_input="\n".join(shard), hook_args=hook_args, cwd=cwd
+        )
+        return (p.returncode, out)
+
+    if len(shards) == 1:
+        return check_shard(shards[0])
+
+    # Imported here, as only needed when using more than one shard.
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        results = list(executor.map(check_shard, shards))
+
+    returncode = next((status for (status, _) in results if status != 0), 0)
+    out = "".join(
+        shard_out if not shard_out or shard_out.endswith("\n") else shard_out + "\n"
+        for (_, shard_out) in results
+    )
+    return (returncode, out)
+
+
+def write_commit_files(filename_list, commit_rev, dest_dir, blob_sha1s=None):
+    """Write the given files, as found in the given commit, inside dest_dir.
+
+    Each file is written at the same path relative to dest_dir as
+    its path relative to the root of the repository.
+
+    Raises CalledProcessError if one of the files cannot be found
+    (Eg: it does not exist in commit_rev).
+
+    PARAMETERS
+        filename_list: The names of the files to write (an iterable).
+        commit_rev: The commit where to get the files from.
+        dest_dir: The directory where to write the files.
+        blob_sha1s: If not None, a dictionary which provides, for some
+            of the files (typically, all the files modified by commit_rev),
+            the SHA1 of the file's blob in commit_rev, saving us the need
+            to look the file up in commit_rev's tree.
+
+    REMARKS
+        The contents of all the files is obtained through a single
+        stream of requests to our object reader, so as to avoid having
+        to fork one git process per file, or to wait for the contents
+        of one file before requesting the next one. The contents of
+        each blob is only read once, and files whose contents is
+        identical to the contents of a file already written are
+        created as hard links to that file.
+    """
+    start_time = time.monotonic()
+
+    # The paths of the files to write, indexed by the name of the object
+    # providing their contents. Usually, this is the blob's SHA1, thus
+    # allowing us to detect the files which have identical contents.
+    paths_by_object = OrderedDict()
+    created_dirs = set()
+    for filename in filename_list:
+        dirname = os.path.dirname(filename)
+        if dirname not in created_dirs:
+            os.makedirs(os.path.join(dest_dir, dirname), exist_ok=True)
+            created_dirs.add(dirname)
+        if blob_sha1s is not None and filename in blob_sha1s:
+            object_name = blob_sha1s[filename]
+        else:
+            object_name = "%s:%s" % (commit_rev, filename)
+        paths_by_object.setdefault(object_name, []).append(
+            os.path.join(dest_dir, filename)
+        )
+
+    nb_files = 0
+    for (object_name, contents) in object_reader().iter_contents(
+        list(paths_by_object.keys())
+    ):
+        paths = paths_by_object[object_name]
+        if contents is None:
+            # Report the error the same way "git show" would have.
+            raise CalledProcessError(
+                1, "git show %s:%s" % (commit_rev, os.path.relpath(paths[0], dest_dir))
+            )
+        with open(paths[0], "wb") as f:
+            f.write(contents)
+        for path in paths[1:]:
+            try:
+                os.link(paths[0], path)
+            except OSError:
+                # Hard links are not supported by the filesystem,
+                # or paths[0] and path are on different filesystems.
+                # Just write the file again.
+                with open(path, "wb") as f:
+                    f.write(contents)
+        nb_files += len(paths)
+
+    debug(
+        "write_commit_files: %d files (%d blobs) written in %.3fs"
+        % (nb_files, len(paths_by_object), time.monotonic() - start_time),
+        level=3,
+    )
 
 
 def ensure_iso_8859_15_only(commit):
@@ -329,22 +595,110 @@ def check_revision_history(commit):
     check_missing_ticket_number(commit)
 
 
-def check_filename_collisions(commit):
+class CaseFoldedFilesIndex(object):
+    """An index of all the files in a commit, grouped by case-folded name.
+
+    This index is meant to be updated incrementally, by applying
+    the changes made by each child commit in turn, which is a lot
+    less expensive than recomputing the index from the list of all
+    the files in each commit when a repository contains a large
+    number of files.
+
+    ATTRIBUTES
+        rev: The revision (SHA1) of the commit this index represents.
+    """
+
+    def __init__(self, commit):
+        """The constructor.
+
+        PARAMETERS
+            commit: A CommitInfo object. The index is initialized
+                with all the files in that commit.
+        """
+        self.rev = commit.rev
+        self.__files_map = {}
+        for filename in commit.all_files():
+            self.__files_map.setdefault(filename.lower(), set()).add(filename)
+
+    def update(self, commit):
+        """Update the index by applying the changes made by the given commit.
+
+        PARAMETERS
+            commit: A CommitInfo object. The base_rev_for_display of
+                that commit must be the commit this index represents.
+        """
+        assert commit.base_rev_for_display() == self.rev
+        # Process the deleted files first, so as to handle the case
+        # of files being replaced by files whose name only differ
+        # in casing (Eg: "README" renamed into "readme").
+        changes = commit.changes()
+        for (_, _, _, _, status, filename) in changes:
+            if status == "D":
+                key = filename.lower()
+                self.__files_map[key].discard(filename)
+                if not self.__files_map[key]:
+                    del self.__files_map[key]
+        for (_, _, _, _, status, filename) in changes:
+            if status == "A":
+                self.__files_map.setdefault(filename.lower(), set()).add(filename)
+        self.rev = commit.rev
+
+    def collisions(self, filenames):
+        """Return the list of collisions involving the given files.
+
+        PARAMETERS
+            filenames: An iterable of file names, which must all be
+                in this index.
+
+        RETURN VALUE
+            A list of lists of names. Each list contains all the files
+            (sorted alphabetically) whose case-folded name is the same
+            as one of the given files, when there are more than one
+            such file.
+        """
+        collisions = []
+        keys_seen = set()
+        for filename in filenames:
+            key = filename.lower()
+            if key in keys_seen:
+                continue
+            keys_seen.add(key)
+            if len(self.__files_map[key]) > 1:
+                collisions.append(sorted(self.__files_map[key]))
+        return collisions
+
+
+def check_filename_collisions(commit_list):
     """raise InvalidUpdate if the name of two files only differ in casing.
 
+    Only the files added by each commit are checked, so as to avoid
+    rejecting every new commit of a repository where two files
+    were already colliding.
+
     PARAMETERS
-        commit: A CommitInfo object representing the commit to be checked.
+        commit_list: A list of CommitInfo objects representing
+            the commits to be checked, in chronological order.
     """
-    filename_map = {}
-    for filename in commit.all_files():
-        key = filename.lower()
-        if key not in filename_map:
-            filename_map[key] = [filename]
+    index = None
+    for commit in commit_list:
+        if index is not None and index.rev == commit.base_rev_for_display():
+            # The index currently represents this commit's parent,
+            # so we can just update it with this commit's changes.
+            index.update(commit)
         else:
-            filename_map[key].append(filename)
-    collisions = [
-        filename_map[k] for k in filename_map.keys() if len(filename_map[k]) > 1
-    ]
+            index = CaseFoldedFilesIndex(commit)
+        report_filename_collisions(commit, index.collisions(commit.added_files()))
+
+
+def report_filename_collisions(commit, collisions):
+    """Raise InvalidUpdate if the list of collisions is not empty.
+
+    PARAMETERS
+        commit: A CommitInfo object representing the commit
+            which introduced the collisions.
+        collisions: A list of lists of colliding file names
+            (see CaseFoldedFilesIndex.collisions).
+    """
     if collisions:
         info = [
             "The following filename collisions have been detected.",
@@ -438,7 +792,9 @@ def reject_commit_if_merge(commit, ref_name):
         )
 
 
-def style_check_commit(old_rev, new_rev, project_name):
+def style_check_commit(
+    old_rev, new_rev, project_name, raw_revlog=None, changes=None, scratch_dir=None
+):
     """Call check_file for every file changed between old_rev and new_rev.
 
     Raise InvalidUpdate if one or more style violation are detected.
@@ -450,19 +806,30 @@ def style_check_commit(old_rev, new_rev, project_name):
         new_rev: The commit to be checked.
         project_name: The name of the project (same as the attribute
             in updates.emails.EmailInfo).
+        raw_revlog: The raw revision log of new_rev, if already known
+            by the caller (see CommitInfo.raw_revlog). None otherwise,
+            in which case this function gets it from git.
+        changes: The list of changes between old_rev and new_rev,
+            as returned by diff_tree("-r", old_rev, new_rev), if already
+            known by the caller (see CommitInfo.changes).  None otherwise,
+            in which case this function gets it from git.
+        scratch_dir: Same as in style_check_files.
     """
     debug("style_check_commit(old_rev=%s, new_rev=%s)" % (old_rev, new_rev))
 
     # We allow users to explicitly disable pre-commit checks for
     # specific commits via the use of a special keyword placed anywhere
     # in the revision log. If found, then return immediately.
-    raw_revlog = git.log("-1", new_rev, pretty="format:%B", _decode=True)
+    if raw_revlog is None:
+        raw_revlog = git.log("-1", new_rev, pretty="format:%B", _decode=True)
     if "no-precommit-check" in raw_revlog:
         debug("pre-commit checks explicity disabled for commit %s" % new_rev)
         return
 
-    changes = diff_tree("-r", old_rev, new_rev)
+    if changes is None:
+        changes = iter_diff_tree("-r", old_rev, new_rev)
     files_to_check = []
+    blob_sha1s = {}
 
     for item in changes:
         (old_mode, new_mode, old_sha1, new_sha1, status, filename) = item
@@ -484,6 +851,7 @@ def style_check_commit(old_rev, new_rev, project_name):
             # above to detect renames, and why we do not have a special
             # branch for status values starting with `R'.
             files_to_check.append(filename)
+            blob_sha1s[filename] = new_sha1
 
     no_style_check_map = git_attribute(new_rev, files_to_check, "no-precommit-check")
 
@@ -504,4 +872,173 @@ def style_check_commit(old_rev, new_rev, project_name):
         debug("style_check_commit: no files to style-check")
         return
 
-    style_check_files(files_to_check, new_rev, project_name)
+    style_check_files(
+        files_to_check,
+        new_rev,
+        project_name,
+        scratch_dir=scratch_dir,
+        blob_sha1s=blob_sha1s,
+    )
+
+
+class ThreadOutputCapture(object):
+    """A replacement for sys.stderr allowing threads to capture their output.
+
+    Everything written to this object by a thread which called
+    the start method is saved in a buffer specific to that thread,
+    while everything written by the other threads is written to
+    the file this object replaces.
+
+    ATTRIBUTES
+        orig_file: The file this object replaces.
+        local: A threading.local object, whose "output" attribute,
+            when defined, is the list of strings written so far
+            by the current thread.
+    """
+
+    def __init__(self, orig_file):
+        """The constructor.
+
+        PARAMETERS
+            orig_file: Same as the attribute.
+        """
+        self.orig_file = orig_file
+        self.local = threading.local()
+
+    def start(self):
+        """Start capturing the output of the current thread."""
+        self.local.output = []
+
+    def stop(self):
+        """Stop capturing the output of the current thread, and return it."""
+        output = "".join(self.local.output)
+        del self.local.output
+        return output
+
+    def write(self, s):
+        """Same as io.TextIOBase.write."""
+        if not hasattr(self.local, "output"):
+            return self.orig_file.write(s)
+        self.local.output.append(s)
+        return len(s)
+
+    def flush(self):
+        """Same as io.TextIOBase.flush."""
+        if not hasattr(self.local, "output"):
+            self.orig_file.flush()
+
+    def __getattr__(self, name):
+        """Forward all other attribute lookups to orig_file."""
+        return getattr(self.orig_file, name)
+
+
+def style_check_commits(commit_list, project_name):
+    """Call style_check_commit for each commit in commit_list, in order.
+
+    Raise InvalidUpdate if one or more style violations are detected,
+    for the first commit in commit_list which has some.
+
+    PARAMETERS
+        commit_list: A list of CommitInfo objects.
+        project_name: The name of the project (same as the attribute
+            in updates.emails.EmailInfo).
+
+    REMARKS
+        The commits are checked concurrently when the repository
+        is configured to allow it (see the hooks.style-checker-jobs
+        config option).
+    """
+    max_jobs = git_config("hooks.style-checker-jobs")
+    if max_jobs > 1 and len(commit_list) > 1:
+        style_check_commits_concurrently(commit_list, project_name, max_jobs)
+        return
+
+    for commit in commit_list:
+        style_check_commit(
+            commit.base_rev_for_git(),
+            commit.rev,
+            project_name,
+            raw_revlog=commit.raw_revlog,
+            changes=commit.changes(),
+        )
+
+
+def style_check_commits_concurrently(commit_list, project_name, max_jobs):
+    """Same as style_check_commits, but checking up to max_jobs commits at once.
+
+    The user sees exactly the same output as if the commits had been
+    checked one after the other: The output generated while checking
+    each commit (warnings, debug traces, etc) is captured, and then
+    printed in the order of commit_list, up to and including the first
+    commit which fails the check, whose error is then raised.
+
+    As soon as the check fails for one commit, the commits after it
+    whose check has not started yet are not checked at all, since
+    the outcome of their check would not be reported anyway.
+
+    PARAMETERS
+        commit_list: Same as in style_check_commits.
+        project_name: Same as in style_check_commits.
+        max_jobs: The maximum number of commits to check at the same time.
+    """
+    # Imported here, as only needed when checking commits concurrently.
+    from concurrent.futures import ThreadPoolExecutor
+
+    # The index in commit_list of the first commit known to have
+    # failed the check so far (len(commit_list) if none).
+    first_failure = [len(commit_list)]
+    lock = threading.Lock()
+    futures = []
+
+    def check_one_commit(index, commit):
+        """Check the given commit, in its own scratch directory.
+
+        RETURN VALUE
+            None if the check was skipped. Otherwise, a tuple with
+            the output generated while checking the commit, and
+            the exception raised by the check (None if it passed).
+        """
+        with lock:
+            if first_failure[0] < index:
+                return None
+        output_capture.start()
+        commit_scratch_dir = mkdtemp("", "style-check-", utils.scratch_dir)
+        try:
+            style_check_commit(
+                commit.base_rev_for_git(),
+                commit.rev,
+                project_name,
+                raw_revlog=commit.raw_revlog,
+                changes=commit.changes(),
+                scratch_dir=commit_scratch_dir,
+            )
+            error = None
+        except Exception as E:
+            error = E
+            with lock:
+                first_failure[0] = min(first_failure[0], index)
+            for future in futures[index + 1 :]:
+                future.cancel()
+        finally:
+            rmtree(commit_scratch_dir, ignore_errors=True)
+            output = output_capture.stop()
+        return (output, error)
+
+    # Make sure the object reader gets created before the threads
+    # start using it.
+    object_reader()
+
+    output_capture = ThreadOutputCapture(sys.stderr)
+    sys.stderr = output_capture
+    try:
+        with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+            with lock:
+                for (index, commit) in enumerate(commit_list):
+                    futures.append(executor.submit(check_one_commit, index, commit))
+            for future in futures:
+                (output, error) = future.result()
+                sys.stderr.write(output)
+                if error is not None:
+                    raise error
+    finally:
+        sys.stderr = output_capture.orig_file
@@ -0,0 +1,600 @@
+#! /usr/bin/env python
+"""The git-hooks server...
+
+Each time git calls one of the hooks, a new Python interpreter gets
+started, which then needs to import all the modules implementing
+the hooks before doing any actual work. The git-hooks server is
+an optional daemon which avoids that cost, by importing all these
+modules once, and then forking a new process for each hook call.
+
+The server listens on a Unix socket (see server_client.server_socket_path)
+for requests sent by the hooks' wrappers via the server_client module.
+Each request contains the name of the script implementing the hook,
+its arguments, the environment and current working directory of
+the caller, as well as the caller's stdin, stdout and stderr (passed
+as file descriptors). For each request, the server forks a process
+which sets itself up to match the caller's environment, and then
+runs the script, exactly as the Python interpreter would. Once that
+process terminates, the server reports its exit status to the caller.
+
+Since the hooks are run by the process forked by the server, they
+run with the privileges of the user running the server. For that
+reason, the server only accepts requests from processes run by that
+same user.
+
+Before forking a process for a request, the server warms some caches
+for the request's repository, which the forked process then inherits:
+the packfiles of the repository are mapped in memory (see
+git_odb.pack_file), and its configuration is parsed (see
+config.preload_git_config). These caches are keyed such that they
+never hold stale data: the packfiles by their path and modification
+time, and the configuration by the SHA1 of the config file, which
+the server only resolves again when the references of the repository
+might have changed. Apart from that, the forked processes start from
+a pristine state, which guarantees that the hooks behave the same
+with or without the server.
+
+Usage: server.py [--socket PATH] [--daemon] [--log-file FILE]
+"""
+
+from argparse import ArgumentParser
+import array
+import errno
+import importlib
+import io
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import time
+import types
+
+from config import (
+    CONFIG_FILENAME,
+    CONFIG_REF,
+    git_config_preloaded_p,
+    preload_git_config,
+)
+from daemon import daemonize
+from git_odb import (
+    ObjectStore,
+    add_objects_dir,
+    check_repository_format,
+    object_headers,
+    prune_pack_files,
+    tree_entries,
+)
+from git_refs import read_ref
+from server_client import (
+    PROTOCOL_VERSION,
+    REQUEST_HEADER,
+    SERVED_SCRIPTS,
+    hooks_dir,
+    peer_uid,
+    python_id,
+    server_socket_path,
+)
+from updates.factory import REF_CHANGE_MAP
+
+# The maximum size of a request (in bytes).
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+# The maximum time (in seconds) we wait for a client to send its request.
+REQUEST_TIMEOUT = 10
+
+
+class InvalidRequest(Exception):
+    """An exception raised when receiving a request we cannot handle."""
+
+    pass
+
+
+def log(message):
+    """Print the given message on stderr, prefixed with a timestamp.
+
+    PARAMETERS
+        message: The message to print.
+    """
+    print(
+        "%s [%d] %s" % (time.strftime("%Y-%m-%d %H:%M:%S"), os.getpid(), message),
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+# The modules which the scripts we serve only import when needed,
+# so as to start faster when run without the server (including
+# the modules imported implicitly by the Python standard library). The server
+# imports them upfront, so that the processes it forks do not need
+# to import them again (see preload_modules).
+LAZILY_IMPORTED_MODULES = (
+    "concurrent.futures",  # See pre_commit_checks and updates.
+    "email.charset",  # See updates.emails.
+    "email.header",  # See updates.emails.
+    "email.mime.text",  # See updates.emails.
+    "email.utils",  # See updates.emails.
+    "encodings.iso8859_15",  # See io_utils.safe_decode.
+    "hashlib",  # See style_check_cache.
+    "resource",  # Needed by os.wait4 (see config.HookProcess).
+    "smtplib",  # See updates.sendmail.
+)
+
+
+def preload_modules():
+    """Import all the modules that the scripts we serve need.
+
+    This includes the modules which these scripts only import when
+    needed (see LAZILY_IMPORTED_MODULES), and the modules implementing
+    each kind of update (see updates.factory.REF_CHANGE_MAP).
+    """
+    for script in SERVED_SCRIPTS:
+        importlib.import_module(os.path.splitext(script)[0])
+    for module_name in LAZILY_IMPORTED_MODULES:
+        importlib.import_module(module_name)
+    for (module_name, _) in REF_CHANGE_MAP.values():
+        importlib.import_module(module_name)
+
+
+def exit_status(wait_status):
+    """Convert the given status, as returned by os.waitpid, to an exit status.
+
+    PARAMETERS
+        wait_status: A process status, as returned by os.waitpid.
+    """
+    if os.WIFSIGNALED(wait_status):
+        # Same convention as the shell.
+        return 128 + os.WTERMSIG(wait_status)
+    return os.WEXITSTATUS(wait_status)
+
+
+def refs_snapshot(common_dir, ref_name):
+    """Return a value which changes whenever the given reference may have changed.
+
+    PARAMETERS
+        common_dir: The repository's common directory.
+        ref_name: The name of the reference.
+    """
+    result = []
+    for filename in (
+        os.path.join(common_dir, ref_name),
+        os.path.join(common_dir, "packed-refs"),
+    ):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            result.append(None)
+        else:
+            # References are updated by renaming a new file over
+            # the old one, so the inode changes as well.
+            result.append((st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(result)
+
+
+def config_file_sha(common_dir, store):
+    """Return the SHA1 of the repository's CONFIG_FILENAME blob, or None.
+
+    PARAMETERS
+        common_dir: The repository's common directory.
+        store: The repository's ObjectStore.
+    """
+    config_commit = read_ref(common_dir, CONFIG_REF)
+    if config_commit is None:
+        return None
+    (obj_type, data) = store.read(config_commit)
+    if obj_type != "commit":
+        return None
+    (_, data) = store.read(object_headers(data)[b"tree"][0].decode("ascii"))
+    for (_, entry_name, entry_sha) in tree_entries(data):
+        if entry_name == os.fsencode(CONFIG_FILENAME):
+            return entry_sha
+    return None
+
+
+def receive_request(conn):
+    """Receive a request from the given connection, and return it.
+
+    Raise InvalidRequest if the request is invalid.
+
+    PARAMETERS
+        conn: The socket of a connection with a client.
+
+    RETURN VALUE
+        A tuple (request, fds) where request is the dictionary sent
+        by the client, and fds the list of the file descriptors sent
+        along with the request (the client's stdin, stdout and stderr).
+    """
+    if peer_uid(conn) != os.getuid():
+        raise InvalidRequest("request from a different user")
+
+    fds = array.array("i")
+    (data, ancdata, _, _) = conn.recvmsg(64 * 1024, socket.CMSG_SPACE(3 * fds.itemsize))
+    for (cmsg_level, cmsg_type, cmsg_data) in ancdata:
+        if cmsg_level == socket.SOL_SOCKET and cmsg_type == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[: len(cmsg_data) - (len(cmsg_data) % fds.itemsize)])
+    fds = list(fds)
+    try:
+        if len(data) < REQUEST_HEADER.size or len(fds) != 3:
+            raise InvalidRequest("malformed request")
+        (size,) = REQUEST_HEADER.unpack(data[: REQUEST_HEADER.size])
+        if size > MAX_REQUEST_SIZE:
+            raise InvalidRequest("request too large")
+        data = data[REQUEST_HEADER.size :]
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise InvalidRequest("truncated request")
+            data += chunk
+        try:
+            request = json.loads(data.decode("utf-8"))
+        except ValueError:
+            raise InvalidRequest("malformed request")
+
+        if request.get("version") != PROTOCOL_VERSION:
+            raise InvalidRequest("unsupported protocol version")
+        if request.get("hooks_dir") != hooks_dir():
+            # The client is using a different copy of the hooks.
+            raise InvalidRequest("hooks mismatch (%s)" % request.get("hooks_dir"))
+        if request.get("python") != python_id():
+            # The client would not use the same Python as us.
+            raise InvalidRequest("Python mismatch (%s)" % request.get("python"))
+        if request.get("script") not in SERVED_SCRIPTS:
+            raise InvalidRequest("unsupported script: %s" % request.get("script"))
+    except BaseException:
+        for fd in fds:
+            os.close(fd)
+        raise
+    return (request, fds)
+
+
+def send_response(conn, response):
+    """Send the given response to the client, ignoring errors.
+
+    Errors are ignored, because they just mean that the client
+    is gone, in which case there is nothing else we can do.
+
+    PARAMETERS
+        conn: The socket of a connection with a client.
+        response: A dictionary.
+    """
+    try:
+        conn.sendall(json.dumps(response).encode("utf-8") + b"\n")
+    except OSError:
+        pass
+
+
+class Server(object):
+    """The git-hooks server.
+
+    ATTRIBUTES
+        socket_path: The path of the Unix socket we listen on.
+        sock: The listening socket.
+        selector: The selector we use to wait for events.
+        wakeup_fds: A pipe used to wake the selector up when
+            we receive a signal (see signal.set_wakeup_fd).
+        children: A dictionary mapping the PID of each process
+            we forked to the connection with the corresponding client.
+        stopping: True if we have been asked to terminate.
+        config_shas: A dictionary mapping the git directory of each
+            repository we warmed the caches for (see warm_caches)
+            to a tuple (snapshot, cfg_sha), where cfg_sha is the SHA1
+            of the repository's CONFIG_FILENAME blob (or None), as of
+            the given snapshot of its references (see refs_snapshot).
+    """
+
+    def __init__(self, socket_path):
+        """The constructor.
+
+        PARAMETERS
+            socket_path: The path of the Unix socket to listen on.
+        """
+        self.socket_path = socket_path
+        self.sock = None
+        self.selector = None
+        self.wakeup_fds = None
+        self.children = {}
+        self.stopping = False
+        self.config_shas = {}
+
+    def listen(self):
+        """Create the listening socket."""
+        if os.path.exists(self.socket_path):
+            # Check whether this is the socket of a server that
+            # is still running, or a leftover from a previous server.
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)
+            else:
+                raise OSError(
+                    errno.EADDRINUSE,
+                    "git-hooks server already running",
+                    self.socket_path,
+                )
+            finally:
+                probe.close()
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            self.sock.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        self.sock.listen(64)
+        self.sock.setblocking(False)
+
+    def serve(self):
+        """Serve requests until asked to stop.
+
+        RETURN VALUE
+            In the server process, None, once all the processes
+            we forked have terminated. In the processes we fork
+            to handle the requests, the request to handle (as
+            returned by receive_request).
+        """
+        self.wakeup_fds = os.pipe()
+        for fd in self.wakeup_fds:
+            os.set_blocking(fd, False)
+        signal.set_wakeup_fd(self.wakeup_fds[1])
+        # We need a handler for SIGCHLD, or else the signal is
+        # just discarded, and does not wake us up.
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self.stop)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.selector.register(self.wakeup_fds[0], selectors.EVENT_READ)
+
+        log("listening on %s" % self.socket_path)
+        while not self.stopping or self.children:
+            for (key, _) in self.selector.select():
+                if key.fileobj is self.sock:
+                    if self.stopping:
+                        # We stopped listening in the meantime.
+                        continue
+                    request = self.accept()
+                    if request is not None:
+                        # We are in the forked process.
+                        return request
+                else:
+                    self.drain_wakeup_fd()
+            self.reap_children()
+
+        log("terminated")
+        return None
+
+    def drain_wakeup_fd(self):
+        """Read everything written to our wakeup pipe so far."""
+        try:
+            while os.read(self.wakeup_fds[0], 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def stop(self, signum, frame):
+        """Stop accepting new requests (a signal handler)."""
+        if self.stopping:
+            return
+        self.stopping = True
+        self.selector.unregister(self.sock)
+        self.sock.close()
+        os.unlink(self.socket_path)
+
+    def accept(self):
+        """Accept a new connection, and handle the request it sends.
+
+        RETURN VALUE
+            Same as the serve method, except that None is returned
+            in the server process (including when the request is
+            not accepted).
+        """
+        try:
+            (conn, _) = self.sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return None
+        try:
+            conn.setblocking(True)
+            conn.settimeout(REQUEST_TIMEOUT)
+            (request, fds) = receive_request(conn)
+        except (InvalidRequest, OSError) as E:
+            log("request rejected: %s" % E)
+            send_response(conn, {"accepted": False, "reason": str(E)})
+            conn.close()
+            return None
+
+        self.warm_caches(request)
+        pid = os.fork()
+        if pid == 0:
+            self.setup_child(conn)
+            return (request, fds)
+
+        for fd in fds:
+            os.close(fd)
+        log("%s: started process %d" % (request["script"], pid))
+        self.children[pid] = conn
+        send_response(conn, {"accepted": True})
+        return None
+
+    def warm_caches(self, request):
+        """Warm the caches for the repository of the given request.
+
+        The caches are warmed in the server, so that the process forked
+        to handle the request, as well as those forked for the subsequent
+        requests, inherit them (see the module's documentation).
+
+        PARAMETERS
+            request: The request, as returned by receive_request.
+        """
+        git_dir = request["env"].get("GIT_DIR")
+        if git_dir is None:
+            return
+        git_dir = os.path.normpath(os.path.join(request["cwd"], git_dir))
+        if "GIT_COMMON_DIR" in request["env"] or os.path.exists(
+            os.path.join(git_dir, "commondir")
+        ):
+            # A worktree. Such repositories are very unlikely to be
+            # the ones being pushed to, so do not bother.
+            return
+
+        try:
+            check_repository_format(git_dir, git_dir)
+            objects_dirs = []
+            add_objects_dir(objects_dirs, os.path.join(git_dir, "objects"), 0)
+            # Creating the ObjectStore maps the repository's packfiles
+            # in memory. Forget about the packfiles which were removed
+            # or modified since we mapped them first.
+            prune_pack_files()
+            store = ObjectStore(objects_dirs)
+
+            snapshot = refs_snapshot(git_dir, CONFIG_REF)
+            (known_snapshot, cfg_sha) = self.config_shas.get(git_dir, (None, None))
+            if snapshot != known_snapshot:
+                cfg_sha = config_file_sha(git_dir, store)
+                self.config_shas[git_dir] = (snapshot, cfg_sha)
+            if cfg_sha is not None and not git_config_preloaded_p(cfg_sha):
+                (_, cfg_contents) = store.read(cfg_sha)
+                preload_git_config(cfg_sha, cfg_contents)
+        except Exception as E:
+            # The caches are only an optimization, and the process
+            # handling the request will report the problem, if any,
+            # so just log the error.
+            log("%s: cannot warm caches: %s" % (git_dir, E))
+
+    def setup_child(self, conn):
+        """Undo, in a forked process, everything that is specific to the server.
+
+        PARAMETERS
+            conn: The connection with the client (the server is
+                responsible for it, not the forked process).
+        """
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        self.selector.close()
+        for fd in self.wakeup_fds:
+            os.close(fd)
+        if not self.stopping:
+            self.sock.close()
+        for child_conn in self.children.values():
+            child_conn.close()
+        conn.close()
+
+    def reap_children(self):
+        """Report the exit status of all the processes which terminated."""
+        while self.children:
+            try:
+                (pid, wait_status) = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            conn = self.children.pop(pid, None)
+            if conn is None:
+                continue
+            status = exit_status(wait_status)
+            log("process %d exited with status %d" % (pid, status))
+            send_response(conn, {"status": status})
+            conn.close()
+
+
+def run_request(request, fds):
+    """Run the script for the given request, in the current process.
+
+    This function is called in the process forked to handle the request.
+    It sets the process up to match the environment of the client,
+    and then runs the script, the same way the Python interpreter does.
+
+    PARAMETERS
+        request: The request, as returned by receive_request.
+        fds: The client's stdin, stdout and stderr file descriptors.
+    """
+    os.environ.clear()
+    os.environ.update(request["env"])
+    os.chdir(request["cwd"])
+    os.umask(request["umask"])
+
+    # Our stdin, stdout and stderr become the client's. Recreate
+    # the corresponding file objects, using the client's encodings,
+    # and in unbuffered mode (the hooks are run using "python -u").
+    for (n, fd) in enumerate(fds):
+        os.dup2(fd, n)
+        os.close(fd)
+    (encoding, errors) = request["stdio_encodings"][0]
+    sys.stdin = io.TextIOWrapper(
+        io.open(0, "rb", closefd=False), encoding=encoding, errors=errors
+    )
+    for (n, name) in ((1, "stdout"), (2, "stderr")):
+        (encoding, errors) = request["stdio_encodings"][n]
+        setattr(
+            sys,
+            name,
+            io.TextIOWrapper(
+                io.open(n, "wb", buffering=0, closefd=False),
+                encoding=encoding,
+                errors=errors,
+                write_through=True,
+            ),
+        )
+
+    script_path = os.path.join(hooks_dir(), request["script"])
+    sys.argv = [script_path] + request["args"]
+    with open(script_path, "rb") as f:
+        code = compile(f.read(), script_path, "exec")
+    # Run the script in a new __main__ module, as the Python interpreter
+    # would do (our own __main__ module is not needed anymore).
+    main_module = types.ModuleType("__main__")
+    main_module.__file__ = script_path
+    sys.modules["__main__"] = main_module
+    exec(code, main_module.__dict__)
+
+
+def parse_command_line():
+    """Return a namespace built after parsing the command line."""
+    ap = ArgumentParser(description="The git-hooks server.")
+    ap.add_argument(
+        "--socket",
+        default=server_socket_path(),
+        help="the Unix socket to listen on (default: %(default)s)",
+    )
+    ap.add_argument(
+        "--daemon",
+        action="store_true",
+        help="run in the background",
+    )
+    ap.add_argument(
+        "--log-file",
+        help="append the server's log to this file, rather than printing it"
+        " on stderr",
+    )
+    return ap.parse_args()
+
+
+def main():
+    """Implement the main routine of this script."""
+    args = parse_command_line()
+
+    log_fd = None
+    if args.log_file is not None:
+        log_fd = os.open(args.log_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        if not args.daemon:
+            os.dup2(log_fd, 2)
+
+    preload_modules()
+    server = Server(args.socket)
+    server.listen()
+    if args.daemon and not daemonize(log_fd):
+        return
+
+    result = server.serve()
+    if result is not None:
+        # We are in a process forked to handle a request.
+        run_request(*result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""A thin client forwarding the execution of a hook to the git-hooks server.
+
+See the server module for a description of the git-hooks server.
+
+Usage: server_client.py SCRIPT [ARGS...]
+
+... where SCRIPT is the name of the Python script implementing the hook
+(Eg: "update.py"), and ARGS the arguments to pass to that script.
+
+If the server cannot be reached, or refuses to handle the request,
+this script executes the hook's script directly, exactly as if
+the server did not exist.
+
+This module is deliberately kept small, and only imports modules
+from the Python standard library, in order to start as fast as
+possible.
+"""
+
+import array
+import json
+import os
+import socket
+import struct
+import sys
+
+# The version of the protocol used to communicate with the server.
+PROTOCOL_VERSION = 1
+
+# The scripts that the server knows how to run.
+SERVED_SCRIPTS = ("pre_receive.py", "update.py", "post_receive.py")
+
+# The struct used to transmit the length of a request.
+REQUEST_HEADER = struct.Struct("!I")
+
+
+def server_socket_path():
+    """Return the path of the Unix socket the git-hooks server listens on.
+
+    This is $GIT_HOOKS_SERVER_SOCKET if defined. Otherwise, it is a file
+    in the temporary directory whose name includes the current user's ID,
+    since the server only accepts requests from the user running it.
+
+    REMARKS
+        The hooks' shell wrappers compute the same default, in order
+        to avoid starting this client when no server is running.
+    """
+    if os.environ.get("GIT_HOOKS_SERVER_SOCKET"):
+        return os.environ["GIT_HOOKS_SERVER_SOCKET"]
+    return os.path.join(
+        os.environ.get("TMPDIR") or "/tmp", "git-hooks-server-%d.sock" % os.getuid()
+    )
+
+
+def hooks_dir():
+    """Return the (real) path of the directory containing the hooks' scripts."""
+    return os.path.dirname(os.path.realpath(__file__))
+
+
+def python_id():
+    """Return a description of the Python installation running this script.
+
+    This allows the server to verify that it uses the same Python
+    as the hooks would use when not using the server.
+    """
+    return [os.path.realpath(sys.executable), sys.prefix, list(sys.version_info)]
+
+
+def current_umask():
+    """Return the current process' umask."""
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def peer_uid(sock):
+    """Return the user ID of the process at the other end of the given socket.
+
+    Return None if this information is not available on this platform.
+
+    PARAMETERS
+        sock: A connected Unix socket.
+    """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    (_, uid, _) = struct.unpack("3i", creds)
+    return uid
+
+
+def read_response(sock_file):
+    """Read the next response from the server, and return it.
+
+    Return None if the server closed the connection.
+
+    PARAMETERS
+        sock_file: A file object reading from the server's socket.
+    """
+    line = sock_file.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+def run_in_server(script, args):
+    """Ask the git-hooks server to run the given script.
+
+    PARAMETERS
+        script: The name of the hook's script (Eg: "update.py").
+        args: A list with the arguments to pass to that script.
+
+    RETURN VALUE
+        The script's exit status, or None if the server could not
+        be reached, or refused to run the script (in which case
+        the script has not been run at all).
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(server_socket_path())
+        # Only trust a server run by the same user as us.
+        if peer_uid(sock) != os.getuid():
+            return None
+
+        # Send the request, with our stdin, stdout and stderr attached,
+        # so that the hook reads and writes directly from/to them.
+        request = json.dumps(
+            {
+                "version": PROTOCOL_VERSION,
+                "hooks_dir": hooks_dir(),
+                "script": script,
+                "args": args,
+                "cwd": os.getcwd(),
+                "umask": current_umask(),
+                "python": python_id(),
+                "env": dict(os.environ),
+                "stdio_encodings": [
+                    (f.encoding, f.errors) for f in (sys.stdin, sys.stdout, sys.stderr)
+                ],
+            }
+        ).encode("utf-8")
+        for f in (sys.stdout, sys.stderr):
+            f.flush()
+        sock.sendmsg(
+            [REQUEST_HEADER.pack(len(request)), request],
+            [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", [0, 1, 2]))],
+        )
+
+        sock_file = sock.makefile("rb")
+        response = read_response(sock_file)
+        if response is None or not response.get("accepted"):
+            return None
+        # From there on, the script is being run by the server,
+        # so we must not fall back to running it ourselves,
+        # even if something goes wrong.
+        try:
+            response = read_response(sock_file)
+        except (OSError, ValueError):
+            response = None
+        if response is None or "status" not in response:
+            print(
+                "*** git-hooks server: connection lost while running %s" % script,
+                file=sys.stderr,
+            )
+            return 1
+        return response["status"]
+    except (OSError, ValueError):
+        return None
+    finally:
+        sock.close()
+
+
+def main():
+    """Implement the main routine of this script."""
+    if len(sys.argv) < 2 or sys.argv[1] not in SERVED_SCRIPTS:
+        sys.exit("Usage: server_client.py {%s} [ARGS...]" % ",".join(SERVED_SCRIPTS))
+    (script, args) = (sys.argv[1], sys.argv[2:])
+
+    status = run_in_server(script, args)
+    if status is None:
+        # Run the script ourselves, the usual way.
+        script_path = os.path.join(hooks_dir(), script)
+        os.execv(sys.executable, [sys.executable, "-u", script_path] + args)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#! /usr/bin/env python
+"""A persistent cache of the style-checker's verdicts...
+
+... allowing the hooks to avoid style-checking the same files again
+and again (Eg: when the same change is cherry-picked to several
+branches, or when a topic branch gets rebased and pushed again).
+
+Each entry of the cache records the fact that a file passed
+the style-check, and is identified by:
+  - The SHA1 of the file's blob;
+  - The path of the file;
+  - A fingerprint of the style-checker executable;
+  - The SHA1 of the blob of the style-checker's config file (if any);
+  - The name of the project.
+
+Only the files which passed the style-check without the style-checker
+printing anything are recorded, so any failure or warning is always
+reported again.
+
+The cache is stored in a file inside the repository's git directory,
+and is limited to a maximum number of entries (see the
+hooks.style-checker-cache-size config option), the least recently
+used entries being evicted first.
+
+This module can also be called as a script, from the repository
+(or with GIT_DIR set to the repository's git directory), in order
+to flush the cache.
+
+Usage: style_check_cache.py --flush
+"""
+
+from argparse import ArgumentParser
+import atexit
+from collections import OrderedDict
+import json
+import os
+from shutil import which
+from tempfile import mkstemp
+import threading
+
+from config import git_config
+from git_odb import repository_dirs
+
+# The name of the file, in the repository's git directory, where
+# the style-checker's verdicts are saved.
+STYLE_CHECK_CACHE_FILENAME = "git-hooks-style-check-cache.json"
+
+# The version of the format of the STYLE_CHECK_CACHE_FILENAME file.
+# It must be changed each time the format changes, or whenever
+# the way the entries are identified changes, so as to invalidate
+# the existing caches.
+STYLE_CHECK_CACHE_VERSION = 1
+
+
+class StyleCheckCache(object):
+    """The cache of the style-checker's verdicts.
+
+    This class is thread-safe.
+
+    ATTRIBUTES
+        filename: The full path of the file where the cache is saved.
+        max_entries: The maximum number of entries in the cache.
+    """
+
+    def __init__(self, filename, max_entries):
+        """Initialize self, loading the cache from filename.
+
+        PARAMETERS
+            filename: Same as the attribute.
+            max_entries: Same as the attribute.
+        """
+        self.filename = filename
+        self.max_entries = max_entries
+        self.__lock = threading.Lock()
+        # The entries of the cache, in least recently used order
+        # (only the keys matter).
+        self.__entries = self.__load()
+        # The entries used or added since the cache was loaded,
+        # in least recently used order.
+        self.__used_entries = OrderedDict()
+
+    def passed_files(self, filename_list, blob_sha1s, context):
+        """Return the files known to have passed the style-check.
+
+        PARAMETERS
+            filename_list: The names of the files to look up.
+            blob_sha1s: A dictionary providing the SHA1 of the blob
+                of the files. Files which are not in this dictionary
+                are never found in the cache.
+            context: The style-check context, as returned by
+                style_check_context.
+
+        RETURN VALUE
+            A set with the names of the files in filename_list which
+            have been found in the cache.
+        """
+        result = set()
+        with self.__lock:
+            for (filename, key) in self.__keys(filename_list, blob_sha1s, context):
+                if key in self.__entries:
+                    self.__use(key)
+                    result.add(filename)
+        return result
+
+    def record_passed_files(self, filename_list, blob_sha1s, context):
+        """Record that the given files passed the style-check.
+
+        PARAMETERS
+            filename_list: Same as in passed_files.
+            blob_sha1s: Same as in passed_files.
+            context: Same as in passed_files.
+        """
+        with self.__lock:
+            for (_, key) in self.__keys(filename_list, blob_sha1s, context):
+                self.__use(key)
+
+    def save(self):
+        """Save the entries used or added so far in self.filename.
+
+        The entries are merged with the entries currently in that file,
+        in case other processes updated it since we loaded it.
+
+        This method does nothing if the cache cannot be written
+        (Eg: the repository is read-only for the current user),
+        since the cache is only an optimization.
+        """
+        with self.__lock:
+            if not self.__used_entries:
+                return
+            entries = self.__load()
+            for key in self.__used_entries:
+                entries.pop(key, None)
+                entries[key] = True
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+            tmp_file = None
+            try:
+                # Write the cache in a temporary file first, and then move it
+                # to its final location, so that other processes never see
+                # a partially written cache.
+                (tmp_fd, tmp_file) = mkstemp(
+                    prefix=STYLE_CHECK_CACHE_FILENAME,
+                    dir=os.path.dirname(self.filename),
+                )
+                with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
+                    json.dump(
+                        {
+                            "version": STYLE_CHECK_CACHE_VERSION,
+                            "entries": list(entries.keys()),
+                        },
+                        f,
+                    )
+                os.chmod(tmp_file, 0o644)
+                os.replace(tmp_file, self.filename)
+                tmp_file = None
+            except OSError:
+                pass
+            finally:
+                if tmp_file is not None:
+                    os.unlink(tmp_file)
+
+            self.__entries = entries
+            self.__used_entries = OrderedDict()
+
+    def __load(self):
+        """Return the entries stored in self.filename.
+
+        RETURN VALUE
+            An OrderedDict whose keys are the entries, in least
+            recently used order. This dictionary is empty if the file
+            does not exist or is invalid.
+        """
+        try:
+            with open(self.filename, encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return OrderedDict()
+        if (
+            not isinstance(cache, dict)
+            or cache.get("version") != STYLE_CHECK_CACHE_VERSION
+            or not isinstance(cache.get("entries"), list)
+        ):
+            return OrderedDict()
+        return OrderedDict(
+            (key, True) for key in cache["entries"] if isinstance(key, str)
+        )
+
+    def __use(self, key):
+        """Mark the given entry as the most recently used one.
+
+        REMARKS
+            This method assumes that self.__lock is held.
+        """
+        self.__used_entries.pop(key, None)
+        self.__used_entries[key] = True
+
+    @staticmethod
+    def __keys(filename_list, blob_sha1s, context):
+        """Yield (filename, key) for each file of filename_list we can cache.
+
+        PARAMETERS
+            filename_list: Same as in passed_files.
+            blob_sha1s: Same as in passed_files.
+            context: Same as in passed_files.
+        """
+        if context is None or blob_sha1s is None:
+            return
+        # Imported here, as hashlib is comparatively slow to import,
+        # and this is only needed when the cache is enabled.
+        from hashlib import sha1
+
+        for filename in filename_list:
+            if filename in blob_sha1s:
+                key_data = "\0".join((context, blob_sha1s[filename], filename))
+                yield (
+                    filename,
+                    sha1(key_data.encode("utf-8", "surrogateescape")).hexdigest(),
+                )
+
+
+def style_check_cache_filename():
+    """Return the full path of the STYLE_CHECK_CACHE_FILENAME file."""
+    (git_dir, _) = repository_dirs()
+    return os.path.join(git_dir, STYLE_CHECK_CACHE_FILENAME)
+
+
+def style_check_cache():
+    """Return the StyleCheckCache to be used by this process.
+
+    Return None if the cache is disabled (see the
+    hooks.style-checker-cache-size config option).
+
+    The cache is automatically saved when this process exits.
+    """
+    if not hasattr(style_check_cache, "cache"):
+        max_entries = git_config("hooks.style-checker-cache-size")
+        if max_entries <= 0:
+            style_check_cache.cache = None
+        else:
+            style_check_cache.cache = StyleCheckCache(
+                style_check_cache_filename(), max_entries
+            )
+            atexit.register(style_check_cache.cache.save)
+    return style_check_cache.cache
+
+
+def style_check_context(style_checker_exe, config_sha1, project_name):
+    """Return a string identifying the context of a style-check.
+
+    Return None if the style-checker cannot be found (in which case
+    the style-checker's verdicts should not be cached).
+
+    PARAMETERS
+        style_checker_exe: The style-checker program (either a path,
+            or the name of a program in the PATH).
+        config_sha1: The SHA1 of the blob of the style-checker's
+            config file, or None if there is no such file.
+        project_name: The name of the project.
+    """
+    style_checker_path = which(style_checker_exe)
+    if style_checker_path is None:
+        return None
+    style_checker_path = os.path.realpath(style_checker_path)
+    st = os.stat(style_checker_path)
+    return "\0".join(
+        (
+            style_checker_path,
+            "%d:%d:%d" % (st.st_size, st.st_mtime_ns, st.st_ino),
+            config_sha1 or "",
+            project_name,
+        )
+    )
+
+
+def flush_style_check_cache():
+    """Delete all the entries of the style-check cache."""
+    try:
+        os.unlink(style_check_cache_filename())
+    except FileNotFoundError:
+        pass
+
+
+if __name__ == "__main__":
+    ap = ArgumentParser(description="Manage the cache of the style-checker verdicts.")
+    ap.add_argument(
+        "--flush",
+        action="store_true",
+        required=True,
+        help="delete all the entries of the cache",
+    )
+    ap.parse_args()
+    flush_style_check_cache()
@@ -0,0 +1,274 @@
+"""Support for running the style-checker as a co-process...
+
+... rather than executing it for each style-check (see the
+hooks.style-checker-protocol config option), thus saving the cost
+of starting the style-checker, and of loading its configuration,
+each time.
+
+In that mode, the style-checker is started with "--server" as its only
+argument the first time a style-check is needed, and then receives
+one request per style-check via its standard input. Each request is
+a JSON dictionary on a line of its own, with the following key/value
+pairs:
+  - "files": The names of the files to check, relative to "root";
+  - "root": The full path of the directory where the files to check
+    have been written;
+  - "config": The name of the style-checker's config file, relative
+    to "root", or null if there is no such file;
+  - "project": The name of the project.
+
+For each request, the style-checker sends back a response via its
+standard output, which is a JSON dictionary on a line of its own,
+with the following key/value pairs:
+  - "status": The status the style-checker would have returned if it
+    had been executed for this style-check (an integer);
+  - "output": The output the style-checker would have printed if it
+    had been executed for this style-check (a string).
+
+The style-checker's standard error is redirected to its standard
+output, so anything the style-checker prints on its standard error
+must be part of the "output" of a response.
+
+The style-checker is shut down, by closing its standard input, when
+the hooks exit.
+
+If the style-checker cannot be started, or fails to follow this
+protocol (Eg: it exits unexpectedly, sends an invalid response,
+or does not respond within STYLE_CHECKER_SERVER_RESPONSE_TIMEOUT
+seconds, or within the limit set by the hooks.hook-timeout config
+option), it gets killed, and the style-checker gets executed for
+each style-check instead, for the rest of the hooks' execution.
+In particular, this is what happens with a style-checker which
+does not support this protocol, and therefore just waits for
+the end of its standard input.
+"""
+
+import atexit
+import json
+from subprocess import TimeoutExpired
+import threading
+
+from config import ThirdPartyHookTimeoutError, kill_process_group
+from errors import InvalidUpdate
+from io_utils import encode_utf8
+from utils import debug
+
+# The maximum time (in seconds) given to a style-checker to exit
+# once its standard input got closed, after which it gets killed.
+STYLE_CHECKER_SERVER_SHUTDOWN_TIMEOUT = 10
+
+# The maximum time (in seconds) given to a style-checker to respond
+# to a request, after which it gets killed.
+STYLE_CHECKER_SERVER_RESPONSE_TIMEOUT = 60
+
+
+class StyleCheckerServer(object):
+    """A style-checker running as a co-process.
+
+    This class is not thread-safe: Only one style-check can be
+    performed at a time by a given server.
+
+    ATTRIBUTES
+        style_checker_hook: The ThirdPartyHook for the style checker.
+        process: The Popen object of the style-checker's process.
+    """
+
+    def __init__(self, style_checker_hook):
+        """Initialize self, starting the style-checker.
+
+        Raises InvalidUpdate if the style-checker could not be started.
+
+        PARAMETERS
+            style_checker_hook: The ThirdPartyHook for the style checker.
+        """
+        self.style_checker_hook = style_checker_hook
+        self.process = style_checker_hook.start(hook_args=["--server"])
+
+    def check(self, filename_list, root_dir, config_file, project_name):
+        """Ask the style-checker to check the given files.
+
+        PARAMETERS
+            filename_list: The names of the files to check, relative
+                to root_dir.
+            root_dir: The directory where the files to be checked
+                have been written.
+            config_file: The name of the style-checker's config file,
+                relative to root_dir, or None if there is no such file.
+            project_name: The name of the project.
+
+        RETURN VALUE
+            A tuple with the status and the output of the style-check,
+            or None if the style-checker failed to provide a valid
+            response in time.
+        """
+        request = {
+            "files": list(filename_list),
+            "root": root_dir,
+            "config": config_file,
+            "project": project_name,
+        }
+        try:
+            response = self.style_checker_hook.request(
+                self.process,
+                encode_utf8(json.dumps(request) + "\n"),
+                STYLE_CHECKER_SERVER_RESPONSE_TIMEOUT,
+            )
+        except OSError:
+            return None
+        except ThirdPartyHookTimeoutError as E:
+            debug("style-checker server: %s" % E.message)
+            return None
+        try:
+            response = json.loads(response.decode("utf-8"))
+        except ValueError:
+            return None
+        if (
+            not isinstance(response, dict)
+            or type(response.get("status")) is not int
+            or not isinstance(response.get("output"), str)
+        ):
+            return None
+        return (response["status"], response["output"])
+
+    def shutdown(self):
+        """Shut the style-checker down, and wait for it to exit.
+
+        The style-checker gets killed if it does not exit within
+        STYLE_CHECKER_SERVER_SHUTDOWN_TIMEOUT seconds.
+        """
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=STYLE_CHECKER_SERVER_SHUTDOWN_TIMEOUT)
+        except TimeoutExpired:
+            self.kill()
+        self.process.stdout.close()
+
+    def kill(self):
+        """Kill the style-checker, and wait for it to exit.
+
+        The processes started by the style-checker get killed as well.
+        """
+        kill_process_group(self.process)
+        self.process.wait()
+
+
+class StyleCheckerServerPool(object):
+    """The servers running a given style-checker.
+
+    Several style-checks may be performed at the same time (see
+    the hooks.style-checker-jobs and hooks.style-checker-shards config
+    options), so this class starts as many servers as needed to handle
+    them, each of them being reused once its style-check is done.
+
+    This class is thread-safe.
+
+    ATTRIBUTES
+        style_checker_hook: The ThirdPartyHook for the style checker.
+    """
+
+    def __init__(self, style_checker_hook):
+        """Initialize self.
+
+        PARAMETERS
+            style_checker_hook: Same as the attribute.
+        """
+        self.style_checker_hook = style_checker_hook
+        self.__lock = threading.Lock()
+        # All the servers started so far, and not shut down yet.
+        self.__servers = []
+        # The servers which are not performing a style-check.
+        self.__idle_servers = []
+        # True if the servers failed, in which case the style-checker
+        # should be executed for each style-check instead.
+        self.__disabled = False
+
+    def check(self, filename_list, root_dir, config_file, project_name):
+        """Same as StyleCheckerServer.check, using an idle server.
+
+        A new server is started if none of the existing ones is idle.
+
+        Returns None if we should fall back to executing the style-checker
+        for this style-check (Eg: the server failed, or a server already
+        failed before).
+        """
+        with self.__lock:
+            if self.__disabled:
+                return None
+            server = self.__idle_servers.pop() if self.__idle_servers else None
+
+        if server is None:
+            try:
+                server = StyleCheckerServer(self.style_checker_hook)
+            except InvalidUpdate:
+                self.__disable(None, "cannot start the style-checker")
+                return None
+            with self.__lock:
+                self.__servers.append(server)
+
+        result = server.check(filename_list, root_dir, config_file, project_name)
+        if result is None:
+            self.__disable(server, "no valid response from the style-checker")
+            return None
+
+        with self.__lock:
+            self.__idle_servers.append(server)
+        return result
+
+    def shutdown(self):
+        """Shut all the servers down."""
+        with self.__lock:
+            servers = self.__servers
+            self.__servers = []
+            self.__idle_servers = []
+        for server in servers:
+            server.shutdown()
+
+    def __disable(self, failed_server, reason):
+        """Stop using servers, following a failure.
+
+        PARAMETERS
+            failed_server: The StyleCheckerServer which failed (it gets
+                killed), or None if the failure was not caused by
+                a specific server.
+            reason: A description of the failure.
+        """
+        debug(
+            "style-checker server: %s (falling back to executing"
+            " the style-checker for each style-check)" % reason
+        )
+        with self.__lock:
+            self.__disabled = True
+            if failed_server is not None:
+                self.__servers.remove(failed_server)
+        if failed_server is not None:
+            failed_server.kill()
+
+
+# The StyleCheckerServerPool objects created so far, indexed by
+# the name of their style-checker.
+__server_pools = {}
+
+# A lock protecting __server_pools.
+__server_pools_lock = threading.Lock()
+
+
+def style_checker_server_pool(style_checker_hook):
+    """Return the StyleCheckerServerPool for the given style-checker.
+
+    The pool is created the first time this function is called for
+    a given style-checker, and all its servers are automatically shut
+    down when this process exits.
+
+    PARAMETERS
+        style_checker_hook: The ThirdPartyHook for the style checker.
+    """
+    with __server_pools_lock:
+        pool = __server_pools.get(style_checker_hook.hook_exe)
+        if pool is None:
+            pool = StyleCheckerServerPool(style_checker_hook)
+            __server_pools[style_checker_hook.hook_exe] = pool
+            atexit.register(pool.shutdown)
+        return pool
@@ -4,17 +4,28 @@ from config import (
     git_config,
     SUBJECT_MAX_SUBJECT_CHARS,
     ThirdPartyHook,
+    ThirdPartyHookBatchError,
+    ThirdPartyHookTimeoutError,
     CONFIG_FILENAME,
     CONFIG_REF,
+    kill_process_group,
 )
 from copy import deepcopy
 from enum import Enum
 from errors import InvalidUpdate
 import json
-from git import git, is_null_rev, commit_parents, commit_rev, split_ref_name
+from git import (
+    git,
+    is_null_rev,
+    commit_parents,
+    commit_rev,
+    rev_list_input,
+    split_ref_name,
+)
 from pre_commit_checks import (
     check_revision_history,
     style_check_commit,
+    style_check_commits,
     check_filename_collisions,
     check_filepath_length,
     reject_commit_if_merge,
@@ -22,9 +33,14 @@ from pre_commit_checks import (
 import re
 import shlex
 import sys
+import threading
 
 from io_utils import safe_decode_by_line
-from updates.commits import commit_info_list
+from updates.commits import (
+    commit_info_list,
+    prefetch_changes,
+    prefetch_raw_revlogs,
+)
 from updates.emails import EmailCustomContents, EmailInfo, Email
 from updates.mailinglists import expanded_mailing_list
 from utils import commit_email_subject_prefix
@@ -338,8 +354,12 @@ class AbstractUpdate(object):
         # so do not provide the option of doing the check on the
         # final commit only (following hooks.combined-style-checking).
         # Do it on all new commits.
-        for commit in self.commits_to_check:
-            check_filename_collisions(commit)
+        #
+        # These checks, as well as the ones that follow, need the list
+        # of changes made by each commit. Get them all in one go now,
+        # rather than letting each check call git once for each commit.
+        prefetch_changes(self.commits_to_check)
+        check_filename_collisions(self.commits_to_check)
 
         # Perform the filepath length checks. File paths which
         # are too long can cause trouble on some file systems,
@@ -610,6 +630,10 @@ class AbstractUpdate(object):
         """The new_commits_for_ref attribute, lazy-initialized."""
         if self.__new_commits_for_ref is None:
             self.__new_commits_for_ref = self.__get_added_commits()
+            # Most of the checks we perform on these commits need
+            # their revision log, so get them all in one go now,
+            # rather than one at a time as each commit gets checked.
+            prefetch_raw_revlogs(self.__new_commits_for_ref)
         return self.__new_commits_for_ref
 
     @property
@@ -671,17 +695,51 @@ class AbstractUpdate(object):
 
         Raise InvalidUpdate with the associated error message if the hook
         returned nonzero. Just print the hook's output otherwise.
+
+        If the hooks.commit-extra-checker-batch config option is set,
+        the hook is called only once for all the commits, in batch mode
+        (see ThirdPartyHook.call_batch). Otherwise, the hook may be called
+        for several commits at the same time (see the
+        hooks.commit-extra-checker-jobs config option). Either way,
+        the results are handled exactly as if the hook had been called
+        for each commit, one after the other.
         """
         commit_checker_hook = ThirdPartyHook("hooks.commit-extra-checker")
-        if not commit_checker_hook.defined_p:
+        if not commit_checker_hook.defined_p or not self.commits_to_check:
             return
 
-        for commit in self.commits_to_check:
-            hook_exe, p, out = commit_checker_hook.call(
-                hook_input=json.dumps(self.commit_data_for_hook(commit)),
-                hook_args=(self.ref_name, commit.rev),
+        if git_config("hooks.commit-extra-checker-batch"):
+            try:
+                _, _, results = commit_checker_hook.call_batch(
+                    [
+                        self.commit_data_for_hook(commit)
+                        for commit in self.commits_to_check
+                    ],
+                    hook_args=("--batch", self.ref_name),
+                )
+            except ThirdPartyHookBatchError as E:
+                invalid_update_msg = [
+                    "The hooks.commit-extra-checker script failed"
+                    " in batch mode: {err}".format(err=str(E)),
+                ] + E.out.splitlines()
+                raise InvalidUpdate(*invalid_update_msg)
+        elif (
+            git_config("hooks.commit-extra-checker-jobs") > 1
+            and len(self.commits_to_check) > 1
+        ):
+            results = self.__call_project_specific_commit_checker_concurrently(
+                commit_checker_hook, git_config("hooks.commit-extra-checker-jobs")
+            )
+        else:
+            # Call the hook lazily, so as to stop at the first commit
+            # being rejected.
+            results = (
+                self.__call_project_specific_commit_checker(commit_checker_hook, commit)
+                for commit in self.commits_to_check
             )
-            if p.returncode != 0:
+
+        for commit, (returncode, out) in zip(self.commits_to_check, results):
+            if returncode != 0:
                 # Python-2.x compatibility: When the list of arguments in a call
                 # are so long that they get formatted over multiple lines, black
                 # adds a comma at the end of the last argument. Unfortunately,
@@ -696,13 +754,128 @@ class AbstractUpdate(object):
                 invalid_update_msg = [
                     "The following commit was rejected by your"
                     " hooks.commit-extra-checker script"
-                    " (status: {p.returncode})".format(p=p),
+                    " (status: {returncode})".format(returncode=returncode),
                     "commit: {commit.rev}".format(commit=commit),
                 ] + out.splitlines()
                 raise InvalidUpdate(*invalid_update_msg)
             else:
                 sys.stdout.write(out)
 
+    def __call_project_specific_commit_checker(
+        self, commit_checker_hook, commit, on_start=None
+    ):
+        """Call hooks.commit-extra-checker for the given commit.
+
+        PARAMETERS
+            commit_checker_hook: The ThirdPartyHook for the
+                hooks.commit-extra-checker script.
+            commit: A CommitInfo object.
+            on_start: Same as in ThirdPartyHook.call.
+
+        RETURN VALUE
+            A tuple with the status returned by the hook, and its output.
+        """
+        hook_exe, p, out = commit_checker_hook.call(
+            hook_input=json.dumps(self.commit_data_for_hook(commit)),
+            hook_args=(self.ref_name, commit.rev),
+            on_start=on_start,
+        )
+        return (p.returncode, out)
+
+    def __call_project_specific_commit_checker_concurrently(
+        self, commit_checker_hook, max_jobs
+    ):
+        """Call hooks.commit-extra-checker for up to max_jobs commits at once.
+
+        As soon as the hook rejects a commit, the hook is no longer
+        called for the commits after it, and the calls in progress
+        for those commits are cancelled (by killing the hook, along with
+        all the processes it started), since their outcome would not be
+        reported anyway.
+
+        PARAMETERS
+            commit_checker_hook: The ThirdPartyHook for the
+                hooks.commit-extra-checker script.
+            max_jobs: The maximum number of calls to the hook
+                at the same time.
+
+        RETURN VALUE
+            A list with the result of __call_project_specific_commit_checker
+            for each commit of self.commits_to_check, in order, up to and
+            including the first commit rejected by the hook.
+        """
+        # Imported here, as only needed when calling the hook concurrently.
+        from concurrent.futures import ThreadPoolExecutor
+
+        commit_list = self.commits_to_check
+        lock = threading.Lock()
+        # The index in commit_list of the first commit known to have
+        # been rejected so far (len(commit_list) if none).
+        first_failure = [len(commit_list)]
+        # The hook processes currently running, indexed by the index
+        # of their commit in commit_list.
+        processes = {}
+        futures = []
+
+        def cancel_after(index):
+            """Cancel the calls to the hook for the commits after index.
+
+            REMARKS
+                This function assumes that lock is held.
+            """
+            first_failure[0] = min(first_failure[0], index)
+            for future in futures[index + 1 :]:
+                future.cancel()
+            for (process_index, p) in processes.items():
+                if process_index > index:
+                    kill_process_group(p)
+
+        def check_one_commit(index, commit):
+            """Call the hook for the given commit, unless no longer needed.
+
+            RETURN VALUE
+                Same as __call_project_specific_commit_checker,
+                or None if the call was cancelled.
+            """
+
+            def on_start(p):
+                """Record p as running, or kill it if no longer needed."""
+                with lock:
+                    if first_failure[0] < index:
+                        kill_process_group(p)
+                    else:
+                        processes[index] = p
+
+            with lock:
+                if first_failure[0] < index:
+                    return None
+            try:
+                result = self.__call_project_specific_commit_checker(
+                    commit_checker_hook, commit, on_start=on_start
+                )
+            except Exception:
+                with lock:
+                    processes.pop(index, None)
+                    cancel_after(index)
+                raise
+            with lock:
+                processes.pop(index, None)
+                if result[0] != 0:
+                    cancel_after(index)
+            return result
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+            with lock:
+                for (index, commit) in enumerate(commit_list):
+                    futures.append(executor.submit(check_one_commit, index, commit))
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                if result[0] != 0:
+                    break
+        return results
+
     def __get_added_commits(self):
         """Return a list of CommitInfo objects added by our update.
 
@@ -722,6 +895,10 @@ class AbstractUpdate(object):
         # of commit hashes is more convenient for what we want to do
         # than a list of CommitInfo objects.
 
+        #
+        # The list of references can be very large, so pass them to git
+        # via its standard input, rather than its command line.
+
         exclude = [
             "^%s" % self.all_refs[ref_name]
             for ref_name in self.all_refs.keys()
@@ -730,9 +907,22 @@ class AbstractUpdate(object):
         if not is_null_rev(self.old_rev):
             exclude.append("^%s" % self.old_rev)
 
-        new_repo_revs = git.rev_list(
-            self.new_rev, *exclude, reverse=True, _split_lines=True, _decode=True
-        )
+        # The output of "git rev-list" is consumed as it arrives, and
+        # we only keep what we need: The oldest commit, and the set of
+        # all the commits, for quick membership testing.
+        first_new_repo_rev = None
+        new_repo_revs = set()
+        for rev in git.rev_list(
+            "--stdin",
+            self.new_rev,
+            reverse=True,
+            _input=rev_list_input(exclude),
+            _iter=True,
+            _decode=True,
+        ):
+            if first_new_repo_rev is None:
+                first_new_repo_rev = rev
+            new_repo_revs.add(rev)
 
         # If this is a reference creation (base_rev is null), try to
         # find a commit which can serve as base_rev.  We try to find
@@ -740,13 +930,13 @@ class AbstractUpdate(object):
         # as short as possible.
         base_rev = self.old_rev
         if is_null_rev(base_rev):
-            if len(new_repo_revs) > 0:
+            if first_new_repo_rev is not None:
                 # The ref update brings some new commits.  The first
                 # parent of the oldest of those commits, if it exists,
                 # seems like a good candidate.  If it does not exist,
                 # we are pushing an entirely new headless branch, and
                 # base_rev should remain null.
-                parents = commit_parents(new_repo_revs[0])
+                parents = commit_parents(first_new_repo_rev)
                 if parents:
                     base_rev = parents[0]
             else:
@@ -790,8 +980,9 @@ class AbstractUpdate(object):
         # The list of lost commits is computed by listing all commits
         # accessible from the old_rev, but not from any of the references.
 
-        exclude = ["^%s" % self.all_refs[rev] for rev in self.all_refs.keys()]
-        commit_list = commit_info_list(self.old_rev, *exclude)
+        commit_list = commit_info_list(
+            self.old_rev, exclude=list(self.all_refs.values())
+        )
 
         return commit_list
 
@@ -901,10 +1092,7 @@ class AbstractUpdate(object):
         else:
             debug("(commit-per-commit style checking)")
             # Perform the pre-commit checks, as needed...
-            for commit in added:
-                style_check_commit(
-                    commit.base_rev_for_git(), commit.rev, self.email_info.project_name
-                )
+            style_check_commits(added, self.email_info.project_name)
 
     def __email_ref_update(self):
         """Send the email describing to the reference update.
@@ -939,9 +1127,7 @@ class AbstractUpdate(object):
             )
             update_email.enqueue()
 
-    def __maybe_get_email_custom_contents(
-        self, commit, default_subject, default_body, default_diff
-    ):
+    def __maybe_get_email_custom_contents(self, commit, standard_email):
         """Return an EmailCustomContents for the given commit, if applicable.
 
         For projects that define the hooks.commit-email-formatter config
@@ -957,100 +1143,203 @@ class AbstractUpdate(object):
 
         PARAMETERS
             commit: A CommitInfo object.
-            default_subject: The email's subject to use by default
-                unless overriden by the commit-email-formatter hook.
-            default_body: The email's body to use by default, unless
-                overriden by the commit-email-formatter hook.
-            default_diff: The email's "Diff:" section to use by default,
+            standard_email: An Email object, containing the standard email
+                for the given commit (see self.get_standard_commit_email).
+                Its subject, body and diff are the ones to use by default,
                 unless overriden by the commit-email-formatter hook.
         """
         email_contents_hook = ThirdPartyHook("hooks.commit-email-formatter")
         if not email_contents_hook.defined_p:
             return None
 
-        hooks_data = self.commit_data_for_hook(commit)
-        hooks_data["email_default_subject"] = default_subject
-        hooks_data["email_default_body"] = default_body
-        hooks_data["email_default_diff"] = default_diff
-
-        hook_exe, p, out = email_contents_hook.call(
-            hook_input=json.dumps(hooks_data),
-            hook_args=(self.ref_name, commit.rev),
+        hook_args = (self.ref_name, commit.rev)
+        try:
+            hook_exe, p, out = email_contents_hook.call(
+                hook_input=json.dumps(
+                    self.__email_formatter_data_for_hook(commit, standard_email)
+                ),
+                hook_args=hook_args,
+            )
+        except ThirdPartyHookTimeoutError as E:
+            return self.__standard_email_due_to_error(
+                E.message,
+                standard_email,
+                email_contents_hook.hook_exe,
+                hook_args,
+                E.out,
+            )
+        return self.__email_custom_contents_from_hook_result(
+            commit, standard_email, hook_exe, p.returncode, out
         )
 
-        def standard_email_due_to_error(err_msg):
-            """Return an EmailCustomContents with the given err_msg.
+    def __get_email_custom_contents_batch(self, commit_list, standard_email_list):
+        """Return the EmailCustomContents for the given commits, in batch mode.
 
-            This function allows us to perform consistent error handling
-            when trying to call the hooks.commit-email-formatter script.
-            It returns an EmailCustomContents where nothing is changed
-            (and therefore the standard email gets sent) except for
-            the addition of a warning section at the end of the email's
-            body (just before the "Diff:" section). This warning section
-            indicates that an error was detected, and provides information
-            about it.
+        Same as __maybe_get_email_custom_contents, but calling the
+        hooks.commit-email-formatter script only once for all commits,
+        in batch mode (see ThirdPartyHook.call_batch). The results are
+        handled exactly as if the script had been called for each commit.
 
-            PARAMETERS
-                err_msg: A description of the error that occurred (a string).
-            """
-            appendix = (
-                "WARNING:\n"
-                "{err_msg}\n"
-                "Falling back to default email format.\n"
-                "\n"
-                "$ {hook_exe} {update.ref_name}"
-                " {commit.rev}\n"
-                "{out}\n".format(
-                    err_msg=err_msg,
-                    hook_exe=hook_exe,
-                    update=self,
-                    commit=commit,
-                    out=out,
+        If the script fails as a whole (Eg: it returns nonzero, runs out
+        of time, or does not provide a valid result for each commit),
+        the standard email is used for all commits, with a warning section
+        describing the error that occurred.
+
+        This method assumes that the repository's configuration defines
+        the hooks.commit-email-formatter config option.
+
+        PARAMETERS
+            commit_list: A list of CommitInfo objects.
+            standard_email_list: A list with the standard email for
+                each commit of commit_list (see the standard_email
+                parameter of __maybe_get_email_custom_contents).
+
+        RETURN VALUE
+            A list with the EmailCustomContents object for each commit
+            of commit_list.
+        """
+        email_contents_hook = ThirdPartyHook("hooks.commit-email-formatter")
+        hook_args = ("--batch", self.ref_name)
+        try:
+            hook_exe, _, results = email_contents_hook.call_batch(
+                [
+                    self.__email_formatter_data_for_hook(commit, standard_email)
+                    for (commit, standard_email) in zip(
+                        commit_list, standard_email_list
+                    )
+                ],
+                hook_args=hook_args,
+            )
+        except (ThirdPartyHookBatchError, ThirdPartyHookTimeoutError) as E:
+            return [
+                self.__standard_email_due_to_error(
+                    E.message,
+                    standard_email,
+                    email_contents_hook.hook_exe,
+                    hook_args,
+                    E.out,
                 )
+                for standard_email in standard_email_list
+            ]
+
+        return [
+            self.__email_custom_contents_from_hook_result(
+                commit, standard_email, hook_exe, returncode, out
             )
-            return EmailCustomContents(
-                appendix=indent(appendix, "| "), diff=default_diff
+            for (commit, standard_email, (returncode, out)) in zip(
+                commit_list, standard_email_list, results
             )
+        ]
+
+    def __email_formatter_data_for_hook(self, commit, standard_email):
+        """Return the data to pass to hooks.commit-email-formatter for commit.
+
+        PARAMETERS
+            commit: A CommitInfo object.
+            standard_email: Same as in __maybe_get_email_custom_contents.
+        """
+        hooks_data = self.commit_data_for_hook(commit)
+        hooks_data["email_default_subject"] = standard_email.email_subject
+        hooks_data["email_default_body"] = standard_email.email_body
+        hooks_data["email_default_diff"] = standard_email.diff
+        return hooks_data
+
+    def __email_custom_contents_from_hook_result(
+        self, commit, standard_email, hook_exe, returncode, out
+    ):
+        """Return the EmailCustomContents for the given formatter's result.
 
-        if p.returncode != 0:
-            return standard_email_due_to_error(
+        PARAMETERS
+            commit: A CommitInfo object.
+            standard_email: Same as in __maybe_get_email_custom_contents.
+            hook_exe: The name of the hooks.commit-email-formatter script.
+            returncode: The status returned by the script for that commit.
+            out: The output of the script for that commit.
+        """
+        if returncode != 0:
+            return self.__standard_email_due_to_error(
                 "hooks.commit-email-formatter returned nonzero:"
-                " {p.returncode}.".format(p=p)
+                " {returncode}.".format(returncode=returncode),
+                standard_email,
+                hook_exe,
+                (self.ref_name, commit.rev),
+                out,
             )
 
         try:
             contents_data = json.loads(out)
         except ValueError:
-            return standard_email_due_to_error(
-                "hooks.commit-email-formatter returned invalid JSON."
+            return self.__standard_email_due_to_error(
+                "hooks.commit-email-formatter returned invalid JSON.",
+                standard_email,
+                hook_exe,
+                (self.ref_name, commit.rev),
+                out,
             )
 
         if not isinstance(contents_data, dict):
-            return standard_email_due_to_error(
-                "hooks.commit-email-formatter output is not JSON dict."
+            return self.__standard_email_due_to_error(
+                "hooks.commit-email-formatter output is not JSON dict.",
+                standard_email,
+                hook_exe,
+                (self.ref_name, commit.rev),
+                out,
             )
 
         return EmailCustomContents(
             subject=contents_data.get("email_subject"),
             body=contents_data.get("email_body"),
-            diff=contents_data.get("diff", default_diff),
+            diff=contents_data.get("diff", standard_email.diff),
         )
 
-    def __send_commit_email(self, commit, standard_email):
+    def __standard_email_due_to_error(
+        self, err_msg, standard_email, hook_exe, hook_args, out
+    ):
+        """Return an EmailCustomContents with the given err_msg.
+
+        This function allows us to perform consistent error handling
+        when trying to call the hooks.commit-email-formatter script.
+        It returns an EmailCustomContents where nothing is changed
+        (and therefore the standard email gets sent) except for
+        the addition of a warning section at the end of the email's
+        body (just before the "Diff:" section). This warning section
+        indicates that an error was detected, and provides information
+        about it.
+
+        PARAMETERS
+            err_msg: A description of the error that occurred (a string).
+            standard_email: Same as in __maybe_get_email_custom_contents.
+            hook_exe: The name of the hooks.commit-email-formatter script.
+            hook_args: The arguments the script was called with.
+            out: The output of the script.
+        """
+        appendix = (
+            "WARNING:\n"
+            "{err_msg}\n"
+            "Falling back to default email format.\n"
+            "\n"
+            "$ {hook_cmd}\n"
+            "{out}\n".format(
+                err_msg=err_msg,
+                hook_cmd=" ".join((hook_exe,) + tuple(hook_args)),
+                out=out,
+            )
+        )
+        return EmailCustomContents(
+            appendix=indent(appendix, "| "), diff=standard_email.diff
+        )
+
+    def __send_commit_email(self, standard_email, custom_email_contents):
         """Send the email for the given commit.
 
         PARAMETERS
-            commit: A CommitInfo object.
             standard_email: An Email object, containing the standard email
                 for the given commit (see self.get_standard_commit_email).
+            custom_email_contents: An EmailCustomContents object with
+                the customizations to apply to standard_email, or None
+                if the standard email should be sent as is.
         """
         email = standard_email
-        custom_email_contents = self.__maybe_get_email_custom_contents(
-            commit=commit,
-            default_subject=email.email_subject,
-            default_body=email.email_body,
-            default_diff=email.diff,
-        )
         if custom_email_contents is not None:
             # Create a new Email object with the requested customizations.
             email = deepcopy(standard_email)
@@ -1065,10 +1354,38 @@ class AbstractUpdate(object):
         email.enqueue()
 
     def __email_new_commits(self):
-        """Send one email per new (non-pre-existing) commit."""
-        for commit in self.new_commits_for_ref:
-            if commit.send_email_p:
-                self.__send_commit_email(commit, self.get_standard_commit_email(commit))
+        """Send one email per new (non-pre-existing) commit.
+
+        If the hooks.commit-email-formatter-batch config option is set,
+        the standard emails of all the commits are computed first, so as
+        to call the hooks.commit-email-formatter script only once for
+        all commits.
+        """
+        commit_list = [
+            commit for commit in self.new_commits_for_ref if commit.send_email_p
+        ]
+        if (
+            commit_list
+            and ThirdPartyHook("hooks.commit-email-formatter").defined_p
+            and git_config("hooks.commit-email-formatter-batch")
+        ):
+            standard_email_list = [
+                self.get_standard_commit_email(commit) for commit in commit_list
+            ]
+            custom_email_contents_list = self.__get_email_custom_contents_batch(
+                commit_list, standard_email_list
+            )
+            for standard_email, custom_email_contents in zip(
+                standard_email_list, custom_email_contents_list
+            ):
+                self.__send_commit_email(standard_email, custom_email_contents)
+        else:
+            for commit in commit_list:
+                standard_email = self.get_standard_commit_email(commit)
+                self.__send_commit_email(
+                    standard_email,
+                    self.__maybe_get_email_custom_contents(commit, standard_email),
+                )
 
     def __set_send_email_p_attr(self, commit_list):
         # Make sure we have at least one commit in the list.  Otherwise,
@@ -1096,8 +1413,14 @@ class AbstractUpdate(object):
             base_rev = commit_list[0].base_rev_for_display()
             if base_rev is not None:
                 exclude.append("^%s" % base_rev)
-            included_refs = git.rev_list(
-                self.new_rev, *exclude, _split_lines=True, _decode=True
+            included_refs = set(
+                git.rev_list(
+                    "--stdin",
+                    self.new_rev,
+                    _input=rev_list_input(exclude),
+                    _iter=True,
+                    _decode=True,
+                )
             )
 
             for commit in commit_list:
@@ -1124,8 +1447,14 @@ class AbstractUpdate(object):
             # Also reduce the list already present in this branch
             # prior to the update.
             exclude.append("^%s" % base_rev)
-        included_refs = git.rev_list(
-            self.new_rev, *exclude, _split_lines=True, _decode=True
+        included_refs = set(
+            git.rev_list(
+                "--stdin",
+                self.new_rev,
+                _input=rev_list_input(exclude),
+                _iter=True,
+                _decode=True,
+            )
         )
 
         # Also, we always send emails for first-parent commits.
@@ -1163,10 +1492,10 @@ class AbstractUpdate(object):
         # so as to keep the call short-enough to fit in a single line.
         rev_list_kwargs = {
             "first_parent": True,
-            "_split_lines": True,
+            "_iter": True,
             "_decode": True,
         }
-        first_parents = git.rev_list(*first_parents_expr, **rev_list_kwargs)
+        first_parents = set(git.rev_list(*first_parents_expr, **rev_list_kwargs))
 
         for commit in commit_list:
             commit.send_email_p = (
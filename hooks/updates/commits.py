@@ -1,6 +1,15 @@
 """Management of git commits during updates..."""
 
-from git import git, empty_tree_rev, diff_tree
+from git import (
+    git,
+    empty_tree_rev,
+    iter_diff_tree,
+    iter_diff_tree_batch,
+    rev_list_input,
+)
+import git_odb
+from git_odb import ObjectStoreError
+from git_parsers import parse_rev_list
 from io_utils import safe_decode
 from updates.mailinglists import expanded_mailing_list
 from utils import debug
@@ -46,6 +55,9 @@ class CommitInfo(object):
         # A cache for the "all_files" method.
         self.__all_files = None
 
+        # A cache for the "changes" method.
+        self.__changes = None
+
         # A cache for the "files_changed" method.
         self.__files_changed = None
 
@@ -76,6 +88,19 @@ class CommitInfo(object):
             )
         return self.__raw_revlog
 
+    def set_raw_revlog(self, raw_revlog):
+        """Set the commit's raw revlog, as if computed by raw_revlog.
+
+        This allows the raw revlog of this commit to be computed
+        by other means (see prefetch_raw_revlogs, for instance),
+        without having to call git again once it is needed.
+
+        PARAMETERS
+            raw_revlog: The commit's raw revlog.
+        """
+        self.__raw_revlog = raw_revlog
+        self.__raw_revlog_lines = None
+
     @property
     def raw_revlog_lines(self):
         """Return the commit's raw revlog split into lines.
@@ -113,6 +138,39 @@ class CommitInfo(object):
             self.__all_files = self.__all_files_from_commit_rev(self.rev)
         return self.__all_files
 
+    def changes(self):
+        """Return the list of changes made by this commit.
+
+        The list is computed against this commit's base_rev_for_git,
+        and each element is a tuple as returned by the diff_tree
+        function (see the git module).
+
+        Cache the result in self.__changes so that subsequent
+        calls to this method do not require calling git again.
+        """
+        if self.__changes is None:
+            self.set_changes(
+                list(iter_diff_tree("-r", self.base_rev_for_git(), self.rev))
+            )
+        return self.__changes
+
+    def set_changes(self, changes):
+        """Set the list of changes made by this commit, as if computed by changes.
+
+        PARAMETERS
+            changes: The list of changes made by this commit
+                (see the changes method).
+        """
+        for item in changes:
+            (old_mode, new_mode, old_sha1, new_sha1, status, filename) = item
+            debug(
+                "diff-tree entry: %s %s %s %s %s %s"
+                % (old_mode, new_mode, old_sha1, new_sha1, status, filename),
+                level=5,
+            )
+        self.__changes = changes
+        self.__files_changed = None
+
     def files_changed(self):
         """Return the list of files changed by this commit (incl. new files).
 
@@ -120,16 +178,7 @@ class CommitInfo(object):
         calls to this method do not require calling git again.
         """
         if self.__files_changed is None:
-            self.__files_changed = []
-            all_changes = diff_tree("-r", self.base_rev_for_git(), self.rev)
-            for item in all_changes:
-                (old_mode, new_mode, old_sha1, new_sha1, status, filename) = item
-                debug(
-                    "diff-tree entry: %s %s %s %s %s %s"
-                    % (old_mode, new_mode, old_sha1, new_sha1, status, filename),
-                    level=5,
-                )
-                self.__files_changed.append(filename)
+            self.__files_changed = [item[5] for item in self.changes()]
         return self.__files_changed
 
     def added_files(self):
@@ -141,29 +190,20 @@ class CommitInfo(object):
         """
         assert self.parent_revs is not None
 
-        # One method we could use to compute the list of new files is
-        # to ask git, via the status code returned by the "git diff-tree"
-        # command. However, while the format of that code seems to be well
-        # documented, this method seems more difficult to test because
-        # of the copy-edit/rename-edit status codes. How Git decides
-        # whether a file comes from another one is a bit of a black box,
-        # and bound to change from version to version.
+        # We used to compute this list by getting the list of all files
+        # in this commit and in its parent, and then declaring new any
+        # file not present in the parent. This was very expensive on
+        # repositories with a large number of files, so we now rely on
+        # the list of changes made by this commit instead. Because we do
+        # not ask git to detect copies and renames when computing that
+        # list, the files which are new are simply the ones whose status
+        # is "A" (a renamed file being reported as the old file being
+        # deleted, and the new file being added), which gives us
+        # the same result as the former method.
         #
-        # So, to avoid this complexity, we rely on a different approach
-        # instead, which consists in simply getting the list of files
-        # in the parent commit, and compare it to the list of files
-        # in this commit. Any file not present in the parent is declared
-        # new.
-
-        base_rev = self.base_rev_for_display()
-        if base_rev is None:
-            prev_commit_all_files = set()
-        else:
-            prev_commit_all_files = set(self.__all_files_from_commit_rev(base_rev))
-
         # The list of files is returned in sorted alphabetical order,
         # mostly to ensure predictability and stability in the result.
-        return sorted(set(self.all_files()) - prev_commit_all_files)
+        return sorted(item[5] for item in self.changes() if item[4] == "A")
 
     def base_rev_for_display(self):
         """The rev as reference to determine what changed in this commit.
@@ -248,33 +288,117 @@ class CommitInfo(object):
         Note that unlike in the all_files method, the result of
         this method is not cached.
         """
-        return git.ls_tree(
-            "--full-tree", "--name-only", "-r", rev, _split_lines=True, _decode=True
+        try:
+            return [safe_decode(f) for f in git_odb.list_tree_files(rev)]
+        except ObjectStoreError:
+            pass
+        # Use the -z option, so as to get the file names as is, rather
+        # than quoted when they contain some unusual characters.
+        return list(
+            git.ls_tree(
+                "--full-tree",
+                "--name-only",
+                "-r",
+                "-z",
+                rev,
+                _iter_sep=b"\0",
+                _decode=True,
+            )
         )
 
 
-def commit_info_list(*args):
+def commit_info_list(*args, exclude=()):
     """Return a list of CommitInfo objects in chronological order.
 
     PARAMETERS
-        Same as in the "git rev-list" command.
+        *args: Same as in the "git rev-list" command.
+        exclude: A list of revisions whose accessible commits should be
+            excluded from the list. These revisions are passed to git via
+            its standard input, so this argument should be preferred
+            over passing "^<rev>" arguments when the list can be large.
     """
-    rev_info_in_bytes = git.rev_list(
-        *args, pretty="format:%P%n%an%n%ae%n%s", _split_lines=True, reverse=True
+    # Use the "tformat:" form, rather than "format:", so that the last
+    # line be newline-terminated as well, and thus never be confused
+    # with the end of the output (in case the subject is empty).
+    rev_info = git.rev_list(
+        "--stdin",
+        *args,
+        pretty="tformat:%P%n%an%n%ae%n%s",
+        reverse=True,
+        _input=rev_list_input("^%s" % rev for rev in exclude),
+        _iter=True,
     )
-    # Each commit should generate 5 lines of output.
-    assert len(rev_info_in_bytes) % 5 == 0
-
-    rev_info = [safe_decode(b) for b in rev_info_in_bytes]
 
+    # Each commit should generate 5 lines of output: The "commit <rev>"
+    # line, followed by the 4 lines of our format.
     result = []
-    while rev_info:
-        commit_keyword, rev = rev_info.pop(0).split(None, 1)
-        parents = rev_info.pop(0).split()
-        author_name = rev_info.pop(0)
-        author_email = rev_info.pop(0)
-        subject = rev_info.pop(0)
-        assert commit_keyword == "commit"
-        result.append(CommitInfo(rev, author_name, author_email, subject, parents))
+    for (rev, commit_info) in parse_rev_list(rev_info, 4):
+        (parents, author_name, author_email, subject) = [
+            safe_decode(b) for b in commit_info
+        ]
+        result.append(
+            CommitInfo(
+                safe_decode(rev), author_name, author_email, subject, parents.split()
+            )
+        )
 
     return result
+
+
+def prefetch_raw_revlogs(commit_list):
+    """Compute the raw revlog of all the given commits at once.
+
+    This function is equivalent to accessing the raw_revlog attribute
+    of each commit in the list, except that all revlogs are fetched
+    using a single call to git, rather than one call per commit.
+    This makes a significant difference when the list contains
+    a large number of commits.
+
+    PARAMETERS
+        commit_list: A list of CommitInfo objects.
+    """
+    if not commit_list:
+        return
+
+    commits_by_rev = {}
+    for commit in commit_list:
+        commits_by_rev.setdefault(commit.rev, []).append(commit)
+
+    # Use the -z option so that the output for each commit be terminated
+    # by a NUL character, which cannot be part of a revision log, and
+    # let git read the list of commits from its standard input, so as
+    # to avoid any limit on the length of the command line.
+    revlogs = git.log(
+        "-z",
+        "--no-walk=unsorted",
+        "--stdin",
+        pretty="format:%H%n%B",
+        _input="".join("%s\n" % rev for rev in commits_by_rev).encode("ascii"),
+        _iter_sep=b"\0",
+        _decode=True,
+    )
+    for entry in revlogs:
+        (rev, _, raw_revlog) = entry.partition("\n")
+        # Strip the trailing whitespaces, as git_run does in the case
+        # where we get the revlog of each commit individually.
+        for commit in commits_by_rev.get(rev, ()):
+            commit.set_raw_revlog(raw_revlog.rstrip())
+
+
+def prefetch_changes(commit_list):
+    """Compute the list of changes made by all the given commits at once.
+
+    This function is equivalent to calling the changes method
+    of each commit in the list, except that the changes are all
+    computed by a single "git diff-tree" process, rather than
+    by one process per commit.
+
+    This function assumes that the parent_revs attribute of all
+    commits is not None.
+
+    PARAMETERS
+        commit_list: A list of CommitInfo objects.
+    """
+    rev_pairs = [(commit.base_rev_for_display(), commit.rev) for commit in commit_list]
+    for n, (_, changes) in enumerate(iter_diff_tree_batch(rev_pairs)):
+        commit_list[n].set_changes(changes)
@@ -1,17 +1,13 @@
 """Email helpers for sending update-related emails."""
 
 from config import git_config
-from email.charset import Charset, QP
-from email.header import Header
-from email.mime.text import MIMEText
-from email.utils import getaddresses, parseaddr
 from errors import InvalidUpdate
 from git import get_module_name
 from io_utils import encode_utf8, safe_decode
 import os
 from subprocess import Popen, PIPE, STDOUT
 from time import sleep
-from updates.sendmail import sendmail
+from updates.sendmail import email_transport, SendmailTransport
 from utils import debug, get_user_name, get_user_full_name
 
 # The delay (in seconds) between each email being sent out.
@@ -43,8 +39,10 @@ class EmailInfo(object):
 
     REMARKS
         This class assumes that the hooks.from-domain config parameter
-        is set.  Otherwise, an InvalidUpdate exception is raised when
-        the object is initialized.
+        is set, and that the email transport (see the hooks.email-transport
+        and hooks.smtp-server config parameters) is properly configured.
+        Otherwise, an InvalidUpdate exception is raised when the object
+        is initialized.
     """
 
     def __init__(self, email_from):
@@ -57,6 +55,11 @@ class EmailInfo(object):
         """
         self.project_name = get_module_name()
 
+        # Verify the configuration of the email transport now, rather
+        # than when sending the emails, since emails are sent from
+        # a daemon, which cannot report errors to the user.
+        email_transport()
+
         from_domain = git_config("hooks.from-domain")
         if not from_domain:
             raise InvalidUpdate(
@@ -104,9 +107,11 @@ class EmailQueue(object):
     def flush(self):
         """Send all enqueued emails...
 
-        ... in the same order that they were enqueued.  A delay
-        of EMAIL_DELAY_IN_SECONDS is also introduced between
-        emails.
+        ... in the same order that they were enqueued, using the
+        transport selected by the hooks.email-transport config option.
+        Unless the transport does not need it (see the transport's
+        inter_email_delay_p attribute), a delay of EMAIL_DELAY_IN_SECONDS
+        is also introduced between emails.
 
         REMARKS
             If the GIT_HOOKS_TESTSUITE_MODE environment variable
@@ -115,21 +120,25 @@ class EmailQueue(object):
             not actually sent when in GIT_HOOKS_TESTSUITE_MODE,
             there is no point in waiting for this delay.
         """
-        nb_emails_left = len(self.queue)
-        for email in self.queue:
-            email.send()
-            nb_emails_left -= 1
-            if nb_emails_left > 0:
-                # Need a small delay until we can send the next one.
-                if "GIT_HOOKS_TESTSUITE_MODE" in os.environ:
-                    # For the testsuite, print a debug trace in place
-                    # of delaying the execution.  Use debug level 0
-                    # to make sure it is always printed (to make sure
-                    # the testsuite always alerts us if there is any
-                    # change in the delay policy).
-                    debug("inter-email delay...", level=0)
-                else:  # pragma: no cover (do not want delays during testing)
-                    sleep(EMAIL_DELAY_IN_SECONDS)
+        transport = email_transport()
+        try:
+            nb_emails_left = len(self.queue)
+            for email in self.queue:
+                email.send(transport)
+                nb_emails_left -= 1
+                if nb_emails_left > 0 and transport.inter_email_delay_p:
+                    # Need a small delay until we can send the next one.
+                    if "GIT_HOOKS_TESTSUITE_MODE" in os.environ:
+                        # For the testsuite, print a debug trace in place
+                        # of delaying the execution.  Use debug level 0
+                        # to make sure it is always printed (to make sure
+                        # the testsuite always alerts us if there is any
+                        # change in the delay policy).
+                        debug("inter-email delay...", level=0)
+                    else:  # pragma: no cover (do not want delays during testing)
+                        sleep(EMAIL_DELAY_IN_SECONDS)
+        finally:
+            transport.close()
         self.queue = []
 
 
@@ -243,18 +252,30 @@ class Email(object):
         """
         EmailQueue().enqueue(self)
 
-    def send(self):
+    def send(self, transport=None):
         """Perform all send operations related to this email...
 
         These consists in:
             - send the notification email;
             - call self.filer_cmd if not None.
 
+        PARAMETERS
+            transport: The transport to use for sending the email
+                (see updates.sendmail.email_transport). If None,
+                the email is sent using sendmail.
+
         REMARKS
             If the GIT_HOOKS_TESTSUITE_MODE environment variable
             is set, then a trace of the email is printed, instead
             of sending it.  This is for testing purposes.
         """
+        # The email package is fairly expensive to import, and is only
+        # needed when actually sending emails (which the update hook,
+        # for instance, never does). So only import it when needed.
+        from email.charset import Charset, QP
+        from email.mime.text import MIMEText
+        from email.utils import getaddresses
+
         # Force the charset being used to UTF-8. We could possibly try
         # to guess whether more primitive charsets might work such as
         # ASCII or IS0-8859-15, but UTF-8 is so close to those encodings
@@ -340,11 +361,12 @@ class Email(object):
             )
         ]
 
-        sendmail(
+        if transport is None:
+            transport = SendmailTransport()
+        transport.send(
             self.email_info.email_from,
             email_recipients,
             e_msg.as_string(),
-            "localhost",
         )
 
         if self.filer_cmd is not None:
@@ -453,6 +475,8 @@ def sanitized_email_header_field(field_body):
         # and just send the header as is.
         return field_body
 
+    from email.header import Header
+
     return Header(field_body, encoding).encode()
 
 
@@ -467,6 +491,8 @@ def sanitized_email_address(email_address):
     PARAMETERS
         email_address: A string containing an email address.
     """
+    from email.utils import parseaddr
+
     email_address = email_address.strip()
     gecos, email_spec = parseaddr(email_address)
     if not gecos:
@@ -1,23 +1,12 @@
 """A module providing an AbstractUpdate factory."""
 from collections import namedtuple
+from importlib import import_module
 
 from config import git_config
 from git import is_null_rev, get_object_type
 from errors import InvalidUpdate
 from updates import RefKind, UpdateKind
-from updates.branches.creation import BranchCreation
-from updates.branches.deletion import BranchDeletion
-from updates.branches.update import BranchUpdate
-from updates.notes.creation import NotesCreation
-from updates.notes.deletion import NotesDeletion
-from updates.notes.update import NotesUpdate
-from updates.tags.atag_creation import AnnotatedTagCreation
-from updates.tags.atag_update import AnnotatedTagUpdate
-from updates.tags.atag_deletion import AnnotatedTagDeletion
-from updates.tags.ltag_creation import LightweightTagCreation
-from updates.tags.ltag_update import LightweightTagUpdate
-from updates.tags.ltag_deletion import LightweightTagDeletion
-from utils import ref_matches_regexp
+from utils import ref_pattern_matcher
 
 
 # A named tuple used to determine a repository's namespace information
@@ -72,22 +61,90 @@ NAMESPACES_INFO = {
     ),
 }
 
+# A dictionary providing the class to use for each kind of update.
+#
+# The dictionary is architected as follow:
+#   + The key is a (RefKind, UpdateKind, object_type) tuple;
+#   + The value is a (module_name, class_name) tuple identifying
+#     the AbstractUpdate child class to use.
+#
+# The classes are only identified by name, rather than being imported
+# here, so that only the module of the class actually needed gets
+# imported (see update_class_for).
 REF_CHANGE_MAP = {
-    (RefKind.branch_ref, UpdateKind.create, "commit"): BranchCreation,
-    (RefKind.branch_ref, UpdateKind.delete, "commit"): BranchDeletion,
-    (RefKind.branch_ref, UpdateKind.update, "commit"): BranchUpdate,
-    (RefKind.notes_ref, UpdateKind.create, "commit"): NotesCreation,
-    (RefKind.notes_ref, UpdateKind.delete, "commit"): NotesDeletion,
-    (RefKind.notes_ref, UpdateKind.update, "commit"): NotesUpdate,
-    (RefKind.tag_ref, UpdateKind.create, "tag"): AnnotatedTagCreation,
-    (RefKind.tag_ref, UpdateKind.delete, "tag"): AnnotatedTagDeletion,
-    (RefKind.tag_ref, UpdateKind.update, "tag"): AnnotatedTagUpdate,
-    (RefKind.tag_ref, UpdateKind.create, "commit"): LightweightTagCreation,
-    (RefKind.tag_ref, UpdateKind.delete, "commit"): LightweightTagDeletion,
-    (RefKind.tag_ref, UpdateKind.update, "commit"): LightweightTagUpdate,
+    (RefKind.branch_ref, UpdateKind.create, "commit"): (
+        "updates.branches.creation",
+        "BranchCreation",
+    ),
+    (RefKind.branch_ref, UpdateKind.delete, "commit"): (
+        "updates.branches.deletion",
+        "BranchDeletion",
+    ),
+    (RefKind.branch_ref, UpdateKind.update, "commit"): (
+        "updates.branches.update",
+        "BranchUpdate",
+    ),
+    (RefKind.notes_ref, UpdateKind.create, "commit"): (
+        "updates.notes.creation",
+        "NotesCreation",
+    ),
+    (RefKind.notes_ref, UpdateKind.delete, "commit"): (
+        "updates.notes.deletion",
+        "NotesDeletion",
+    ),
+    (RefKind.notes_ref, UpdateKind.update, "commit"): (
+        "updates.notes.update",
+        "NotesUpdate",
+    ),
+    (RefKind.tag_ref, UpdateKind.create, "tag"): (
+        "updates.tags.atag_creation",
+        "AnnotatedTagCreation",
+    ),
+    (RefKind.tag_ref, UpdateKind.delete, "tag"): (
+        "updates.tags.atag_deletion",
+        "AnnotatedTagDeletion",
+    ),
+    (RefKind.tag_ref, UpdateKind.update, "tag"): (
+        "updates.tags.atag_update",
+        "AnnotatedTagUpdate",
+    ),
+    (RefKind.tag_ref, UpdateKind.create, "commit"): (
+        "updates.tags.ltag_creation",
+        "LightweightTagCreation",
+    ),
+    (RefKind.tag_ref, UpdateKind.delete, "commit"): (
+        "updates.tags.ltag_deletion",
+        "LightweightTagDeletion",
+    ),
+    (RefKind.tag_ref, UpdateKind.update, "commit"): (
+        "updates.tags.ltag_update",
+        "LightweightTagUpdate",
+    ),
 }
 
 
+def update_class_for(ref_kind, change_type, object_type):
+    """Return the AbstractUpdate child class handling the given kind of update.
+
+    PARAMETERS
+        ref_kind: A RefKind object.
+        change_type: An UpdateKind object.
+        object_type: The type of the object the reference points to
+            (or used to point to, for deletions).
+
+    RETURN VALUE
+        The class, or None if this kind of update is not supported.
+
+    REMARKS
+        The module containing the class is imported on first use.
+    """
+    cls_info = REF_CHANGE_MAP.get((ref_kind, change_type, object_type), None)
+    if cls_info is None:
+        return None
+    (module_name, class_name) = cls_info
+    return getattr(import_module(module_name), class_name)
+
+
 def get_namespace_info(ref_kind):
     """Return the repository's namespace info for the given type of reference.
 
@@ -142,9 +199,8 @@ def get_ref_kind(ref_name):
     #     pretty much for free).
     for ref_kind in RefKind:
         namespace_info = get_namespace_info(ref_kind)
-        for ref_re in namespace_info:
-            if ref_matches_regexp(ref_name, ref_re):
-                return ref_kind
+        if ref_pattern_matcher(tuple(namespace_info)).search(ref_name) is not None:
+            return ref_kind
 
     return None
 
@@ -217,7 +273,7 @@ def new_update(ref_name, old_rev, new_rev, all_refs, submitter_email):
     if ref_kind is None:
         raise_unrecognized_ref_name(ref_name)
 
-    new_cls = REF_CHANGE_MAP.get((ref_kind, change_type, object_type), None)
+    new_cls = update_class_for(ref_kind, change_type, object_type)
     if new_cls is None:
         return None
 
@@ -1,9 +1,7 @@
 """Handling of the hooks.mailinglist config...
 """
-from config import git_config
-from io_utils import encode_utf8, safe_decode
+from config import git_config, ThirdPartyHook, ThirdPartyHookTimeoutError
 import os
-from subprocess import Popen, PIPE
 from utils import warn
 
 
@@ -37,11 +35,19 @@ def get_emails_from_script(script_filename, ref_name, changed_files):
     """
     input_str = "" if changed_files is None else "\n".join(changed_files)
 
-    p = Popen([script_filename, ref_name], stdin=PIPE, stdout=PIPE)
-    (output, _) = p.communicate(input=encode_utf8(input_str))
+    # The script is subject to the same time limits as the other
+    # hooks. If it does not complete in time, we treat it the same
+    # as a script which failed (the emails still need to be sent).
+    try:
+        (_, p, output) = ThirdPartyHook("hooks.mailinglist", script_filename).call(
+            hook_input=input_str, hook_args=(ref_name,), stderr_p=False
+        )
+    except ThirdPartyHookTimeoutError as E:
+        warn("!!! %s" % E.message)
+        return []
     if p.returncode != 0:
         warn("!!! %s failed with error code: %d." % (script_filename, p.returncode))
-    return safe_decode(output).splitlines()
+    return output.splitlines()
 
 
 def expanded_mailing_list(ref_name, get_files_changed_cb):
@@ -1,6 +1,9 @@
 """Git Notes updates root module."""
 
 from git import git, CalledProcessError, diff_tree
+import git_odb
+from git_odb import ObjectStoreError
+from io_utils import safe_decode
 
 
 class GitNotes(object):
@@ -93,6 +96,12 @@ class GitNotes(object):
             notes_rev: The revision of the notes change.
             notes_filename: The filename containing the notes.
         """
+        try:
+            contents = git_odb.read_path(notes_rev, notes_filename)
+            return None if contents is None else safe_decode(contents).rstrip()
+        except ObjectStoreError:
+            pass
+
         try:
             return git.show("%s:%s" % (notes_rev, notes_filename), _decode=True)
         except CalledProcessError:
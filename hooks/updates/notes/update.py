@@ -196,7 +196,7 @@ class NotesUpdate(AbstractUpdate):
         # there is at least one commit that is accessible from the old
         # revision which would no longer be accessible from the new
         # revision.
-        if git.rev_list("%s..%s" % (self.new_rev, self.old_rev), _decode=True) == "":
+        if not git.rev_list("%s..%s" % (self.new_rev, self.old_rev), max_count="1"):
             return
 
         raise InvalidUpdate(
@@ -1,9 +1,25 @@
 """A module to send emails...
 """
+from config import git_config
 from errors import InvalidUpdate
 from io_utils import encode_utf8, safe_decode
 import os
 from subprocess import Popen, PIPE, STDOUT
+from time import sleep
+from utils import debug
+
+# The maximum number of attempts at sending a given email via SMTP,
+# before falling back to sendmail.
+SMTP_MAX_ATTEMPTS = 3
+
+# The delay (in seconds) before retrying to send an email via SMTP,
+# following a transient error. This delay is doubled after each
+# failed attempt.
+SMTP_RETRY_DELAY_IN_SECONDS = 2
+
+# The timeout (in seconds) for each operation on the connection
+# to the SMTP server.
+SMTP_TIMEOUT_IN_SECONDS = 60
 
 
 def get_sendmail_exe():
@@ -83,3 +99,229 @@ def sendmail(from_email, to_emails, mail_as_string, smtp_server):
     if p.returncode != 0 or "GIT_HOOKS_TESTSUITE_MODE" in os.environ:
         print(safe_decode(out))
     return p.returncode == 0
+
+
+class SendmailTransport(object):
+    """An email transport calling sendmail for each email (the default).
+
+    ATTRIBUTES
+        inter_email_delay_p: True if a delay should be introduced
+            between emails (see EmailQueue.flush).
+    """
+
+    inter_email_delay_p = True
+
+    def send(self, from_email, to_emails, mail_as_string):
+        """Send an email.
+
+        PARAMETERS
+            from_email: Same as in the sendmail function.
+            to_emails: Same as in the sendmail function.
+            mail_as_string: Same as in the sendmail function.
+
+        RETURN VALUE
+            A boolean (sent / not sent).
+        """
+        return sendmail(from_email, to_emails, mail_as_string, "localhost")
+
+    def close(self):
+        """Release the resources used by this transport."""
+        pass
+
+
+class SMTPTransport(object):
+    """An email transport sending all emails over a single SMTP connection.
+
+    The connection to the SMTP server is established when sending
+    the first email, and then reused for all the other emails, until
+    self.close is called.
+
+    Sending an email is retried after transient errors (Eg: the server
+    being unreachable, or replying with a 4xx code), up to
+    SMTP_MAX_ATTEMPTS times, with a delay which doubles after each
+    failed attempt. If an email still cannot be sent, or is rejected
+    with a permanent error, this transport falls back to sendmail for
+    that email, and all the remaining ones. Similarly, if the server
+    refuses some of the recipients of an email, the email is sent
+    to those recipients with sendmail.
+
+    ATTRIBUTES
+        smtp_server: The SMTP server, in "host[:port]" format.
+    """
+
+    def __init__(self, smtp_server):
+        """Initialize self.
+
+        PARAMETERS
+            smtp_server: Same as the attribute.
+        """
+        self.smtp_server = smtp_server
+        # The connection to the SMTP server (an smtplib.SMTP object),
+        # or None if not connected.
+        self.__connection = None
+        # The SendmailTransport to use after a failure (None if
+        # no failure occurred so far).
+        self.__fallback = None
+
+    @property
+    def inter_email_delay_p(self):
+        """Same as SendmailTransport.inter_email_delay_p.
+
+        No delay is needed as long as we send the emails via SMTP,
+        since they are then handed over to the SMTP server in order,
+        one after the other, over the same connection.
+        """
+        return self.__fallback is not None
+
+    def send(self, from_email, to_emails, mail_as_string):
+        """Same as SendmailTransport.send."""
+        if self.__fallback is None:
+            try:
+                refused = self.__send_with_retries(
+                    from_email, to_emails, mail_as_string
+                )
+                if not refused:
+                    return True
+                # The server accepted the email for some of the recipients
+                # only. Try sending it to the other ones with sendmail.
+                for (to_email, (code, msg)) in refused.items():
+                    debug(
+                        "SMTP transport: recipient {to_email} refused:"
+                        " {code} {msg} (falling back to sendmail)".format(
+                            to_email=to_email, code=code, msg=safe_decode(msg)
+                        )
+                    )
+                return SendmailTransport().send(
+                    from_email, list(refused.keys()), mail_as_string
+                )
+            except OSError as E:
+                # Note that smtplib.SMTPException is a subclass of OSError.
+                debug(
+                    "SMTP transport: failed to send email via {server}: {err}"
+                    " (falling back to sendmail)".format(server=self.smtp_server, err=E)
+                )
+                self.close()
+                self.__fallback = SendmailTransport()
+        return self.__fallback.send(from_email, to_emails, mail_as_string)
+
+    def close(self):
+        """Same as SendmailTransport.close."""
+        if self.__connection is None:
+            return
+        try:
+            self.__connection.quit()
+        except OSError:
+            self.__connection.close()
+        self.__connection = None
+
+    def __send_with_retries(self, from_email, to_emails, mail_as_string):
+        """Send an email via SMTP, retrying after transient errors.
+
+        Raises OSError (which includes smtplib.SMTPException) if the email
+        could not be sent after SMTP_MAX_ATTEMPTS attempts, or if it was
+        rejected with a permanent error.
+
+        PARAMETERS
+            from_email: Same as in the sendmail function.
+            to_emails: Same as in the sendmail function.
+            mail_as_string: Same as in the sendmail function.
+
+        RETURN VALUE
+            A dictionary of the recipients refused by the server, if any
+            (see smtplib.SMTP.sendmail). The email was sent to all the
+            other recipients.
+        """
+        # The smtplib module is fairly expensive to import, and is only
+        # needed when actually using this transport. So only import it
+        # when needed.
+        import smtplib
+
+        retry_delay = SMTP_RETRY_DELAY_IN_SECONDS
+        for attempt in range(1, SMTP_MAX_ATTEMPTS + 1):
+            try:
+                if self.__connection is None:
+                    (host, _, port) = self.smtp_server.partition(":")
+                    self.__connection = smtplib.SMTP(
+                        host, int(port or 0), timeout=SMTP_TIMEOUT_IN_SECONDS
+                    )
+                return self.__connection.sendmail(
+                    from_email, to_emails, encode_utf8(mail_as_string)
+                )
+            except OSError as E:
+                # Always start with a new connection after an error,
+                # as we do not know which state the current one is in.
+                self.close()
+                if attempt == SMTP_MAX_ATTEMPTS or not smtp_error_transient_p(E):
+                    raise
+                debug(
+                    "SMTP transport: failed to send email via {server}: {err}"
+                    " (attempt {attempt} of {max_attempts})".format(
+                        server=self.smtp_server,
+                        err=E,
+                        attempt=attempt,
+                        max_attempts=SMTP_MAX_ATTEMPTS,
+                    )
+                )
+                if "GIT_HOOKS_TESTSUITE_MODE" in os.environ:
+                    # For the testsuite, print a debug trace in place
+                    # of delaying the execution (see EmailQueue.flush).
+                    debug("SMTP retry delay...", level=0)
+                else:  # pragma: no cover (do not want delays during testing)
+                    sleep(retry_delay)
+                retry_delay *= 2
+
+
+def smtp_error_transient_p(err):
+    """Return True if the given SMTP error is transient, False otherwise.
+
+    A transient error is an error after which sending the same email
+    again may succeed.
+
+    PARAMETERS
+        err: The exception raised while sending an email via SMTP
+            (an OSError, which includes smtplib.SMTPException).
+    """
+    import smtplib
+
+    if isinstance(err, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for (code, _) in err.recipients.values())
+    if isinstance(err, smtplib.SMTPResponseException):
+        return 400 <= err.smtp_code < 500
+    if isinstance(err, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(err, smtplib.SMTPException):
+        return False
+    # Any other OSError is a network error (Eg: the connection being
+    # refused, or timing out).
+    return True
+
+
+def email_transport():
+    """Return a new transport for sending emails.
+
+    The kind of transport is determined by the hooks.email-transport
+    config option.
+
+    Raises InvalidUpdate if the hooks.email-transport config option
+    or the hooks.smtp-server config option is invalid.
+
+    RETURN VALUE
+        Either a SendmailTransport or an SMTPTransport object.
+    """
+    transport = git_config("hooks.email-transport")
+    if transport == "sendmail":
+        return SendmailTransport()
+    elif transport == "smtp":
+        smtp_server = git_config("hooks.smtp-server")
+        (host, _, port) = smtp_server.partition(":")
+        if not host or (port and not port.isdigit()):
+            raise InvalidUpdate(
+                "Invalid hooks.smtp-server value: %s"
+                " (must be 'host' or 'host:port')" % smtp_server
+            )
+        return SMTPTransport(smtp_server)
+    else:
+        raise InvalidUpdate(
+            "Invalid hooks.email-transport value: %s"
+            " (must be 'sendmail' or 'smtp')" % transport
+        )
@@ -169,18 +169,126 @@ def ref_matches_regexp(ref_name, ref_re):
     RETURN VALUE
         True if ref_name matches ref_re. False otherwise.
     """
-    m = re.match(ref_re, ref_name)
-    if m is None:
-        return False
-    # We also need to verify that the namespace pattern matches
-    # the whole reference name (i.e. we do not want a reference
-    # named 'refs/heads/master2' be considered part of a namespace
-    # whose regexp is 'refs/heads/master').
-    #
-    # With Python 2.7, the simplest is to just verify the extent
-    # of the string being matched. Once we transition to Python 3,
-    # we can simplify this by using re.fullmatch instead of re.match.
-    return m.end() - m.start() == len(ref_name)
+    # We need to verify that the pattern matches the whole reference
+    # name (i.e. we do not want a reference named 'refs/heads/master2'
+    # be considered part of a namespace whose regexp is 'refs/heads/master').
+    return re.fullmatch(ref_re, ref_name) is not None
+
+
+# A regular expression matching the constructs which prevent us from
+# combining a regular expression with others, because they would
+# change meaning once embedded in a larger regular expression:
+#   - references to numbered groups (the numbering changes);
+#   - global inline flags (they apply to the entire expression).
+UNCOMBINABLE_RE_CONSTRUCTS_RE = re.compile(r"\\[1-9]|\(\?\(\d|\(\?[aiLmsux]+\)")
+
+
+class RefPatternMatcher(object):
+    """An object matching reference names against a list of regexps.
+
+    This is the equivalent of iterating over the list of regular
+    expressions, and returning the first one which matches the entire
+    reference name, except that the regular expressions are combined
+    into a single one, so that each reference name is matched only once
+    rather than once per regular expression. The result for each
+    reference name is also memoized.
+
+    ATTRIBUTES
+        patterns: The list of regular expressions (as strings),
+            with leading and trailing whitespaces stripped.
+        combined_re: The compiled regular expression combining all
+            the regular expressions in patterns, each in its own group.
+            None if the regular expressions could not be combined,
+            in which case we match them one at a time instead.
+        group_to_pattern: A dictionary mapping the index of each group
+            in combined_re corresponding to one of the regular expressions
+            to that regular expression.
+        results: A dictionary, keyed by reference name, of the results
+            already computed.
+    """
+
+    def __init__(self, patterns):
+        """The constructor.
+
+        PARAMETERS
+            patterns: An iterable of regular expressions, as strings.
+        """
+        self.patterns = [pattern.strip() for pattern in patterns]
+        self.combined_re = None
+        self.group_to_pattern = {}
+        self.results = {}
+
+        if not self.patterns or any(
+            UNCOMBINABLE_RE_CONSTRUCTS_RE.search(p) for p in self.patterns
+        ):
+            return
+        group_index = 1
+        try:
+            for pattern in self.patterns:
+                self.group_to_pattern[group_index] = pattern
+                group_index += 1 + re.compile(pattern).groups
+            combined_re = re.compile(
+                "|".join("(%s)" % pattern for pattern in self.patterns)
+            )
+        except re.error:
+            # One of the regular expressions is invalid, or cannot
+            # be combined with the others (Eg: because it defines
+            # a named group already defined by another one). Just
+            # match them one at a time, which also preserves the
+            # behavior of only reporting an invalid regular expression
+            # when we actually try to use it.
+            self.group_to_pattern = {}
+            return
+        self.combined_re = combined_re
+
+    def search(self, ref_name):
+        """Return the first regular expression matching ref_name, or None.
+
+        PARAMETERS
+            ref_name: The name of the reference used for the search.
+        """
+        if ref_name not in self.results:
+            self.results[ref_name] = self.__search(ref_name)
+        return self.results[ref_name]
+
+    def __search(self, ref_name):
+        """Implement the search method, without the memoization."""
+        if self.combined_re is None:
+            for pattern in self.patterns:
+                if ref_matches_regexp(ref_name, pattern):
+                    return pattern
+            return None
+
+        m = self.combined_re.fullmatch(ref_name)
+        if m is None:
+            return None
+        # The alternatives of combined_re are tried in order, so
+        # the one that matched is the first regular expression
+        # matching the entire reference name. And since its group
+        # encloses all the other groups of that alternative, it is
+        # also the last group to have been closed.
+        return self.group_to_pattern[m.lastindex]
+
+
+def ref_pattern_matcher(patterns):
+    """Return a RefPatternMatcher object for the given regular expressions.
+
+    The RefPatternMatcher objects are cached, so that subsequent calls
+    with the same regular expressions return the same object (and
+    therefore benefit from the results it already memoized).
+
+    PARAMETERS
+        patterns: A tuple of regular expressions, as strings.
+    """
+    # Implement the cache as an attribute of this function,
+    # keyed by the list of regular expressions. This way,
+    # the cache remains valid even if the configuration
+    # gets reloaded (Eg: after the update of the config ref).
+    if "cache" not in ref_pattern_matcher.__dict__:
+        ref_pattern_matcher.cache = {}
+    if patterns not in ref_pattern_matcher.cache:
+        ref_pattern_matcher.cache[patterns] = RefPatternMatcher(patterns)
+    return ref_pattern_matcher.cache[patterns]
 
 
 def search_config_option_list(option_name, ref_name):
@@ -199,12 +307,7 @@ def search_config_option_list(option_name, ref_name):
     RETURN VALUE
         The first regular expression matching REF_NAME, or None.
     """
-    ref_re_list = git_config(option_name)
-    for ref_re in ref_re_list:
-        ref_re = ref_re.strip()
-        if ref_matches_regexp(ref_name, ref_re):
-            return ref_re
-    return None
+    return ref_pattern_matcher(tuple(git_config(option_name))).search(ref_name)
 
 
 def commit_email_subject_prefix(project_name, ref_names):
@@ -0,0 +1,153 @@
+#! /usr/bin/env python3
+"""Measure how long it takes to compute the attributes of many files.
+
+This script creates a temporary repository with one commit containing
+a large number of files spread over many directories, some of which
+have a .gitattributes file, and then measures how long it takes to
+determine the "no-precommit-check" attribute of all these files:
+First using git_attribute, and then using "git check-attr" from
+a checkout of the .gitattributes files (the way git_attribute used
+to compute attributes).
+
+Usage: bench_git_attrs.py [NB_FILES]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "hooks"))
+
+from git import git  # noqa: E402
+from git_attrs import git_attribute  # noqa: E402
+import git_attrs  # noqa: E402
+
+# The number of directories at each level of the tree.
+NB_TOP_DIRS = 50
+NB_SUB_DIRS = 20
+
+
+def file_path(n):
+    """Return the path of the n-th file of the tree."""
+    return "dir%d/sub%d/file%d.%s" % (
+        n % NB_TOP_DIRS,
+        (n // NB_TOP_DIRS) % NB_SUB_DIRS,
+        n,
+        ("adb", "ads", "c", "txt")[n % 4],
+    )
+
+
+def gitattributes_files():
+    """Return the .gitattributes files of the tree, indexed by path."""
+    result = {".gitattributes": "*.txt no-precommit-check\n*.c -text\n"}
+    for top in range(NB_TOP_DIRS):
+        result["dir%d/.gitattributes" % top] = (
+            "# Generated files.\n"
+            "file1*.ads no-precommit-check\n"
+            "sub%d/** -no-precommit-check\n" % (top % NB_SUB_DIRS)
+        )
+        result[
+            "dir%d/sub%d/.gitattributes" % (top, top % NB_SUB_DIRS)
+        ] = "*.adb no-precommit-check\n"
+    return result
+
+
+def create_repo(repo_dir, nb_files):
+    """Create a repository with a commit containing nb_files files in repo_dir."""
+    subprocess.check_call(["git", "init", "-q", repo_dir])
+    fast_import_input = [
+        "commit refs/heads/master\n"
+        "committer Bench <bench@example.com> 1600000000 +0000\n"
+        "data <<EOF\nAdd many files.\nEOF\n"
+    ]
+    for (path, contents) in gitattributes_files().items():
+        fast_import_input.append(
+            "M 644 inline %s\ndata %d\n%s\n" % (path, len(contents), contents)
+        )
+    for n in range(nb_files):
+        fast_import_input.append("M 644 inline %s\ndata 0\n\n" % file_path(n))
+    subprocess.run(
+        ["git", "fast-import", "--quiet"],
+        input="".join(fast_import_input).encode(),
+        cwd=repo_dir,
+        check=True,
+    )
+
+
+def check_attr_from_checkout(filenames, attr_name):
+    """Compute the attributes using "git check-attr" from a checkout."""
+    env = dict(os.environ)
+    env.pop("GIT_DIR", None)
+    with tempfile.TemporaryDirectory() as work_tree:
+        subprocess.check_call(["git", "init", "-q", work_tree], env=env)
+        for (path, contents) in gitattributes_files().items():
+            os.makedirs(os.path.join(work_tree, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(work_tree, path), "w") as f:
+                f.write(contents)
+        subprocess.run(
+            ["git", "check-attr", "-z", "--stdin", attr_name],
+            input="\0".join(filenames).encode(),
+            stdout=subprocess.DEVNULL,
+            cwd=work_tree,
+            env=env,
+            check=True,
+        )
+
+
+def bench(label, fun, *args):
+    """Call fun with the given arguments, and print the time it took."""
+    start = time.perf_counter()
+    result = fun(*args)
+    elapsed = time.perf_counter() - start
+    print("%-45s %8.3fs" % (label, elapsed))
+    return result
+
+
+def main():
+    nb_files = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        create_repo(tmp_dir, nb_files)
+        os.chdir(os.path.join(tmp_dir, ".git"))
+        os.environ["GIT_DIR"] = "."
+        rev = git.rev_parse("master", _decode=True)
+        filenames = [file_path(n) for n in range(nb_files)]
+
+        print("Computing the attributes of %d files:" % nb_files)
+        attrs = bench(
+            "git_attribute (first call)",
+            git_attribute,
+            rev,
+            filenames,
+            "no-precommit-check",
+        )
+        bench(
+            "git_attribute (compiled rules cached)",
+            git_attribute,
+            rev,
+            filenames,
+            "no-precommit-check",
+        )
+        git_attrs.gitattributes_file.cache.clear()
+        bench(
+            "git_attribute (other attribute)",
+            git_attribute,
+            rev,
+            filenames,
+            "text",
+        )
+        bench(
+            "git check-attr from a checkout",
+            check_attr_from_checkout,
+            filenames,
+            "no-precommit-check",
+        )
+        print(
+            "(%d files with no-precommit-check set)"
+            % sum(1 for value in attrs.values() if value == "set")
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#! /usr/bin/env python3
+"""Compare the performance of the git_odb module against calling git.
+
+This script creates a temporary repository with a number of commits,
+packs it, and then measures how long it takes to get the parents
+and subject of each commit, as well as the list of files of each
+commit, using the git_odb module, and then using git.
+
+Usage: bench_git_odb.py [NB_COMMITS]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "hooks"))
+
+from git import git  # noqa: E402
+import git_odb  # noqa: E402
+
+
+def create_repo(repo_dir, nb_commits):
+    """Create a repository with nb_commits commits in repo_dir."""
+    subprocess.check_call(["git", "init", "-q", repo_dir])
+    fast_import_input = []
+    for n in range(nb_commits):
+        contents = "".join("line %d of file %d\n" % (i, n % 20) for i in range(n % 200))
+        fast_import_input.append(
+            "commit refs/heads/master\n"
+            "committer Bench <bench@example.com> %d +0000\n"
+            "data <<EOF\nCommit %d\n\nSome description.\nEOF\n"
+            "M 644 inline dir%d/file%d\ndata %d\n%s\n"
+            % (1600000000 + n, n, n % 10, n % 20, len(contents), contents)
+        )
+    subprocess.run(
+        ["git", "fast-import", "--quiet"],
+        input="".join(fast_import_input).encode(),
+        cwd=repo_dir,
+        check=True,
+    )
+    subprocess.check_call(["git", "repack", "-q", "-a", "-d"], cwd=repo_dir)
+
+
+def bench(label, fun, revs):
+    """Call fun for each rev in revs, and print the time it took."""
+    start = time.perf_counter()
+    for rev in revs:
+        fun(rev)
+    elapsed = time.perf_counter() - start
+    print("%-40s %8.3fs (%.1f us/call)" % (label, elapsed, elapsed / len(revs) * 1e6))
+
+
+def main():
+    nb_commits = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        create_repo(tmp_dir, nb_commits)
+        os.chdir(tmp_dir)
+        os.environ["GIT_DIR"] = os.path.join(tmp_dir, ".git")
+        revs = git.rev_list("master", _split_lines=True, _decode=True)
+
+        bench("commit_parents (git_odb)", git_odb.commit_parents, revs)
+        bench(
+            "commit_parents (git log)",
+            lambda rev: git.log("-n1", "--pretty=format:%P", rev, _decode=True),
+            revs,
+        )
+        bench("commit_subject (git_odb)", git_odb.commit_subject, revs)
+        bench(
+            "commit_subject (git log)",
+            lambda rev: git.log("-n1", "--pretty=format:%s", rev, _decode=True),
+            revs,
+        )
+        bench("list_tree_files (git_odb)", git_odb.list_tree_files, revs)
+        bench(
+            "list_tree_files (git ls-tree)",
+            lambda rev: git.ls_tree("-r", "--name-only", rev),
+            revs,
+        )
+
+
+if __name__ == "__main__":
+    main()
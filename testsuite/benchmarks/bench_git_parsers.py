@@ -0,0 +1,139 @@
+#! /usr/bin/env python3
+"""Microbenchmarks for the git_parsers module.
+
+For each parser, this script measures the time it takes to parse
+some synthetic output of increasing size, and compares it with
+the list.pop(0)-based parsing we used to do. The time per entry
+should remain roughly constant as the size of the output grows
+for the git_parsers module (linear scaling), whereas it grows
+with the size of the output for the list.pop(0)-based parsing
+(quadratic scaling).
+
+Usage: bench_git_parsers.py [MAX_NB_ENTRIES]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "hooks"))
+
+from git_parsers import (  # noqa: E402
+    parse_check_attr,
+    parse_config_list,
+    parse_diff_tree,
+    parse_rev_list,
+)
+
+
+def diff_tree_records(n):
+    result = []
+    for i in range(n):
+        result.append(":100644 100644 %040x %040x M" % (i, i + 1))
+        result.append("dir%d/file%d" % (i % 100, i))
+    return result
+
+
+def rev_list_records(n):
+    result = []
+    for i in range(n):
+        result.extend(
+            [
+                "commit %040x" % i,
+                "%040x" % (i + 1),
+                "Some Author",
+                "author@example.com",
+                "Subject of commit %d" % i,
+            ]
+        )
+    return result
+
+
+def check_attr_records(n):
+    result = []
+    for i in range(n):
+        result.extend(["src/dir%d/file%d" % (i % 100, i), "attr", "unspecified"])
+    return result
+
+
+def config_records(n):
+    return ["hooks.option-%d\nvalue %d" % (i, i) for i in range(n)]
+
+
+def pop_diff_tree(records):
+    records = list(records)
+    result = []
+    while records:
+        stats = records.pop(0)
+        filename = records.pop(0)
+        result.append(tuple(stats[1:].split(None, 4)) + (filename,))
+    return result
+
+
+def pop_rev_list(records):
+    records = list(records)
+    result = []
+    while records:
+        rev = records.pop(0).split(None, 1)[1]
+        result.append((rev, [records.pop(0) for _ in range(4)]))
+    return result
+
+
+def pop_check_attr(records):
+    records = list(records)
+    result = []
+    while records:
+        result.append((records.pop(0), records.pop(0), records.pop(0)))
+    return result
+
+
+def pop_config_list(records):
+    records = list(records)
+    result = []
+    while records:
+        result.append(tuple(records.pop(0).split("\n", 1)))
+    return result
+
+
+BENCHMARKS = (
+    ("diff-tree", diff_tree_records, parse_diff_tree, pop_diff_tree),
+    ("rev-list", rev_list_records, lambda r: parse_rev_list(r, 4), pop_rev_list),
+    ("check-attr", check_attr_records, parse_check_attr, pop_check_attr),
+    ("config", config_records, parse_config_list, pop_config_list),
+)
+
+
+def timed(fun, records):
+    """Return the time it takes to call fun with records and consume the result."""
+    start = time.perf_counter()
+    for _ in fun(records):
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    max_nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 40000
+    sizes = [max_nb_entries // 8, max_nb_entries // 4, max_nb_entries // 2]
+    sizes.append(max_nb_entries)
+
+    print("%-12s %10s %16s %16s" % ("format", "entries", "git_parsers", "list.pop(0)"))
+    for (name, make_records, parser, pop_parser) in BENCHMARKS:
+        for n in sizes:
+            records = make_records(n)
+            new_time = timed(parser, records)
+            old_time = timed(pop_parser, records)
+            print(
+                "%-12s %10d %10.3fs %4.2fus %10.3fs %4.2fus"
+                % (
+                    name,
+                    n,
+                    new_time,
+                    new_time / n * 1e6,
+                    old_time,
+                    old_time / n * 1e6,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
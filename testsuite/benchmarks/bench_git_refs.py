@@ -0,0 +1,88 @@
+#! /usr/bin/env python3
+"""Compare the performance of the git_refs module against "git show-ref".
+
+This script creates a temporary repository with a large number of
+references, most of them in Gerrit's internal namespaces (which
+the hooks ignore by default), and then measures how long it takes
+to get the list of references the hooks care about, first using
+the git_refs module, and then using "git show-ref" followed by
+the filtering of the ignored references.
+
+Usage: bench_git_refs.py [NB_REFS]
+"""
+
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "hooks"))
+
+from config import GERRIT_INTERNAL_REFS  # noqa: E402
+from git import git  # noqa: E402
+from git_refs import literal_prefix, read_refs  # noqa: E402
+
+
+def create_repo(repo_dir, nb_refs):
+    """Create a repository with (about) nb_refs packed references in repo_dir."""
+    subprocess.check_call(["git", "init", "-q", "--bare", repo_dir])
+    rev = subprocess.run(
+        [
+            "git",
+            "commit-tree",
+            "-m",
+            "bench",
+            "4b825dc642cb6eb9a060e54bf8d69288fbee4904",
+        ],
+        cwd=repo_dir,
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout.strip()
+    # 1% of branches and tags, the rest being Gerrit changes.
+    refs = ["refs/heads/branch-%d" % n for n in range(nb_refs // 200)]
+    refs += ["refs/tags/tag-%d" % n for n in range(nb_refs // 200)]
+    refs += [
+        "refs/changes/%02d/%d/%d" % (n % 100, n // 3, n % 3 + 1)
+        for n in range(nb_refs - len(refs))
+    ]
+    with open(os.path.join(repo_dir, "packed-refs"), "w") as f:
+        f.write("# pack-refs with: peeled fully-peeled sorted \n")
+        f.write("".join("%s %s\n" % (rev, ref) for ref in sorted(refs)))
+
+
+def show_ref_and_filter():
+    """Same as git_show_ref, when reading the references using git."""
+    ignore_refs_list = [re.compile(regex) for regex in GERRIT_INTERNAL_REFS]
+    result = {}
+    for ref_info in git.show_ref(_iter=True, _decode=True):
+        rev, ref = ref_info.split(None, 2)
+        if not any(ignore_ref_re.match(ref) for ignore_ref_re in ignore_refs_list):
+            result[ref] = rev
+    return result
+
+
+def bench(label, fun):
+    """Call fun, print the time it took, and return its result."""
+    start = time.perf_counter()
+    result = fun()
+    print("%-40s %8.3fs" % (label, time.perf_counter() - start))
+    return result
+
+
+def main():
+    nb_refs = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        create_repo(tmp_dir, nb_refs)
+        os.environ["GIT_DIR"] = tmp_dir
+        skip_prefixes = [literal_prefix(regex) for regex in GERRIT_INTERNAL_REFS]
+        print("%d references" % nb_refs)
+        refs = bench("git_refs.read_refs", lambda: read_refs(skip_prefixes))
+        expected_refs = bench("git show-ref + filtering", show_ref_and_filter)
+        assert refs == expected_refs
+
+
+if __name__ == "__main__":
+    main()
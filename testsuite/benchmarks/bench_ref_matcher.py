@@ -0,0 +1,119 @@
+#! /usr/bin/env python3
+"""Compare the performance of RefPatternMatcher against matching one regexp at a time.
+
+This script generates a list of reference names, and a list of
+regular expressions similar to the ones typically found in the
+hooks' configuration (Eg: hooks.no-emails or hooks.ignore-refs).
+It then measures how long it takes to find, for each reference,
+the first regular expression which matches it, first using
+a RefPatternMatcher object, and then by iterating over the list
+of regular expressions (which is what search_config_option_list
+used to do).
+
+Usage: bench_ref_matcher.py [NB_REFS [NB_PATTERNS]]
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "hooks"))
+
+from utils import RefPatternMatcher  # noqa: E402
+
+
+def search_one_at_a_time(patterns, ref_name):
+    """Return the first of the given patterns matching all of ref_name.
+
+    This is how search_config_option_list used to search the list
+    of regular expressions.
+    """
+    for pattern in patterns:
+        pattern = pattern.strip()
+        m = re.match(pattern, ref_name)
+        if m is not None and m.end() - m.start() == len(ref_name):
+            return pattern
+    return None
+
+
+def make_patterns(nb_patterns):
+    """Return a list of nb_patterns regular expressions."""
+    patterns = []
+    for n in range(nb_patterns):
+        patterns.append(
+            (
+                "refs/heads/release-%d\\.[0-9]+",
+                "refs/heads/user-%d/.*",
+                "refs/tags/v%d\\..*",
+                "refs/heads/(fsf|gcc)-%d/.*",
+                "refs/vendor/project-%d/heads/.*",
+            )[n % 5]
+            % n
+        )
+    return patterns
+
+
+def make_ref_names(nb_refs, nb_patterns):
+    """Return a list of nb_refs reference names.
+
+    About half of them match one of the regular expressions
+    returned by make_patterns (with the same nb_patterns).
+    """
+    ref_names = []
+    for n in range(nb_refs):
+        k = n % (2 * nb_patterns)
+        ref_names.append(
+            (
+                "refs/heads/release-%d.%d",
+                "refs/heads/user-%d/topic-%d",
+                "refs/tags/v%d.%d",
+                "refs/heads/gcc-%d/branch-%d",
+                "refs/vendor/project-%d/heads/b%d",
+            )[k % 5]
+            % (k, n)
+        )
+    return ref_names
+
+
+def bench(label, fun, ref_names):
+    """Call fun for each reference name, and print the time it took.
+
+    Return the list of results.
+    """
+    start = time.perf_counter()
+    result = [fun(ref_name) for ref_name in ref_names]
+    elapsed = time.perf_counter() - start
+    print(
+        "%-40s %8.3fs %6.2fus"
+        % (label, elapsed, elapsed * 1000000 / max(len(ref_names), 1))
+    )
+    return result
+
+
+def main():
+    nb_refs = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    nb_patterns = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    patterns = make_patterns(nb_patterns)
+    ref_names = make_ref_names(nb_refs, nb_patterns)
+    print("%d references, %d regular expressions" % (nb_refs, nb_patterns))
+
+    start = time.perf_counter()
+    matcher = RefPatternMatcher(patterns)
+    print(
+        "%-40s %8.3fs"
+        % ("RefPatternMatcher (construction)", time.perf_counter() - start)
+    )
+    result = bench("RefPatternMatcher", matcher.search, ref_names)
+    bench("RefPatternMatcher (memoized)", matcher.search, ref_names)
+    expected = bench(
+        "one regexp at a time",
+        lambda ref_name: search_one_at_a_time(patterns, ref_name),
+        ref_names,
+    )
+    print("Same results: %s" % (result == expected))
+    print("Matches: %d" % sum(1 for match in result if match is not None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#! /usr/bin/env python3
+"""Measure how long it takes to write the files of a large commit.
+
+This script creates a temporary repository with one commit touching
+a large number of files (similar to a commit updating the copyright
+year of every file in a project), and then measures how long it takes
+to write all these files in a scratch directory, the way the files
+are prepared for the style checker: First one file at a time, and
+then using the write_commit_files function.
+
+Usage: bench_write_commit_files.py [NB_FILES]
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "hooks"))
+
+from git import git, object_reader  # noqa: E402
+from pre_commit_checks import write_commit_files  # noqa: E402
+
+
+def create_repo(repo_dir, nb_files):
+    """Create a repository with a commit touching nb_files files in repo_dir."""
+    subprocess.check_call(["git", "init", "-q", repo_dir])
+    fast_import_input = [
+        "commit refs/heads/master\n"
+        "committer Bench <bench@example.com> 1600000000 +0000\n"
+        "data <<EOF\nUpdate copyright year.\nEOF\n"
+    ]
+    for n in range(nb_files):
+        # A tenth of the files are identical, like the many small
+        # files (__init__.py, etc) found in most projects.
+        contents = (
+            "-- Copyright (C) 2024\n"
+            if n % 10 == 0
+            else "".join("line %d of file %d\n" % (i, n) for i in range(n % 100))
+        )
+        fast_import_input.append(
+            "M 644 inline src/dir%d/subdir%d/file%d\ndata %d\n%s\n"
+            % (n % 20, n % 7, n, len(contents), contents)
+        )
+    subprocess.run(
+        ["git", "fast-import", "--quiet"],
+        input="".join(fast_import_input).encode(),
+        cwd=repo_dir,
+        check=True,
+    )
+
+
+def write_files_one_by_one(filenames, rev, dest_dir):
+    """Write the given files one at a time (the original implementation)."""
+    for filename in filenames:
+        path_to_filename = "%s/%s" % (dest_dir, os.path.dirname(filename))
+        if not os.path.exists(path_to_filename):
+            os.makedirs(path_to_filename)
+        with open("%s/%s" % (dest_dir, filename), "wb") as f:
+            f.write(object_reader().contents("%s:%s" % (rev, filename)))
+
+
+def bench(label, fun, *args):
+    """Call fun with the given arguments, and print the time it took."""
+    dest_dir = tempfile.mkdtemp()
+    start = time.perf_counter()
+    fun(*args, dest_dir)
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(dest_dir)
+    print("%-45s %8.3fs" % (label, elapsed))
+
+
+def main():
+    nb_files = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        create_repo(tmp_dir, nb_files)
+        os.chdir(tmp_dir)
+        os.environ["GIT_DIR"] = os.path.join(tmp_dir, ".git")
+        rev = git.rev_parse("master", _decode=True)
+        filenames = git.ls_tree(
+            "-r", "--name-only", rev, _split_lines=True, _decode=True
+        )
+        blob_sha1s = {
+            line.split("\t")[1]: line.split()[2]
+            for line in git.ls_tree("-r", rev, _split_lines=True, _decode=True)
+        }
+
+        print("Writing %d files:" % len(filenames))
+        bench("one file at a time", write_files_one_by_one, filenames, rev)
+        bench("write_commit_files", write_commit_files, filenames, rev)
+        bench(
+            "write_commit_files (blob SHA1s known)",
+            lambda filenames, rev, dest_dir: write_commit_files(
+                filenames, rev, dest_dir, blob_sha1s=blob_sha1s
+            ),
+            filenames,
+            rev,
+        )
+
+
+if __name__ == "__main__":
+    main()
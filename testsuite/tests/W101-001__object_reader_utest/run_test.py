@@ -0,0 +1,33 @@
+def test_object_reader(testcase):
+    """Unit test the ObjectReader class."""
+    testcase.run_unit_test_script(
+        cwd=testcase.repo_dir,
+        expected_out="""\
+DEBUG: Test object existence queries...
+True
+False
+True
+False
+DEBUG: Test object type and size queries...
+commit
+tree
+blob
+None
+71
+DEBUG: Test object info queries...
+('44f596be83d9a33d7e184655fa6fb1a553dec282', 'tree', 29)
+None
+DEBUG: Test object contents queries...
+b'Some file.\\nSecond line, in the middle.\\nIn the middle too!\\nThird line.\\n\\n'
+b'Some file.\\nSecond line.\\nThird line.\\n'
+None
+DEBUG: Test names containing a newline...
+None
+None
+True
+DEBUG: Test that the reader survives a fork...
+36
+71
+71
+""",
+    )
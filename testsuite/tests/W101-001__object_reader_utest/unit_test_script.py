@@ -0,0 +1,47 @@
+import os
+
+from git import file_exists, get_object_type, git, is_valid_commit, object_reader
+
+reader = object_reader()
+
+print("DEBUG: Test object existence queries...")
+print(is_valid_commit("a605403"))
+print(is_valid_commit("a605403~10"))
+print(file_exists("a605403", "a"))
+print(file_exists("a605403", "no-such-file"))
+
+print("DEBUG: Test object type and size queries...")
+print(get_object_type("a605403"))
+print(get_object_type("a605403^{tree}"))
+print(get_object_type("a605403:a"))
+print(reader.object_type("a605403:no-such-file"))
+print(reader.object_size("a605403:a"))
+
+print("DEBUG: Test object info queries...")
+print(reader.info("a605403^{tree}"))
+print(reader.info("a605403:a b c"))
+
+print("DEBUG: Test object contents queries...")
+print(reader.contents("a605403:a"))
+print(reader.contents("d065089:a"))
+print(reader.contents("a605403:no-such-file"))
+
+print("DEBUG: Test names containing a newline...")
+print(reader.info("a605403:a\nb"))
+print(reader.contents("a605403:a\nb"))
+# The contents returned for names containing a newline are obtained
+# via "git cat-file", which should return the exact same bytes as
+# the pipe does (in particular, without stripping the trailing
+# newlines).
+print(git.cat_file("blob", "a605403:a", _no_strip=True) == reader.contents("a605403:a"))
+
+print("DEBUG: Test that the reader survives a fork...")
+pid = os.fork()
+if pid == 0:
+    print(reader.object_size("d065089:a"), flush=True)
+    reader.close()
+    os._exit(0)
+os.waitpid(pid, 0)
+print(reader.object_size("a605403:a"))
+reader.close()
+print(reader.object_size("a605403:a"))
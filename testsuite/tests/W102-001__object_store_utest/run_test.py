@@ -0,0 +1,103 @@
+import os
+
+
+def prepare_repo(testcase):
+    """Add to the testcase's repository the objects we want to check."""
+    for cmds in (
+        ["git", "checkout", "-b", "odb-tests", "master"],
+        ["mkdir", "dir"],
+        ["sh", "-c", "echo b > dir/b; echo c > dir/c; echo e > dir/é; echo q > 'd\"q'"],
+        ["git", "add", "."],
+        ["git", "commit", "-q", "-m", "\n\nMulti-line  \nsubject\n\nBody.\n"],
+        ["sh", "-c", "seq 1 2000 > a"],
+        ["git", "commit", "-q", "-a", "-m", "Large a"],
+        ["sh", "-c", "seq 1 2001 > a"],
+        ["git", "commit", "-q", "-a", "-m", "Large a, one more line"],
+        ["sh", "-c", "printf 'Latin-1 subject: \\351t\\351\\n' > ../msg"],
+        [
+            "git",
+            "-c",
+            "i18n.commitEncoding=iso-8859-1",
+            "commit",
+            "-q",
+            "--allow-empty",
+            "-F",
+            "../msg",
+        ],
+        ["git", "notes", "add", "-m", "A note", "master"],
+        ["git", "notes", "add", "-m", "Another note", "odb-tests"],
+    ):
+        p = testcase.run(cmds)
+        assert p.status == 0, p.image
+
+    for (tag_name, date) in (
+        ("west-tag", "1340722274 -0700"),
+        ("east-tag", "1340722274 +0530"),
+        ("epoch-tag", "@0 +0000"),
+    ):
+        p = testcase.run(
+            ["git", "tag", "-a", "-m", "Tag %s" % tag_name, tag_name, "odb-tests~1"],
+            env={"GIT_COMMITTER_DATE": date},
+        )
+        assert p.status == 0, p.image
+
+
+def test_object_store(testcase):
+    """Unit test the git_odb module."""
+    prepare_repo(testcase)
+    # Note that the object store does not support reading the subject
+    # of commits using an encoding other than UTF-8, nor reading a path
+    # which is not a blob. The git-hooks fall back to using git
+    # in that case.
+    expected_out = """\
+commit_subject: odb-tests: not supported
+read_path: odb-tests:dir: not supported
+read_path: odb-tests~1:dir: not supported
+read_path: odb-tests~2:dir: not supported
+read_path: odb-tests~3:dir: not supported
+Checked 12 commits.
+Checked 3 tags.
+commit_subject: no-such-rev: not supported
+"""
+
+    # First, with all objects loose.
+    testcase.run_unit_test_script(cwd=testcase.repo_dir, expected_out=expected_out)
+
+    # Same, after having packed everything, forcing the use of deltas.
+    p = testcase.run(["git", "repack", "-q", "-a", "-d", "-f", "--window=250"])
+    assert p.status == 0, p.image
+    testcase.run_unit_test_script(cwd=testcase.repo_dir, expected_out=expected_out)
+
+    # Same, with a version-1 pack index.
+    p = testcase.run(
+        ["git", "-c", "pack.indexVersion=1", "repack", "-q", "-a", "-d", "-f"]
+    )
+    assert p.status == 0, p.image
+    testcase.run_unit_test_script(cwd=testcase.repo_dir, expected_out=expected_out)
+
+    # Same, with the objects being only available through
+    # GIT_ALTERNATE_OBJECT_DIRECTORIES, similar to what the update hook
+    # sees during a push (quarantine).
+    quarantine_dir = os.path.join(testcase.work_dir, "quarantine")
+    os.mkdir(quarantine_dir)
+    testcase.run_unit_test_script(
+        cwd=testcase.repo_dir,
+        env={
+            "GIT_OBJECT_DIRECTORY": quarantine_dir,
+            "GIT_ALTERNATE_OBJECT_DIRECTORIES": os.path.join(
+                testcase.repo_dir, ".git", "objects"
+            ),
+        },
+        expected_out=expected_out,
+    )
+
+    # And finally, verify that the object store refuses to work
+    # in a repository using replace references.
+    p = testcase.run(["git", "replace", "master", "master~1"])
+    assert p.status == 0, p.image
+    testcase.run_unit_test_script(
+        cwd=testcase.repo_dir,
+        expected_out="""\
+Object store not available: repository uses replace references
+""",
+    )
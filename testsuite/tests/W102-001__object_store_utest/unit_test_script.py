@@ -0,0 +1,111 @@
+import sys
+
+from git import git, CalledProcessError
+import git_odb
+from git_odb import ObjectStoreError
+from io_utils import safe_decode
+
+# Verify that the results we get from the object store are the same
+# as the ones we get from git. Some of the objects may not be supported
+# by the object store, in which case we just list them.
+
+
+def check(what, name, odb_fun, git_fun, *args):
+    try:
+        odb_result = odb_fun(*args)
+    except ObjectStoreError:
+        print("%s: %s: not supported" % (what, name))
+        return
+    git_result = git_fun(*args)
+    if odb_result != git_result:
+        print("%s: %s: MISMATCH" % (what, name))
+        print("  object store: %r" % (odb_result,))
+        print("           git: %r" % (git_result,))
+
+
+def git_commit_parents(rev):
+    return git.log("-n1", "--pretty=format:%P", rev, _decode=True).split()
+
+
+def git_commit_subject(rev):
+    return git.log("-n1", "--pretty=format:%s", rev, _decode=True)
+
+
+def git_list_tree_files(rev):
+    return git.ls_tree("-r", "-z", "--name-only", rev).split(b"\0")[:-1]
+
+
+def odb_read_path(rev, path):
+    # Strip the contents the same way our git wrapper does.
+    contents = git_odb.read_path(rev, path)
+    return None if contents is None else contents.rstrip()
+
+
+def git_show_path(rev, path):
+    try:
+        return git.show("%s:%s" % (rev, path))
+    except CalledProcessError:
+        return None
+
+
+def git_show_header(tag_name):
+    result = []
+    for line in git.show(tag_name, _split_lines=True, _decode=True):
+        result.append(line)
+        if not line.strip():
+            break
+    return result
+
+
+def odb_cat_file(tag_name):
+    return safe_decode(git_odb.read_object(tag_name, "tag")[2])
+
+
+def git_cat_file(tag_name):
+    return git.cat_file("-p", tag_name, _decode=True) + "\n"
+
+
+try:
+    git_odb.object_store()
+except ObjectStoreError as E:
+    print("Object store not available: %s" % E)
+    sys.exit(0)
+
+all_commits = git.rev_list("--all", _split_lines=True, _decode=True)
+for rev in all_commits:
+    # Use a symbolic name for the commit, so as to have a stable output.
+    rev_name = git.name_rev("--name-only", "--refs=odb-tests", rev, _decode=True)
+    check("commit_parents", rev_name, git_odb.commit_parents, git_commit_parents, rev)
+    check("commit_subject", rev_name, git_odb.commit_subject, git_commit_subject, rev)
+    check(
+        "list_tree_files",
+        rev_name,
+        git_odb.list_tree_files,
+        git_list_tree_files,
+        rev,
+    )
+    for path in ("a", "dir/b", "dir", "no-such-file", "dir/no-such-file"):
+        check(
+            "read_path",
+            "%s:%s" % (rev_name, path),
+            odb_read_path,
+            git_show_path,
+            rev,
+            path,
+        )
+print("Checked %d commits." % len(all_commits))
+
+all_tags = git.tag(_split_lines=True, _decode=True)
+for tag_name in all_tags:
+    check(
+        "tag_show_header_lines",
+        tag_name,
+        git_odb.tag_show_header_lines,
+        git_show_header,
+        tag_name,
+    )
+    check("read_object", tag_name, odb_cat_file, git_cat_file, tag_name)
+print("Checked %d tags." % len(all_tags))
+
+for rev in ("a605403", "no-such-rev"):
+    check("commit_subject", rev, git_odb.commit_subject, git_commit_subject, rev)
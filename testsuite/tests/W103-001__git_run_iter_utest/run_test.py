@@ -0,0 +1,39 @@
+def test_git_run_iter(testcase):
+    """Unit test the _iter and _iter_sep parameters of git_run."""
+    p = testcase.run(
+        ["git", "commit", "-q", "--allow-empty", "--allow-empty-message", "-m", ""],
+        env={
+            "GIT_AUTHOR_DATE": "1340722274 -0700",
+            "GIT_COMMITTER_DATE": "1340722274 -0700",
+            "GIT_COMMITTER_NAME": "hooks tester",
+            "GIT_COMMITTER_EMAIL": "hooks-tester@example.com",
+        },
+    )
+    assert p.status == 0, p.image
+
+    testcase.run_unit_test_script(
+        cwd=testcase.repo_dir,
+        expected_out="""\
+DEBUG: Iterate over lines...
+1f80c9cd9b47771a44c00a8679185e05430390a0
+a60540361d47901d3fe254271779f380d94645f7
+d065089ff184d97934c010ccd0e7e8ed94cb7165
+DEBUG: Iterate over lines, without decoding...
+b'1f80c9c '
+b'a605403 Updated a.'
+DEBUG: Iterate over NUL-separated records...
+'100644 blob a90d85104b3899fcb497e60f077341baedab2d15\\ta'
+DEBUG: Iterate with some input...
+2
+DEBUG: Iterate over the output of a command which fails...
+returncode = 128
+fatal: ambiguous argument 'no-such-rev': unknown revision or path not in the working tree.
+DEBUG: Stop iterating early...
+a35368a65979ab3b8ba20de51a1b145baa0dad68
+DEBUG: iter_diff_tree...
+('100644', '100644', '01d0f124f86599aac247a7471aa98a583ecd027e', 'a90d85104b3899fcb497e60f077341baedab2d15', 'M', 'a')
+DEBUG: commit_info_list with an empty subject...
+Joel Brobecker 'Updated a.' 1
+hooks tester '' 1
+""",
+    )
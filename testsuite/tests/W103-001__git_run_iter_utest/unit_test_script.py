@@ -0,0 +1,43 @@
+from git import git, iter_diff_tree, CalledProcessError
+from updates.commits import commit_info_list
+
+print("DEBUG: Iterate over lines...")
+for line in git.rev_list("master", _iter=True, _decode=True):
+    print(line)
+
+print("DEBUG: Iterate over lines, without decoding...")
+for line in git.rev_list("-n2", "master", oneline=True, _iter=True):
+    print(line)
+
+print("DEBUG: Iterate over NUL-separated records...")
+for record in git.ls_tree("-r", "-z", "master", _iter_sep=b"\0", _decode=True):
+    print(repr(record))
+
+print("DEBUG: Iterate with some input...")
+revs = git.rev_list(
+    "--stdin", "--no-walk", _input="d065089\n" * 20000 + "a605403\n", _iter=True
+)
+print(len(list(revs)))
+
+print("DEBUG: Iterate over the output of a command which fails...")
+records = git.rev_list("no-such-rev", _iter=True, _decode=True)
+try:
+    for record in records:
+        print(record)
+    print("Error: no exception raised")
+except CalledProcessError as E:
+    print("returncode = %d" % E.returncode)
+    print(E.output.decode().splitlines()[0])
+
+print("DEBUG: Stop iterating early...")
+records = git.rev_list("--all", "--objects", _iter=True, _decode=True)
+print(next(records))
+records.close()
+
+print("DEBUG: iter_diff_tree...")
+for entry in iter_diff_tree("-r", "a605403"):
+    print(entry)
+
+print("DEBUG: commit_info_list with an empty subject...")
+for commit in commit_info_list("-2", "master"):
+    print("%s %r %s" % (commit.author_name, commit.subject, len(commit.parent_revs)))
@@ -0,0 +1,30 @@
+def test_git_parsers(testcase):
+    """Unit test the git_parsers module."""
+    testcase.run_unit_test_script(
+        expected_out="""\
+DEBUG: parse_diff_tree...
+('100644', '100644', '1111111', '2222222', 'M', 'a')
+('000000', '100644', '0000000', '3333333', 'A', 'dir/new file\\twith tab')
+('100644', '100644', '4444444', '5555555', 'R086', 'new-name')
+('100644', '000000', '6666666', '0000000', 'D', 'b')
+(b'100644', b'100644', b'1111111', b'2222222', b'M', b'a')
+GitOutputParseError: truncated output while reading diff-tree entry
+GitOutputParseError: invalid diff-tree entry: ':100644 M'
+DEBUG: parse_rev_list...
+(b'a605403', [b'd065089', b'Joel Brobecker', b'brobecker@adacore.com', b'Updated a.'])
+(b'd065089', [b'', b'Joel Brobecker', b'brobecker@adacore.com', b''])
+GitOutputParseError: truncated output while reading rev-list entry
+GitOutputParseError: invalid rev-list entry: 'a605403'
+DEBUG: parse_check_attr...
+('src/a', 'no-precommit-check', 'unspecified')
+('src/b c', 'whatever', 'set')
+GitOutputParseError: truncated output while reading check-attr entry
+DEBUG: parse_config_list...
+('hooks.from-domain', 'adacore.com')
+('hooks.mailinglist', 'first@example.com\\nsecond@example.com')
+('hooks.no-value', None)
+('hooks.empty-value', '')
+(b'hooks.no-value', None)
+(b'hooks.debug-level', b'1')
+""",
+    )
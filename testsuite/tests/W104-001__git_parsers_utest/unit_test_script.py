@@ -0,0 +1,77 @@
+from git_parsers import (
+    GitOutputParseError,
+    parse_check_attr,
+    parse_config_list,
+    parse_diff_tree,
+    parse_rev_list,
+)
+
+
+def print_parse(parser, records, *args):
+    try:
+        for entry in parser(iter(records), *args):
+            print(entry)
+    except GitOutputParseError as E:
+        print("GitOutputParseError: %s" % E)
+
+
+print("DEBUG: parse_diff_tree...")
+print_parse(
+    parse_diff_tree,
+    [
+        "a605403",
+        ":100644 100644 1111111 2222222 M",
+        "a",
+        ":000000 100644 0000000 3333333 A",
+        "dir/new file\twith tab",
+        ":100644 100644 4444444 5555555 R086",
+        "old-name",
+        "new-name",
+        "d065089",
+        ":100644 000000 6666666 0000000 D",
+        "b",
+    ],
+)
+print_parse(parse_diff_tree, [b":100644 100644 1111111 2222222 M", b"a"])
+print_parse(parse_diff_tree, [])
+print_parse(parse_diff_tree, [":100644 100644 1111111 2222222 M"])
+print_parse(parse_diff_tree, [":100644 M", "a"])
+
+print("DEBUG: parse_rev_list...")
+print_parse(
+    parse_rev_list,
+    [
+        b"commit a605403",
+        b"d065089",
+        b"Joel Brobecker",
+        b"brobecker@adacore.com",
+        b"Updated a.",
+        b"commit d065089",
+        b"",
+        b"Joel Brobecker",
+        b"brobecker@adacore.com",
+        b"",
+    ],
+    4,
+)
+print_parse(parse_rev_list, ["commit a605403", "d065089", "Joel"], 4)
+print_parse(parse_rev_list, ["a605403"], 4)
+
+print("DEBUG: parse_check_attr...")
+print_parse(
+    parse_check_attr,
+    ["src/a", "no-precommit-check", "unspecified", "src/b c", "whatever", "set"],
+)
+print_parse(parse_check_attr, ["src/a", "no-precommit-check"])
+
+print("DEBUG: parse_config_list...")
+print_parse(
+    parse_config_list,
+    [
+        "hooks.from-domain\nadacore.com",
+        "hooks.mailinglist\nfirst@example.com\nsecond@example.com",
+        "hooks.no-value",
+        "hooks.empty-value\n",
+    ],
+)
+print_parse(parse_config_list, [b"hooks.no-value", b"hooks.debug-level\n1"])
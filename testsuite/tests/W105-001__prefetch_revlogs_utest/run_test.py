@@ -0,0 +1,39 @@
+def test_prefetch_raw_revlogs(testcase):
+    """Unit test updates.commits.prefetch_raw_revlogs."""
+    for msg in (
+        "",
+        "Subject only",
+        "Subject\n\nFirst paragraph.\n\n    indented line   \n\n\n",
+        'Revert "Updated a."\n\nThis reverts commit a605403.\n\nno-precommit-check',
+    ):
+        p = testcase.run(
+            [
+                "git",
+                "commit",
+                "-q",
+                "--allow-empty",
+                "--allow-empty-message",
+                "--cleanup=verbatim",
+                "-m",
+                msg,
+            ],
+        )
+        assert p.status == 0, p.image
+
+    testcase.run_unit_test_script(
+        cwd=testcase.repo_dir,
+        expected_out="""\
+DEBUG: prefetch_raw_revlogs on an empty list...
+DEBUG: prefetch_raw_revlogs...
+'New file: a.' True
+'Updated a.\\n\\nJust added a little bit of text inside file a.\\nThought about doing something else, but not really necessary.' True
+'' True
+'Subject only' True
+'Subject\\n\\nFirst paragraph.\\n\\n    indented line' True
+'Revert "Updated a."\\n\\nThis reverts commit a605403.\\n\\nno-precommit-check' True
+DEBUG: prefetch_raw_revlogs with duplicate commits...
+True True
+DEBUG: raw_revlog_lines after prefetch...
+['Subject only']
+""",
+    )
@@ -0,0 +1,27 @@
+from updates.commits import commit_info_list, prefetch_raw_revlogs
+
+print("DEBUG: prefetch_raw_revlogs on an empty list...")
+prefetch_raw_revlogs([])
+
+print("DEBUG: prefetch_raw_revlogs...")
+prefetched = commit_info_list("master")
+prefetch_raw_revlogs(prefetched)
+# Compare against what we get when computing the revlogs lazily.
+lazy_commits = commit_info_list("master")
+for n, commit in enumerate(prefetched):
+    lazy_revlog = lazy_commits[n].raw_revlog
+    print("%r %s" % (commit.raw_revlog, commit.raw_revlog == lazy_revlog))
+
+print("DEBUG: prefetch_raw_revlogs with duplicate commits...")
+commits = commit_info_list("-1", "master") + commit_info_list("-1", "master")
+prefetch_raw_revlogs(commits)
+print(
+    "%s %s"
+    % (
+        commits[0].raw_revlog == prefetched[-1].raw_revlog,
+        commits[1].raw_revlog == prefetched[-1].raw_revlog,
+    )
+)
+
+print("DEBUG: raw_revlog_lines after prefetch...")
+print(prefetched[3].raw_revlog_lines)
@@ -0,0 +1,52 @@
+def test_diff_tree_batch(testcase):
+    """Unit test iter_diff_tree_batch and updates.commits.prefetch_changes."""
+    # Create a few more commits, to exercise all sorts of changes:
+    # An empty commit, a rename, a file with an unusual name, as well
+    # as a merge commit, and a new root commit. The hooks' configuration
+    # is also needed in our repository, so fetch it first.
+    for cmd in (
+        "git fetch -q origin refs/meta/config:refs/meta/config",
+        "git commit -q --allow-empty -m empty",
+        "git mv a b",
+        "git commit -q -m rename",
+        "git checkout -q -b topic HEAD~2",
+        "printf 'c\\n' > 'tab\tand \"quote\"'",
+        "git add .",
+        "git commit -q -m 'unusual name'",
+        "git checkout -q master",
+        "git merge -q --no-edit topic",
+        "git checkout -q --orphan orphan",
+        "git rm -q -r --cached .",
+        "printf 'root\\n' > root",
+        "git add root",
+        "git commit -q -m root",
+        "git checkout -q -f master",
+    ):
+        p = testcase.run(["bash", "-c", cmd])
+        assert p.status == 0, p.image
+
+    testcase.run_unit_test_script(
+        cwd=testcase.repo_dir,
+        expected_out="""\
+DEBUG: iter_diff_tree_batch with no commit...
+[]
+DEBUG: iter_diff_tree_batch...
+root: ['root'] True
+unusual name: ['tab\\tand "quote"'] True
+Merge branch 'topic': ['tab\\tand "quote"'] True
+rename: ['a', 'b'] True
+empty: [] True
+Updated a.: ['a'] True
+New file: a.: ['a'] True
+DEBUG: iter_diff_tree_batch with an invalid commit...
+GitOutputParseError: unexpected commit in diff-tree output: None (expected 0000000000000000000000000000000000000000)
+DEBUG: prefetch_changes...
+root: ['root'] True
+unusual name: ['tab\\tand "quote"'] True
+Merge branch 'topic': ['tab\\tand "quote"'] True
+rename: ['a', 'b'] True
+empty: [] True
+Updated a.: ['a'] True
+New file: a.: ['a'] True
+""",
+    )
@@ -0,0 +1,60 @@
+from git import git, iter_diff_tree, iter_diff_tree_batch
+from git_parsers import GitOutputParseError
+from updates.commits import commit_info_list, prefetch_changes
+
+
+def expected_changes(commit):
+    """Return the changes made by commit, computed using iter_diff_tree."""
+    return list(iter_diff_tree("-r", commit.base_rev_for_git(), commit.rev))
+
+
+commits = (
+    commit_info_list("--first-parent", "master")
+    + commit_info_list("-1", "topic")
+    + commit_info_list("orphan")
+)
+# Make sure the commits are not in chronological order, so as to verify
+# that the order in which we provide the commits is preserved.
+commits.reverse()
+
+print("DEBUG: iter_diff_tree_batch with no commit...")
+print(list(iter_diff_tree_batch([])))
+
+print("DEBUG: iter_diff_tree_batch...")
+rev_pairs = [(commit.base_rev_for_display(), commit.rev) for commit in commits]
+for n, (rev, changes) in enumerate(iter_diff_tree_batch(rev_pairs)):
+    commit = commits[n]
+    assert rev == commit.rev
+    print(
+        "%s: %s %s"
+        % (
+            commit.subject,
+            [item[5] for item in changes],
+            changes == expected_changes(commit),
+        )
+    )
+
+print("DEBUG: iter_diff_tree_batch with an invalid commit...")
+try:
+    list(iter_diff_tree_batch([(None, commits[0].rev), (None, "0" * 40)]))
+    print("Error: no exception raised")
+except GitOutputParseError as E:
+    # "git diff-tree --stdin" silently ignores the invalid commits,
+    # so it is the missing output for that commit that we detect.
+    print("GitOutputParseError: %s" % E)
+
+print("DEBUG: prefetch_changes...")
+all_expected_changes = [expected_changes(commit) for commit in commits]
+prefetch_changes(commits)
+# Verify that the changes are now cached, by making sure we do not
+# call "git diff-tree" again.
+git.diff_tree = None
+for n, commit in enumerate(commits):
+    print(
+        "%s: %s %s"
+        % (
+            commit.subject,
+            commit.files_changed(),
+            commit.changes() == all_expected_changes[n],
+        )
+    )
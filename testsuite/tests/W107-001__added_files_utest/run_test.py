@@ -0,0 +1,45 @@
+def test_added_files(testcase):
+    """Unit test CommitInfo.added_files."""
+    # Create some commits performing all sorts of changes, so as to
+    # compare the result of CommitInfo.added_files against what
+    # the former implementation (based on the list of all files
+    # in the commit and in its parent) used to return. The hooks'
+    # configuration is also needed in our repository, so fetch it
+    # first.
+    for cmd in (
+        "git fetch -q origin refs/meta/config:refs/meta/config",
+        "mkdir -p src/sub && printf 'x\\n' > src/x && printf 'y\\n' > src/sub/y",
+        "printf 'new\\n' > $'tab\\tand \"quote\" \\303\\251'",
+        "git add . && git commit -q -m 'add files'",
+        "git mv src/x src/renamed && git rm -q a && git commit -q -m rename",
+        "ln -s src/renamed link && git add link && git commit -q -m symlink",
+        "rm link && printf 'l\\n' > link && git add link",
+        "git commit -q -m typechange",
+        "git rm -q link && mkdir link && printf 'z\\n' > link/z && git add link",
+        "git commit -q -m 'file to dir'",
+        "git update-index --add --cacheinfo 160000,$(git rev-parse HEAD),module",
+        "git commit -q -m submodule",
+        "git checkout -q -b topic HEAD~3 && printf 't\\n' > t && git add t",
+        "git commit -q -m topic && git checkout -q master",
+        "git merge -q --no-edit topic",
+        "git commit -q --allow-empty -m empty",
+    ):
+        p = testcase.run(["bash", "-c", cmd])
+        assert p.status == 0, p.image
+
+    testcase.run_unit_test_script(
+        cwd=testcase.repo_dir,
+        expected_out="""\
+New file: a.: ['a'] True
+Updated a.: [] True
+add files: ['src/sub/y', 'src/x', 'tab\\tand "quote" é'] True
+rename: ['src/renamed'] True
+symlink: ['link'] True
+typechange: [] True
+file to dir: ['link/z'] True
+submodule: ['module'] True
+Merge branch 'topic': ['t'] True
+empty: [] True
+topic: ['t'] True
+""",
+    )
@@ -0,0 +1,34 @@
+from git import git
+from io_utils import safe_decode
+from updates.commits import commit_info_list
+
+
+def all_files(rev):
+    """Return the set of all files in the given commit."""
+    if rev is None:
+        return set()
+    return {
+        safe_decode(f)
+        for f in git.ls_tree("--full-tree", "--name-only", "-r", "-z", rev).split(b"\0")
+        if f
+    }
+
+
+def set_difference_added_files(commit):
+    """Compute commit's list of added files the way we used to compute it."""
+    return sorted(all_files(commit.rev) - all_files(commit.base_rev_for_display()))
+
+
+# Use --first-parent, and then add the commit from the topic branch,
+# so as to get an order which does not depend on the commits' dates.
+commits = commit_info_list("--first-parent", "master") + commit_info_list("-1", "topic")
+for commit in commits:
+    added_files = commit.added_files()
+    print(
+        "%s: %s %s"
+        % (
+            commit.subject,
+            added_files,
+            added_files == set_difference_added_files(commit),
+        )
+    )
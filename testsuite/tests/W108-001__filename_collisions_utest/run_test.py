@@ -0,0 +1,64 @@
+def test_filename_collisions(testcase):
+    """Unit test check_filename_collisions and CaseFoldedFilesIndex."""
+    # Create a series of commits, some of which introduce some
+    # filename collisions. The hooks' configuration is also needed
+    # in our repository, so fetch it first.
+    for cmd in (
+        "git fetch -q origin refs/meta/config:refs/meta/config",
+        "git tag base",
+        # A pre-existing collision, which should not cause the commits
+        # that follow to be rejected.
+        "printf 'x\\n' > X && printf 'x\\n' > x && git add X x",
+        "git commit -q -m 'pre-existing collision' && git tag pre-existing",
+        "printf 'r\\n' > README && git add README && git commit -q -m readme",
+        "git mv README readme && git commit -q -m 'rename readme'",
+        "mkdir dir && printf 'f\\n' > dir/File && git add dir",
+        "git commit -q -m 'new file in dir'",
+        "printf 'z\\n' > zz && git add zz && git commit -q -m 'no collision'",
+        "printf 'f\\n' > dir/file && git add dir/file",
+        "printf 'r\\n' > ReadMe && git add ReadMe",
+        "git commit -q -m 'two collisions'",
+        "git checkout -q -b topic pre-existing",
+        "printf 'A\\n' > A && git add A && git commit -q -m 'collision with a'",
+    ):
+        p = testcase.run(["bash", "-c", cmd])
+        assert p.status == 0, p.image
+
+    testcase.run_unit_test_script(
+        cwd=testcase.repo_dir,
+        expected_out="""\
+DEBUG: Linear history, the last commit introducing some collisions...
+*** The following filename collisions have been detected.
+*** These collisions happen when the name of two or more files
+*** differ in casing only (Eg: "hello.txt" and "Hello.txt").
+*** Please re-do your commit, chosing names that do not collide.
+***
+***     Commit: two collisions
+***     Subject: two collisions
+***
+*** The matching files are:
+***
+***     ReadMe
+***     readme
+***
+***     dir/File
+***     dir/file
+DEBUG: Same, without the last commit...
+OK
+DEBUG: Non-linear history...
+*** The following filename collisions have been detected.
+*** These collisions happen when the name of two or more files
+*** differ in casing only (Eg: "hello.txt" and "Hello.txt").
+*** Please re-do your commit, chosing names that do not collide.
+***
+***     Commit: collision with a
+***     Subject: collision with a
+***
+*** The matching files are:
+***
+***     A
+***     a
+DEBUG: Incrementally updated index vs index of all files...
+master: True
+""",
+    )
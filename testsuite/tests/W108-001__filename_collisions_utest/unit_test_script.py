@@ -0,0 +1,46 @@
+from errors import InvalidUpdate
+from pre_commit_checks import CaseFoldedFilesIndex, check_filename_collisions
+from updates.commits import commit_info_list
+
+
+def check(commit_list):
+    """Call check_filename_collisions, and print the outcome."""
+    try:
+        check_filename_collisions(commit_list)
+        print("OK")
+    except InvalidUpdate as E:
+        for line in E.args:
+            for rev, subject in revs_map.items():
+                line = line.replace(rev, subject)
+            print(("*** %s" % line).rstrip())
+
+
+commits = commit_info_list("pre-existing..master")
+topic_commits = commit_info_list("pre-existing..topic")
+# Use the commits' subject rather than their SHA1 in the output,
+# so as to make it independent of the commits' SHA1.
+revs_map = {commit.rev: commit.subject for commit in commits + topic_commits}
+
+print("DEBUG: Linear history, the last commit introducing some collisions...")
+check(commits)
+
+print("DEBUG: Same, without the last commit...")
+check(commits[:-1])
+
+print("DEBUG: Non-linear history...")
+check(commits[:-1] + topic_commits)
+
+print("DEBUG: Incrementally updated index vs index of all files...")
+index = CaseFoldedFilesIndex(commits[0])
+for commit in commits[1:]:
+    index.update(commit)
+all_files = commits[-1].all_files()
+print(
+    "master: %s"
+    % (
+        sorted(sorted(c) for c in index.collisions(all_files))
+        == sorted(
+            sorted(c) for c in CaseFoldedFilesIndex(commits[-1]).collisions(all_files)
+        )
+    )
+)
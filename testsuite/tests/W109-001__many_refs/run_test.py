@@ -0,0 +1,83 @@
+import os
+
+
+def test_push_with_many_refs(testcase):
+    """Push a commit on master in a repository with a large number of refs."""
+    # Push the new commit to a Gerrit-internal reference, which
+    # should be ignored by the hooks (hooks.ignore-refs), and thus
+    # should not prevent this commit from being considered new
+    # when we push it to master later on.
+    p = testcase.run("git push origin master:refs/changes/01/1/1".split())
+    testcase.assertEqual(p.status, 0, p.image)
+
+    # Create 50,000 branches in the remote repository, all pointing
+    # to the current master, plus a few Gerrit-internal references
+    # pointing to the new commit. Passing all these references
+    # to "git rev-list" via its command line would exceed the system's
+    # limit on the size of the arguments.
+    #
+    # Write the references directly in the packed-refs file,
+    # as this is much faster than creating them using git.
+    p = testcase.run(
+        ["git", "rev-parse", "master", "refs/changes/01/1/1"],
+        cwd=testcase.bare_repo_dir,
+    )
+    testcase.assertEqual(p.status, 0, p.image)
+    master_rev, change_rev = p.out.split()
+    with open(os.path.join(testcase.bare_repo_dir, "packed-refs"), "a") as f:
+        if f.tell() == 0:
+            f.write("# pack-refs with: peeled fully-peeled \n")
+        for n in range(50000):
+            f.write("%s refs/heads/many/branch-%05d\n" % (master_rev, n))
+        for n in range(2, 10):
+            f.write("%s refs/changes/%02d/%d/1\n" % (change_rev, n, n))
+
+    # Push master to the `origin' remote.  The delta should be one
+    # commit with one file being modified.
+    p = testcase.run("git push origin master".split())
+    expected_out = """\
+remote: *** cvs_check: `repo' < `a'
+remote: DEBUG: Content-Type: text/plain; charset="utf-8"
+remote: MIME-Version: 1.0
+remote: Content-Transfer-Encoding: quoted-printable
+remote: From: Test Suite <testsuite@adacore.com>
+remote: To: git-hooks-ci@example.com
+remote: Bcc: filer@example.com
+remote: Subject: [repo] Updated a.
+remote: X-Act-Checkin: repo
+remote: X-Git-Author: Joel Brobecker <brobecker@adacore.com>
+remote: X-Git-Refname: refs/heads/master
+remote: X-Git-Oldrev: d065089ff184d97934c010ccd0e7e8ed94cb7165
+remote: X-Git-Newrev: a60540361d47901d3fe254271779f380d94645f7
+remote:
+remote: commit a60540361d47901d3fe254271779f380d94645f7
+remote: Author: Joel Brobecker <brobecker@adacore.com>
+remote: Date:   Fri Apr 27 13:08:29 2012 -0700
+remote:
+remote:     Updated a.
+remote:
+remote:     Just added a little bit of text inside file a.
+remote:     Thought about doing something else, but not really necessary.
+remote:
+remote: Diff:
+remote: ---
+remote:  a | 4 +++-
+remote:  1 file changed, 3 insertions(+), 1 deletion(-)
+remote:
+remote: diff --git a/a b/a
+remote: index 01d0f12..a90d851 100644
+remote: --- a/a
+remote: +++ b/a
+remote: @@ -1,3 +1,5 @@
+remote:  Some file.
+remote: -Second line.
+remote: +Second line, in the middle.
+remote: +In the middle too!
+remote:  Third line.
+remote: +
+To ../bare/repo.git
+   d065089..a605403  master -> master
+"""
+
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
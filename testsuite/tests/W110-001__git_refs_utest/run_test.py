@@ -0,0 +1,48 @@
+def test_git_refs(testcase):
+    """Unit test the git_refs module."""
+    testcase.run_unit_test_script(
+        expected_out="""\
+DEBUG: literal_prefix...
+'refs/changes/.*' -> 'refs/changes/'
+'^refs/users/' -> 'refs/users/'
+'refs/cache-automerge/.*' -> 'refs/cache-automerge/'
+'refs/heads/.*/private' -> None
+'refs/heads/release-[0-9]+' -> None
+'refs/meta\\\\.old/.*' -> None
+'.*' -> None
+DEBUG: Repository with loose references only...
+loose []: 2 refs, True
+loose ['refs/changes/']: 2 refs, True
+loose ['refs/changes/', 'refs/users/', 'refs/tags/']: 2 refs, True
+loose ['refs/heads/many/branch-00']: 2 refs, True
+loose ['refs/heads/m', 'refs/z']: 1 refs, True
+DEBUG: Repository with packed references only...
+packed []: 412 refs, True
+packed ['refs/changes/']: 212 refs, True
+packed ['refs/changes/', 'refs/users/', 'refs/tags/']: 102 refs, True
+packed ['refs/heads/many/branch-00']: 402 refs, True
+packed ['refs/heads/m', 'refs/z']: 311 refs, True
+DEBUG: Repository with packed and loose references...
+packed+loose []: 427 refs, True
+packed+loose ['refs/changes/']: 217 refs, True
+packed+loose ['refs/changes/', 'refs/users/', 'refs/tags/']: 107 refs, True
+packed+loose ['refs/heads/many/branch-00']: 417 refs, True
+packed+loose ['refs/heads/m', 'refs/z']: 321 refs, True
+DEBUG: Repository with unsorted packed references...
+unsorted []: 427 refs, True
+unsorted ['refs/changes/']: 217 refs, True
+unsorted ['refs/changes/', 'refs/users/', 'refs/tags/']: 107 refs, True
+unsorted ['refs/heads/many/branch-00']: 417 refs, True
+unsorted ['refs/heads/m', 'refs/z']: 321 refs, True
+DEBUG: References packed while being read...
+True
+True
+DEBUG: Unsupported situations...
+RefStoreError: unsupported loose reference: b'refs/heads/symbolic'
+438
+True
+RefStoreError: unsupported reference name: b'refs/heads/bad.lock'
+DEBUG: git_show_ref...
+True
+""",
+    )
@@ -0,0 +1,167 @@
+import os
+import random
+
+from git import git, git_show_ref
+import git_refs
+from git_refs import RefStoreError, literal_prefix, read_refs
+
+
+def show_ref(skip_prefixes=()):
+    """Return the references as listed by "git show-ref", minus skip_prefixes."""
+    result = {}
+    for line in git.show_ref(_split_lines=True, _decode=True):
+        rev, ref = line.split(None, 2)
+        if not ref.startswith(tuple(skip_prefixes)):
+            result[ref] = rev
+    return result
+
+
+def check(what):
+    """Compare the result of read_refs with "git show-ref" for various prefixes."""
+    for skip_prefixes in (
+        (),
+        ("refs/changes/",),
+        ("refs/changes/", "refs/users/", "refs/tags/"),
+        ("refs/heads/many/branch-00",),
+        ("refs/heads/m", "refs/z"),
+    ):
+        refs = read_refs(skip_prefixes)
+        expected_refs = show_ref(skip_prefixes)
+        print(
+            "%s %s: %d refs, %s"
+            % (
+                what,
+                list(skip_prefixes),
+                len(refs),
+                list(refs.items()) == list(expected_refs.items()),
+            )
+        )
+
+
+print("DEBUG: literal_prefix...")
+for regex in (
+    "refs/changes/.*",
+    "^refs/users/",
+    "refs/cache-automerge/.*",
+    "refs/heads/.*/private",
+    "refs/heads/release-[0-9]+",
+    r"refs/meta\.old/.*",
+    ".*",
+):
+    print("%r -> %r" % (regex, literal_prefix(regex)))
+
+print("DEBUG: Repository with loose references only...")
+check("loose")
+
+# Create a large number of references, some of which are annotated
+# tags (so as to have some peeled entries in the packed-refs file),
+# and pack them.
+update_ref_input = []
+for n in range(200):
+    update_ref_input.append("create refs/changes/%02d/%d/1 2f5a916\n" % (n % 100, n))
+for n in range(100):
+    update_ref_input.append("create refs/heads/many/branch-%03d d065089\n" % n)
+    update_ref_input.append("create refs/users/%02d/%d d065089\n" % (n % 10, n))
+git.update_ref("--stdin", _input="".join(update_ref_input).encode())
+for n in range(10):
+    git.tag("-m", "tag %d" % n, "annotated-%d" % n, "2f5a916")
+git.pack_refs("--all", "--prune")
+
+print("DEBUG: Repository with packed references only...")
+check("packed")
+
+# Now, create some loose references, some new, and some overriding
+# the packed ones.
+update_ref_input = []
+for n in range(190, 210):
+    update_ref_input.append("update refs/changes/%02d/%d/1 d065089\n" % (n % 100, n))
+for n in range(95, 105):
+    update_ref_input.append("update refs/heads/many/branch-%03d 2f5a916\n" % n)
+update_ref_input.append("delete refs/heads/many/branch-050\n")
+update_ref_input.append("create refs/zzz d065089\n")
+git.update_ref("--stdin", _input="".join(update_ref_input).encode())
+
+print("DEBUG: Repository with packed and loose references...")
+check("packed+loose")
+
+# Rewrite the packed-refs file, in random order, and without
+# the "sorted" trait. We should still be able to read it.
+with open("packed-refs") as f:
+    packed_refs = f.read().splitlines(True)
+entries = []
+for line in packed_refs[1:]:
+    if line.startswith("^"):
+        entries[-1] += line
+    else:
+        entries.append(line)
+random.seed(1)
+random.shuffle(entries)
+with open("packed-refs", "w") as f:
+    f.write("# pack-refs with: peeled fully-peeled \n")
+    f.write("".join(entries))
+
+print("DEBUG: Repository with unsorted packed references...")
+check("unsorted")
+
+print("DEBUG: References packed while being read...")
+# Pack the references right before the loose ones get read, as a "git gc"
+# running at the same time could do. They should all be found anyway.
+update_ref_input = []
+for n in range(110, 120):
+    update_ref_input.append("update refs/heads/many/branch-%03d 2f5a916\n" % n)
+git.update_ref("--stdin", _input="".join(update_ref_input).encode())
+expected_refs = show_ref()
+real_read_loose_refs = git_refs.read_loose_refs
+
+
+def read_loose_refs_after_pack_refs(*args):
+    git.pack_refs("--all", "--prune")
+    return real_read_loose_refs(*args)
+
+
+git_refs.read_loose_refs = read_loose_refs_after_pack_refs
+print(read_refs() == expected_refs)
+git_refs.read_loose_refs = real_read_loose_refs
+
+# Same, with a loose reference which gets deleted after its directory
+# was listed, but before it was read.
+git.update_ref("refs/heads/many/branch-120", "d065089")
+expected_refs = show_ref()
+real_walk = os.walk
+
+
+def walk_and_pack_refs(top):
+    for (dirpath, dirnames, filenames) in real_walk(top):
+        if b"branch-120" in filenames:
+            git.pack_refs("--all", "--prune")
+        yield (dirpath, dirnames, filenames)
+
+
+os.walk = walk_and_pack_refs
+print(read_refs() == expected_refs)
+os.walk = real_walk
+
+print("DEBUG: Unsupported situations...")
+git.symbolic_ref("refs/heads/symbolic", "refs/heads/master")
+try:
+    read_refs()
+    print("Error: no exception raised")
+except RefStoreError as E:
+    print("RefStoreError: %s" % E)
+# References in the skipped namespaces are not looked at.
+print(len(read_refs(("refs/heads/sym",))))
+# But git_show_ref falls back to using git.
+print(git_show_ref() == show_ref(("refs/changes/", "refs/users/")))
+os.unlink(os.path.join("refs", "heads", "symbolic"))
+
+with open(os.path.join("refs", "heads", "bad.lock"), "w") as f:
+    f.write("2f5a91661d47901d3fe254271779f380d94645f7\n")
+try:
+    read_refs()
+    print("Error: no exception raised")
+except RefStoreError as E:
+    print("RefStoreError: %s" % E)
+os.unlink(os.path.join("refs", "heads", "bad.lock"))
+
+print("DEBUG: git_show_ref...")
+print(git_show_ref() == show_ref(("refs/changes/", "refs/users/")))
@@ -0,0 +1,58 @@
+def test_ref_pattern_matcher(testcase):
+    """Unit test the RefPatternMatcher class."""
+    testcase.run_unit_test_script(
+        expected_out="""\
+DEBUG: RefPatternMatcher...
+simple: combined=True, same_results=True
+  'refs/heads/master' -> 'refs/heads/master'
+  'refs/heads/master2' -> 'refs/heads/.*'
+  'refs/heads/release-1' -> 'refs/heads/release-[0-9]+'
+  'refs/heads/release-12' -> 'refs/heads/release-[0-9]+'
+  'refs/heads/release-x' -> 'refs/heads/.*'
+  'refs/heads/fsf/master' -> 'refs/heads/(release|fsf)/.*'
+  'refs/heads/user/private' -> 'refs/heads/.*/private'
+  'refs/heads/ab' -> 'refs/heads/.*'
+  'refs/tags/v1.0' -> 'refs/tags/.*'
+  'refs/tags/V1.0' -> 'refs/tags/.*'
+  'refs/notes/commits' -> None
+  'refs/changes/01/1/1' -> None
+  'refs/meta/config' -> None
+  'refs/vendor/x/heads/y' -> None
+  '' -> None
+empty: combined=False, same_results=True
+alternatives: combined=True, same_results=True
+nested groups: combined=True, same_results=True
+named groups: combined=True, same_results=True
+anchors: combined=True, same_results=True
+back-references: combined=False, same_results=True
+inline flags: combined=False, same_results=True
+duplicated group names: combined=False, same_results=True
+DEBUG: Invalid pattern only raises an error when used...
+refs/heads/.*
+re.error
+DEBUG: ref_pattern_matcher...
+True
+False
+DEBUG: search_config_option_list...
+  refs/changes/01/1/1: 'refs/changes/.*' None
+  refs/users/joe: 'refs/users/.*' None
+  refs/heads/master: None None
+  refs/meta/config: None None
+DEBUG: get_ref_kind...
+  'refs/heads/master' -> RefKind.branch_ref
+  'refs/heads/master2' -> RefKind.branch_ref
+  'refs/heads/release-1' -> RefKind.branch_ref
+  'refs/heads/release-12' -> RefKind.branch_ref
+  'refs/heads/release-x' -> RefKind.branch_ref
+  'refs/heads/fsf/master' -> RefKind.branch_ref
+  'refs/heads/user/private' -> RefKind.branch_ref
+  'refs/heads/ab' -> RefKind.branch_ref
+  'refs/tags/v1.0' -> RefKind.tag_ref
+  'refs/tags/V1.0' -> RefKind.tag_ref
+  'refs/notes/commits' -> RefKind.notes_ref
+  'refs/changes/01/1/1' -> None
+  'refs/meta/config' -> RefKind.branch_ref
+  'refs/vendor/x/heads/y' -> None
+  '' -> None
+""",
+    )
@@ -0,0 +1,107 @@
+import re
+
+from updates.factory import get_ref_kind
+from utils import RefPatternMatcher, ref_pattern_matcher, search_config_option_list
+
+
+def search_one_at_a_time(patterns, ref_name):
+    """Return the first of the given patterns matching all of ref_name."""
+    for pattern in patterns:
+        if re.fullmatch(pattern.strip(), ref_name) is not None:
+            return pattern.strip()
+    return None
+
+
+REF_NAMES = (
+    "refs/heads/master",
+    "refs/heads/master2",
+    "refs/heads/release-1",
+    "refs/heads/release-12",
+    "refs/heads/release-x",
+    "refs/heads/fsf/master",
+    "refs/heads/user/private",
+    "refs/heads/ab",
+    "refs/tags/v1.0",
+    "refs/tags/V1.0",
+    "refs/notes/commits",
+    "refs/changes/01/1/1",
+    "refs/meta/config",
+    "refs/vendor/x/heads/y",
+    "",
+)
+
+
+def check(what, patterns):
+    """Compare a RefPatternMatcher with matching each pattern one at a time."""
+    matcher = RefPatternMatcher(patterns)
+    print(
+        "%s: combined=%s, same_results=%s"
+        % (
+            what,
+            matcher.combined_re is not None,
+            all(
+                matcher.search(ref_name) == search_one_at_a_time(patterns, ref_name)
+                for ref_name in REF_NAMES + REF_NAMES
+            ),
+        )
+    )
+    return matcher
+
+
+print("DEBUG: RefPatternMatcher...")
+matcher = check(
+    "simple",
+    (
+        " refs/heads/master ",
+        "refs/heads/release-[0-9]+",
+        r"refs/heads/(release|fsf)/.*",
+        "refs/heads/.*/private",
+        "refs/heads/.*",
+        "refs/tags/.*",
+    ),
+)
+for ref_name in REF_NAMES:
+    print("  %r -> %r" % (ref_name, matcher.search(ref_name)))
+check("empty", ())
+check("alternatives", ("refs/heads/a|refs/heads/ab", "refs/heads/(a|ab)"))
+check("nested groups", ("((refs)/(heads))/(.*)/private", "(refs/)(tags/)(.*)"))
+check(
+    "named groups",
+    (r"refs/(?P<kind>heads)/master2", r"refs/(?P<ns>[^/]*)/(?P=ns)/.*", ".*(?=1)1"),
+)
+check("anchors", ("^refs/heads/master$", "refs/tags/.*$", "^$"))
+check("back-references", (r"refs/(heads)/\1", r"refs/(?:tags)/(.)(\.)[0-9]"))
+check("inline flags", ("(?i)refs/tags/v.*", "refs/notes/.*"))
+check("duplicated group names", ("refs/(?P<x>heads)/.*", "refs/(?P<x>tags)/.*"))
+
+print("DEBUG: Invalid pattern only raises an error when used...")
+matcher = RefPatternMatcher(("refs/heads/.*", "refs/tags/("))
+print(matcher.search("refs/heads/master"))
+try:
+    matcher.search("refs/tags/v1.0")
+except re.error:
+    print("re.error")
+
+print("DEBUG: ref_pattern_matcher...")
+print(ref_pattern_matcher(("a", "b")) is ref_pattern_matcher(("a", "b")))
+print(ref_pattern_matcher(("a", "b")) is ref_pattern_matcher(("b", "a")))
+
+print("DEBUG: search_config_option_list...")
+for ref_name in (
+    "refs/changes/01/1/1",
+    "refs/users/joe",
+    "refs/heads/master",
+    "refs/meta/config",
+):
+    print(
+        "  %s: %r %r"
+        % (
+            ref_name,
+            search_config_option_list("hooks.ignore-refs", ref_name),
+            search_config_option_list("hooks.no-emails", ref_name),
+        )
+    )
+
+print("DEBUG: get_ref_kind...")
+for ref_name in REF_NAMES:
+    print("  %r -> %s" % (ref_name, get_ref_kind(ref_name)))
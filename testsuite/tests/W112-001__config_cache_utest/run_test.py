@@ -0,0 +1,41 @@
+def test_config_cache(testcase):
+    """Unit test the config cache and the config file parser."""
+    testcase.run_unit_test_script(
+        expected_out="""\
+DEBUG: parse_config_file...
+[b'hooks.from-domain\\nadacore.com']: True
+[b'hooks.from-domain\\na']: True
+[b'hooks.Sub"Section.key\\n  quoted; # value   unquoted']: True
+[b'hooks.old.key', b'hooks.flag', b'hooks.other\\na   b\\tc\\n\\\\"']: True
+[b'key\\nno section', b'a.k\\n1 [b]']: True
+[b'hooks.mailinglist\\na@example.com, b@example.com']: True
+[b'hooks.k\\n\\xe9t\\xe9']: True
+None: True
+None: True
+None: True
+None: True
+None: True
+None: True
+random inputs: 0 mismatches
+DEBUG: Config cache...
+None
+adacore.com
+['config', 'key'] adacore.com
+100
+True
+cached.example.com
+True
+adacore.com
+adacore.com
+adacore.com
+42
+DEBUG: Update of the config ref...
+example.com
+12
+('refs/notes/review', 'refs/heads/a', ' refs/heads/b')
+12 two
+InvalidUpdate: Invalid hooks.debug-level value: two (must be integer)
+DEBUG: Invalid config file...
+CalledProcessError
+""",
+    )
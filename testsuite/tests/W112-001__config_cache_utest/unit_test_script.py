@@ -0,0 +1,157 @@
+import json
+import os
+import random
+import subprocess
+
+import config
+from git import git
+from git_config_file import ConfigFileParseError, parse_config_file
+from init import init_all_globals
+
+
+def git_config_file(contents):
+    """Return the records of "git config -z -l" for the given config file.
+
+    Return None if git rejects the file.
+    """
+    with open("tmp.config", "wb") as f:
+        f.write(contents)
+    try:
+        p = subprocess.run(
+            ["git", "config", "-z", "-l", "--file", "tmp.config"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+    finally:
+        os.unlink("tmp.config")
+    if p.returncode != 0:
+        return None
+    return p.stdout.split(b"\0")[:-1]
+
+
+def native_config_file(contents):
+    """Same as git_config_file, but using our parser."""
+    try:
+        return parse_config_file(contents)
+    except ConfigFileParseError:
+        return None
+
+
+def make_config_commit(cfg_contents):
+    """Create a commit with the given project.config, and return its SHA1."""
+    blob = git.hash_object("-w", "--stdin", _input=cfg_contents, _decode=True)
+    tree = git.mktree(
+        _input=b"100644 blob %s\tproject.config\n" % blob.encode(), _decode=True
+    )
+    return git.commit_tree(tree, "-m", "new config", _decode=True)
+
+
+def read_cache():
+    """Return the contents of the config cache, or None if it does not exist."""
+    if not os.path.exists(config.CONFIG_CACHE_FILENAME):
+        return None
+    with open(config.CONFIG_CACHE_FILENAME) as f:
+        return json.load(f)
+
+
+print("DEBUG: parse_config_file...")
+for contents in (
+    b"[hooks]\n\tfrom-domain = adacore.com\n",
+    b"\xef\xbb\xbf[Hooks]\r\n  From-Domain=a ; comment\r\n",
+    b'[hooks "Sub\\"Section"]\n\tkey = "  quoted; # value  " unquoted\n',
+    b'[hooks.Old]\nkey\n[hooks]\tflag\nother = a \\\n  b\\tc\\n\\\\\\"\n',
+    b"key = no section\n[a]k=1 [b]",
+    b"[hooks] mailinglist = a@example.com, b@example.com # comment\n",
+    b"[hooks]\nk = \xe9t\xe9\n",
+    b"[hooks]\nk = \\x\n",
+    b'[hooks]\nk = "unterminated\n',
+    b"[hooks\n",
+    b"[]\nk = 1\n",
+    b"[hooks]\nk_1 = 1\n",
+    b"[hooks]\n1k = 1\n",
+):
+    expected = git_config_file(contents)
+    print("%r: %s" % (expected, native_config_file(contents) == expected))
+
+# Also compare our parser with git on random inputs, built using
+# a vocabulary exercising the various corners of the file format.
+VOCABULARY = [bytes([c]) for c in b'[]"\\\n\r \t=#;aK-_.1nt'] + [
+    b"\xc3\xa9",
+    b"[hooks]\n",
+    b"k = v\n",
+    b'[s "x"]\n',
+]
+random.seed(0)
+nb_errors = 0
+for _ in range(500):
+    contents = b"".join(random.choice(VOCABULARY) for _ in range(random.randint(0, 25)))
+    if native_config_file(contents) != git_config_file(contents):
+        nb_errors += 1
+        print("mismatch: %r" % contents)
+print("random inputs: %d mismatches" % nb_errors)
+
+print("DEBUG: Config cache...")
+print(read_cache())
+print(config.git_config("hooks.from-domain"))
+cache = read_cache()
+print(sorted(cache.keys()), cache["config"]["hooks.from-domain"])
+print(cache["config"]["hooks.max-commit-emails"])
+print(cache["config"]["hooks.ignore-refs"] == list(config.GERRIT_INTERNAL_REFS))
+
+# Modify the cache, and verify that its contents is used.
+cache["config"]["hooks.from-domain"] = "cached.example.com"
+with open(config.CONFIG_CACHE_FILENAME, "w") as f:
+    json.dump(cache, f)
+config.initialize_git_config_map()
+print(config.git_config("hooks.from-domain"))
+print(config.git_config("hooks.ignore-refs") == config.GERRIT_INTERNAL_REFS)
+
+# A corrupted cache is simply ignored (and then replaced).
+with open(config.CONFIG_CACHE_FILENAME, "w") as f:
+    f.write("{corrupted")
+config.initialize_git_config_map()
+print(config.git_config("hooks.from-domain"))
+print(read_cache()["config"]["hooks.from-domain"])
+
+# So is the cache of a different version of the hooks' options.
+config.GIT_CONFIG_OPTS["hooks.max-commit-emails"]["default"] = 42
+cache = read_cache()
+cache["config"]["hooks.from-domain"] = "cached.example.com"
+with open(config.CONFIG_CACHE_FILENAME, "w") as f:
+    json.dump(cache, f)
+config.initialize_git_config_map()
+print(config.git_config("hooks.from-domain"))
+print(config.git_config("hooks.max-commit-emails"))
+
+print("DEBUG: Update of the config ref...")
+new_config_commit = make_config_commit(
+    b"[hooks]\n"
+    b"\tfrom-domain = example.com\n"
+    b"\tmax-commit-emails = 12\n"
+    b"\tdebug-level = two\n"
+    b"\tno-emails = refs/heads/a, refs/heads/b\n"
+)
+init_all_globals(
+    {
+        config.CONFIG_REF: (
+            git.rev_parse(config.CONFIG_REF, _decode=True),
+            new_config_commit,
+        )
+    }
+)
+print(config.git_config("hooks.from-domain"))
+print(config.git_config("hooks.max-commit-emails"))
+print(config.git_config("hooks.no-emails"))
+cache = read_cache()
+print(cache["config"]["hooks.max-commit-emails"], cache["config"]["hooks.debug-level"])
+try:
+    config.git_config("hooks.debug-level")
+except config.InvalidUpdate as E:
+    print("InvalidUpdate: %s" % E)
+
+print("DEBUG: Invalid config file...")
+config.config_commit = make_config_commit(b"[hooks\n")
+try:
+    config.git_config("hooks.from-domain")
+except subprocess.CalledProcessError:
+    print("CalledProcessError")
@@ -0,0 +1,162 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+
+def start_server(testcase, socket_path, log_file):
+    """Start the git-hooks server, and wait until it is ready.
+
+    Return the server's Popen object.
+    """
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            # Have Python report every module it imports on stderr.
+            # In the processes the server forks, stderr is the client's,
+            # so any module which the server did not preload shows up
+            # in the output of the hooks (see check_no_imports).
+            "-X",
+            "importtime",
+            os.path.join(testcase.hooks_src_dir, "server.py"),
+            "--socket",
+            socket_path,
+            "--log-file",
+            log_file,
+        ]
+    )
+    for _ in range(500):
+        if os.path.exists(socket_path):
+            break
+        time.sleep(0.01)
+    return server
+
+
+def stop_server(server):
+    """Stop the given server, and return its exit status."""
+    server.terminate()
+    return server.wait(timeout=30)
+
+
+def check_no_imports(testcase, p):
+    """Verify that the hooks did not import any module.
+
+    PARAMETERS
+        testcase: The testcase.
+        p: The result of running the hooks via the server (as
+            returned by testcase.run), the server being started
+            by start_server.
+    """
+    imports = [line for line in p.out.splitlines() if "import time:" in line]
+    testcase.assertEqual(imports, [], p.image)
+
+
+def scripts_run_by_server(log_file):
+    """Return the list of scripts that the server ran, according to its log."""
+    with open(log_file) as f:
+        return [
+            line.split()[3].rstrip(":")
+            for line in f
+            if line.split()[4:6] == ["started", "process"]
+        ]
+
+
+def test_hooks_server(testcase):
+    """Push a commit with the git-hooks server running."""
+    socket_path = os.path.join(testcase.work_dir, "server.sock")
+    log_file = os.path.join(testcase.work_dir, "server.log")
+    client = os.path.join(testcase.hooks_src_dir, "server_client.py")
+    env = {"GIT_HOOKS_SERVER_SOCKET": socket_path}
+
+    server = start_server(testcase, socket_path, log_file)
+    try:
+        # Push master to the `origin' remote. The output should be
+        # exactly the same as when not using the server.
+        p = testcase.run("git push origin master".split(), env=env)
+        check_no_imports(testcase, p)
+        expected_out = """\
+remote: *** cvs_check: `repo' < `a'
+remote: DEBUG: Content-Type: text/plain; charset="utf-8"
+remote: MIME-Version: 1.0
+remote: Content-Transfer-Encoding: quoted-printable
+remote: From: Test Suite <testsuite@adacore.com>
+remote: To: git-hooks-ci@example.com
+remote: Bcc: filer@example.com
+remote: Subject: [repo] Updated a.
+remote: X-Act-Checkin: repo
+remote: X-Git-Author: Joel Brobecker <brobecker@adacore.com>
+remote: X-Git-Refname: refs/heads/master
+remote: X-Git-Oldrev: d065089ff184d97934c010ccd0e7e8ed94cb7165
+remote: X-Git-Newrev: a60540361d47901d3fe254271779f380d94645f7
+remote:
+remote: commit a60540361d47901d3fe254271779f380d94645f7
+remote: Author: Joel Brobecker <brobecker@adacore.com>
+remote: Date:   Fri Apr 27 13:08:29 2012 -0700
+remote:
+remote:     Updated a.
+remote:
+remote:     Just added a little bit of text inside file a.
+remote:     Thought about doing something else, but not really necessary.
+remote:
+remote: Diff:
+remote: ---
+remote:  a | 4 +++-
+remote:  1 file changed, 3 insertions(+), 1 deletion(-)
+remote:
+remote: diff --git a/a b/a
+remote: index 01d0f12..a90d851 100644
+remote: --- a/a
+remote: +++ b/a
+remote: @@ -1,3 +1,5 @@
+remote:  Some file.
+remote: -Second line.
+remote: +Second line, in the middle.
+remote: +In the middle too!
+remote:  Third line.
+remote: +
+To ../bare/repo.git
+   d065089..a605403  master -> master
+"""
+
+        testcase.assertEqual(p.status, 0, p.image)
+        testcase.assertRunOutputEqual(p, expected_out)
+
+        # Also verify that the exit status of the hooks is forwarded
+        # correctly, using a call with missing arguments.
+        p = testcase.run([sys.executable, client, "update.py"], env=env)
+        check_no_imports(testcase, p)
+        expected_out = """\
+usage: update.py [-h] ref_name old_rev new_rev
+update.py: error: the following arguments are required: ref_name, old_rev, new_rev
+"""
+        testcase.assertEqual(p.status, 2, p.image)
+        testcase.assertRunOutputEqual(p, expected_out)
+    finally:
+        status = stop_server(server)
+        testcase.assertEqual(status, 0, "server exit status: %d" % status)
+
+    with open(log_file) as f:
+        server_log = f.read()
+    testcase.assertEqual(
+        scripts_run_by_server(log_file),
+        ["pre_receive.py", "update.py", "post_receive.py", "update.py"],
+        server_log,
+    )
+    testcase.assertEqual(os.path.exists(socket_path), False, server_log)
+    # The server warms its caches for each request (see Server.warm_caches).
+    testcase.assertEqual("cannot warm caches" in server_log, False, server_log)
+
+    # Now that the server is gone, verify that the client runs
+    # the script itself, including when the socket is still there.
+    p = testcase.run([sys.executable, client, "update.py"], env=env)
+    testcase.assertEqual(p.status, 2, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+
+    stale_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale_socket.bind(socket_path)
+    stale_socket.close()
+    p = testcase.run([sys.executable, client, "update.py"], env=env)
+    testcase.assertEqual(p.status, 2, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+    os.unlink(socket_path)
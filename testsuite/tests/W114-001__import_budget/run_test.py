@@ -0,0 +1,92 @@
+import re
+import sys
+
+# The modules which the hooks' entry points should not import
+# at startup, because they are expensive to import, and only
+# needed on some specific code paths.
+FORBIDDEN_MODULES_RE = re.compile(
+    r"email(\..*)?"  # Only needed when actually sending emails.
+    r"|hashlib"
+    r"|updates\.(branches|notes|tags)(\..*)?"  # See REF_CHANGE_MAP.
+)
+
+# The maximum number of modules which each of the hooks' entry points
+# may import at startup (including the modules from the standard library).
+# This is a budget which does not depend on the load of the machine,
+# unlike the time it takes to import those modules. These numbers
+# leave some room for the differences between the versions of Python
+# (at the time of writing, the entry points import 30, 51 and 53 modules
+# respectively, with Python 3.11).
+MAX_IMPORTED_MODULES = {
+    "pre_receive": 45,
+    "update": 75,
+    "post_receive": 80,
+}
+
+# A regular expression matching the lines printed by python
+# when using "-X importtime" (self time, cumulative time,
+# and module name).
+IMPORT_TIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def imported_modules(testcase, module_name):
+    """Return the modules imported when importing the given module.
+
+    RETURN VALUE
+        A list with the names of the modules imported by module_name
+        (including itself). Modules which were already imported
+        before module_name (Eg: by the site module) are not included.
+
+    REMARKS
+        The time it takes to import each module is deliberately
+        not checked, as it depends too much on the load of the machine.
+    """
+    env = {"PYTHONPATH": testcase.hooks_src_dir}
+    cmd = [sys.executable, "-X", "importtime", "-c", "import %s" % module_name]
+    p = testcase.run(cmd, cwd=testcase.bare_repo_dir, env=env)
+    testcase.assertEqual(p.status, 0, p.image)
+
+    # Python prints the modules imported by a given module before
+    # that module, with a larger indentation.
+    result = []
+    imported = []
+    for line in p.out.splitlines():
+        m = IMPORT_TIME_RE.match(line)
+        if m is None:
+            continue
+        imported.append(m.group(4))
+        if not m.group(3):
+            if m.group(4) == module_name:
+                result.extend(imported)
+            imported = []
+    return result
+
+
+def test_import_budget(testcase):
+    """Verify the modules imported by the hooks' entry points."""
+    for (module_name, max_modules) in MAX_IMPORTED_MODULES.items():
+        modules = imported_modules(testcase, module_name)
+        testcase.assertEqual(
+            module_name in modules, True, "%s: module not imported" % module_name
+        )
+
+        forbidden_modules = sorted(
+            name
+            for name in modules
+            if FORBIDDEN_MODULES_RE.fullmatch(name)
+            # The pre-receive hook does not need the updates package at all.
+            or (module_name == "pre_receive" and name.startswith("updates"))
+        )
+        testcase.assertEqual(
+            forbidden_modules,
+            [],
+            "%s: unexpected modules imported: %s"
+            % (module_name, ", ".join(forbidden_modules)),
+        )
+
+        testcase.assertEqual(
+            len(modules) <= max_modules,
+            True,
+            "%s: too many modules imported (%d > %d): %s"
+            % (module_name, len(modules), max_modules, ", ".join(modules)),
+        )
@@ -0,0 +1,46 @@
+def test_style_checker_jobs(testcase):
+    """Push commits with style-checking done on several commits at once."""
+    # Push a branch introducing 6 new commits, the third and fifth ones
+    # having some style violations. The checking of the second commit
+    # is artificially slow, so that the commits after it (including
+    # the one with the second violation) get checked first. The error
+    # reported should nevertheless be the one for the third commit,
+    # exactly as if the commits had been checked one after the other.
+    p = testcase.run("git push origin topic".split())
+    expected_out = """\
+remote: *** cvs_check: `repo' < `a'
+remote: *** cvs_check: `repo' < `c'
+remote: *** pre-commit check failed for commit: 09e18398437799f487398ef326fc94d3b298250c
+remote: *** cvs_check: `repo' < `b'
+remote: *** ERROR: b: Copyright year in header is not up to date
+remote: error: hook declined to update refs/heads/topic
+To ../bare/repo.git
+ ! [remote rejected] topic -> topic (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+"""
+
+    assert p.status != 0, p.image
+    testcase.assertRunOutputEqual(p, expected_out)
+
+    # Push a branch whose commits all pass the style checks.
+    # The output of the style checker for each commit should
+    # be printed in order.
+    testcase.change_email_sending_verbosity(full_verbosity=False)
+    p = testcase.run("git push origin topic-ok".split())
+    expected_out = """\
+remote: *** cvs_check: `repo' < `a'
+remote: *** cvs_check: `repo' < `c'
+remote: *** cvs_check: `repo' < `d'
+remote: DEBUG: Sending email: [repo] Created branch 'topic-ok'...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/topic-ok] Update file a...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/topic-ok] Update file c...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/topic-ok] Update file d...
+To ../bare/repo.git
+ * [new branch]      topic-ok -> topic-ok
+"""
+
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
@@ -0,0 +1,23 @@
+def test_write_commit_files(testcase):
+    """Unit test the write_commit_files function."""
+    testcase.run_unit_test_script(
+        expected_out="""\
+DEBUG: write_commit_files...
+blob SHA1s known: same contents: True
+blob SHA1s known: hard links: [3, 3, 3, 1]
+blob SHA1s partially known: same contents: True
+blob SHA1s partially known: hard links: [1, 1, 1, 1]
+blob SHA1s unknown: same contents: True
+blob SHA1s unknown: hard links: [1, 1, 1, 1]
+DEBUG: write_commit_files with a missing file...
+Command 'git show <commit>:missing' returned non-zero exit status 1.
+DEBUG: ObjectReader.iter_contents...
+9b0d6e7d2b6fea685ca530b22246c3e22fb055f7: 14
+<commit>:dir/big: 1048576
+<commit>:missing: None
+HEAD:a: 36
+b'same contents\\n'
+b'other contents\\n'
+[]
+""",
+    )
@@ -0,0 +1,119 @@
+from collections import OrderedDict
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from git import CalledProcessError, git, object_reader
+from init import init_all_globals
+from pre_commit_checks import write_commit_files
+
+init_all_globals(OrderedDict())
+
+
+def make_commit(files):
+    """Create a commit with the given files, and return its SHA1.
+
+    PARAMETERS
+        files: A dictionary, whose keys are the files' path, and whose
+            values are the files' contents (byte strings).
+
+    RETURN VALUE
+        A tuple with the SHA1 of the commit, and a dictionary providing
+        the SHA1 of each file's blob.
+    """
+    sha1_by_contents = {}
+    for contents in set(files.values()):
+        sha1_by_contents[contents] = git.hash_object(
+            "-w", "--stdin", _input=contents, _decode=True
+        )
+    blob_sha1s = {path: sha1_by_contents[files[path]] for path in files}
+    index_env = dict(os.environ, GIT_INDEX_FILE=os.path.abspath("tmp.index"))
+    try:
+        git.update_index(
+            "--add",
+            "--index-info",
+            _input="".join(
+                "100644 %s\t%s\n" % (sha1, path) for (path, sha1) in blob_sha1s.items()
+            ).encode("utf-8"),
+            _env=index_env,
+        )
+        tree = git.write_tree(_env=index_env, _decode=True)
+    finally:
+        os.unlink(index_env["GIT_INDEX_FILE"])
+    return (git.commit_tree(tree, "-m", "files", _decode=True), blob_sha1s)
+
+
+def read_file(path):
+    """Return the contents of the given file."""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+FILES = {
+    "one": b"same contents\n",
+    "dir/two": b"same contents\n",
+    "dir/subdir/three": b"same contents\n",
+    "dir/subdir/four": b"other contents\n",
+    "dir/big": b"0123456789abcdef" * 65536,
+    "dir/empty": b"",
+}
+# Add enough files to make sure that the requests sent to git
+# cannot all fit in the pipe.
+for n in range(2000):
+    FILES["many/sub%d/file%d" % (n % 10, n)] = b"file %d\n" % (n % 10)
+(commit, blob_sha1s) = make_commit(FILES)
+
+
+def check(what, blob_sha1s):
+    """Call write_commit_files for all FILES, and check the result."""
+    dest_dir = mkdtemp(dir=os.getcwd())
+    write_commit_files(FILES.keys(), commit, dest_dir, blob_sha1s=blob_sha1s)
+    paths = {name: os.path.join(dest_dir, name) for name in FILES}
+    print(
+        "%s: same contents: %s"
+        % (what, all(read_file(paths[name]) == FILES[name] for name in FILES))
+    )
+    print(
+        "%s: hard links: %s"
+        % (
+            what,
+            [
+                os.stat(paths[name]).st_nlink
+                for name in ("one", "dir/two", "dir/subdir/three", "dir/subdir/four")
+            ],
+        )
+    )
+    rmtree(dest_dir)
+
+
+print("DEBUG: write_commit_files...")
+check("blob SHA1s known", blob_sha1s)
+check("blob SHA1s partially known", {"one": blob_sha1s["one"]})
+check("blob SHA1s unknown", None)
+
+print("DEBUG: write_commit_files with a missing file...")
+dest_dir = mkdtemp(dir=os.getcwd())
+try:
+    write_commit_files(["one", "missing"], commit, dest_dir)
+except CalledProcessError as E:
+    print(str(E).replace(commit, "<commit>"))
+rmtree(dest_dir)
+
+print("DEBUG: ObjectReader.iter_contents...")
+reader = object_reader()
+names = [blob_sha1s["one"], "%s:dir/big" % commit, "%s:missing" % commit, "HEAD:a"]
+for (name, contents) in reader.iter_contents(names):
+    print(
+        "%s: %s"
+        % (
+            name.replace(commit, "<commit>"),
+            None if contents is None else len(contents),
+        )
+    )
+
+# Stop iterating early, and verify that the reader can still be used.
+contents_iter = reader.iter_contents(names)
+print(next(contents_iter)[1])
+del contents_iter
+print(reader.contents("%s:dir/subdir/four" % commit))
+print(list(reader.iter_contents([])))
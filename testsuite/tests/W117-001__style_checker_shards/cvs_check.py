@@ -0,0 +1,36 @@
+#! /usr/bin/env python
+"""A dummy cvs_check program that passes all files except `src/bad.adb'.
+
+It also prints a trace on stdout, in order to allow us
+to verify that the script was called with the correct arguments.
+
+Checking file `src/big.adb' is artificially slow, so that the other
+style-checker processes complete first when using several shards.
+"""
+import sys
+import time
+
+filenames = sys.stdin.read().splitlines(False)
+
+# To help with testing, print a trace containing the name of the module
+# and the names of the files being checked.
+print(
+    "cvs_check: %s < %s"
+    % (
+        " ".join(["`%s'" % arg for arg in sys.argv[1:]]),
+        " ".join(["`%s'" % arg for arg in filenames]),
+    ),
+    file=sys.stderr,
+)
+
+if "src/big.adb" in filenames:
+    time.sleep(0.5)
+
+# Fail the style-check for the following files:
+for filename in filenames:
+    if filename == "src/bad.adb":
+        print(
+            "ERROR: %s: Copyright year in header is not up to date" % filename,
+            file=sys.stderr,
+        )
+        sys.exit(1)
@@ -0,0 +1,37 @@
+def test_style_checker_shards(testcase):
+    """Push commits with files style-checked using several shards."""
+    # Push a commit whose files all pass the style checks.
+    # The files should be split into 2 shards of similar size,
+    # and the output of each shard printed in a stable order.
+    testcase.change_email_sending_verbosity(full_verbosity=False)
+    p = testcase.run("git push origin sharded".split())
+    expected_out = """\
+remote: *** cvs_check: `repo' < `doc/guide.txt' `doc/notes.txt' `src/small1.adb' `src/small2.adb' `top.txt'
+remote: *** cvs_check: `repo' < `src/big.adb'
+remote: DEBUG: Sending email: [repo] Created branch 'sharded'...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/sharded] Add various files...
+To ../bare/repo.git
+ * [new branch]      sharded -> sharded
+"""
+
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+
+    # Push a commit where one of the files fails the style check.
+    # The error should be reported along with the output of the
+    # other shard.
+    p = testcase.run("git push origin sharded-bad".split())
+    expected_out = """\
+remote: *** pre-commit check failed for commit: e93a41b8fd37eb22267f8d939f382d0470ce05e5
+remote: *** cvs_check: `repo' < `doc/notes.txt'
+remote: *** cvs_check: `repo' < `src/bad.adb' `src/small1.adb'
+remote: *** ERROR: src/bad.adb: Copyright year in header is not up to date
+remote: error: hook declined to update refs/heads/sharded-bad
+To ../bare/repo.git
+ ! [remote rejected] sharded-bad -> sharded-bad (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+"""
+
+    assert p.status != 0, p.image
+    testcase.assertRunOutputEqual(p, expected_out)
@@ -0,0 +1,35 @@
+def test_style_checker_shards(testcase):
+    """Unit test the style_checker_shards function."""
+    testcase.run_unit_test_script(
+        expected_out="""\
+DEBUG: shard_by=size, nb_shards=2
+ 560: a/one.adb a/b/three.adb c/four.adb c/five.adb
+ 550: a/two.adb six.txt seven.txt
+DEBUG: shard_by=size, nb_shards=3
+ 350: a/one.adb six.txt seven.txt
+ 360: a/two.adb a/b/three.adb c/five.adb
+ 400: c/four.adb
+DEBUG: shard_by=size, nb_shards=10
+ 100: a/one.adb
+ 300: a/two.adb
+  50: a/b/three.adb
+ 400: c/four.adb
+  10: c/five.adb
+ 250: six.txt
+   0: seven.txt
+DEBUG: shard_by=directory, nb_shards=2
+ 650: a/one.adb a/two.adb six.txt seven.txt
+ 460: a/b/three.adb c/four.adb c/five.adb
+DEBUG: shard_by=directory, nb_shards=3
+ 400: a/one.adb a/two.adb
+ 300: a/b/three.adb six.txt seven.txt
+ 410: c/four.adb c/five.adb
+DEBUG: shard_by=directory, nb_shards=10
+ 400: a/one.adb a/two.adb
+  50: a/b/three.adb
+ 410: c/four.adb c/five.adb
+ 250: six.txt seven.txt
+DEBUG: shard_by=invalid, nb_shards=2
+InvalidUpdate: Invalid hooks.style-checker-shard-by value: invalid (must be 'size' or 'directory')
+""",
+    )
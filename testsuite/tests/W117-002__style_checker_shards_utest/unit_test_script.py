@@ -0,0 +1,46 @@
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from errors import InvalidUpdate
+from pre_commit_checks import style_checker_shards
+
+# The files to split into shards, with their size.
+FILES = {
+    "a/one.adb": 100,
+    "a/two.adb": 300,
+    "a/b/three.adb": 50,
+    "c/four.adb": 400,
+    "c/five.adb": 10,
+    "six.txt": 250,
+    "seven.txt": 0,
+}
+
+files_dir = mkdtemp(dir=os.getcwd())
+for (filename, size) in FILES.items():
+    os.makedirs(os.path.join(files_dir, os.path.dirname(filename)), exist_ok=True)
+    with open(os.path.join(files_dir, filename), "w") as f:
+        f.write("x" * size)
+
+for (shard_by, nb_shards) in (
+    ("size", 2),
+    ("size", 3),
+    ("size", 10),
+    ("directory", 2),
+    ("directory", 3),
+    ("directory", 10),
+    ("invalid", 2),
+):
+    print("DEBUG: shard_by=%s, nb_shards=%d" % (shard_by, nb_shards))
+    try:
+        for shard in style_checker_shards(
+            list(FILES.keys()), files_dir, nb_shards, shard_by
+        ):
+            print(
+                "%4d: %s"
+                % (sum(FILES[filename] for filename in shard), " ".join(shard))
+            )
+    except InvalidUpdate as E:
+        print("InvalidUpdate: %s" % E)
+
+rmtree(files_dir)
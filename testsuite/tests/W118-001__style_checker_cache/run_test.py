@@ -0,0 +1,125 @@
+import os
+import sys
+
+
+def style_checker_log(testcase):
+    """Return the trace logged by cvs_check.py since the last call.
+
+    The log file is deleted afterwards.
+    """
+    log_filename = os.path.join(testcase.work_dir, "cvs_check.log")
+    if not os.path.exists(log_filename):
+        return ""
+    with open(log_filename) as f:
+        log = f.read()
+    os.unlink(log_filename)
+    return log
+
+
+def test_style_checker_cache(testcase):
+    """Push the same files several times, with the style-checker cache enabled."""
+    testcase.change_email_sending_verbosity(full_verbosity=False)
+
+    # Push a branch adding files a, b and c. These files have never
+    # been checked before, so they should all be checked, and then
+    # recorded in the cache.
+    p = testcase.run("git push origin topic1".split())
+    expected_out = """\
+remote: DEBUG: Sending email: [repo] Created branch 'topic1'...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/topic1] Add files a, b and c...
+To ../bare/repo.git
+ * [new branch]      topic1 -> topic1
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        style_checker_log(testcase),
+        "cvs_check: `repo' < `a.adb' `b.adb' `c.adb'\n",
+        "topic1",
+    )
+
+    # Push a branch adding the same files a and b, as well as a new
+    # file d. Only d should be checked.
+    p = testcase.run("git push origin topic2".split())
+    expected_out = """\
+remote: DEBUG: Sending email: [repo] Created branch 'topic2'...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/topic2] Add files a, b and d...
+To ../bare/repo.git
+ * [new branch]      topic2 -> topic2
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        style_checker_log(testcase), "cvs_check: `repo' < `d.adb'\n", "topic2"
+    )
+
+    # Push a branch adding file c again. The cache is limited to
+    # 3 entries, and c's is the least recently used one, so it
+    # should have been evicted when d was added. So c should be
+    # checked again.
+    p = testcase.run("git push origin topic3".split())
+    expected_out = """\
+remote: DEBUG: Sending email: [repo] Created branch 'topic3'...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/topic3] Add file c...
+To ../bare/repo.git
+ * [new branch]      topic3 -> topic3
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        style_checker_log(testcase), "cvs_check: `repo' < `c.adb'\n", "topic3"
+    )
+
+    # Flush the cache, and then push a branch adding file a again.
+    # Since the cache is now empty, a should be checked again.
+    p = testcase.run(
+        [
+            sys.executable,
+            os.path.join(testcase.hooks_src_dir, "style_check_cache.py"),
+            "--flush",
+        ],
+        cwd=testcase.bare_repo_dir,
+    )
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertEqual(p.out, "", p.image)
+
+    p = testcase.run("git push origin topic4".split())
+    expected_out = """\
+remote: DEBUG: Sending email: [repo] Created branch 'topic4'...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/topic4] Add file a...
+To ../bare/repo.git
+ * [new branch]      topic4 -> topic4
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        style_checker_log(testcase), "cvs_check: `repo' < `a.adb'\n", "topic4"
+    )
+
+    # Push two branches adding the same file w, for which the
+    # style-checker prints a warning. The warning should be
+    # printed each time.
+    for (branch, subject) in (
+        ("warning1", "Add file w"),
+        ("warning2", "Add file w again"),
+    ):
+        p = testcase.run(["git", "push", "origin", branch])
+        expected_out = """\
+remote: *** WARNING: w.adb: Copyright notice is missing
+remote: DEBUG: Sending email: [repo] Created branch '{branch}'...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/{branch}] {subject}...
+To ../bare/repo.git
+ * [new branch]      {branch} -> {branch}
+""".format(
+            branch=branch, subject=subject
+        )
+        testcase.assertEqual(p.status, 0, p.image)
+        testcase.assertRunOutputEqual(p, expected_out)
+        testcase.assertEqual(
+            style_checker_log(testcase), "cvs_check: `repo' < `w.adb'\n", branch
+        )
@@ -0,0 +1,30 @@
+def test_git_attribute_commits(testcase):
+    """Unit test the git_attribute function at several commits."""
+    testcase.run_unit_test_script(
+        expected_out="""\
+DEBUG: commit1...
+a.c: set
+new.adb: set
+sub/b.c: unset
+sub/deep/c.c: set
+DEBUG: commit2...
+a.c: set
+new.adb: set
+sub/b.c: set
+sub/deep/c.c: set
+DEBUG: commit3...
+a.c: unset
+new.adb: set
+sub/b.c: unset
+sub/deep/c.c: set
+DEBUG: commit1 again...
+a.c: set
+new.adb: set
+sub/b.c: unset
+sub/deep/c.c: set
+DEBUG: other/x.c...
+{'other/x.c': 'unset'}
+{'other/x.c': 'unset'}
+{}
+""",
+    )
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+import os
+
+from git import git
+from git_attrs import git_attribute
+from init import init_all_globals
+
+init_all_globals(OrderedDict())
+
+
+def make_commit(files):
+    """Create a commit with the given files, and return its SHA1.
+
+    PARAMETERS
+        files: A dictionary, whose keys are the files' path, and whose
+            values are the files' contents (byte strings).
+    """
+    blob_sha1s = {
+        path: git.hash_object("-w", "--stdin", _input=contents, _decode=True)
+        for (path, contents) in files.items()
+    }
+    index_env = dict(os.environ, GIT_INDEX_FILE=os.path.abspath("tmp.index"))
+    try:
+        git.update_index(
+            "--add",
+            "--index-info",
+            _input="".join(
+                "100644 %s\t%s\n" % (sha1, path) for (path, sha1) in blob_sha1s.items()
+            ).encode("utf-8"),
+            _env=index_env,
+        )
+        tree = git.write_tree(_env=index_env, _decode=True)
+    finally:
+        os.unlink(index_env["GIT_INDEX_FILE"])
+    return git.commit_tree(tree, "-m", "files", _decode=True)
+
+
+FILES = {
+    ".gitattributes": b"*.c no-precommit-check\n",
+    "sub/.gitattributes": b"b.c -no-precommit-check\n",
+    "other/.gitattributes": b"x.c -no-precommit-check\n",
+    "a.c": b"a\n",
+    "sub/b.c": b"b\n",
+    "sub/deep/c.c": b"c\n",
+    "other/x.c": b"x\n",
+}
+commit1 = make_commit(FILES)
+# Delete sub/.gitattributes.
+del FILES["sub/.gitattributes"]
+commit2 = make_commit(FILES)
+# Modify .gitattributes, and add sub/.gitattributes back.
+FILES[".gitattributes"] = b"*.c -no-precommit-check\nsub/deep/* no-precommit-check\n"
+FILES["sub/.gitattributes"] = b"b.c -no-precommit-check\n"
+commit3 = make_commit(FILES)
+
+# The default attributes apply to the files for which none of
+# the .gitattributes files sets the attribute.
+os.makedirs("info", exist_ok=True)
+with open("info/default_attributes", "w") as f:
+    f.write("*.adb no-precommit-check\n")
+
+for (name, commit) in (
+    ("commit1", commit1),
+    ("commit2", commit2),
+    ("commit3", commit3),
+    ("commit1 again", commit1),
+):
+    print("DEBUG: %s..." % name)
+    attrs = git_attribute(
+        commit, ["a.c", "sub/b.c", "sub/deep/c.c", "new.adb"], "no-precommit-check"
+    )
+    for filename in sorted(attrs):
+        print("%s: %s" % (filename, attrs[filename]))
+
+# Query files in another directory.
+print("DEBUG: other/x.c...")
+print(git_attribute(commit1, ["other/x.c"], "no-precommit-check"))
+print(git_attribute(commit3, ["other/x.c"], "no-precommit-check"))
+print(git_attribute(commit3, [], "no-precommit-check"))
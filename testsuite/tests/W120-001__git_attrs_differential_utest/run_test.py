@@ -0,0 +1,8 @@
+def test_git_attrs_differential(testcase):
+    """Compare git_attribute with "git check-attr" on random trees."""
+    testcase.run_unit_test_script(
+        expected_out="""\
+200 trials, 0 mismatches
+at least 10000 checks: True
+""",
+    )
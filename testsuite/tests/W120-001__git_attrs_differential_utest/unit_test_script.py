@@ -0,0 +1,346 @@
+"""Compare git_attribute with "git check-attr" on random trees.
+
+For each trial, we generate a random tree, with some random
+.gitattributes files, as well as a random default attributes
+file. We then compute the attributes of all the files of that
+tree, as well as some files which do not exist, using both
+git_attribute and "git check-attr", and verify that the results
+are identical.
+
+For "git check-attr", the tree's .gitattributes files are written
+in a temporary non-bare repository, and the default attributes
+file is passed via the core.attributesFile config option, since
+this is the role it plays for git_attribute.
+"""
+from collections import OrderedDict
+import os
+import random
+from shutil import rmtree
+import subprocess
+from tempfile import mkdtemp
+
+from git import git
+from git_attrs import DEFAULT_ATTRIBUTES_FILE, git_attribute
+from git_parsers import parse_check_attr
+from init import init_all_globals
+
+init_all_globals(OrderedDict())
+
+NB_TRIALS = 200
+
+# The attributes we query. "mymacro" and "othermacro" are macro
+# attributes defined in some of the attributes files, and "text"
+# is set by git's builtin "binary" macro attribute.
+ATTR_NAMES = ("no-precommit-check", "text", "foo", "mymacro", "othermacro")
+
+# The names used for the directories and the files of the trees
+# we generate.
+DIR_NAMES = ("a", "b", "sub", "x.c", "d[1]")
+FILE_NAMES = (
+    "a",
+    "b.c",
+    "c.adb",
+    "C.ADB",
+    "e.txt",
+    "f[1].c",
+    "g*h",
+    "h?",
+    "i j.c",
+    ".hidden",
+    "d1",
+    "été.c",
+)
+
+# The pieces used to generate the patterns.
+PATTERN_PIECES = (
+    "*",
+    "*",
+    "?",
+    "**",
+    "**/",
+    "/**",
+    "/",
+    "a",
+    "b",
+    "c",
+    "sub",
+    ".c",
+    ".adb",
+    "e.txt",
+    "[a-c]",
+    "[!a]",
+    "[^b]",
+    "[[:digit:]]",
+    "[[:alpha:]]",
+    "[]]",
+    "[c-a]",
+    "[a-",
+    "\\*",
+    "\\[",
+    "\\",
+    "d[1]",
+    "d\\[1]",
+    "é",
+    "?t?",
+)
+
+# The pieces used to generate the attribute states.
+STATE_PIECES = (
+    "{attr}",
+    "-{attr}",
+    "!{attr}",
+    "{attr}=value",
+    "{attr}=",
+    "-{attr}=value",
+)
+
+
+def random_pattern(paths):
+    """Return a random pattern.
+
+    PARAMETERS
+        paths: A list of paths, from which some of the patterns
+            are derived, so as to get patterns which actually
+            match some files.
+    """
+    if random.randint(0, 1) == 0:
+        pattern = "".join(
+            random.choice(PATTERN_PIECES) for _ in range(random.randint(1, 4))
+        )
+    else:
+        components = random.choice(paths).split("/")
+        # Keep only some of the path's components (possibly just
+        # its basename), and replace some of them by wildcards.
+        components = components[random.randint(0, len(components) - 1) :]
+        for n in range(len(components)):
+            kind = random.randint(0, 8)
+            if kind == 0:
+                components[n] = "*"
+            elif kind == 1:
+                components[n] = "**"
+            elif kind == 2:
+                components[n] = "*" + components[n][-2:]
+            elif kind == 3 and components[n]:
+                pos = random.randint(0, len(components[n]) - 1)
+                components[n] = (
+                    components[n][:pos]
+                    + random.choice(("?", "[a-z]", "*"))
+                    + components[n][pos + 1 :]
+                )
+        pattern = random.choice(("", "", "/", "**/")) + "/".join(components)
+
+    kind = random.randint(0, 20)
+    if kind == 0:
+        # Quoted pattern (possibly with escape sequences).
+        pattern = '"%s"' % pattern.replace(" ", "\\040")
+    elif kind == 1:
+        # Negative pattern (ignored by git).
+        pattern = "!" + pattern
+    if " " in pattern:
+        pattern = '"%s"' % pattern
+    return pattern
+
+
+def random_states(macro_names):
+    """Return a random list of attribute states."""
+    attr_names = ATTR_NAMES + ("binary",) + tuple(macro_names)
+    states = [
+        random.choice(STATE_PIECES).format(attr=random.choice(attr_names))
+        for _ in range(random.randint(1, 3))
+    ]
+    if random.randint(0, 30) == 0:
+        # An invalid attribute name (git ignores the whole line).
+        states.append("in$valid")
+    return " ".join(states)
+
+
+def random_attributes_file(paths, macros_allowed):
+    """Return the contents of a random attributes file (a string).
+
+    PARAMETERS
+        paths: Same as in random_pattern.
+        macros_allowed: True if macro attributes can be defined
+            in that file.
+    """
+    lines = []
+    for _ in range(random.randint(1, 8)):
+        kind = random.randint(0, 12)
+        if kind == 0:
+            lines.append("# A comment")
+        elif kind == 1:
+            lines.append("")
+        elif kind == 2 or (kind == 3 and macros_allowed):
+            # Macro attributes are only allowed in some files;
+            # git ignores them in the other files.
+            macro_name = random.choice(("mymacro", "othermacro"))
+            lines.append("[attr]%s %s" % (macro_name, random_states((macro_name,))))
+        else:
+            lines.append(
+                "%s%s%s"
+                % (
+                    random.choice(("", "  ", "\t")),
+                    random_pattern(paths),
+                    random.choice((" ", "\t", "  ")),
+                )
+                + random_states(("mymacro", "othermacro"))
+                + random.choice(("", " ", "\r"))
+            )
+    return "\n".join(lines) + random.choice(("", "\n"))
+
+
+def random_tree():
+    """Return a random tree.
+
+    RETURN VALUE
+        A tuple with the list of paths of the files of the tree,
+        and a dictionary providing the contents of its .gitattributes
+        files, indexed by path.
+    """
+    dirs = [""]
+    for _ in range(random.randint(0, 6)):
+        parent = random.choice(dirs)
+        dirs.append(os.path.join(parent, random.choice(DIR_NAMES)))
+    dirs = sorted(set(dirs))
+
+    files = set()
+    for _ in range(random.randint(1, 20)):
+        files.add(os.path.join(random.choice(dirs), random.choice(FILE_NAMES)))
+    # Make sure that no file has the same name as a directory.
+    files = sorted(files - set(dirs))
+
+    gitattributes = {}
+    for dir_name in dirs:
+        if random.randint(0, 2) != 0:
+            # The patterns are relative to the directory of the
+            # .gitattributes file.
+            paths = [
+                os.path.relpath(path, dir_name)
+                for path in files
+                if path.startswith(dir_name + "/") or not dir_name
+            ] or ["a"]
+            gitattributes[
+                os.path.join(dir_name, ".gitattributes")
+            ] = random_attributes_file(paths, macros_allowed=not dir_name)
+    return (files, gitattributes)
+
+
+def make_commit(files, gitattributes):
+    """Create a commit with the given tree, and return its SHA1.
+
+    PARAMETERS
+        files: The list of files in the tree (all of them are empty).
+        gitattributes: The contents of the .gitattributes files,
+            indexed by path.
+    """
+    empty_sha1 = git.hash_object("-w", "--stdin", _input=b"", _decode=True)
+    index_entries = ["100644 %s\t%s\n" % (empty_sha1, path) for path in files]
+    for (path, contents) in gitattributes.items():
+        sha1 = git.hash_object(
+            "-w", "--stdin", _input=contents.encode("utf-8"), _decode=True
+        )
+        index_entries.append("100644 %s\t%s\n" % (sha1, path))
+
+    index_env = dict(os.environ, GIT_INDEX_FILE=os.path.abspath("tmp.index"))
+    try:
+        git.update_index(
+            "--add",
+            "--index-info",
+            _input="".join(index_entries).encode("utf-8"),
+            _env=index_env,
+        )
+        tree = git.write_tree(_env=index_env, _decode=True)
+    finally:
+        os.unlink(index_env["GIT_INDEX_FILE"])
+    return git.commit_tree(tree, "-m", "files", _decode=True)
+
+
+def check_attr(paths, gitattributes, default_attributes):
+    """Return the attributes of the given paths, using "git check-attr".
+
+    PARAMETERS
+        paths: The list of paths to query.
+        gitattributes: Same as in make_commit.
+        default_attributes: The contents of the default attributes
+            file (a string), or None if there is no such file.
+
+    RETURN VALUE
+        A dictionary, indexed by (path, attr_name), providing
+        the value of each attribute of ATTR_NAMES for each path.
+    """
+    work_tree = mkdtemp(dir=os.getcwd())
+    env = dict(os.environ, GIT_ATTR_NOSYSTEM="1")
+    env.pop("GIT_DIR", None)
+    try:
+        subprocess.check_call(["git", "init", "-q"], cwd=work_tree, env=env)
+        for (path, contents) in gitattributes.items():
+            os.makedirs(os.path.join(work_tree, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(work_tree, path), "wb") as f:
+                f.write(contents.encode("utf-8"))
+        attributes_file = os.devnull
+        if default_attributes is not None:
+            attributes_file = os.path.join(work_tree, ".git", "default_attributes")
+            with open(attributes_file, "wb") as f:
+                f.write(default_attributes.encode("utf-8"))
+        p = subprocess.run(
+            ["git", "-c", "core.attributesFile=" + attributes_file]
+            + ["check-attr", "-z", "--stdin"]
+            + list(ATTR_NAMES),
+            input=b"".join(os.fsencode(path) + b"\0" for path in paths),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=work_tree,
+            env=env,
+            check=True,
+        )
+    finally:
+        rmtree(work_tree)
+    records = (os.fsdecode(r) for r in p.stdout.split(b"\0")[:-1])
+    return {
+        (path, attr_name): attr_val
+        for (path, attr_name, attr_val) in parse_check_attr(records)
+    }
+
+
+random.seed(20241118)
+nb_checks = 0
+nb_mismatches = 0
+for trial in range(NB_TRIALS):
+    (files, gitattributes) = random_tree()
+    default_attributes = None
+    if random.randint(0, 2) != 0:
+        default_attributes = random_attributes_file(files, macros_allowed=True)
+    commit = make_commit(files, gitattributes)
+    # Also query some files which do not exist in the tree.
+    paths = files + ["new.c", "sub/new.adb", "a/b/c/new"]
+
+    if default_attributes is None:
+        if os.path.exists(DEFAULT_ATTRIBUTES_FILE):
+            os.unlink(DEFAULT_ATTRIBUTES_FILE)
+    else:
+        with open(DEFAULT_ATTRIBUTES_FILE, "wb") as f:
+            f.write(default_attributes.encode("utf-8"))
+
+    expected = check_attr(paths, gitattributes, default_attributes)
+    for attr_name in ATTR_NAMES:
+        actual = git_attribute(commit, paths, attr_name)
+        for path in paths:
+            nb_checks += 1
+            if actual[path] != expected[(path, attr_name)]:
+                nb_mismatches += 1
+                print(
+                    "Trial %d: %s: %s: %s (expected %s)"
+                    % (
+                        trial,
+                        path,
+                        attr_name,
+                        actual[path],
+                        expected[(path, attr_name)],
+                    )
+                )
+                if nb_mismatches <= 5:
+                    for (gitattributes_path, contents) in sorted(gitattributes.items()):
+                        print("  %s: %r" % (gitattributes_path, contents))
+                    print("  default attributes: %r" % default_attributes)
+
+print("%d trials, %d mismatches" % (NB_TRIALS, nb_mismatches))
+print("at least 10000 checks: %s" % (nb_checks >= 10000))
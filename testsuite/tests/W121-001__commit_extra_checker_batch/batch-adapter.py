@@ -0,0 +1,61 @@
+#! /usr/bin/env python
+"""A commit-extra-checker which supports the batch mode.
+
+When called in batch mode, this script calls commit-extra-checker.py
+for each commit, and then prints the results following the batch mode
+protocol. Each call in batch mode is also logged in batch-adapter.log.
+
+Otherwise, this script simply calls commit-extra-checker.py.
+
+The script can also be asked to misbehave in batch mode, by writing
+one of the following keywords in a file named batch-adapter-failure:
+  - "nonzero": Return nonzero;
+  - "missing-result": Omit the result of the last commit;
+  - "invalid-json": Print a line which is not valid JSON;
+  - "invalid-result": Print a result which is not a dictionary.
+"""
+import json
+import os
+import subprocess
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+checker = os.path.join(script_dir, "commit-extra-checker.py")
+
+if sys.argv[1:2] != ["--batch"]:
+    sys.exit(subprocess.call([checker] + sys.argv[1:]))
+
+ref_name = sys.argv[2]
+commits_data = sys.stdin.read().splitlines()
+
+with open(os.path.join(script_dir, "batch-adapter.log"), "a") as f:
+    f.write("--batch {} ({} commits)\n".format(ref_name, len(commits_data)))
+
+failure = None
+if os.path.exists(os.path.join(script_dir, "batch-adapter-failure")):
+    with open(os.path.join(script_dir, "batch-adapter-failure")) as f:
+        failure = f.read().strip()
+
+if failure == "nonzero":
+    print("Error: batch-adapter.py crashed!")
+    sys.exit(2)
+
+results = []
+for commit_data in commits_data:
+    p = subprocess.run(
+        [checker, ref_name, json.loads(commit_data)["rev"]],
+        input=commit_data.encode("utf-8"),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    results.append({"status": p.returncode, "output": p.stdout.decode("utf-8")})
+
+if failure == "missing-result":
+    results.pop()
+elif failure == "invalid-json":
+    print("{")
+elif failure == "invalid-result":
+    print("[1, 2, 3]")
+
+for result in results:
+    print(json.dumps(result))
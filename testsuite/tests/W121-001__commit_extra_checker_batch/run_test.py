@@ -0,0 +1,214 @@
+import os
+import shutil
+
+
+def push(testcase, mode, refspec):
+    """Push refspec to the bare repository configured for the given mode.
+
+    The testcase uses two copies of the bare repository: One where
+    the commit-extra-checker is called once per commit ("per-commit"
+    mode), and one where it is called in batch mode ("batch" mode).
+    The copy not being used is stored in the work directory,
+    in a directory named "bare-<mode>".
+
+    PARAMETERS
+        testcase: The testcase fixture.
+        mode: Either "per-commit" or "batch".
+        refspec: The refspec to push.
+    """
+    mode_repo_dir = os.path.join(testcase.work_dir, "bare-" + mode)
+    os.rename(mode_repo_dir, testcase.bare_repo_dir)
+    try:
+        return testcase.run(["git", "push", "origin", refspec])
+    finally:
+        os.rename(testcase.bare_repo_dir, mode_repo_dir)
+
+
+def batch_adapter_log(testcase):
+    """Return the calls logged by batch-adapter.py since the last call.
+
+    The log file is deleted afterwards.
+    """
+    log_filename = os.path.join(testcase.work_dir, "batch-adapter.log")
+    if not os.path.exists(log_filename):
+        return ""
+    with open(log_filename) as f:
+        log = f.read()
+    os.unlink(log_filename)
+    return log
+
+
+def set_batch_adapter_failure(testcase, failure):
+    """Tell batch-adapter.py how to misbehave (None to behave)."""
+    failure_filename = os.path.join(testcase.work_dir, "batch-adapter-failure")
+    if failure is None:
+        os.unlink(failure_filename)
+    else:
+        with open(failure_filename, "w") as f:
+            f.write(failure)
+
+
+def test_commit_extra_checker_batch(testcase):
+    """Test hooks.commit-extra-checker in batch mode.
+
+    The purpose of this testcase is to verify that, in batch mode,
+    the hooks behave exactly as in the default mode, where the hook
+    is called once per commit, while only calling the hook once per
+    reference update.
+
+    For that, the script used as our commit-extra-checker is
+    batch-adapter.py, which calls the commit-extra-checker.py script
+    once per commit, whatever the mode is. We then push the same
+    references in both modes, and verify that the output is the same.
+    """
+    testcase.change_email_sending_verbosity(full_verbosity=False)
+
+    # Create the two copies of the bare repository, one for each mode.
+
+    testcase.update_git_hooks_config(
+        [
+            (
+                "hooks.commit-extra-checker",
+                os.path.join(testcase.work_dir, "batch-adapter.py"),
+            ),
+        ]
+    )
+    os.rename(
+        testcase.bare_repo_dir, os.path.join(testcase.work_dir, "bare-per-commit")
+    )
+    shutil.copytree(
+        os.path.join(testcase.work_dir, "bare-per-commit"),
+        testcase.bare_repo_dir,
+        symlinks=True,
+    )
+    testcase.update_git_hooks_config([("hooks.commit-extra-checker-batch", "true")])
+    os.rename(testcase.bare_repo_dir, os.path.join(testcase.work_dir, "bare-batch"))
+    # The hooks configuration update above used the new configuration,
+    # and therefore called batch-adapter.py in batch mode.
+    testcase.assertEqual(
+        batch_adapter_log(testcase), "--batch refs/meta/config (1 commits)\n", ""
+    )
+
+    # Push the same references in both modes, and verify that
+    # the results are the same. Also verify that the hook was
+    # called only once per update in batch mode.
+
+    for refspec, expected_log in (
+        (
+            "single-commit-accept",
+            "--batch refs/heads/single-commit-accept (1 commits)\n",
+        ),
+        (
+            "single-commit-reject",
+            "--batch refs/heads/single-commit-reject (1 commits)\n",
+        ),
+        (
+            "multiple-commits-accept-all-new",
+            "--batch refs/heads/multiple-commits-accept-all-new (3 commits)\n",
+        ),
+        (
+            "multiple-commits-accept-some-preexisting",
+            "--batch refs/heads/multiple-commits-accept-some-preexisting"
+            " (1 commits)\n",
+        ),
+        (
+            "multiple-commits-reject-first",
+            "--batch refs/heads/multiple-commits-reject-first (3 commits)\n",
+        ),
+        (
+            "multiple-commits-reject-middle",
+            "--batch refs/heads/multiple-commits-reject-middle (3 commits)\n",
+        ),
+        (
+            "multiple-commits-reject-last",
+            "--batch refs/heads/multiple-commits-reject-last (3 commits)\n",
+        ),
+        (
+            "new-branch-multiple-commits-reject-first",
+            "--batch refs/heads/new-branch-multiple-commits-reject-first"
+            " (3 commits)\n",
+        ),
+        (":delete-me", ""),
+    ):
+        p_per_commit = push(testcase, "per-commit", refspec)
+        testcase.assertEqual(batch_adapter_log(testcase), "", refspec)
+
+        p_batch = push(testcase, "batch", refspec)
+        testcase.assertEqual(p_batch.status, p_per_commit.status, p_batch.image)
+        testcase.assertRunOutputEqual(p_batch, p_per_commit.cmd_out)
+        testcase.assertEqual(batch_adapter_log(testcase), expected_log, refspec)
+
+    # Now, verify that the update is rejected when the hook fails
+    # as a whole in batch mode.
+
+    set_batch_adapter_failure(testcase, "nonzero")
+    p = push(testcase, "batch", "multiple-commits-reject-last")
+    expected_out = """\
+remote: *** The hooks.commit-extra-checker script failed in batch mode: hooks.commit-extra-checker returned nonzero: 2.
+remote: *** Error: batch-adapter.py crashed!
+remote: error: hook declined to update refs/heads/multiple-commits-reject-last
+To ../bare/repo.git
+ ! [remote rejected] multiple-commits-reject-last -> multiple-commits-reject-last (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+"""
+    testcase.assertNotEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+
+    # Same if the hook does not print a result for each commit...
+
+    set_batch_adapter_failure(testcase, "missing-result")
+    p = push(testcase, "batch", "single-commit-reject")
+    expected_out = """\
+remote: *** The hooks.commit-extra-checker script failed in batch mode: hooks.commit-extra-checker returned 0 result(s) for 1 input(s).
+remote: error: hook declined to update refs/heads/single-commit-reject
+To ../bare/repo.git
+ ! [remote rejected] single-commit-reject -> single-commit-reject (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+"""
+    testcase.assertNotEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+
+    # ... or prints something which is not valid JSON...
+
+    set_batch_adapter_failure(testcase, "invalid-json")
+    p = push(testcase, "batch", "single-commit-reject")
+    expected_out = """\
+remote: *** The hooks.commit-extra-checker script failed in batch mode: hooks.commit-extra-checker returned invalid JSON (line 1).
+remote: *** {
+remote: *** {"status": 1, "output": "DEBUG: commit-extra-checker.py refs/heads/single-commit-reject 2c27994b8413d8b9515ebd38a0b229639809e5c1\\n-----[ stdin ]-----\\n  . author_email: brobecker@adacore.com\\n  . author_name: Joel Brobecker\\n  . body: modify a with some contents (bad-commit)\\n  . object_type: commit\\n  . ref_kind: branch\\n  . ref_name: refs/heads/single-commit-reject\\n  . rev: 2c27994b8413d8b9515ebd38a0b229639809e5c1\\n  . subject: modify a with some contents (bad-commit)\\n---[ end stdin ]---\\nError: Invalid bla bla bla. Rejecting Update.\\n"}
+remote: error: hook declined to update refs/heads/single-commit-reject
+To ../bare/repo.git
+ ! [remote rejected] single-commit-reject -> single-commit-reject (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+"""
+    testcase.assertNotEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+
+    # ... or prints a result which is not a dictionary.
+
+    set_batch_adapter_failure(testcase, "invalid-result")
+    p = push(testcase, "batch", "single-commit-reject")
+    expected_out = """\
+remote: *** The hooks.commit-extra-checker script failed in batch mode: hooks.commit-extra-checker returned an invalid result (line 1).
+remote: *** [1, 2, 3]
+remote: *** {"status": 1, "output": "DEBUG: commit-extra-checker.py refs/heads/single-commit-reject 2c27994b8413d8b9515ebd38a0b229639809e5c1\\n-----[ stdin ]-----\\n  . author_email: brobecker@adacore.com\\n  . author_name: Joel Brobecker\\n  . body: modify a with some contents (bad-commit)\\n  . object_type: commit\\n  . ref_kind: branch\\n  . ref_name: refs/heads/single-commit-reject\\n  . rev: 2c27994b8413d8b9515ebd38a0b229639809e5c1\\n  . subject: modify a with some contents (bad-commit)\\n---[ end stdin ]---\\nError: Invalid bla bla bla. Rejecting Update.\\n"}
+remote: error: hook declined to update refs/heads/single-commit-reject
+To ../bare/repo.git
+ ! [remote rejected] single-commit-reject -> single-commit-reject (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+"""
+    testcase.assertNotEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+
+    # Finally, verify that a hook misbehaving in batch mode
+    # does not prevent an update which does not introduce any
+    # new commit.
+
+    p = push(testcase, "batch", ":single-commit-accept")
+    expected_out = """\
+remote: DEBUG: Sending email: [repo] Deleted branch 'single-commit-accept'...
+To ../bare/repo.git
+ - [deleted]         single-commit-accept
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
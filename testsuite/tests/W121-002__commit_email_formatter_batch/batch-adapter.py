@@ -0,0 +1,42 @@
+#! /usr/bin/env python
+"""A commit-email-formatter which supports the batch mode.
+
+When called in batch mode, this script calls commit-email-formatter.py
+for each commit, and then prints the results following the batch mode
+protocol. Each call in batch mode is also logged in batch-adapter.log.
+
+Otherwise, this script simply calls commit-email-formatter.py.
+
+The script can also be asked to misbehave in batch mode, by writing
+"nonzero" in a file named batch-adapter-failure, in which case
+it returns nonzero.
+"""
+import json
+import os
+import subprocess
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+formatter = os.path.join(script_dir, "commit-email-formatter.py")
+
+if sys.argv[1:2] != ["--batch"]:
+    sys.exit(subprocess.call([formatter] + sys.argv[1:]))
+
+ref_name = sys.argv[2]
+commits_data = sys.stdin.read().splitlines()
+
+with open(os.path.join(script_dir, "batch-adapter.log"), "a") as f:
+    f.write("--batch {} ({} commits)\n".format(ref_name, len(commits_data)))
+
+if os.path.exists(os.path.join(script_dir, "batch-adapter-failure")):
+    print("Error: batch-adapter.py crashed!")
+    sys.exit(2)
+
+for commit_data in commits_data:
+    p = subprocess.run(
+        [formatter, ref_name, json.loads(commit_data)["rev"]],
+        input=commit_data.encode("utf-8"),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    print(json.dumps({"status": p.returncode, "output": p.stdout.decode("utf-8")}))
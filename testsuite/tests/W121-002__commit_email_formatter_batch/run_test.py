@@ -0,0 +1,167 @@
+import os
+import shutil
+
+
+def push(testcase, mode, refspec):
+    """Push refspec to the bare repository configured for the given mode.
+
+    The testcase uses two copies of the bare repository: One where
+    the commit-email-formatter is called once per commit ("per-commit"
+    mode), and one where it is called in batch mode ("batch" mode).
+    The copy not being used is stored in the work directory,
+    in a directory named "bare-<mode>".
+
+    PARAMETERS
+        testcase: The testcase fixture.
+        mode: Either "per-commit" or "batch".
+        refspec: The refspec to push.
+    """
+    mode_repo_dir = os.path.join(testcase.work_dir, "bare-" + mode)
+    os.rename(mode_repo_dir, testcase.bare_repo_dir)
+    try:
+        return testcase.run(["git", "push", "origin", refspec])
+    finally:
+        os.rename(testcase.bare_repo_dir, mode_repo_dir)
+
+
+def batch_adapter_log(testcase):
+    """Return the calls logged by batch-adapter.py since the last call.
+
+    The log file is deleted afterwards.
+    """
+    log_filename = os.path.join(testcase.work_dir, "batch-adapter.log")
+    if not os.path.exists(log_filename):
+        return ""
+    with open(log_filename) as f:
+        log = f.read()
+    os.unlink(log_filename)
+    return log
+
+
+def test_commit_email_formatter_batch(testcase):
+    """Test hooks.commit-email-formatter in batch mode.
+
+    The purpose of this testcase is to verify that, in batch mode,
+    the emails sent are exactly the same as in the default mode,
+    where the hook is called once per commit, while only calling
+    the hook once per reference update.
+
+    For that, the script used as our commit-email-formatter is
+    batch-adapter.py, which calls the commit-email-formatter.py script
+    once per commit, whatever the mode is. We then push the same
+    references in both modes, and verify that the output is the same.
+    """
+    # Create the two copies of the bare repository, one for each mode.
+
+    testcase.update_git_hooks_config(
+        [
+            (
+                "hooks.commit-email-formatter",
+                os.path.join(testcase.work_dir, "batch-adapter.py"),
+            ),
+        ]
+    )
+    os.rename(
+        testcase.bare_repo_dir, os.path.join(testcase.work_dir, "bare-per-commit")
+    )
+    shutil.copytree(
+        os.path.join(testcase.work_dir, "bare-per-commit"),
+        testcase.bare_repo_dir,
+        symlinks=True,
+    )
+    testcase.update_git_hooks_config([("hooks.commit-email-formatter-batch", "true")])
+    os.rename(testcase.bare_repo_dir, os.path.join(testcase.work_dir, "bare-batch"))
+    # The hooks configuration update above used the new configuration,
+    # and therefore called batch-adapter.py in batch mode.
+    testcase.assertEqual(
+        batch_adapter_log(testcase), "--batch refs/meta/config (1 commits)\n", ""
+    )
+
+    # Push the same references in both modes, and verify that
+    # the emails are the same. Branch "master" introduces a series
+    # of commits covering the various scenarios supported by
+    # commit-email-formatter.py, including errors. Also verify
+    # that the hook was called only once per update in batch mode.
+
+    for refspec, expected_log in (
+        ("master", "--batch refs/heads/master (11 commits)\n"),
+        ("notes/commits", "--batch refs/notes/commits (1 commits)\n"),
+    ):
+        p_per_commit = push(testcase, "per-commit", refspec)
+        testcase.assertEqual(batch_adapter_log(testcase), "", refspec)
+
+        p_batch = push(testcase, "batch", refspec)
+        testcase.assertEqual(p_batch.status, p_per_commit.status, p_batch.image)
+        testcase.assertRunOutputEqual(p_batch, p_per_commit.cmd_out)
+        testcase.assertEqual(batch_adapter_log(testcase), expected_log, refspec)
+
+    # Push branch "hook-dump" in batch mode, with the hook failing
+    # as a whole. The standard email should be sent, with a warning
+    # describing the error.
+
+    with open(os.path.join(testcase.work_dir, "batch-adapter-failure"), "w") as f:
+        f.write("nonzero")
+    p = push(testcase, "batch", "hook-dump")
+    expected_out = """\
+remote: DEBUG: Content-Type: text/plain; charset="utf-8"
+remote: MIME-Version: 1.0
+remote: Content-Transfer-Encoding: quoted-printable
+remote: From: Test Suite <testsuite@adacore.com>
+remote: To: git-hooks-ci@example.com
+remote: Subject: [repo] Created branch 'hook-dump'
+remote: X-Act-Checkin: repo
+remote: X-Git-Author: Test Suite <testsuite@adacore.com>
+remote: X-Git-Refname: refs/heads/hook-dump
+remote: X-Git-Oldrev: 0000000000000000000000000000000000000000
+remote: X-Git-Newrev: c7642aaf521a65fcd2414d1b9e51f7d51b881370
+remote:
+remote: The branch 'hook-dump' was created pointing to:
+remote:
+remote:  c7642aa... Update a (dump_hook_data).
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Content-Type: text/plain; charset="utf-8"
+remote: MIME-Version: 1.0
+remote: Content-Transfer-Encoding: quoted-printable
+remote: From: Test Suite <testsuite@adacore.com>
+remote: To: git-hooks-ci@example.com
+remote: Bcc: filer@example.com
+remote: Subject: [repo/hook-dump] Update a (dump_hook_data).
+remote: X-Act-Checkin: repo
+remote: X-Git-Author: Joel Brobecker <brobecker@adacore.com>
+remote: X-Git-Refname: refs/heads/hook-dump
+remote: X-Git-Oldrev: bb7753f79d9fbab15012afb1d8214ed0fec0a00d
+remote: X-Git-Newrev: c7642aaf521a65fcd2414d1b9e51f7d51b881370
+remote:
+remote: commit c7642aaf521a65fcd2414d1b9e51f7d51b881370
+remote: Author: Joel Brobecker <brobecker@adacore.com>
+remote: Date:   Sun Aug 2 18:26:31 2020 -0700
+remote:
+remote:     Update a (dump_hook_data).
+remote:
+remote: | WARNING:
+remote: | hooks.commit-email-formatter returned nonzero: 2.
+remote: | Falling back to default email format.
+remote: |
+remote: | $ {work_dir}/batch-adapter.py --batch refs/heads/hook-dump
+remote: | Error: batch-adapter.py crashed!
+remote: |
+remote:
+remote: Diff:
+remote: ---
+remote:  a | 2 +-
+remote:  1 file changed, 1 insertion(+), 1 deletion(-)
+remote:
+remote: diff --git a/a b/a
+remote: index 18832d3..c12abce 100644
+remote: --- a/a
+remote: +++ b/a
+remote: @@ -1 +1 @@
+remote: -Hello.
+remote: +Hello there.
+To ../bare/repo.git
+ * [new branch]      hook-dump -> hook-dump
+""".format(
+        work_dir=testcase.work_dir
+    )
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
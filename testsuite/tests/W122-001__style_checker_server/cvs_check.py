@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+"""A dummy cvs_check program that passes all files except `b'.
+
+It also prints a trace, in order to allow us to verify that
+the script was called with the correct arguments.
+
+This program supports the "server" protocol (see the
+hooks.style-checker-protocol config option). Each time it is
+started, and each time it checks some files, it also appends
+a trace to a log file, in order to allow us to verify that
+the expected protocol was used.
+
+The server can also be asked to crash on its first request,
+by creating a file named cvs_check-crash, to print a warning on
+its standard error before its first response, by creating a file
+named cvs_check-stderr, or to behave like a style-checker which
+does not support the "server" protocol (that is, to wait for
+the end of its standard input, without ever responding), by
+creating a file named cvs_check-unsupported.
+"""
+import json
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def log(msg):
+    """Append msg to our log file."""
+    with open(os.path.join(script_dir, "cvs_check.log"), "a") as f:
+        f.write(msg + "\n")
+
+
+def check_files(args, filenames):
+    """Check the given files, as if called with the given arguments.
+
+    RETURN VALUE
+        A tuple with the exit status and the output of the check.
+    """
+    out = "cvs_check: %s < %s\n" % (
+        " ".join(["`%s'" % arg for arg in args]),
+        " ".join(["`%s'" % arg for arg in filenames]),
+    )
+    for filename in filenames:
+        if filename == "b":
+            out += "ERROR: %s: Copyright year in header is not up to date\n" % filename
+            return (1, out)
+    return (0, out)
+
+
+if sys.argv[1:] == ["--server"]:
+    log("server: start")
+    if os.path.exists(os.path.join(script_dir, "cvs_check-unsupported")):
+        log("server: unsupported")
+        sys.stdin.read()
+        sys.exit(1)
+    for line in sys.stdin:
+        request = json.loads(line)
+        log("server: %s" % " ".join(request["files"]))
+        if os.path.exists(os.path.join(script_dir, "cvs_check-crash")):
+            log("server: crash")
+            sys.exit(1)
+        args = []
+        if request["config"] is not None:
+            args.extend(["--config", request["config"]])
+        args.append(request["project"])
+        with open(os.path.join(request["root"], request["files"][0])):
+            # Verify that the files to check have been written
+            # where we expect them.
+            pass
+        (status, out) = check_files(args, request["files"])
+        if os.path.exists(os.path.join(script_dir, "cvs_check-stderr")):
+            log("server: stderr")
+            print("warning: using the server protocol", file=sys.stderr, flush=True)
+        print(json.dumps({"status": status, "output": out}), flush=True)
+    log("server: exit")
+else:
+    filenames = sys.stdin.read().splitlines(False)
+    log("exec: %s" % " ".join(filenames))
+    (status, out) = check_files(sys.argv[1:], filenames)
+    sys.stderr.write(out)
+    sys.exit(status)
@@ -0,0 +1,214 @@
+import os
+import re
+
+
+def style_checker_log(testcase):
+    """Return the trace logged by cvs_check.py since the last call.
+
+    The log file is deleted afterwards.
+    """
+    log_filename = os.path.join(testcase.work_dir, "cvs_check.log")
+    if not os.path.exists(log_filename):
+        return ""
+    with open(log_filename) as f:
+        log = f.read()
+    os.unlink(log_filename)
+    return log
+
+
+def test_style_checker_server(testcase):
+    """Push commits with the style-checker running as a co-process."""
+    testcase.change_email_sending_verbosity(full_verbosity=False)
+
+    # Check the commits one after the other, so that the style-checker
+    # traces are deterministic.
+    testcase.update_git_hooks_config(
+        [
+            ("hooks.style-checker-jobs", "1"),
+            ("hooks.style-checker-protocol", "server"),
+        ]
+    )
+    # The update of the hooks configuration itself was style-checked
+    # using the new configuration.
+    testcase.assertEqual(
+        style_checker_log(testcase),
+        "server: start\nserver: project.config\nserver: exit\n",
+        "config update",
+    )
+
+    # Push a branch whose commits all pass the style checks.
+    # The style-checker should only be started once, and then
+    # receive one request per commit.
+    p = testcase.run("git push origin topic-ok".split())
+    expected_out = """\
+remote: *** cvs_check: `repo' < `a'
+remote: *** cvs_check: `repo' < `c'
+remote: *** cvs_check: `repo' < `d'
+remote: DEBUG: Sending email: [repo] Created branch 'topic-ok'...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/topic-ok] Update file a...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/topic-ok] Update file c...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/topic-ok] Update file d...
+To ../bare/repo.git
+ * [new branch]      topic-ok -> topic-ok
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        style_checker_log(testcase),
+        """\
+server: start
+server: a
+server: c
+server: d
+server: exit
+""",
+        "topic-ok",
+    )
+
+    # Push a branch introducing 6 new commits, the third one having
+    # some style violations. The error should be reported exactly as
+    # when the style-checker is executed for each commit.
+    p = testcase.run("git push origin topic".split())
+    expected_out = """\
+remote: *** cvs_check: `repo' < `a'
+remote: *** cvs_check: `repo' < `c'
+remote: *** pre-commit check failed for commit: 09e18398437799f487398ef326fc94d3b298250c
+remote: *** cvs_check: `repo' < `b'
+remote: *** ERROR: b: Copyright year in header is not up to date
+remote: error: hook declined to update refs/heads/topic
+To ../bare/repo.git
+ ! [remote rejected] topic -> topic (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+"""
+    assert p.status != 0, p.image
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        style_checker_log(testcase),
+        """\
+server: start
+server: a
+server: c
+server: b
+server: exit
+""",
+        "topic",
+    )
+
+    # Same, but with the style-checker crashing on its first request.
+    # The hooks should fall back to executing the style-checker for
+    # each commit, and report the same error.
+    with open(os.path.join(testcase.work_dir, "cvs_check-crash"), "w"):
+        pass
+    p = testcase.run("git push origin topic".split())
+    expected_out = """\
+remote: *** cvs_check: `repo' < `a'
+remote: *** cvs_check: `repo' < `c'
+remote: *** pre-commit check failed for commit: 09e18398437799f487398ef326fc94d3b298250c
+remote: *** cvs_check: `repo' < `b'
+remote: *** ERROR: b: Copyright year in header is not up to date
+remote: error: hook declined to update refs/heads/topic
+To ../bare/repo.git
+ ! [remote rejected] topic -> topic (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+"""
+    assert p.status != 0, p.image
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        style_checker_log(testcase),
+        """\
+server: start
+server: a
+server: crash
+exec: a
+exec: c
+exec: b
+""",
+        "topic (crash)",
+    )
+
+    # Same, but with the style-checker printing a warning on its
+    # standard error. This is not allowed by the protocol, so the hooks
+    # should also fall back to executing the style-checker, rather
+    # than let the warning reach the user.
+    os.unlink(os.path.join(testcase.work_dir, "cvs_check-crash"))
+    with open(os.path.join(testcase.work_dir, "cvs_check-stderr"), "w"):
+        pass
+    p = testcase.run("git push origin topic".split())
+    assert p.status != 0, p.image
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        style_checker_log(testcase),
+        """\
+server: start
+server: a
+server: stderr
+exec: a
+exec: c
+exec: b
+""",
+        "topic (stderr)",
+    )
+    os.unlink(os.path.join(testcase.work_dir, "cvs_check-stderr"))
+
+    # Same, but with a style-checker which does not support
+    # the server protocol, and therefore never responds. It should
+    # get killed once it runs out of time, and the hooks should
+    # then fall back to executing the style-checker.
+    testcase.update_git_hooks_config([("hooks.hook-timeout", "2")])
+    style_checker_log(testcase)
+    with open(os.path.join(testcase.work_dir, "cvs_check-unsupported"), "w"):
+        pass
+    p = testcase.run("git push origin topic".split())
+    assert p.status != 0, p.image
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        style_checker_log(testcase),
+        """\
+server: start
+server: unsupported
+exec: a
+exec: c
+exec: b
+""",
+        "topic (unsupported)",
+    )
+
+    # Same, but with a time budget rather than a timeout. The time
+    # spent waiting for the style-checker's response counts against
+    # that budget, so the style-checker should get killed once it
+    # has used up the whole budget, and the update should then be
+    # rejected, as there is no time left to execute the style-checker.
+    # The config update is itself checked by the style-checker,
+    # so it needs to respond to that update.
+    os.unlink(os.path.join(testcase.work_dir, "cvs_check-unsupported"))
+    testcase.update_git_hooks_config(
+        [("hooks.hook-timeout", "0"), ("hooks.hook-time-budget", "2")]
+    )
+    with open(os.path.join(testcase.work_dir, "cvs_check-unsupported"), "w"):
+        pass
+    style_checker_log(testcase)
+    p = testcase.run("git push origin topic".split())
+    expected_out = """\
+remote: *** Cannot call hooks.style-checker ({work_dir}/cvs_check.py): the hooks ran for a total of N.N seconds, exceeding their time budget of 2 seconds (hooks.hook-time-budget) by N.N seconds.
+remote: error: hook declined to update refs/heads/topic
+To ../bare/repo.git
+ ! [remote rejected] topic -> topic (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+""".format(
+        work_dir=testcase.work_dir
+    )
+    assert p.status != 0, p.image
+    testcase.assertEqual(
+        re.sub(r"\b\d+\.\d+ seconds", "N.N seconds", p.cmd_out), expected_out, p.image
+    )
+    testcase.assertEqual(
+        style_checker_log(testcase),
+        """\
+server: start
+server: unsupported
+""",
+        "topic (unsupported, time budget)",
+    )
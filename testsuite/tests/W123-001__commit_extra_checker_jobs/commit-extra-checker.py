@@ -0,0 +1,33 @@
+#! /usr/bin/env python
+"""A commit-extra-checker which rejects the commits marked "(bad-commit)".
+
+If a file named slow-good-commits exists, this script takes a very
+long time to accept a commit, in order to allow us to verify that
+the calls which are no longer needed get cancelled. The waiting is
+done by a child process, which keeps the script's standard output
+open, in order to verify that the processes started by the script
+get cancelled as well.
+"""
+import json
+import os
+import subprocess
+import sys
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+cli_args = sys.argv[1:]
+stdin_data = sys.stdin.read()
+
+print("DEBUG: commit-extra-checker.py {}".format(" ".join(cli_args)))
+print("-----[ stdin ]-----")
+checker_data = json.loads(stdin_data)
+for k in sorted(checker_data.keys()):
+    print("  . {}: {}".format(k, checker_data[k]))
+print("---[ end stdin ]---")
+
+if "(bad-commit)" in stdin_data:
+    print("Error: Invalid bla bla bla. Rejecting Update.")
+    sys.exit(1)
+
+if os.path.exists(os.path.join(script_dir, "slow-good-commits")):
+    subprocess.call([sys.executable, "-c", "import time; time.sleep(120)"])
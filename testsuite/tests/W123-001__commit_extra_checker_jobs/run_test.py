@@ -0,0 +1,98 @@
+import os
+import shutil
+import time
+
+
+def push(testcase, mode, refspec):
+    """Push refspec to the bare repository configured for the given mode.
+
+    The testcase uses two copies of the bare repository: One where
+    the commit-extra-checker is called for one commit at a time
+    ("sequential" mode), and one where it is called for several
+    commits at the same time ("concurrent" mode). The copy not being
+    used is stored in the work directory, in a directory named
+    "bare-<mode>".
+
+    PARAMETERS
+        testcase: The testcase fixture.
+        mode: Either "sequential" or "concurrent".
+        refspec: The refspec to push.
+    """
+    mode_repo_dir = os.path.join(testcase.work_dir, "bare-" + mode)
+    os.rename(mode_repo_dir, testcase.bare_repo_dir)
+    try:
+        return testcase.run(["git", "push", "origin", refspec])
+    finally:
+        os.rename(testcase.bare_repo_dir, mode_repo_dir)
+
+
+def test_commit_extra_checker_jobs(testcase):
+    """Test hooks.commit-extra-checker with hooks.commit-extra-checker-jobs.
+
+    The purpose of this testcase is to verify that, when the hook
+    is called for several commits at the same time, the hooks behave
+    exactly as when the hook is called for one commit at a time.
+    For that, we push the same references in both modes, and verify
+    that the output is the same.
+    """
+    testcase.change_email_sending_verbosity(full_verbosity=False)
+
+    # Create the two copies of the bare repository, one for each mode.
+
+    testcase.update_git_hooks_config(
+        [
+            (
+                "hooks.commit-extra-checker",
+                os.path.join(testcase.work_dir, "commit-extra-checker.py"),
+            ),
+        ]
+    )
+    os.rename(
+        testcase.bare_repo_dir, os.path.join(testcase.work_dir, "bare-sequential")
+    )
+    shutil.copytree(
+        os.path.join(testcase.work_dir, "bare-sequential"),
+        testcase.bare_repo_dir,
+        symlinks=True,
+    )
+    testcase.update_git_hooks_config([("hooks.commit-extra-checker-jobs", "4")])
+    os.rename(
+        testcase.bare_repo_dir, os.path.join(testcase.work_dir, "bare-concurrent")
+    )
+
+    # Push the same references in both modes, and verify that
+    # the results are the same.
+
+    sequential_out = {}
+    for refspec in (
+        "single-commit-accept",
+        "single-commit-reject",
+        "multiple-commits-accept-all-new",
+        "multiple-commits-accept-some-preexisting",
+        "multiple-commits-reject-first",
+        "multiple-commits-reject-middle",
+        "multiple-commits-reject-last",
+        "new-branch-multiple-commits-reject-first",
+        ":delete-me",
+    ):
+        p_sequential = push(testcase, "sequential", refspec)
+        sequential_out[refspec] = p_sequential.cmd_out
+        p_concurrent = push(testcase, "concurrent", refspec)
+        testcase.assertEqual(
+            p_concurrent.status, p_sequential.status, p_concurrent.image
+        )
+        testcase.assertRunOutputEqual(p_concurrent, p_sequential.cmd_out)
+
+    # Push a branch whose first commit gets rejected, with the hook
+    # taking a very long time to accept the other commits. The calls
+    # for those other commits should be cancelled as soon as the first
+    # commit gets rejected, rather than waited for.
+
+    with open(os.path.join(testcase.work_dir, "slow-good-commits"), "w"):
+        pass
+    start_time = time.monotonic()
+    p = push(testcase, "concurrent", "multiple-commits-reject-first")
+    elapsed_time = time.monotonic() - start_time
+    testcase.assertNotEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, sequential_out["multiple-commits-reject-first"])
+    assert elapsed_time < 60, "push took %.1f seconds" % elapsed_time
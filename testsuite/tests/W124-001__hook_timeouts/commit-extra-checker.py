@@ -0,0 +1,28 @@
+#! /usr/bin/env python
+"""A commit-extra-checker which takes some time to check some commits.
+
+  - Commits marked "(slow)" take a little over a second to check;
+  - Commits marked "(hung)" never finish being checked. The script
+    also starts a child process which never finishes either, and
+    writes its PID in a file named hung-child.pid, in order to allow
+    us to verify that this child process gets killed as well.
+"""
+import json
+import os
+from subprocess import Popen
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+checker_data = json.loads(sys.stdin.read())
+print("Checking {}...".format(checker_data["subject"]), flush=True)
+
+if "(slow)" in checker_data["subject"]:
+    time.sleep(1.2)
+
+if "(hung)" in checker_data["subject"]:
+    child = Popen(["sleep", "600"])
+    with open(os.path.join(script_dir, "hung-child.pid"), "w") as f:
+        f.write(str(child.pid))
+    time.sleep(600)
@@ -0,0 +1,107 @@
+import os
+import re
+import time
+
+
+def normalize_durations(out):
+    """Return out with all durations replaced by "N.N seconds".
+
+    The durations reported when a hook runs out of time depend on
+    the speed of the machine running the testsuite.
+    """
+    return re.sub(r"\b\d+\.\d+ seconds", "N.N seconds", out)
+
+
+def process_running_p(pid):
+    """Return True if the process with the given PID is still running."""
+    try:
+        with open("/proc/{}/stat".format(pid)) as f:
+            stat = f.read()
+    except FileNotFoundError:
+        return False
+    # The process' state is the first field after the command name
+    # (which is between parentheses); "Z" means zombie.
+    return stat.rsplit(")", 1)[1].split()[0] != "Z"
+
+
+def test_hook_timeouts(testcase):
+    """Test the hooks.hook-timeout and hooks.hook-time-budget options."""
+    testcase.change_email_sending_verbosity(full_verbosity=False)
+    testcase.update_git_hooks_config(
+        [
+            (
+                "hooks.commit-extra-checker",
+                os.path.join(testcase.work_dir, "commit-extra-checker.py"),
+            ),
+            ("hooks.hook-timeout", "5"),
+        ]
+    )
+
+    # Push a commit for which the commit-extra-checker never returns.
+    # The update should be rejected once the hook has run out of time,
+    # and the hook should be killed, along with the process it started.
+
+    start_time = time.monotonic()
+    p = testcase.run("git push origin hung-commit".split())
+    elapsed_time = time.monotonic() - start_time
+    expected_out = """\
+remote: *** hooks.commit-extra-checker ({work_dir}/commit-extra-checker.py) timed out and was killed: it ran for N.N seconds, exceeding its time limit of 5 seconds (hooks.hook-timeout) by N.N seconds.
+remote: *** Checking Update a (hung)...
+remote: error: hook declined to update refs/heads/hung-commit
+To ../bare/repo.git
+ ! [remote rejected] hung-commit -> hung-commit (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+""".format(
+        work_dir=testcase.work_dir
+    )
+    testcase.assertNotEqual(p.status, 0, p.image)
+    testcase.assertEqual(normalize_durations(p.cmd_out), expected_out, p.image)
+    assert elapsed_time < 60, "push took %.1f seconds" % elapsed_time
+
+    with open(os.path.join(testcase.work_dir, "hung-child.pid")) as f:
+        hung_child_pid = int(f.read())
+    for _ in range(50):
+        if not process_running_p(hung_child_pid):
+            break
+        time.sleep(0.1)
+    assert not process_running_p(hung_child_pid), "hook's child still running"
+
+    # Push a branch with 3 commits, each taking a little over one
+    # second to check, with a time budget of 3 seconds for all hooks.
+    # The third commit should run out of time.
+
+    testcase.update_git_hooks_config(
+        [("hooks.hook-timeout", "0"), ("hooks.hook-time-budget", "3")]
+    )
+    p = testcase.run("git push origin slow-commits".split())
+    expected_out = """\
+remote: Checking Update a, step 1 (slow)...
+remote: Checking Update a, step 2 (slow)...
+remote: *** hooks.commit-extra-checker ({work_dir}/commit-extra-checker.py) timed out and was killed: the hooks ran for a total of N.N seconds, exceeding their time budget of 3 seconds (hooks.hook-time-budget) by N.N seconds.
+remote: *** Checking Update a, step 3 (slow)...
+remote: error: hook declined to update refs/heads/slow-commits
+To ../bare/repo.git
+ ! [remote rejected] slow-commits -> slow-commits (hook declined)
+error: failed to push some refs to '../bare/repo.git'
+""".format(
+        work_dir=testcase.work_dir
+    )
+    testcase.assertNotEqual(p.status, 0, p.image)
+    testcase.assertEqual(normalize_durations(p.cmd_out), expected_out, p.image)
+
+    # Same with a larger time budget, with debug traces enabled.
+    # The push should be accepted, and the debug traces should show
+    # the resources used by each call to the commit-extra-checker.
+
+    testcase.update_git_hooks_config([("hooks.hook-time-budget", "60")])
+    testcase.set_debug_level(3)
+    p = testcase.run("git push origin slow-commits".split())
+    testcase.assertEqual(p.status, 0, p.image)
+    usage_traces = re.findall(
+        r"DEBUG: hooks\.commit-extra-checker \(.*\): wall time: (\d+\.\d+)s,"
+        r" cpu time: \d+\.\d+s, max rss: \d+ KB",
+        p.cmd_out,
+    )
+    testcase.assertEqual(len(usage_traces), 3, p.image)
+    for wall_time in usage_traces:
+        assert float(wall_time) >= 1.2, p.image
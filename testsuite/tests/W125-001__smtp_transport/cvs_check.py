@@ -0,0 +1,2 @@
+#! /usr/bin/env python
+"""A dummy cvs_check program that does nothing."""
@@ -0,0 +1,209 @@
+import os
+from subprocess import Popen
+import sys
+import time
+
+
+def start_smtp_server(testcase):
+    """Start a stand-in SMTP server (see smtp_server.py) in the background.
+
+    RETURN VALUE
+        A tuple with the Popen object of the server's process,
+        and the name of the server, in "host:port" format.
+    """
+    port_filename = os.path.join(testcase.work_dir, "smtp-server.port")
+    server = Popen(
+        [
+            sys.executable,
+            os.path.join(testcase.work_dir, "smtp_server.py"),
+            testcase.work_dir,
+        ]
+    )
+    for _ in range(100):
+        if os.path.exists(port_filename):
+            break
+        time.sleep(0.1)
+    with open(port_filename) as f:
+        return (server, "localhost:" + f.read())
+
+
+def smtp_server_log(testcase):
+    """Return the trace logged by the SMTP server since the last call.
+
+    The log file is deleted afterwards.
+    """
+    log_filename = os.path.join(testcase.work_dir, "smtp-server.log")
+    if not os.path.exists(log_filename):
+        return ""
+    with open(log_filename) as f:
+        log = f.read()
+    os.unlink(log_filename)
+    return log
+
+
+def set_smtp_server_failure(testcase, failure):
+    """Tell the SMTP server how to fail (None to stop failing)."""
+    failure_filename = os.path.join(testcase.work_dir, "smtp-server-failure")
+    if failure is None:
+        os.unlink(failure_filename)
+    else:
+        with open(failure_filename, "w") as f:
+            f.write(failure)
+
+
+def test_smtp_transport(testcase):
+    """Test sending emails via SMTP (hooks.email-transport = smtp)."""
+    (server, server_name) = start_smtp_server(testcase)
+    try:
+        check_smtp_transport(testcase, server, server_name)
+    finally:
+        server.kill()
+        server.wait()
+
+
+def check_smtp_transport(testcase, server, server_name):
+    """Implement test_smtp_transport.
+
+    PARAMETERS
+        testcase: The testcase fixture.
+        server: The Popen object of the SMTP server's process.
+        server_name: The name of the SMTP server ("host:port").
+    """
+    testcase.change_email_sending_verbosity(full_verbosity=False)
+    testcase.update_git_hooks_config(
+        [("hooks.email-transport", "smtp"), ("hooks.smtp-server", server_name)]
+    )
+    # The hooks configuration update above used the new configuration,
+    # and therefore sent its email via SMTP.
+    testcase.assertEqual(
+        smtp_server_log(testcase),
+        """\
+connect
+message: testsuite@adacore.com -> git-hooks-ci@example.com, filer@example.com: [repo(refs/meta/config)] Update hooks config
+disconnect
+""",
+        "config update",
+    )
+
+    # Push a branch introducing 3 new commits. The emails should all
+    # be sent over the same connection, without any delay between them.
+
+    p = testcase.run("git push origin multiple-commits-accept-all-new".split())
+    expected_out = """\
+To ../bare/repo.git
+   1e1e706..309196c  multiple-commits-accept-all-new -> multiple-commits-accept-all-new
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        smtp_server_log(testcase),
+        """\
+connect
+message: testsuite@adacore.com -> git-hooks-ci@example.com, filer@example.com: [repo/multiple-commits-accept-all-new] Add b
+message: testsuite@adacore.com -> git-hooks-ci@example.com, filer@example.com: [repo/multiple-commits-accept-all-new] Add c
+message: testsuite@adacore.com -> git-hooks-ci@example.com, filer@example.com: [repo/multiple-commits-accept-all-new] Remove a (not needed anymore)
+disconnect
+""",
+        "multiple-commits-accept-all-new",
+    )
+
+    # Push a branch introducing 1 new commit, with the SMTP server
+    # failing with a transient error. Sending the email should be
+    # retried, after a delay, using a new connection.
+
+    set_smtp_server_failure(testcase, "transient")
+    p = testcase.run("git push origin single-commit-accept".split())
+    expected_out = """\
+remote: DEBUG: SMTP retry delay...
+To ../bare/repo.git
+   1e1e706..f109361  single-commit-accept -> single-commit-accept
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        smtp_server_log(testcase),
+        """\
+connect
+message (421): [repo/single-commit-accept] This is an ok commit touching file a.
+disconnect
+connect
+message: testsuite@adacore.com -> git-hooks-ci@example.com, filer@example.com: [repo/single-commit-accept] This is an ok commit touching file a.
+disconnect
+""",
+        "single-commit-accept",
+    )
+
+    # Push a branch introducing 1 new commit, with the SMTP server
+    # refusing one of the recipients. The email should be sent via
+    # SMTP to the other recipients, and with sendmail to the refused
+    # recipient.
+
+    set_smtp_server_failure(testcase, "refuse filer@example.com")
+    p = testcase.run("git push origin single-commit-reject".split())
+    expected_out = """\
+remote: DEBUG: Sending email: [repo/single-commit-reject] modify a with some contents (bad-commit)...
+To ../bare/repo.git
+   1e1e706..2c27994  single-commit-reject -> single-commit-reject
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        smtp_server_log(testcase),
+        """\
+connect
+recipient (550): filer@example.com
+message: testsuite@adacore.com -> git-hooks-ci@example.com: [repo/single-commit-reject] modify a with some contents (bad-commit)
+disconnect
+""",
+        "single-commit-reject",
+    )
+    set_smtp_server_failure(testcase, None)
+
+    # Push a branch introducing 3 new commits, with the SMTP server
+    # rejecting all emails with a permanent error. The hooks should
+    # fall back to sendmail for all the emails, without retrying.
+
+    set_smtp_server_failure(testcase, "permanent")
+    p = testcase.run("git push origin multiple-commits-reject-first".split())
+    expected_out = """\
+remote: DEBUG: Sending email: [repo/multiple-commits-reject-first] Modify `a' and add `b' (bad-commit)...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/multiple-commits-reject-first] Fix `a' and delete `b' (no longer needed, after all)...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/multiple-commits-reject-first] Really fix `a' this time (I think?!?)...
+To ../bare/repo.git
+   1e1e706..2d5e188  multiple-commits-reject-first -> multiple-commits-reject-first
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
+    testcase.assertEqual(
+        smtp_server_log(testcase),
+        """\
+connect
+message (554): [repo/multiple-commits-reject-first] Modify `a' and add `b' (bad-commit)
+disconnect
+""",
+        "multiple-commits-reject-first",
+    )
+    set_smtp_server_failure(testcase, None)
+
+    # Same, but with the SMTP server no longer running. The hooks
+    # should make SMTP_MAX_ATTEMPTS (3) attempts at sending the first
+    # email, and then fall back to sendmail for all the emails.
+
+    server.kill()
+    server.wait()
+    p = testcase.run("git push origin multiple-commits-reject-last".split())
+    expected_out = """\
+remote: DEBUG: SMTP retry delay...
+remote: DEBUG: SMTP retry delay...
+remote: DEBUG: Sending email: [repo/multiple-commits-reject-last] Modify `a' and add `b'...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/multiple-commits-reject-last] Fix `a' and delete `b' (no longer needed, after all)...
+remote: DEBUG: inter-email delay...
+remote: DEBUG: Sending email: [repo/multiple-commits-reject-last] Really fix `a' this time (bad-commit)...
+To ../bare/repo.git
+   1e1e706..d2593ae  multiple-commits-reject-last -> multiple-commits-reject-last
+"""
+    testcase.assertEqual(p.status, 0, p.image)
+    testcase.assertRunOutputEqual(p, expected_out)
@@ -0,0 +1,135 @@
+#! /usr/bin/env python
+"""A stand-in SMTP server, logging the emails it receives.
+
+Usage: smtp_server.py <dir>
+
+The server listens on a port chosen by the system, whose number it
+writes in <dir>/smtp-server.port once ready. Instead of delivering
+the emails it receives, it logs them in <dir>/smtp-server.log,
+along with the connections being opened and closed.
+
+The server can also be asked to fail, by creating a file named
+<dir>/smtp-server-failure, containing either:
+  - "transient": The server replies to the next message with
+    a transient error (421), and closes the connection;
+  - "permanent": The server rejects all messages with a permanent
+    error (554);
+  - "refuse <address>": The server refuses the given recipient
+    (550), while accepting the other ones.
+"""
+from email.parser import Parser
+import os
+import socketserver
+import sys
+
+work_dir = sys.argv[1]
+
+
+def log(msg):
+    """Append msg to our log file."""
+    with open(os.path.join(work_dir, "smtp-server.log"), "a") as f:
+        f.write(msg + "\n")
+
+
+def failure_mode(message_p=True):
+    """Return the contents of the smtp-server-failure file (None if none).
+
+    Transient failures only apply to one message, so message_p should
+    be False if the caller is not about to reply to a message.
+    """
+    failure_filename = os.path.join(work_dir, "smtp-server-failure")
+    if not os.path.exists(failure_filename):
+        return None
+    with open(failure_filename) as f:
+        failure = f.read().strip()
+    if failure == "transient" and message_p:
+        # Only fail once.
+        os.unlink(failure_filename)
+    return failure
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """A (minimal) SMTP session."""
+
+    def reply(self, *lines):
+        """Send the given reply lines to the client."""
+        self.wfile.write("".join(line + "\r\n" for line in lines).encode("ascii"))
+        self.wfile.flush()
+
+    def handle(self):
+        log("connect")
+        self.reply("220 localhost stand-in SMTP server")
+        from_email = None
+        to_emails = []
+        for line in self.rfile:
+            command = line.decode("ascii").rstrip("\r\n")
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-localhost", "250-PIPELINING", "250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                from_email = command.split(":", 1)[1].split()[0].strip("<>")
+                to_emails = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                to_email = command.split(":", 1)[1].strip().strip("<>")
+                if failure_mode(message_p=False) == "refuse " + to_email:
+                    log("recipient (550): {}".format(to_email))
+                    self.reply("550 No such user")
+                else:
+                    to_emails.append(to_email)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data_lines = []
+                for data_line in self.rfile:
+                    data_line = data_line.decode("utf-8").rstrip("\r\n")
+                    if data_line == ".":
+                        break
+                    if data_line.startswith("."):
+                        data_line = data_line[1:]
+                    data_lines.append(data_line)
+                subject = "".join(
+                    Parser().parsestr("\n".join(data_lines))["Subject"].splitlines()
+                )
+                failure = failure_mode()
+                if failure == "transient":
+                    log("message (421): {}".format(subject))
+                    # Log the disconnection before replying, as the client
+                    # may connect again as soon as it gets the reply.
+                    log("disconnect")
+                    self.reply("421 Service not available, try again later")
+                    return
+                elif failure == "permanent":
+                    log("message (554): {}".format(subject))
+                    self.reply("554 Transaction failed")
+                else:
+                    log(
+                        "message: {} -> {}: {}".format(
+                            from_email, ", ".join(to_emails), subject
+                        )
+                    )
+                    self.reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                # Same as for transient failures above.
+                log("disconnect")
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+        log("disconnect")
+
+
+class SMTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+
+
+with SMTPServer(("localhost", 0), SMTPHandler) as server:
+    port_filename = os.path.join(work_dir, "smtp-server.port")
+    with open(port_filename + ".tmp", "w") as f:
+        f.write(str(server.server_address[1]))
+    os.rename(port_filename + ".tmp", port_filename)
+    server.serve_forever()
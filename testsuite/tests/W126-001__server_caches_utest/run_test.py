@@ -0,0 +1,26 @@
+def test_server_caches(testcase):
+    """Unit test the caches warmed by the git-hooks server."""
+    testcase.run_unit_test_script(
+        expected_out="""\
+DEBUG: Warming the caches...
+True
+True
+True
+adacore.com
+DEBUG: Packfiles...
+True
+False
+[]
+DEBUG: Unchanged references...
+True
+True
+DEBUG: Update of the config ref...
+True
+True
+example.com
+DEBUG: Invalid config file...
+False
+DEBUG: Repository without any config...
+None
+""",
+    )
@@ -0,0 +1,82 @@
+import json
+import os
+
+import config
+from git import git
+import git_odb
+import server
+
+# Make sure the repository has some packfiles, with the config
+# in one of them.
+git.repack("-a", "-d")
+(idx_path,) = [
+    os.path.join(os.getcwd(), "objects", "pack", f)
+    for f in os.listdir(os.path.join("objects", "pack"))
+    if f.endswith(".idx")
+]
+cfg_sha = git.rev_parse(config.CONFIG_REF + ":" + config.CONFIG_FILENAME, _decode=True)
+
+hooks_server = server.Server("unused.sock")
+request = {"env": {"GIT_DIR": "."}, "cwd": os.getcwd()}
+
+print("DEBUG: Warming the caches...")
+hooks_server.warm_caches(request)
+print(list(git_odb.pack_file.cache) == [idx_path])
+print(hooks_server.config_shas[os.getcwd()][1] == cfg_sha)
+print(config.git_config_preloaded_p(cfg_sha))
+
+# The preloaded config is used in priority over the config cache.
+with open(config.CONFIG_CACHE_FILENAME, "w") as f:
+    json.dump(
+        {
+            "key": config.git_config_cache_key(cfg_sha),
+            "config": dict.fromkeys(config.GIT_CONFIG_OPTS, "cached.example.com"),
+        },
+        f,
+    )
+print(config.git_config("hooks.from-domain"))
+
+print("DEBUG: Packfiles...")
+pack = git_odb.pack_file(idx_path)
+print(git_odb.pack_file(idx_path) is pack)
+# A modified packfile is mapped again.
+os.utime(idx_path[: -len(".idx")] + ".pack", ns=(0, 0))
+print(git_odb.pack_file(idx_path) is pack)
+# Packfiles modified since they were cached are forgotten.
+git_odb.pack_file.cache[idx_path] = ((0, 0), pack)
+git_odb.prune_pack_files()
+print(list(git_odb.pack_file.cache))
+
+print("DEBUG: Unchanged references...")
+# The config file's SHA1 is not resolved again.
+config_file_sha = server.config_file_sha
+server.config_file_sha = lambda *args: print("config_file_sha called")
+hooks_server.warm_caches(request)
+server.config_file_sha = config_file_sha
+print(hooks_server.config_shas[os.getcwd()][1] == cfg_sha)
+print(list(git_odb.pack_file.cache) == [idx_path])
+
+print("DEBUG: Update of the config ref...")
+new_cfg_sha = git.hash_object(
+    "-w", "--stdin", _input=b"[hooks]\n\tfrom-domain = example.com\n", _decode=True
+)
+new_tree = git.mktree(
+    _input=b"100644 blob %s\tproject.config\n" % new_cfg_sha.encode(), _decode=True
+)
+new_commit = git.commit_tree(new_tree, "-m", "new config", _decode=True)
+git.update_ref(config.CONFIG_REF, new_commit)
+hooks_server.warm_caches(request)
+print(hooks_server.config_shas[os.getcwd()][1] == new_cfg_sha)
+print(config.git_config_preloaded_p(new_cfg_sha))
+print(config.load_git_config_cache(new_cfg_sha)["hooks.from-domain"])
+
+print("DEBUG: Invalid config file...")
+invalid_cfg_sha = git.hash_object("-w", "--stdin", _input=b"[hooks\n", _decode=True)
+config.preload_git_config(invalid_cfg_sha, b"[hooks\n")
+print(config.git_config_preloaded_p(invalid_cfg_sha))
+
+print("DEBUG: Repository without any config...")
+git.init("--bare", "-q", "../empty.git")
+empty_git_dir = os.path.normpath(os.path.join(os.getcwd(), "..", "empty.git"))
+hooks_server.warm_caches({"env": {"GIT_DIR": "."}, "cwd": empty_git_dir})
+print(hooks_server.config_shas[empty_git_dir][1])
@@ -0,0 +1,18 @@
+#! /usr/bin/env python
+"""A hooks.mailinglist script which never returns.
+
+It also starts a child process which never returns either, and
+records its PID in a file, so the testcase can verify that it
+got killed too.
+"""
+import os
+import subprocess
+import sys
+import time
+
+p = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(3600)"])
+with open(os.path.join(os.path.dirname(__file__), "hung-child.pid"), "w") as f:
+    f.write(str(p.pid))
+print("never-sent@example.com")
+sys.stdout.flush()
+time.sleep(3600)
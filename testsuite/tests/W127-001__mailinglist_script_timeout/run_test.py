@@ -0,0 +1,67 @@
+import os
+import re
+import time
+
+
+def process_running_p(pid):
+    """Return True if the process with the given PID is still running."""
+    try:
+        with open("/proc/{}/stat".format(pid)) as f:
+            stat = f.read()
+    except FileNotFoundError:
+        return False
+    # The process' state is the first field after the command name
+    # (which is between parentheses); "Z" means zombie.
+    return stat.rsplit(")", 1)[1].split()[0] != "Z"
+
+
+def test_mailinglist_script_timeout(testcase):
+    """Test a hooks.mailinglist script which never returns."""
+    # First, adjust the project.config file to use a script to
+    # compute the email recipients.  We have to do it manually
+    # here, because we need to provide the full path to that
+    # script, which isn't known until now.
+    with open("%s/hooks_config" % testcase.work_dir) as f:
+        project_config = f.read() % {"TEST_DIR": testcase.work_dir}
+    with open(os.path.join(testcase.repo_dir, "project.config"), "w") as f:
+        f.write(project_config)
+    p = testcase.run(["git", "commit", "-m", "fix hooks.mailinglist", "project.config"])
+    assert p.status == 0, p.image
+
+    p = testcase.run(
+        ["git", "push", "origin", "refs/heads/meta/config:refs/meta/config"]
+    )
+    assert p.status == 0, p.image
+
+    p = testcase.run("git checkout master".split())
+    assert p.status == 0, p.image
+
+    # Push branch master. The script should be killed each time
+    # it runs out of time, along with the process it started, and
+    # the emails should still be sent, but without any recipient
+    # computed by the script (including the one it printed before
+    # hanging).
+    start_time = time.monotonic()
+    p = testcase.run(["git", "push", "origin", "master"])
+    elapsed_time = time.monotonic() - start_time
+    testcase.assertEqual(p.status, 0, p.image)
+    out = re.sub(r"\b\d+\.\d+ seconds", "N.N seconds", p.cmd_out)
+    timeout_warning = (
+        "remote: *** !!! hooks.mailinglist ({work_dir}/email_to.py) timed out"
+        " and was killed: it ran for N.N seconds, exceeding its time limit"
+        " of 2 seconds (hooks.hook-timeout) by N.N seconds.\n".format(
+            work_dir=testcase.work_dir
+        )
+    )
+    testcase.assertEqual(out.count(timeout_warning), 4, p.image)
+    testcase.assertEqual(out.count("remote: To:\n"), 4, p.image)
+    assert "never-sent@example.com" not in out, p.image
+    assert elapsed_time < 60, "push took %.1f seconds" % elapsed_time
+
+    with open(os.path.join(testcase.work_dir, "hung-child.pid")) as f:
+        hung_child_pid = int(f.read())
+    for _ in range(50):
+        if not process_running_p(hung_child_pid):
+            break
+        time.sleep(0.1)
+    assert not process_running_p(hung_child_pid), "script's child still running"